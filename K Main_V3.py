@@ -4,10 +4,10 @@ import time
 import logging
 import traceback
 import keyboard
-from PyQt5.QtWidgets import QApplication, QMenu, QSystemTrayIcon, QDialog
-from PyQt5.QtCore import QObject, Qt, pyqtSignal
+from PyQt5.QtWidgets import QApplication, QMenu, QSystemTrayIcon, QDialog, QFileDialog, QMessageBox, QProgressDialog
+from PyQt5.QtCore import QObject, Qt, QTimer, pyqtSignal
 from PyQt5.QtGui import QIcon, QPixmap
-from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from PyQt5.QtNetwork import QLocalSocket
 
 # 导入 Container 和 Views
 from core.container import AppContainer
@@ -15,13 +15,17 @@ from core.signals import app_signals
 from ui.quick_window import QuickWindow
 from ui.main_window import MainWindow
 from ui.ball import FloatingBall
-from core.settings import load_setting
-
-SERVER_NAME = "K_KUAIJIBIJI_SINGLE_INSTANCE_SERVER"
+from ui.utils import close_icon_atlas
+from core.settings import load_setting, flush_settings
+from core.config import SERVER_NAME, JOURNAL_COMPACT_INTERVAL_MS
+from services.capture_daemon import CaptureLink, MessageServer, DAEMON_FLAG, daemon_command, run_daemon
+from services.background_task import BackgroundTask
 
 # --- Setup Logging ---
 log_format = '%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s'
-logging.basicConfig(filename='app_log.txt', level=logging.DEBUG, format=log_format, filemode='w')
+def setup_logging(filename='app_log.txt'):
+    # 守护进程写自己的日志，不覆盖界面进程的 app_log.txt
+    logging.basicConfig(filename=filename, level=logging.DEBUG, format=log_format, filemode='w')
 def excepthook(exc_type, exc_value, exc_tb):
     logging.error("Unhandled exception:", exc_info=(exc_type, exc_value, exc_tb))
     traceback.print_exception(exc_type, exc_value, exc_tb)
@@ -45,6 +49,9 @@ class AppManager(QObject):
         self.quick_window = None
         self.ball = None
         self.tray_icon = None
+        self.capture_link = None
+        self._archived_count = 0
+        self._sync_task = None
         
         # 全局热键信号
         self.hotkey_signal = HotkeySignal()
@@ -118,6 +125,15 @@ class AppManager(QObject):
         
         self.quick_window.cm.data_captured.connect(self._on_clipboard_data_captured)
         
+        # 剪贴板采集交给守护进程；守护进程就绪前（或无法启动时）仍由快速笔记窗口在本进程内采集
+        self.capture_link = CaptureLink(parent=self)
+        self.capture_link.ready.connect(self._on_capture_daemon_ready)
+        self.capture_link.lost.connect(self._on_capture_daemon_lost)
+        self.capture_link.captured.connect(self._on_daemon_captured)
+        self.capture_link.updated.connect(self.service.notify_external_change)
+        self.app.focusWindowChanged.connect(self._on_focus_window_changed)
+        self.capture_link.start(*daemon_command(__file__))
+        
         self._init_tray_icon()
         
         # 连接全局信号
@@ -134,12 +150,40 @@ class AppManager(QObject):
 
         self.show_quick_window()
 
+        # 启动完成后再开始归档冷数据：每次移一批，批与批之间回到事件循环，不阻塞界面
+        QTimer.singleShot(30000, self._archive_cold_ideas)
+
+        # 变更日志在 AppContainer 启动时已压缩一次；常驻运行时定期再压缩
+        self._journal_timer = QTimer(self)
+        self._journal_timer.setInterval(JOURNAL_COMPACT_INTERVAL_MS)
+        self._journal_timer.timeout.connect(self._compact_journal)
+        self._journal_timer.start()
+
+    def _archive_cold_ideas(self):
+        try:
+            moved = self.service.archive_cold_ideas(emit_signal=False)
+        except Exception as e:
+            logging.error(f"Archiving cold notes failed: {e}", exc_info=True)
+            moved = 0
+        self._archived_count += moved
+        if moved:
+            QTimer.singleShot(200, self._archive_cold_ideas)
+        elif self._archived_count:
+            logging.info(f"Archived {self._archived_count} cold notes")
+            app_signals.data_changed.emit()
+
+    def _compact_journal(self):
+        try:
+            deleted = self.service.compact_journal()
+            if deleted: logging.info(f"Compacted {deleted} change journal entries")
+        except Exception as e:
+            logging.error(f"Compacting change journal failed: {e}", exc_info=True)
+
     def _on_hotkey_triggered(self):
         self.hotkey_signal.activated.emit()
 
     def _init_tray_icon(self):
         temp_ball = FloatingBall(None)
-        temp_ball.timer.stop()
         temp_ball.is_writing = False
         temp_ball.pen_angle = -45
         temp_ball.pen_x = 0; temp_ball.pen_y = 0; temp_ball.book_y = 0
@@ -159,6 +203,9 @@ class AppManager(QObject):
         action_show = menu.addAction("显示主界面"); action_show.triggered.connect(self.show_main_window)
         action_quick = menu.addAction("显示快速笔记"); action_quick.triggered.connect(self.show_quick_window)
         menu.addSeparator()
+        action_export = menu.addAction("导出同步包..."); action_export.triggered.connect(self.export_changeset)
+        action_import = menu.addAction("导入同步包..."); action_import.triggered.connect(self.import_changeset)
+        menu.addSeparator()
         action_quit = menu.addAction("退出程序"); action_quit.triggered.connect(self.quit_application)
         
         self.tray_icon.setContextMenu(menu)
@@ -171,6 +218,24 @@ class AppManager(QObject):
     def _on_clipboard_data_captured(self, idea_id):
         self.ball.trigger_clipboard_feedback()
 
+    def _on_capture_daemon_ready(self):
+        self.quick_window.set_clipboard_capture(False)
+        self._on_focus_window_changed()
+
+    def _on_capture_daemon_lost(self):
+        # 守护进程意外退出：先恢复本进程内采集，重启成功后 ready 会再次关闭
+        self.quick_window.set_clipboard_capture(True)
+
+    def _on_daemon_captured(self, idea_id):
+        # 记录由守护进程写入，本进程的缓存需手动作废
+        self.service.notify_external_change(idea_id)
+        self._on_clipboard_data_captured(idea_id)
+
+    def _on_focus_window_changed(self, *args):
+        # 与 ClipboardManager 的规则一致：只有主界面或快速笔记窗口在前台时才不采集
+        active = isinstance(QApplication.activeWindow(), (MainWindow, QuickWindow))
+        self.capture_link.set_ui_active(active)
+
     def _force_activate(self, window):
         if not window: return
         window.show()
@@ -185,6 +250,71 @@ class AppManager(QObject):
     def toggle_main_window(self):
         if self.main_window.isVisible() and not self.main_window.isMinimized(): self.main_window.hide()
         else: self.show_main_window()
+    def export_changeset(self):
+        path, _ = QFileDialog.getSaveFileName(None, "导出同步包", "notes.rnsync", "同步包 (*.rnsync)")
+        if not path: return
+        self._run_sync_task(
+            "导出同步包", "已导出 {} 条…",
+            lambda sync, progress: sync.export_changeset(path, progress=progress), self._on_changeset_exported
+        )
+
+    def _on_changeset_exported(self, stats):
+        scope = "全部笔记" if stats['full'] else "上次导出后的变化"
+        QMessageBox.information(None, "导出同步包", f"已导出{scope}：{stats['ideas']} 条，删除 {stats['deleted']} 条")
+
+    def import_changeset(self):
+        path, _ = QFileDialog.getOpenFileName(None, "导入同步包", "", "同步包 (*.rnsync);;所有文件 (*)")
+        if not path: return
+        self._run_sync_task(
+            "导入同步包", "已合并 {} 条…",
+            lambda sync, progress: sync.import_changeset(path, progress=progress), self._on_changeset_imported,
+            # 写入发生在后台连接上；部分批次可能已经提交，无论成败都作废缓存并刷新界面
+            changes_data=True
+        )
+
+    def _on_changeset_imported(self, stats):
+        QMessageBox.information(
+            None, "导入同步包",
+            f"新增 {stats['inserted']} 条，更新 {stats['updated']} 条，删除 {stats['deleted']} 条，未变 {stats['skipped']} 条"
+        )
+
+    def _run_sync_task(self, title, progress_text, work, on_finished, changes_data=False):
+        """在后台线程用独立连接执行同步包的导出 / 导入，期间显示进度；同一时间只执行一个"""
+        if self._sync_task is not None:
+            QMessageBox.information(None, title, "上一个同步任务尚未完成")
+            return
+
+        def job(progress):
+            sync = self.container.open_sync_service()
+            try:
+                return work(sync, progress)
+            finally:
+                sync.repo.db.close()
+
+        dialog = QProgressDialog("正在准备…", None, 0, 0)
+        dialog.setWindowTitle(title)
+        dialog.setMinimumDuration(500)
+        task = BackgroundTask(job, name='changeset-sync', parent=self)
+        task.progress.connect(lambda count: dialog.setLabelText(progress_text.format(count)))
+
+        def done():
+            dialog.close()
+            self._sync_task = None
+            if changes_data: self.service.notify_external_change()
+
+        def finished(result):
+            done()
+            on_finished(result)
+
+        def failed(error):
+            done()
+            QMessageBox.warning(None, title, f"{title}失败：{error}")
+
+        task.finished.connect(finished)
+        task.failed.connect(failed)
+        self._sync_task = task
+        task.start()
+
     def on_main_window_closing(self):
         if self.main_window: self.main_window.hide()
     def quit_application(self):
@@ -209,26 +339,39 @@ class AppManager(QObject):
             except Exception as e:
                 logging.error(f"Failed to save main window state: {e}", exc_info=True)
         
+        for window in (self.quick_window, self.main_window):
+            if window:
+                try:
+                    window.shutdown()
+                except Exception as e:
+                    logging.error(f"Failed to stop background searches: {e}", exc_info=True)
+
+        if self.capture_link:
+            self.capture_link.stop_daemon()
+        
+        flush_settings()
+        close_icon_atlas()
         self.app.quit()
 
 def main():
+    if DAEMON_FLAG in sys.argv:
+        setup_logging('capture_log.txt')
+        sys.exit(run_daemon())
+    setup_logging()
     app = QApplication(sys.argv)
     socket = QLocalSocket(); socket.connectToServer(SERVER_NAME)
     if socket.waitForConnected(500):
         socket.write(b'EXIT'); socket.flush(); socket.waitForBytesWritten(1000)
         socket.disconnectFromServer(); time.sleep(0.5)
-    QLocalServer.removeServer(SERVER_NAME)
-    server = QLocalServer(); server.listen(SERVER_NAME)
+    server = MessageServer(SERVER_NAME); server.listen()
     
     manager = AppManager(app)
     
-    def handle_new_connection():
-        conn = server.nextPendingConnection()
-        if conn and conn.waitForReadyRead(500):
-            msg = conn.readAll().data().decode()
-            if msg == 'SHOW': manager.show_quick_window()
-            elif msg == 'EXIT': manager.quit_application()
-    server.newConnection.connect(handle_new_connection)
+    def handle_message(command, arg, conn):
+        if command == 'SHOW': manager.show_quick_window()
+        elif command == 'EXIT': manager.quit_application()
+        elif manager.capture_link: manager.capture_link.handle_message(command, arg)
+    server.message.connect(handle_message)
     
     manager.start()
     sys.exit(app.exec_())
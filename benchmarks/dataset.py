@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+# benchmarks/dataset.py
+"""
+可复现的合成数据生成器。
+
+同一 seed + size 总是生成完全相同的数据库内容：文本/图片/文件三种剪贴板条目、
+按长尾分布挂载的标签、多层嵌套分类，以及一定比例的回收站条目。
+为了能在合理时间内生成百万级数据，这里直接批量写 SQL，不经过 Repository。
+"""
+import hashlib
+import random
+from datetime import datetime, timedelta
+
+from core.config import COLORS
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+
+BATCH_SIZE = 5000
+
+# 条目类型占比：文本为主，图片和文件路径为辅
+TYPE_WEIGHTS = (('text', 0.75), ('image', 0.12), ('file', 0.13))
+DELETED_RATIO = 0.05
+FAVORITE_RATIO = 0.04
+PINNED_RATIO = 0.01
+UNCATEGORIZED_RATIO = 0.30
+UNTAGGED_RATIO = 0.35
+MAX_TAGS_PER_IDEA = 4
+TIME_SPAN_DAYS = 3 * 365
+
+WORDS = (
+    '会议', '记录', '想法', '项目', '周报', '需求', '设计', '接口', '数据库', '缓存',
+    '性能', '优化', '测试', '部署', '文档', '草稿', '待办', '灵感', '读书', '笔记',
+    'python', 'sqlite', 'qt', 'index', 'query', 'cache', 'deploy', 'review',
+    'bug', 'fix', 'release', 'meeting', 'todo', 'draft', 'idea', 'note', 'link',
+)
+FILE_EXTS = ('.txt', '.pdf', '.docx', '.xlsx', '.png', '.zip', '.py', '.md')
+PALETTE = ('#FF6B6B', '#4ECDC4', '#45B7D1', '#96CEB4', '#FFEEAD', '#D4A5A5', '#9B59B6', '#3498DB')
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class DatasetSpec:
+    """数据集规模参数，标签和分类数量随条目数缓慢增长"""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.seed = seed
+        self.tag_count = max(50, min(5000, size // 200))
+        self.root_categories = max(5, min(40, size // 5000))
+        self.children_per_category = 4
+        self.category_depth = 3
+
+
+class DatasetGenerator:
+    def __init__(self, spec):
+        self.spec = spec
+        self.rng = random.Random(spec.seed)
+        self._now = datetime(2026, 1, 1, 12, 0, 0)
+
+    def generate(self, db_path):
+        """在 db_path 生成数据库，返回包含生成统计的字典"""
+        db = DBContext(db_path, QueryProfiler(enabled=False))
+        try:
+            conn = db.conn
+            conn.execute('PRAGMA synchronous=OFF')
+            category_ids = self._insert_categories(conn)
+            tag_ids = self._insert_tags(conn)
+            stats = self._insert_ideas(conn, category_ids, tag_ids)
+            # 合成数据没有变更历史，批量写入产生的日志直接清掉；挂标签时触发器写入的 modified_at 也还原
+            conn.execute('DELETE FROM change_journal')
+            conn.execute('UPDATE ideas SET modified_at = updated_at')
+            conn.commit()
+            conn.execute('PRAGMA synchronous=FULL')
+            conn.execute('ANALYZE')
+            conn.commit()
+            stats.update({'categories': len(category_ids), 'tags': len(tag_ids)})
+            return stats
+        finally:
+            db.close()
+
+    # --- 分类与标签 ---
+    def _insert_categories(self, conn):
+        ids = []
+        level = [None]
+        for depth in range(self.spec.category_depth):
+            next_level = []
+            for parent_id in level:
+                count = self.spec.root_categories if parent_id is None else self.rng.randint(0, self.spec.children_per_category)
+                for order in range(count):
+                    name = f"{self.rng.choice(WORDS)}-{depth}-{len(ids)}"
+                    cur = conn.execute(
+                        'INSERT INTO categories (name, parent_id, color, sort_order) VALUES (?,?,?,?)',
+                        (name, parent_id, self.rng.choice(PALETTE), order)
+                    )
+                    ids.append(cur.lastrowid)
+                    next_level.append(cur.lastrowid)
+            level = next_level
+        return ids
+
+    def _insert_tags(self, conn):
+        names = [f"{self.rng.choice(WORDS)}_{i}" for i in range(self.spec.tag_count)]
+        conn.executemany('INSERT INTO tags (name) VALUES (?)', [(n,) for n in names])
+        return [r[0] for r in conn.execute('SELECT id FROM tags ORDER BY id')]
+
+    # --- 笔记 ---
+    def _insert_ideas(self, conn, category_ids, tag_ids):
+        stats = {'ideas': 0, 'deleted': 0, 'idea_tags': 0, 'by_type': {}}
+        # 长尾分布：少数热门标签覆盖大部分条目
+        tag_weights = [1.0 / (rank + 1) for rank in range(len(tag_ids))]
+        idea_rows, tag_rows = [], []
+        next_id = 1
+        for _ in range(self.spec.size):
+            row, deleted = self._make_idea(next_id, category_ids)
+            idea_rows.append(row)
+            stats['by_type'][row[9]] = stats['by_type'].get(row[9], 0) + 1
+            stats['deleted'] += deleted
+            if self.rng.random() >= UNTAGGED_RATIO:
+                count = self.rng.randint(1, MAX_TAGS_PER_IDEA)
+                for tid in set(self.rng.choices(tag_ids, weights=tag_weights, k=count)):
+                    tag_rows.append((next_id, tid))
+            next_id += 1
+            if len(idea_rows) >= BATCH_SIZE:
+                stats['idea_tags'] += self._flush(conn, idea_rows, tag_rows)
+        stats['idea_tags'] += self._flush(conn, idea_rows, tag_rows)
+        stats['ideas'] = self.spec.size
+        return stats
+
+    def _flush(self, conn, idea_rows, tag_rows):
+        conn.executemany(
+            '''INSERT INTO ideas (id, title, content, color, is_pinned, is_favorite,
+                   created_at, updated_at, category_id, item_type, data_blob,
+                   content_hash, is_deleted, rating, uuid)
+               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+            idea_rows
+        )
+        conn.executemany('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) VALUES (?,?)', tag_rows)
+        written = len(tag_rows)
+        idea_rows.clear()
+        tag_rows.clear()
+        return written
+
+    def _make_idea(self, iid, category_ids):
+        rng = self.rng
+        item_type = self._pick_type()
+        created = self._now - timedelta(seconds=rng.randint(0, TIME_SPAN_DAYS * 86400))
+        updated = created + timedelta(seconds=rng.randint(0, 30 * 86400))
+        if updated > self._now:
+            updated = self._now
+        deleted = rng.random() < DELETED_RATIO
+        category_id = None
+        if not deleted and category_ids and rng.random() >= UNCATEGORIZED_RATIO:
+            category_id = rng.choice(category_ids)
+
+        data_blob = None
+        if item_type == 'text':
+            content = self._make_text()
+            title = content.strip().split('\n')[0][:50]
+            digest = content.encode('utf-8')
+        elif item_type == 'image':
+            data_blob = PNG_SIGNATURE + rng.randbytes(rng.randint(2 * 1024, 48 * 1024))
+            content = ''
+            title = '[图片]'
+            digest = data_blob
+        else:
+            paths = [self._make_path() for _ in range(rng.randint(1, 3))]
+            content = ';'.join(paths)
+            title = f"[文件] {paths[0].rsplit('/', 1)[-1]}"
+            digest = content.encode('utf-8')
+        content_hash = hashlib.sha256(digest + str(iid).encode()).hexdigest()
+
+        color = COLORS['trash'] if deleted else (rng.choice(PALETTE) if category_id else COLORS['default_note'])
+        row = (
+            iid, title, content, color,
+            int(rng.random() < PINNED_RATIO), int(rng.random() < FAVORITE_RATIO),
+            created.strftime('%Y-%m-%d %H:%M:%S'), updated.strftime('%Y-%m-%d %H:%M:%S'),
+            category_id, item_type, data_blob, content_hash, int(deleted),
+            rng.choice((0, 0, 0, 1, 2, 3, 4, 5)),
+            # 由 seed 和 ID 决定，同一参数生成的数据库完全一致
+            f"{self.spec.seed:016x}{iid:016x}"
+        )
+        return row, int(deleted)
+
+    def _pick_type(self):
+        r = self.rng.random()
+        for name, weight in TYPE_WEIGHTS:
+            if r < weight:
+                return name
+            r -= weight
+        return TYPE_WEIGHTS[0][0]
+
+    def _make_text(self):
+        rng = self.rng
+        lines = []
+        for _ in range(rng.choice((1, 1, 2, 3, 5, 12))):
+            lines.append(' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 16))))
+        return '\n'.join(lines)
+
+    def _make_path(self):
+        rng = self.rng
+        parts = [rng.choice(WORDS) for _ in range(rng.randint(1, 4))]
+        return 'C:/Users/demo/' + '/'.join(parts) + f"_{rng.randint(1, 9999)}" + rng.choice(FILE_EXTS)
+
+
+def generate_dataset(db_path, size, seed=42):
+    return DatasetGenerator(DatasetSpec(size, seed)).generate(db_path)
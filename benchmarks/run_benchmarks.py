@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+# benchmarks/run_benchmarks.py
+"""
+Repository 层基准测试。
+
+用法（在项目根目录执行）:
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000
+    python -m benchmarks.run_benchmarks --compare old.json new.json
+
+每个数据规模生成一个临时数据库，依次跑读取类用例、批量写入用例和采集吞吐用例，
+结果写入 benchmarks/results/<时间戳>.json，便于不同版本之间对比。
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.dataset import DatasetSpec, DatasetGenerator
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.category_repository import CategoryRepository
+from data.repositories.tag_repository import TagRepository
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+DEFAULT_REPEAT = 5
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+PAGE_SIZE = 100
+BULK_BATCH = 500
+CAPTURE_COUNT = 300
+SEARCH_TERMS = ('缓存', 'query', 'meeting 会议')
+
+
+class BenchContext:
+    """一次规模测试所需的仓库对象与样本 ID"""
+
+    def __init__(self, db_path):
+        # 关闭查询分析，测量的是查询本身的耗时
+        self.db = DBContext(db_path, QueryProfiler(enabled=False))
+        self.idea_repo = IdeaRepository(self.db)
+        self.category_repo = CategoryRepository(self.db)
+        self.tag_repo = TagRepository(self.db)
+        c = self.db.get_cursor()
+        c.execute('SELECT id FROM categories ORDER BY id LIMIT 1')
+        row = c.fetchone()
+        self.sample_category = row[0] if row else None
+        c.execute('SELECT name FROM tags ORDER BY id LIMIT 1')
+        row = c.fetchone()
+        self.sample_tag = row[0] if row else None
+        c.execute('SELECT id FROM ideas WHERE is_deleted=0 ORDER BY updated_at DESC LIMIT ?', (BULK_BATCH,))
+        self.recent_ids = [r[0] for r in c.fetchall()]
+
+    def close(self):
+        self.db.close()
+
+
+def _time_case(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return {
+        'repeat': repeat,
+        'min_ms': round(min(samples), 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'max_ms': round(max(samples), 3),
+    }
+
+
+# --- 读取类用例 ---
+def _read_cases(ctx):
+    repo = ctx.idea_repo
+    cases = {
+        'counts': lambda: repo.get_counts(),
+        'list_all_page1': lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE),
+        'count_all': lambda: repo.get_count_by_filter('', 'all', None),
+        'filter_stats_all': lambda: repo.get_filter_stats('', 'all', None),
+        'filter_stats_category': lambda: repo.get_filter_stats('', 'category', ctx.sample_category),
+        'metadata_all': lambda: repo.get_metadata_by_filter('', 'all', None),
+        'metadata_category': lambda: repo.get_metadata_by_filter('', 'category', ctx.sample_category),
+        'metadata_today': lambda: repo.get_metadata_by_filter('', 'today', None),
+        'details_page': lambda: repo.get_details_by_ids(ctx.recent_ids[:PAGE_SIZE]),
+        'list_tag_filter': lambda: repo.get_list_by_filter('', 'all', None, 1, PAGE_SIZE, tag_filter=ctx.sample_tag),
+        'list_criteria': lambda: repo.get_list_by_filter(
+            '', 'all', None, 1, PAGE_SIZE,
+            criteria={'stars': [4, 5], 'types': ['text'], 'date_create': ['week']}
+        ),
+        'top_tags': lambda: ctx.tag_repo.get_top_tags(),
+        'category_tree': lambda: ctx.category_repo.get_tree(),
+    }
+    for i, term in enumerate(SEARCH_TERMS):
+        cases[f'search_{i}_page1'] = lambda t=term: repo.get_list_by_filter(t, 'all', None, 1, PAGE_SIZE)
+        cases[f'search_{i}_count'] = lambda t=term: repo.get_count_by_filter(t, 'all', None)
+        cases[f'search_{i}_ranked_page1'] = lambda t=term: repo.get_list_by_filter(t, 'all', None, 1, PAGE_SIZE, ranked=True)
+    return cases
+
+
+# --- 写入类用例（会修改数据库，放在读取用例之后执行）---
+def _write_cases(ctx):
+    ids = ctx.recent_ids
+    state = {'n': 0}
+
+    def bulk_tag():
+        state['n'] += 1
+        ctx.tag_repo.add_to_multiple(ids, [f"bench_tag_{state['n']}"])
+
+    def bulk_untag():
+        ctx.tag_repo.remove_from_multiple(ids, f"bench_tag_{state['n']}")
+
+    def bulk_lock():
+        ctx.idea_repo.set_locked(ids, state['n'] % 2 == 0)
+
+    def bulk_rating():
+        for iid in ids[:100]:
+            ctx.idea_repo.update_field(iid, 'rating', state['n'] % 6)
+
+    def category_reorder():
+        rows = ctx.category_repo.get_all()
+        ctx.category_repo.save_order([
+            {'id': r['id'], 'sort_order': i, 'parent_id': r['parent_id']} for i, r in enumerate(reversed(rows))
+        ])
+
+    return {
+        'bulk_add_tag': bulk_tag,
+        'bulk_remove_tag': bulk_untag,
+        'bulk_set_locked': bulk_lock,
+        'update_rating_x100': bulk_rating,
+        'category_reorder': category_reorder,
+    }
+
+
+# --- 采集吞吐 ---
+def _capture_case(ctx, repeat):
+    """通过 IdeaService 走完整的剪贴板入库路径：新内容插入 + 重复内容去重"""
+    from services.idea_service import IdeaService
+    service = IdeaService(ctx.idea_repo, ctx.category_repo, ctx.tag_repo)
+    rounds = {'n': 0}
+
+    def capture_new():
+        rounds['n'] += 1
+        for i in range(CAPTURE_COUNT):
+            service.add_clipboard_item('text', f"bench capture {rounds['n']}-{i}\nbody line")
+
+    def capture_duplicate():
+        for i in range(CAPTURE_COUNT):
+            service.add_clipboard_item('text', f"bench capture 1-{i}\nbody line")
+
+    result = {}
+    for name, func in (('capture_new', capture_new), ('capture_duplicate', capture_duplicate)):
+        timing = _time_case(func, repeat)
+        timing['items_per_sec'] = round(CAPTURE_COUNT / (timing['median_ms'] / 1000.0), 1) if timing['median_ms'] else None
+        result[name] = timing
+    return result
+
+
+def run_size(size, repeat, seed, work_dir, selected=None):
+    db_path = os.path.join(work_dir, f'bench_{size}.db')
+    if os.path.exists(db_path):
+        os.remove(db_path)
+
+    start = time.perf_counter()
+    dataset_stats = DatasetGenerator(DatasetSpec(size, seed)).generate(db_path)
+    gen_seconds = time.perf_counter() - start
+    print(f"[{size}] dataset generated in {gen_seconds:.1f}s")
+
+    ctx = BenchContext(db_path)
+    results = {}
+    try:
+        for group in (_read_cases(ctx), _write_cases(ctx)):
+            for name, func in group.items():
+                if selected and name not in selected:
+                    continue
+                results[name] = _time_case(func, repeat)
+                print(f"[{size}] {name:<24} median {results[name]['median_ms']:>10.3f} ms")
+        if not selected or 'capture' in selected:
+            results.update(_capture_case(ctx, repeat))
+            for name in ('capture_new', 'capture_duplicate'):
+                print(f"[{size}] {name:<24} {results[name]['items_per_sec']} items/s")
+    finally:
+        ctx.close()
+
+    return {
+        'dataset': dataset_stats,
+        'generate_seconds': round(gen_seconds, 2),
+        'db_bytes': os.path.getsize(db_path),
+        'cases': results,
+    }
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(sizes, repeat, seed, output=None, keep_db=False, selected=None):
+    work_dir = tempfile.mkdtemp(prefix='rapidnotes-bench-')
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'sizes': {},
+    }
+    try:
+        for size in sizes:
+            report['sizes'][str(size)] = run_size(size, repeat, seed, work_dir, selected)
+    finally:
+        if keep_db:
+            print(f"Benchmark databases kept in {work_dir}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {output}")
+    return report
+
+
+def compare(old_path, new_path):
+    """逐用例对比两次结果的中位数耗时"""
+    with open(old_path, 'r', encoding='utf-8') as f:
+        old = json.load(f)
+    with open(new_path, 'r', encoding='utf-8') as f:
+        new = json.load(f)
+    for size, new_size in new['sizes'].items():
+        old_cases = old['sizes'].get(size, {}).get('cases', {})
+        print(f"== size {size} ==")
+        for name, timing in new_size['cases'].items():
+            before = old_cases.get(name, {}).get('median_ms')
+            after = timing['median_ms']
+            if before:
+                print(f"{name:<24} {before:>10.3f} -> {after:>10.3f} ms  ({after / before:.2f}x)")
+            else:
+                print(f"{name:<24} {'-':>10} -> {after:>10.3f} ms")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='RapidNotes repository benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='结果 JSON 路径（默认写入 benchmarks/results/）')
+    parser.add_argument('--cases', nargs='+', help='只运行指定用例（capture 表示采集吞吐）')
+    parser.add_argument('--keep-db', action='store_true', help='保留生成的临时数据库')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='对比两份结果 JSON')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    run(args.sizes, args.repeat, args.seed, args.output, args.keep_db, set(args.cases) if args.cases else None)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
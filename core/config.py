@@ -1,6 +1,33 @@
 # core/config.py
 DB_NAME = 'ideas.db'
 BACKUP_DIR = 'backups'
+# 归档库：超过 ARCHIVE_AFTER_DAYS 天未更新、未置顶未收藏的笔记分批移入，以 ATTACH 挂载
+ARCHIVE_DB_NAME = 'archive.db'
+ARCHIVE_AFTER_DAYS = 90
+# 变更日志的压缩间隔：启动时压缩一次，长时间运行时按此间隔再压缩
+JOURNAL_COMPACT_INTERVAL_MS = 6 * 60 * 60 * 1000
+
+# 查询性能分析：超过阈值的 SQL 连同执行计划写入滚动日志。
+# 计时游标不改变取数方式，只累计 SQLite 内的耗时，默认开启
+QUERY_PROFILING = True
+SLOW_QUERY_THRESHOLD_MS = 100
+SLOW_QUERY_LOG = 'slow_queries.log'
+# 本地套接字名：界面进程的单实例通道 / 剪贴板采集守护进程
+SERVER_NAME = "K_KUAIJIBIJI_SINGLE_INSTANCE_SERVER"
+CAPTURE_SERVER_NAME = "K_KUAIJIBIJI_CAPTURE_DAEMON"
+# 内置图标的栅格化缓存（内置 SVG 变化后自动重建）
+ICON_ATLAS_FILE = 'icon_atlas.bin'
+# 后台搜索的时间预算：超出后停止查询，只显示已找到的部分结果
+SEARCH_TIME_BUDGET_MS = 1500
+# 正则搜索逐行匹配、边找边显示，预算放宽
+REGEX_TIME_BUDGET_MS = 10000
+# 主界面翻页预取：当前页显示后稍等片刻，在后台读取前后页的详情放进记录缓存；
+# 每轮预取的正文与缩略图合计不超过 PREFETCH_MAX_BYTES
+PREFETCH_DELAY_MS = 300
+PREFETCH_MAX_BYTES = 16 * 1024 * 1024
+PREFETCH_TIME_BUDGET_MS = 10000
+# 数据库以 WAL 模式打开，读不阻塞写；写与写冲突时最多等待这么久（需长于上面最长的读预算）
+DB_BUSY_TIMEOUT_MS = 15000
 
 COLORS = {
     'primary': '#4a90e2',   # 核心蓝
@@ -4,7 +4,12 @@ from data.db_context import DBContext
 from data.repositories.idea_repository import IdeaRepository
 from data.repositories.category_repository import CategoryRepository
 from data.repositories.tag_repository import TagRepository
+from data.repositories.revision_repository import RevisionRepository
+from data.repositories.journal_repository import JournalRepository
+from data.repositories.sync_repository import SyncRepository
+from data.repositories.archive_repository import ArchiveRepository
 from services.idea_service import IdeaService
+from services.sync_service import SyncService
 
 class AppContainer:
     _instance = None
@@ -21,8 +26,24 @@ class AppContainer:
         self.idea_repo = IdeaRepository(self.db_context)
         self.category_repo = CategoryRepository(self.db_context)
         self.tag_repo = TagRepository(self.db_context)
+        self.revision_repo = RevisionRepository(self.db_context)
+        self.journal_repo = JournalRepository(self.db_context)
+        self.journal_repo.compact()
+        self.archive_repo = ArchiveRepository(self.db_context)
 
-        self.idea_service = IdeaService(self.idea_repo, self.category_repo, self.tag_repo)
+        self.idea_service = IdeaService(
+            self.idea_repo, self.category_repo, self.tag_repo, self.revision_repo, self.journal_repo,
+            self.archive_repo
+        )
+        self.sync_service = SyncService(SyncRepository(self.db_context), self.journal_repo)
+
+    def open_sync_service(self):
+        """
+        后台线程用的同步服务：独立的读写连接，不占用界面线程的连接；
+        用完后由调用方关闭 service.repo.db。该连接上的写入需经 notify_external_change() 通知界面。
+        """
+        db = DBContext(self.db_context.db_path, self.db_context.profiler, self.db_context.archive_path)
+        return SyncService(SyncRepository(db), JournalRepository(db))
 
     @property
     def service(self):
@@ -1,44 +1,151 @@
 # core/settings.py
+import atexit
+import copy
 import json
+import logging
 import os
+import tempfile
+import threading
 
 SETTINGS_FILE = 'settings.json'
+FLUSH_DELAY_SECONDS = 0.5
 
-def save_setting(key, value):
-    """保存单个设置项到 JSON 文件"""
-    settings = {}
-    if os.path.exists(SETTINGS_FILE):
+logger = logging.getLogger(__name__)
+
+
+class SettingsStore:
+    """
+    设置存储：首次访问时从 JSON 文件加载一次，之后所有读取都走内存字典。
+    写入只修改内存并启动去抖计时器，计时器到期后把多次修改合并为一次落盘；
+    落盘采用 "临时文件 + os.replace" 的原子替换，避免写到一半时文件损坏。
+    """
+
+    def __init__(self, path=SETTINGS_FILE, flush_delay=FLUSH_DELAY_SECONDS):
+        self._path = path
+        self._flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._write_lock = threading.Lock()
+        self._data = None
+        self._dirty = False
+        self._timer = None
+        self._listeners = []
+
+    # --- 读写接口 ---
+    def get(self, key, default=None):
+        with self._lock:
+            data = self._ensure_loaded()
+            if key not in data:
+                return default
+            # 返回副本：调用方常见写法是 "取出列表 -> 修改 -> 再保存"，
+            # 如果直接返回内部对象，修改会绕过脏标记。
+            return copy.deepcopy(data[key])
+
+    def set(self, key, value):
+        with self._lock:
+            data = self._ensure_loaded()
+            if key in data and data[key] == value:
+                return
+            data[key] = copy.deepcopy(value)
+            self._dirty = True
+            self._schedule_flush()
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(key, value)
+            except Exception as e:
+                logger.error(f"Settings listener failed for '{key}': {e}", exc_info=True)
+
+    def subscribe(self, callback):
+        """注册变更回调 callback(key, value)，在 set() 的调用线程中同步触发。"""
+        with self._lock:
+            if callback not in self._listeners:
+                self._listeners.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._listeners:
+                self._listeners.remove(callback)
+
+    def flush(self):
+        """立即把待写入的修改落盘（退出程序时调用）。"""
+        # 先取得写锁再取快照：去抖计时器与 flush_settings() 同时落盘时，
+        # 按取快照的先后依次写入，较旧的快照不会覆盖较新的
+        with self._write_lock:
+            with self._lock:
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+                if not self._dirty:
+                    return
+                snapshot = copy.deepcopy(self._data)
+                self._dirty = False
+            if not self._write_atomic(snapshot):
+                # 写入失败时保留脏标记，下次 flush 重试
+                with self._lock:
+                    self._dirty = True
+
+    # --- 内部实现 ---
+    def _ensure_loaded(self):
+        if self._data is None:
+            self._data = self._read_file()
+        return self._data
+
+    def _read_file(self):
+        if not os.path.exists(self._path):
+            return {}
+        try:
+            with open(self._path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (json.JSONDecodeError, IOError) as e:
+            # 文件为空或损坏时从空设置开始，下次落盘会覆盖它
+            logger.warning(f"Failed to read settings file {self._path}: {e}")
+            return {}
+
+    def _schedule_flush(self):
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(self._flush_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _write_atomic(self, snapshot):
+        """写入成功返回 True；调用方需持有 _write_lock"""
+        target_dir = os.path.dirname(os.path.abspath(self._path))
+        tmp_path = None
         try:
-            with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-                settings = json.load(f)
-        except (json.JSONDecodeError, IOError):
-            # 如果文件存在但为空或损坏，则忽略
-            pass
-    
-    settings[key] = value
-    
-    try:
-        with open(SETTINGS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(settings, f, indent=4)
-        # print(f"[Settings] 已保存 '{key}': {value}")
-        pass
-    except IOError as e:
-        # print(f"[Settings] 错误：无法写入设置文件 {SETTINGS_FILE}: {e}")
-        pass
+            fd, tmp_path = tempfile.mkstemp(prefix='.settings-', suffix='.tmp', dir=target_dir)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._path)
+            return True
+        except (IOError, OSError) as e:
+            logger.error(f"Failed to write settings file {self._path}: {e}")
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+
+_store = SettingsStore()
+atexit.register(_store.flush)
+
+
+def get_settings_store():
+    return _store
+
+
+def save_setting(key, value):
+    """保存单个设置项（写入内存，延迟合并落盘）"""
+    _store.set(key, value)
+
 
 def load_setting(key, default=None):
-    """从 JSON 文件加载单个设置项"""
-    if not os.path.exists(SETTINGS_FILE):
-        return default
-        
-    try:
-        with open(SETTINGS_FILE, 'r', encoding='utf-8') as f:
-            settings = json.load(f)
-            value = settings.get(key, default)
-            # print(f"[Settings] 已加载 '{key}': {value}")
-            pass
-            return value
-    except (json.JSONDecodeError, IOError) as e:
-        # print(f"[Settings] 错误：无法读取设置文件 {SETTINGS_FILE}: {e}")
-        pass
-        return default
+    """从内存中的设置读取单个设置项"""
+    return _store.get(key, default)
+
+
+def flush_settings():
+    """立即把未落盘的设置写入文件"""
+    _store.flush()
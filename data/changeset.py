@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# data/changeset.py
+"""
+同步包文件格式（纯函数，不访问数据库）。
+
+整个文件是一个 gzip 流，开头为 MAGIC + 版本号，之后是一串帧：
+    [头部长度 4 字节][附件长度 4 字节][头部 JSON][附件字节]
+头部的 type 为 meta / category / idea / tombstone / end，附件只有带图片数据的 idea 帧才有。
+读写都是逐帧进行，任意大小的同步包只需在内存中保留一帧。
+"""
+import gzip
+import json
+import struct
+import zlib
+
+MAGIC = b'RNCS'
+FORMAT_VERSION = 1
+_FRAME = struct.Struct('>II')
+# 按块读取帧内容：长度字段损坏时不会按错误的长度一次分配大块内存
+_READ_CHUNK = 1 << 20
+# 各类帧头部必须有的键；不认识的帧类型由调用方跳过
+_REQUIRED_KEYS = {'category': ('path',), 'idea': ('idea',), 'tombstone': ('uuid',)}
+
+
+class ChangesetError(Exception):
+    """文件不是同步包、版本不支持、内容损坏或被截断"""
+
+
+class ChangesetWriter:
+    def __init__(self, path):
+        self._file = gzip.open(path, 'wb', compresslevel=6)
+        self._file.write(MAGIC + bytes([FORMAT_VERSION]))
+
+    def write(self, header, blob=None):
+        header = dict(header, has_blob=blob is not None)
+        data = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        blob = blob or b''
+        self._file.write(_FRAME.pack(len(data), len(blob)))
+        self._file.write(data)
+        if blob: self._file.write(blob)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read(f, n):
+    if n <= _READ_CHUNK: return f.read(n)
+    parts = []
+    while n > 0:
+        part = f.read(min(n, _READ_CHUNK))
+        if not part: break
+        parts.append(part)
+        n -= len(part)
+    return b''.join(parts)
+
+
+def _parse_header(data):
+    try:
+        header = json.loads(data.decode('utf-8'))
+    except ValueError as e:  # 包括 UnicodeDecodeError 与 JSONDecodeError
+        raise ChangesetError(f"changeset is corrupted: {e}")
+    if not isinstance(header, dict) or not isinstance(header.get('type'), str):
+        raise ChangesetError("changeset is corrupted: frame without a type")
+    missing = [k for k in _REQUIRED_KEYS.get(header['type'], ()) if k not in header]
+    if header['type'] == 'idea' and not missing and not (isinstance(header['idea'], dict) and header['idea'].get('uuid')):
+        missing = ['idea.uuid']
+    if missing:
+        raise ChangesetError(f"changeset is corrupted: {header['type']} frame without {', '.join(missing)}")
+    return header
+
+
+def read_frames(path):
+    """逐帧产出 (头部 dict, 附件 bytes 或 None)；最后一帧必须是 end"""
+    with gzip.open(path, 'rb') as f:
+        try:
+            head = f.read(len(MAGIC) + 1)
+        except (OSError, EOFError, zlib.error) as e:
+            raise ChangesetError(f"not a changeset file: {e}")
+        if len(head) <= len(MAGIC) or head[:len(MAGIC)] != MAGIC:
+            raise ChangesetError("not a changeset file")
+        if head[len(MAGIC)] > FORMAT_VERSION:
+            raise ChangesetError(f"unsupported changeset version {head[len(MAGIC)]}")
+
+        while True:
+            try:
+                prefix = f.read(_FRAME.size)
+                if len(prefix) < _FRAME.size: break
+                header_len, blob_len = _FRAME.unpack(prefix)
+                data = _read(f, header_len)
+                blob = _read(f, blob_len) if blob_len else b''
+            except (OSError, EOFError, zlib.error) as e:
+                raise ChangesetError(f"changeset is corrupted: {e}")
+            if len(data) < header_len or len(blob) < blob_len: break
+            header = _parse_header(data)
+            yield header, (blob if header.get('has_blob') else None)
+            if header['type'] == 'end': return
+        raise ChangesetError("changeset is truncated")
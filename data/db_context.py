@@ -1,19 +1,124 @@
 # -*- coding: utf-8 -*-
 # data/db_context.py
+import os
 import sqlite3
 import logging
-from core.config import DB_NAME, COLORS
+from pathlib import Path
+from core.config import DB_NAME, ARCHIVE_DB_NAME, COLORS, DB_BUSY_TIMEOUT_MS
+from data.query_profiler import QueryProfiler, ProfiledConnection
+from data.schema_migrations import SchemaMigration
+from data.regex_search import register_functions
+
+# 只存在于本连接的临时触发器：记录或其标签变化时逐条调用 idea_changed(idea_id)
+_IDEA_CHANGE_TRIGGERS = (
+    "CREATE TEMP TRIGGER IF NOT EXISTS watch_ideas_au AFTER UPDATE ON ideas BEGIN SELECT idea_changed(old.id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS watch_ideas_ad AFTER DELETE ON ideas BEGIN SELECT idea_changed(old.id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS watch_idea_tags_ai AFTER INSERT ON idea_tags BEGIN SELECT idea_changed(new.idea_id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS watch_idea_tags_ad AFTER DELETE ON idea_tags BEGIN SELECT idea_changed(old.idea_id); END",
+    "CREATE TEMP TRIGGER IF NOT EXISTS watch_tags_au AFTER UPDATE OF name ON tags BEGIN "
+    "SELECT idea_changed(idea_id) FROM idea_tags WHERE tag_id = new.id; END",
+)
+
+
+def archive_path_for(db_path):
+    """主库对应的归档库路径：默认库用 ARCHIVE_DB_NAME，其它库 x.db 对应 x.archive.db；内存数据库没有归档库"""
+    if db_path == ':memory:': return None
+    if db_path == DB_NAME: return ARCHIVE_DB_NAME
+    base, ext = os.path.splitext(db_path)
+    return f"{base}.archive{ext or '.db'}"
+
+
+def _configure_journal(conn, schema='main'):
+    """
+    WAL 模式：后台搜索等长时间的读不再阻塞守护进程和界面的写入（回滚日志模式下写入要等读锁释放，
+    超时后 "database is locked"，采集到的内容就丢了）。写与写之间仍互斥，等待时间由 busy_timeout 决定。
+    """
+    conn.execute(f'PRAGMA {schema}.journal_mode=WAL')
+
+
+def _connect(target, **kwargs):
+    # timeout 即 busy_timeout；sqlite3 默认只等 5 秒，短于正则搜索的读预算
+    return sqlite3.connect(
+        target, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False, factory=ProfiledConnection, **kwargs
+    )
+
 
 class DBContext:
-    def __init__(self):
-        self.conn = sqlite3.connect(DB_NAME, check_same_thread=False)
+    def __init__(self, db_path=DB_NAME, profiler=None, archive_path=None):
+        self.db_path = db_path
+        self.profiler = profiler if profiler is not None else QueryProfiler()
+        self.conn = _connect(db_path)
+        _configure_journal(self.conn)
+        self.conn.profiler = self.profiler
         self.conn.row_factory = sqlite3.Row
+        register_functions(self.conn)
         self._init_schema()
+        SchemaMigration.apply(self.conn)
         self._fix_trash_consistency()
+        # 全文索引在不支持 trigram 的 SQLite 上不会创建，此时搜索退回 LIKE
+        self.search_index = self._table_exists('ideas_search')
+        # 归档库挂载为 archive，查询时以 archive.ideas 引用；挂载失败时只使用主库
+        self.archive_path = archive_path or archive_path_for(db_path)
+        self.archive = self._attach_archive()
+        # 其它进程（剪贴板采集守护进程）写入的次数，由 mark_external_change() 累加
+        self._external_changes = 0
+
+    @property
+    def generation(self):
+        """
+        数据版本号：本连接上的任何写入、或得知其它进程写入，都会让它增大，
+        用于判断内存中的查询结果是否过期
+        """
+        return self.conn.total_changes + self._external_changes
+
+    def mark_external_change(self):
+        self._external_changes += 1
+
+    def _attach_archive(self):
+        if not self.archive_path: return False
+        try:
+            self.conn.execute('ATTACH DATABASE ? AS archive', (self.archive_path,))
+            _configure_journal(self.conn, 'archive')
+            SchemaMigration.ensure_archive(self.conn, 'archive', self.search_index)
+            return True
+        except sqlite3.Error as e:
+            logging.error(f"Failed to attach archive {self.archive_path}: {e}", exc_info=True)
+            return False
+
+    def _table_exists(self, name):
+        c = self.conn.cursor()
+        c.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,))
+        return c.fetchone() is not None
 
     def get_cursor(self):
         return self.conn.cursor()
 
+    def watch_idea_changes(self, callback):
+        """
+        注册 callback(idea_id)：本连接上任何修改、删除记录或增删其标签、重命名标签的语句，
+        都会对受影响的每条记录调用一次（事务回滚时也已调用，只会多失效，不会漏失效）。
+        """
+        def notify(idea_id):
+            # 回调出错会让触发它的写入语句一起失败，这里只记录日志
+            try:
+                callback(idea_id)
+            except Exception as e:
+                logging.error(f"idea change callback failed: {e}", exc_info=True)
+
+        self.conn.create_function('idea_changed', 1, notify)
+        c = self.conn.cursor()
+        for sql in _IDEA_CHANGE_TRIGGERS:
+            c.execute(sql)
+
+    def open_reader(self):
+        """
+        后台搜索用的独立只读连接：可以单独中断，不会打断主连接上正在进行的读写。
+        内存数据库无法被第二个连接打开，返回 None。
+        """
+        if self.db_path == ':memory:' or not os.path.exists(self.db_path):
+            return None
+        return ReaderContext(self.db_path, self.profiler, self.search_index, self.archive_path if self.archive else None)
+
     def commit(self):
         self.conn.commit()
 
@@ -90,4 +195,31 @@ class DBContext:
             self.conn.commit()
             logging.debug("Trash consistency check completed")
         except Exception as e:
-            logging.error(f"Failed to fix trash consistency: {e}", exc_info=True)
\ No newline at end of file
+            logging.error(f"Failed to fix trash consistency: {e}", exc_info=True)
+
+
+class ReaderContext:
+    """只读连接，提供与 DBContext 相同的读取接口，可直接交给仓库使用"""
+
+    def __init__(self, db_path, profiler, search_index, archive_path=None):
+        uri = Path(os.path.abspath(db_path)).as_uri() + '?mode=ro'
+        self.db_path = db_path
+        self.profiler = profiler
+        self.search_index = search_index
+        self.conn = _connect(uri, uri=True)
+        self.conn.profiler = profiler
+        self.conn.row_factory = sqlite3.Row
+        register_functions(self.conn)
+        self.archive = bool(archive_path) and os.path.exists(archive_path)
+        if self.archive:
+            self.conn.execute('ATTACH DATABASE ? AS archive', (Path(os.path.abspath(archive_path)).as_uri() + '?mode=ro',))
+
+    def get_cursor(self):
+        return self.conn.cursor()
+
+    def interrupt(self):
+        """可从其它线程调用：中止本连接上正在执行的语句"""
+        self.conn.interrupt()
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# data/query_cancel.py
+"""
+查询的协作式取消与时间预算。
+
+执行器为每个请求创建一个 CancelToken，并把它挂到连接的 progress handler 上：
+SQLite 每执行 PROGRESS_STEPS 条虚拟机指令检查一次令牌，被取消或超出预算即中止当前语句。
+- 被新请求取代（cancel）：结果作废，抛出 QueryCancelled
+- 超出时间预算（expired）：停止继续取数，已取到的行作为部分结果返回，token.partial 置为 True
+"""
+import sqlite3
+import time
+
+PROGRESS_STEPS = 1000
+FETCH_BATCH = 200
+
+
+class QueryCancelled(Exception):
+    """查询被更新的请求取代"""
+
+
+class CancelToken:
+    def __init__(self, budget_ms=None):
+        self._cancelled = False
+        self.deadline = time.perf_counter() + budget_ms / 1000.0 if budget_ms else None
+        self.partial = False
+        # 执行器设置的回调：查询过程中把已找到的结果分批送回界面
+        self.on_progress = None
+
+    def cancel(self):
+        self._cancelled = True
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def expired(self):
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    def should_stop(self):
+        return self._cancelled or self.expired
+
+    def report(self, value):
+        if self.on_progress is not None and not self._cancelled:
+            self.on_progress(value)
+
+    def check(self):
+        """在两条查询之间调用：已被取消时抛出 QueryCancelled"""
+        if self._cancelled:
+            raise QueryCancelled()
+
+    def install(self, conn):
+        conn.set_progress_handler(lambda: 1 if self.should_stop() else 0, PROGRESS_STEPS)
+
+    @staticmethod
+    def uninstall(conn):
+        conn.set_progress_handler(None, PROGRESS_STEPS)
+
+
+def fetch_within_budget(conn, sql, params, token, batch=FETCH_BATCH, on_batch=None):
+    """
+    分批取回查询结果，每批之间检查令牌；on_batch(rows) 在每批取到后调用（流式显示）。
+    超出预算时返回已取到的行（token.partial=True），被取消时抛出 QueryCancelled。
+    用原生游标逐批读取，耗时由这里记录一次（包含每批之间检查令牌的时间，与时间预算的口径一致）。
+    """
+    cur = sqlite3.Cursor(conn)
+    cur.row_factory = conn.row_factory
+    rows = []
+    start = time.perf_counter()
+    try:
+        cur.execute(sql, params)
+        while True:
+            chunk = cur.fetchmany(batch)
+            if not chunk: break
+            rows.extend(chunk)
+            if on_batch is not None: on_batch(chunk)
+            if token.should_stop():
+                token.check()
+                token.partial = True
+                break
+    except sqlite3.OperationalError:
+        # progress handler 返回非零或 interrupt() 时，SQLite 报 "interrupted"
+        if not token.should_stop(): raise
+        token.check()
+        token.partial = True
+    finally:
+        cur.close()
+
+    profiler = getattr(conn, 'profiler', None)
+    if profiler is not None and profiler.enabled:
+        profiler.record(conn, sql, params, len(rows), (time.perf_counter() - start) * 1000.0)
+    return rows
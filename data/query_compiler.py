@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+# data/query_compiler.py
+"""
+把 ParsedQuery 编译成针对 ideas i 的查询条件。
+
+条件按代价分三段，拼接 WHERE 时依次排列：
+1. 结构化条件：分类、标签、评分、类型、颜色、标记、创建时间区间，都落在列或索引上
+2. 全文匹配：>= 3 个字符的关键词合并为一个 FTS5 匹配式，走 ideas_search 索引
+3. 扫描条件：无法走全文索引的关键词（过短、含 LIKE 通配符、未建索引）用 LIKE 逐行匹配
+
+所有条件都能在 SQL 中表达，不需要在客户端对结果再做过滤。
+"""
+from data.search_index import match_expression
+from data.time_ranges import day_start
+
+_TERM_LIKE_CLAUSE = (
+    '(i.title LIKE ? OR i.content LIKE ? OR EXISTS ('
+    'SELECT 1 FROM idea_tags it JOIN tags t ON t.id=it.tag_id WHERE it.idea_id=i.id AND t.name LIKE ?))'
+)
+_IS_COLUMNS = {'pinned': 'i.is_pinned', 'favorite': 'i.is_favorite', 'locked': 'i.is_locked'}
+_RATING_OPS = {'=', '>', '>=', '<', '<='}
+
+
+class QueryPlan:
+    def __init__(self):
+        self.filter_clauses, self.filter_params = [], []
+        self.match = None
+        self.scan_clauses, self.scan_params = [], []
+
+    def where(self, include_match=True, schema='main'):
+        """
+        返回 (条件列表, 参数列表)。include_match=False 时由调用方自行从全文索引出发（相关度排序）。
+        schema 为 ideas i 所在的库（main / archive），全文匹配使用同一个库里的索引。
+        """
+        clauses, params = list(self.filter_clauses), list(self.filter_params)
+        if include_match and self.match:
+            clauses.append(f'i.id IN (SELECT rowid FROM {schema}.ideas_search WHERE ideas_search MATCH ?)')
+            params.append(self.match)
+        clauses.extend(self.scan_clauses)
+        params.extend(self.scan_params)
+        return clauses, params
+
+
+def compile_match(parsed, use_fts=True):
+    """只编译全文匹配部分：能走索引的关键词组成的 FTS5 匹配式（隐式 AND），没有则返回 None"""
+    if not use_fts: return None
+    phrases = [m for m in (match_expression(t) for t in parsed.terms) if m]
+    return ' '.join(phrases) if phrases else None
+
+
+def compile_query(parsed, use_fts=True, resolve_category=None):
+    """
+    resolve_category(path) -> [category_id, ...]：把 in: 的分类路径解析为分类及其子孙的 ID，
+    未提供时 in: 条件不匹配任何记录。
+    """
+    plan = QueryPlan()
+    for pred in parsed.predicates:
+        _compile_predicate(plan, pred, resolve_category)
+
+    plan.match = compile_match(parsed, use_fts)
+    for term in parsed.terms:
+        if use_fts and match_expression(term):
+            continue
+        plan.scan_clauses.append(_TERM_LIKE_CLAUSE)
+        plan.scan_params.extend([f'%{term}%'] * 3)
+    return plan
+
+
+def _compile_predicate(plan, pred, resolve_category):
+    clauses, params = plan.filter_clauses, plan.filter_params
+    field, value = pred.field, pred.value
+
+    if field == 'tag':
+        clauses.append('i.id IN (SELECT it.idea_id FROM idea_tags it JOIN tags t ON t.id=it.tag_id WHERE t.name=?)')
+        params.append(value)
+    elif field == 'type':
+        clauses.append('i.item_type=?'); params.append(value)
+    elif field == 'color':
+        clauses.append('i.color=? COLLATE NOCASE'); params.append(value)
+    elif field == 'rating' and pred.op in _RATING_OPS:
+        clauses.append(f'i.rating{pred.op}?'); params.append(value)
+    elif field == 'is' and value in _IS_COLUMNS:
+        clauses.append(f'{_IS_COLUMNS[value]}=1')
+    elif field == 'after':
+        clauses.append('i.created_ts>=?'); params.append(day_start(value))
+    elif field == 'before':
+        clauses.append('i.created_ts<?'); params.append(day_start(value))
+    elif field == 'in':
+        ids = resolve_category(value) if resolve_category else []
+        if ids:
+            clauses.append(f"i.category_id IN ({','.join('?' * len(ids))})"); params.extend(ids)
+        else:
+            clauses.append('0')
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+# data/query_parser.py
+"""
+搜索框查询语法解析。
+
+    tag:work type:image rating>=3 in:"Projects/Alpha" after:2025-01-01 foo "bar baz"
+
+- 字段:值 为结构化条件，值可用双引号包含空格；字段名不区分大小写
+- rating 支持 : = > >= < <= 比较，也可写成 rating:>=3
+- after / before 按创建日期筛选：after 含当天，before 不含当天；日期可写到年、月或日
+- 其余的词都是关键词，需要全部命中；双引号括起的内容作为一个整体短语
+- 无法识别的字段（如网址 http://...）或非法取值按普通关键词处理，解析永不抛异常
+"""
+import re
+from datetime import date
+
+FIELD_ALIASES = {
+    'tag': 'tag', 'tags': 'tag',
+    'type': 'type',
+    'rating': 'rating', 'stars': 'rating',
+    'in': 'in', 'category': 'in',
+    'after': 'after', 'before': 'before',
+    'color': 'color',
+    'is': 'is',
+}
+COMPARE_OPS = ('>=', '<=', '>', '<', '=')
+IS_FLAGS = {'pinned': 'pinned', 'favorite': 'favorite', 'bookmark': 'favorite', 'locked': 'locked'}
+MAX_RATING = 5
+# Windows 的 mktime 不支持 1970 年以前以及过远的日期，换算时间戳会失败
+MIN_YEAR, MAX_YEAR = 1970, 2999
+
+_FIELD_RE = re.compile(r'^([A-Za-z]+)(>=|<=|:|=|>|<)')
+_DATE_RE = re.compile(r'^(\d{4})(?:[-/](\d{1,2})(?:[-/](\d{1,2}))?)?$')
+
+
+class Predicate:
+    """一个结构化条件：field 为规范字段名，op 为比较符（除 rating 外均为 '='），value 为已校验的取值"""
+    __slots__ = ('field', 'op', 'value')
+
+    def __init__(self, field, op, value):
+        self.field = field
+        self.op = op
+        self.value = value
+
+    def __eq__(self, other):
+        return isinstance(other, Predicate) and (self.field, self.op, self.value) == (other.field, other.op, other.value)
+
+    def __hash__(self):
+        return hash((self.field, self.op, self.value))
+
+    def __repr__(self):
+        return f'Predicate({self.field!r}, {self.op!r}, {self.value!r})'
+
+    def to_text(self):
+        if self.field == 'rating':
+            op = ':' if self.op == '=' else self.op
+            return f'rating{op}{self.value}'
+        value = self.value.isoformat() if isinstance(self.value, date) else self.value
+        return f'{self.field}:{_quote_if_needed(value)}'
+
+
+class ParsedQuery:
+    """解析结果：terms 为关键词列表（按出现顺序），predicates 为结构化条件列表"""
+    __slots__ = ('terms', 'predicates')
+
+    def __init__(self, terms=None, predicates=None):
+        self.terms = terms or []
+        self.predicates = predicates or []
+
+    def __eq__(self, other):
+        return isinstance(other, ParsedQuery) and (self.terms, self.predicates) == (other.terms, other.predicates)
+
+    def __repr__(self):
+        return f'ParsedQuery(terms={self.terms!r}, predicates={self.predicates!r})'
+
+    def is_empty(self):
+        return not self.terms and not self.predicates
+
+    @property
+    def simple_term(self):
+        """只有一个关键词、没有结构化条件时返回该关键词（与旧版的纯子串搜索等价），否则返回 None"""
+        if not self.predicates and len(self.terms) == 1:
+            return self.terms[0]
+        return None
+
+    def to_text(self):
+        """规范化的查询文本，再次解析得到相同结果"""
+        parts = [p.to_text() for p in self.predicates]
+        parts.extend(_quote_term(t) for t in self.terms)
+        return ' '.join(parts)
+
+
+def parse_query(text):
+    terms, predicates = [], []
+    for raw, value, quoted_whole in _tokenize(text or ''):
+        if quoted_whole:
+            terms.append(value)
+            continue
+        predicate = _parse_predicate(raw)
+        if predicate is not None:
+            predicates.append(predicate)
+        elif value:
+            terms.append(value)
+    return ParsedQuery(terms, predicates)
+
+
+def _tokenize(text):
+    """
+    按空白切分，双引号内的空白不切分。产出 (原始片段, 去掉引号后的值, 是否整体被引号括起)。
+    未闭合的引号延续到文本末尾。
+    """
+    i, n = 0, len(text)
+    while i < n:
+        if text[i].isspace():
+            i += 1
+            continue
+        start = i
+        chars = []
+        quoted_whole = text[i] == '"'
+        while i < n and not text[i].isspace():
+            if text[i] == '"':
+                end = text.find('"', i + 1)
+                if end < 0: end = n
+                chars.append(text[i + 1:end])
+                i = end + 1
+                # 引号闭合后紧跟非空白字符，说明不是一个完整的短语
+                if i < n and not text[i].isspace(): quoted_whole = False
+            else:
+                chars.append(text[i])
+                i += 1
+        value = ''.join(chars)
+        if value:
+            yield text[start:min(i, n)], value, quoted_whole
+
+
+def _parse_predicate(raw):
+    m = _FIELD_RE.match(raw)
+    if not m: return None
+    field = FIELD_ALIASES.get(m.group(1).lower())
+    if field is None: return None
+    op = m.group(2)
+    value = raw[m.end():].replace('"', '')
+
+    if field == 'rating':
+        if op == ':':
+            op = next((o for o in COMPARE_OPS if value.startswith(o)), '=')
+            if value.startswith(op): value = value[len(op):]
+        if not value.isdigit() or not value.isascii(): return None
+        rating = int(value)
+        if rating > MAX_RATING: return None
+        return Predicate('rating', op, rating)
+
+    if op not in (':', '='): return None
+    value = value.strip()
+    if not value: return None
+
+    if field in ('after', 'before'):
+        day = _parse_date(value)
+        return Predicate(field, '=', day) if day else None
+    if field == 'is':
+        flag = IS_FLAGS.get(value.lower())
+        return Predicate('is', '=', flag) if flag else None
+    if field in ('type', 'color'):
+        value = value.lower()
+    return Predicate(field, '=', value)
+
+
+def _parse_date(value):
+    m = _DATE_RE.match(value)
+    if not m: return None
+    year, month, day = int(m.group(1)), int(m.group(2) or 1), int(m.group(3) or 1)
+    if not MIN_YEAR <= year <= MAX_YEAR: return None
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _quote_if_needed(value):
+    if value and not any(ch.isspace() for ch in value):
+        return value
+    return f'"{value}"'
+
+
+def _quote_term(term):
+    # 单独解析会变成结构化条件的词（如 "tag:x"）也要加引号
+    if any(ch.isspace() for ch in term) or _parse_predicate(term) is not None:
+        return f'"{term}"'
+    return term
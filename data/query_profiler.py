@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# data/query_profiler.py
+import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+
+from core.config import QUERY_PROFILING, SLOW_QUERY_THRESHOLD_MS, SLOW_QUERY_LOG
+
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+RECENT_SPAN_LIMIT = 50
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PLACEHOLDER_LIST_RE = re.compile(r'\?(\s*,\s*\?)+')
+
+
+def sql_shape(sql):
+    """把 SQL 归一化为 "形状"：折叠空白，并把 IN (?,?,?) 这类可变长占位符合并成 ?+"""
+    shape = _WHITESPACE_RE.sub(' ', sql).strip()
+    return _PLACEHOLDER_LIST_RE.sub('?+', shape)
+
+
+class QueryStats:
+    __slots__ = ('count', 'total_ms', 'max_ms', 'rows')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+
+    def add(self, elapsed_ms, rows):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        self.max_ms = max(self.max_ms, elapsed_ms)
+        self.rows += max(rows, 0)
+
+    def to_dict(self):
+        return {
+            'count': self.count, 'total_ms': round(self.total_ms, 3),
+            'max_ms': round(self.max_ms, 3), 'rows': self.rows
+        }
+
+
+class Span:
+    """一次 UI 动作的耗时记录，以及期间执行的所有查询"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed_ms = 0.0
+        self.queries = []  # (shape, param_count, rows, elapsed_ms)
+
+    @property
+    def sql_ms(self):
+        return sum(q[3] for q in self.queries)
+
+    def summary(self):
+        return (f"span {self.name}: {self.elapsed_ms:.1f} ms total, "
+                f"{len(self.queries)} queries, {self.sql_ms:.1f} ms in SQL")
+
+
+class QueryProfiler:
+    """
+    查询性能分析器，挂在 DBContext 上。
+    - record(): 由 InstrumentedCursor 在每条查询结束后调用，按 SQL 形状累计耗时/行数
+    - 超过阈值的查询连同 EXPLAIN QUERY PLAN 写入滚动日志
+    - span(): 把一次 UI 动作内的查询归到该动作名下
+    """
+
+    def __init__(self, enabled=QUERY_PROFILING, slow_threshold_ms=SLOW_QUERY_THRESHOLD_MS, log_path=SLOW_QUERY_LOG):
+        self.enabled = enabled
+        self.slow_threshold_ms = slow_threshold_ms
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._local = threading.local()
+        self._recent_spans = deque(maxlen=RECENT_SPAN_LIMIT)
+        self._slow_logger = None
+
+    # --- 查询记录 ---
+    def record(self, conn, sql, params, rows, elapsed_ms):
+        shape = sql_shape(sql)
+        param_count = len(params) if params else 0
+        with self._lock:
+            stats = self._stats.get(shape)
+            if stats is None:
+                stats = self._stats[shape] = QueryStats()
+            stats.add(elapsed_ms, rows)
+        for span in self._span_stack():
+            span.queries.append((shape, param_count, rows, elapsed_ms))
+        if elapsed_ms >= self.slow_threshold_ms:
+            self._log_slow_query(conn, sql, shape, params, param_count, rows, elapsed_ms)
+
+    def stats(self):
+        """按累计耗时降序返回 [(shape, stats_dict), ...]"""
+        with self._lock:
+            items = [(shape, s.to_dict()) for shape, s in self._stats.items()]
+        items.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return items
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent_spans.clear()
+
+    # --- 动作 span ---
+    def _span_stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield None
+            return
+        span = Span(name)
+        stack = self._span_stack()
+        stack.append(span)
+        try:
+            yield span
+        finally:
+            stack.pop()
+            span.elapsed_ms = (time.perf_counter() - span.started) * 1000.0
+            with self._lock:
+                self._recent_spans.append(span)
+            logging.debug(span.summary())
+            if span.elapsed_ms >= self.slow_threshold_ms:
+                self._log_slow_span(span)
+
+    def recent_spans(self):
+        with self._lock:
+            return list(self._recent_spans)
+
+    # --- 慢查询日志 ---
+    def _get_slow_logger(self):
+        if self._slow_logger is None:
+            slow_logger = logging.getLogger(f'{__name__}.slow.{id(self)}')
+            slow_logger.propagate = False
+            slow_logger.setLevel(logging.INFO)
+            try:
+                handler = RotatingFileHandler(self.log_path, maxBytes=SLOW_LOG_MAX_BYTES,
+                                              backupCount=SLOW_LOG_BACKUPS, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+                slow_logger.addHandler(handler)
+            except OSError as e:
+                logging.warning(f"Failed to open slow query log {self.log_path}: {e}")
+            self._slow_logger = slow_logger
+        return self._slow_logger
+
+    def _explain(self, conn, sql, params):
+        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            return []
+        try:
+            # 用原生 Cursor 执行，避免 EXPLAIN 本身再次被记录
+            cur = sqlite3.Cursor(conn)
+            cur.execute('EXPLAIN QUERY PLAN ' + sql, params or ())
+            return [row[3] for row in cur.fetchall()]
+        except sqlite3.Error as e:
+            return [f'<explain failed: {e}>']
+
+    def _log_slow_query(self, conn, sql, shape, params, param_count, rows, elapsed_ms):
+        plan = self._explain(conn, sql, params)
+        spans = ' > '.join(s.name for s in self._span_stack()) or '-'
+        lines = [f"SLOW QUERY {elapsed_ms:.1f} ms, rows={rows}, params={param_count}, span={spans}", f"  {shape}"]
+        lines.extend(f"  PLAN {detail}" for detail in plan)
+        self._get_slow_logger().info('\n'.join(lines))
+
+    def _log_slow_span(self, span):
+        lines = [f"SLOW ACTION {span.summary()}"]
+        for shape, param_count, rows, elapsed_ms in sorted(span.queries, key=lambda q: q[3], reverse=True)[:10]:
+            lines.append(f"  {elapsed_ms:8.1f} ms rows={rows:<6} {shape[:200]}")
+        self._get_slow_logger().info('\n'.join(lines))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """
+    计时游标：不改变取数方式，只累计 execute 与各次取数在 SQLite 内花费的时间
+    （调用方在两次取数之间的处理不计入）。结果取完、游标关闭、再次 execute
+    或游标被回收时记录一次，行数为实际取走的行数；分批取数与时间预算照常工作。
+    """
+    _pending = None  # (profiler, sql, params)
+    _elapsed = 0.0
+    _fetched = 0
+
+    def execute(self, sql, params=()):
+        self._finish()
+        profiler = getattr(self.connection, 'profiler', None)
+        if profiler is None or not profiler.enabled:
+            return super().execute(sql, params)
+        start = time.perf_counter()
+        super().execute(sql, params)
+        elapsed = time.perf_counter() - start
+        if self.description is None:
+            profiler.record(self.connection, sql, params, self.rowcount, elapsed * 1000.0)
+        else:
+            self._pending, self._elapsed, self._fetched = (profiler, sql, params), elapsed, 0
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._finish()
+        profiler = getattr(self.connection, 'profiler', None)
+        if profiler is None or not profiler.enabled:
+            return super().executemany(sql, seq_of_params)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_params)
+        profiler.record(self.connection, sql, (), self.rowcount, (time.perf_counter() - start) * 1000.0)
+        return self
+
+    def fetchone(self):
+        if self._pending is None: return super().fetchone()
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._elapsed += time.perf_counter() - start
+        if row is None: self._finish()
+        else: self._fetched += 1
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        if self._pending is None: return super().fetchmany(size)
+        start = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._elapsed += time.perf_counter() - start
+        self._fetched += len(rows)
+        if len(rows) < size: self._finish()
+        return rows
+
+    def fetchall(self):
+        if self._pending is None: return super().fetchall()
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._elapsed += time.perf_counter() - start
+        self._fetched += len(rows)
+        self._finish()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._pending is None: return super().__next__()
+        row = self.fetchone()
+        if row is None: raise StopIteration
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
+
+    def _finish(self):
+        """记录进行中的查询（未取完的按已取走的行数记录）"""
+        pending = self._pending
+        if pending is None: return
+        self._pending = None
+        profiler, sql, params = pending
+        profiler.record(self.connection, sql, params, self._fetched, self._elapsed * 1000.0)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """所有游标（包括 conn.execute 快捷方式创建的）都使用 InstrumentedCursor"""
+    profiler = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# data/records.py
+"""
+笔记行的紧凑表示。
+
+- IdeaMeta / IdeaDetail：不可变的具名元组，既可按属性也可按键（record['title']）访问，
+  界面原来按字典取值的代码无需改动。颜色、类型和标签名都是驻留字符串，
+  同一个值在内存中只有一份。
+- MetadataTable：大范围元数据的列式存储。id、星级、布尔标志放在 array 里，
+  字符串列只保存引用，相同的标签组合共用一个元组；遍历或下标访问时按需生成 IdeaMeta。
+"""
+import sys
+from array import array
+from collections import namedtuple
+
+_intern = sys.intern
+
+# 标签组合 -> 共用的元组；组合数通常远少于笔记数，超出上限时整体清空
+MAX_TAG_SETS = 50000
+_TAG_SETS = {}
+
+META_FIELDS = (
+    'id', 'title', 'color', 'is_pinned', 'is_favorite', 'created_at', 'updated_at',
+    'item_type', 'rating', 'is_locked', 'tags',
+)
+DETAIL_FIELDS = (
+    'id', 'title', 'content', 'color', 'is_pinned', 'is_favorite', 'created_at', 'updated_at',
+    'category_id', 'is_deleted', 'item_type', 'data_blob', 'content_hash', 'is_locked', 'rating', 'tags',
+)
+
+
+def intern_str(value):
+    return _intern(value) if value.__class__ is str else value
+
+
+def split_tags(tag_names):
+    """GROUP_CONCAT 得到的标签串转为驻留字符串元组；相同的标签串返回同一个元组"""
+    if not tag_names: return ()
+    tags = _TAG_SETS.get(tag_names)
+    if tags is None:
+        if len(_TAG_SETS) >= MAX_TAG_SETS: _TAG_SETS.clear()
+        tags = _TAG_SETS[tag_names] = tuple(_intern(t) for t in tag_names.split(','))
+    return tags
+
+
+class _RecordMixin:
+    """按键取值的兼容层：record['key']、record.get()、record.keys()、'key' in record、dict(record)"""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        if key.__class__ is str:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        return tuple.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self._fields else default
+
+    def keys(self):
+        return self._fields
+
+    def __contains__(self, key):
+        # 与字典一致：'tags' in record 判断的是字段名而不是值
+        return key in self._fields
+
+
+class IdeaMeta(_RecordMixin, namedtuple('IdeaMeta', META_FIELDS)):
+    """列表筛选用的轻量元数据，不含正文与二进制数据"""
+    __slots__ = ()
+
+
+class IdeaDetail(_RecordMixin, namedtuple('IdeaDetail', DETAIL_FIELDS)):
+    """卡片渲染用的完整记录"""
+    __slots__ = ()
+
+
+_new_tuple = tuple.__new__
+
+_PINNED, _FAVORITE, _LOCKED = 1, 2, 4
+
+
+def detail_from_row(r):
+    """get_details_by_ids 查询的一行 -> IdeaDetail"""
+    return _new_tuple(IdeaDetail, (
+        r[0], r[1], r[2], intern_str(r[3]), r[4], r[5], r[6], r[7], r[8], r[9],
+        intern_str(r[10]), r[11], r[12], r[13], r[14], split_tags(r[15]),
+    ))
+
+
+class MetadataTable:
+    """
+    元数据的列式存储，行为近似 IdeaMeta 的列表：len()、遍历、下标与切片、extend、append。
+    布尔标志按位压进一个字节；is_pinned 等字段取回时为 0/1（与数据库中的值一致，NULL 视为 0）。
+    content 列只在增量搜索时临时附带，用 pop_content() 取走。
+    """
+    __slots__ = ('ids', 'ratings', 'flags', 'titles', 'colors', 'types', 'created', 'updated', 'tags', 'content')
+
+    def __init__(self, records=()):
+        self.ids = array('q')
+        self.ratings = array('b')
+        self.flags = array('B')
+        self.titles, self.colors, self.types = [], [], []
+        self.created, self.updated, self.tags = [], [], []
+        self.content = None
+        self.extend(records)
+
+    @classmethod
+    def from_rows(cls, rows, include_content=False):
+        """直接由 METADATA_COLUMNS 查询结果构建，不经过逐行的记录对象"""
+        table = cls()
+        for r in rows:
+            table._append_values(
+                r[0], r[1], r[2], r[3], r[4], r[5], r[6], r[7], r[8], r[9], split_tags(r[10])
+            )
+        if include_content:
+            table.content = [r[11] for r in rows]
+        return table
+
+    def _append_values(self, iid, title, color, pinned, favorite, created, updated, item_type, rating, locked, tags):
+        self.ids.append(iid)
+        self.ratings.append(rating or 0)
+        self.flags.append((_PINNED if pinned else 0) | (_FAVORITE if favorite else 0) | (_LOCKED if locked else 0))
+        self.titles.append(title)
+        self.colors.append(intern_str(color))
+        self.types.append(intern_str(item_type))
+        self.created.append(created)
+        self.updated.append(updated)
+        self.tags.append(tags)
+
+    def append(self, record):
+        self._append_values(*record)
+
+    def extend(self, records):
+        if isinstance(records, MetadataTable):
+            for name in ('ids', 'ratings', 'flags', 'titles', 'colors', 'types', 'created', 'updated', 'tags'):
+                getattr(self, name).extend(getattr(records, name))
+            return
+        for record in records:
+            self._append_values(*record)
+
+    def pop_content(self):
+        content, self.content = self.content, None
+        return content
+
+    def copy(self):
+        return self[:]
+
+    def filter(self, predicate):
+        """保留 predicate(record) 为真的行，返回新表"""
+        return self._take([i for i, record in enumerate(self) if predicate(record)])
+
+    def _take(self, indexes):
+        table = MetadataTable()
+        for name in self.__slots__[:-1]:
+            src, dst = getattr(self, name), getattr(table, name)
+            dst.extend([src[i] for i in indexes])
+        return table
+
+    def _record(self, i):
+        flags = self.flags[i]
+        return _new_tuple(IdeaMeta, (
+            self.ids[i], self.titles[i], self.colors[i], flags & _PINNED, (flags & _FAVORITE) >> 1,
+            self.created[i], self.updated[i], self.types[i], self.ratings[i], (flags & _LOCKED) >> 2,
+            self.tags[i],
+        ))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for iid, title, color, flags, created, updated, item_type, rating, tags in zip(
+            self.ids, self.titles, self.colors, self.flags, self.created, self.updated,
+            self.types, self.ratings, self.tags,
+        ):
+            yield _new_tuple(IdeaMeta, (
+                iid, title, color, flags & _PINNED, (flags & _FAVORITE) >> 1,
+                created, updated, item_type, rating, (flags & _LOCKED) >> 2, tags,
+            ))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            table = MetadataTable()
+            for name in self.__slots__[:-1]:
+                getattr(table, name).extend(getattr(self, name)[index])
+            return table
+        if index < 0: index += len(self.ids)
+        if not 0 <= index < len(self.ids): raise IndexError(index)
+        return self._record(index)
+
+    def __bool__(self):
+        return len(self.ids) > 0
+
+    def __repr__(self):
+        return f'<MetadataTable rows={len(self.ids)}>'
+
+
+def as_table(metadata):
+    return metadata if isinstance(metadata, MetadataTable) else MetadataTable(metadata)
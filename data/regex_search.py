@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+# data/regex_search.py
+"""
+正则 / 全字匹配搜索。
+
+SQLite 没有内置 REGEXP 实现，`X REGEXP Y` 会调用名为 REGEXP 的自定义函数 regexp(Y, X)，
+这里把它注册到连接上，编译好的正则按模式文本缓存（有上限）。
+逐行执行 Python 正则很慢，因此先从模式中提取 "任何匹配都必须包含" 的字面子串，
+用全文索引筛出候选行，再对候选行执行正则。
+"""
+import re
+from functools import lru_cache
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from data.search_index import match_expression
+
+SEARCH_MODES = ('plain', 'word', 'regex')
+PATTERN_CACHE_SIZE = 128
+
+
+def build_pattern(text, mode):
+    """
+    把搜索框文本转成正则：regex 模式原样使用（区分大小写，可用 (?i) 关闭），
+    word 模式把各个词按整词、忽略大小写匹配，词之间允许任意空白。
+    """
+    text = (text or '').strip()
+    if not text: return None
+    if mode == 'word':
+        return r'(?i)\b' + r'\s+'.join(re.escape(w) for w in text.split()) + r'\b'
+    return text
+
+
+@lru_cache(maxsize=PATTERN_CACHE_SIZE)
+def compile_pattern(pattern):
+    return re.compile(pattern)
+
+
+def pattern_error(pattern):
+    """模式无法编译时返回错误描述，否则返回 None"""
+    try:
+        compile_pattern(pattern)
+    except re.error as e:
+        return str(e)
+    return None
+
+
+def regexp(pattern, value):
+    if value is None: return 0
+    try:
+        return 1 if compile_pattern(pattern).search(value) else 0
+    except re.error:
+        return 0
+
+
+def register_functions(conn):
+    conn.create_function('REGEXP', 2, regexp, deterministic=True)
+
+
+def required_literals(pattern):
+    """
+    任何匹配都必须包含的字面子串（保守估计，宁缺毋错）。
+    只沿着必经路径收集：遇到分支、可选重复、字符类等就断开当前子串。
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return []
+    literals = []
+    _collect_literals(parsed, literals)
+    return [s for s in literals if s]
+
+
+def _collect_literals(seq, out):
+    run = []
+
+    def flush():
+        if run: out.append(''.join(run)); run.clear()
+
+    for op, av in seq:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+        elif op is sre_parse.AT:
+            # \b、^、$ 等零宽断言不占字符，不打断子串
+            continue
+        elif op is sre_parse.SUBPATTERN:
+            flush()
+            _collect_literals(av[-1], out)
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) and av[0] >= 1:
+            flush()
+            _collect_literals(av[2], out)
+        else:
+            flush()
+    flush()
+
+
+def prefilter_match(pattern):
+    """由必含子串组成的全文匹配式（隐式 AND）；没有可用子串时返回 None，只能逐行匹配"""
+    phrases = [m for m in (match_expression(s) for s in required_literals(pattern)) if m]
+    return ' '.join(phrases) if phrases else None
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+# data/repositories/archive_repository.py
+import logging
+
+from core.config import ARCHIVE_AFTER_DAYS
+from data.schema_migrations import SchemaMigration
+
+ARCHIVE_BATCH_SIZE = 500
+
+_COLUMNS = ', '.join(SchemaMigration.ARCHIVE_COLUMNS)
+
+
+class ArchiveRepository:
+    """
+    冷数据归档：长期未更新、未置顶未收藏、不在回收站的笔记分批移入挂载的归档库 archive.db，
+    默认列表和计数只查主库，主库保持精简。
+    记录保留原 ID；标签关联和历史版本留在主库，取回时原样可用。
+    搬移期间 ID 写入 archive_moving，触发器据此不记变更日志、不删历史版本（见 v7 迁移）。
+    """
+
+    def __init__(self, db_context):
+        self.db = db_context
+
+    @property
+    def available(self):
+        return self.db.archive
+
+    def _placeholders(self, ids):
+        return ','.join('?' * len(ids))
+
+    def archive_batch(self, days=ARCHIVE_AFTER_DAYS, limit=ARCHIVE_BATCH_SIZE):
+        """移入一批符合条件的笔记，返回移入的条数（0 表示已没有可归档的笔记）"""
+        if not self.available: return 0
+        self._resolve_interrupted()
+        c = self.db.get_cursor()
+        cutoff = f'-{int(days)} days'
+        c.execute("DELETE FROM archive_holds WHERE held_at < datetime('now', ?)", (cutoff,))
+        c.execute(
+            "SELECT id FROM ideas WHERE is_deleted=0 AND updated_ts < CAST(strftime('%s', 'now', ?) AS INTEGER) "
+            "AND is_pinned=0 AND is_favorite=0 AND id NOT IN (SELECT idea_id FROM archive_holds) "
+            "ORDER BY updated_ts LIMIT ?", (cutoff, limit)
+        )
+        ids = [r[0] for r in c.fetchall()]
+        if not ids:
+            self.db.commit()
+            return 0
+        self._move(ids, 'main', 'archive')
+        # 重新统计归档库（创建时借用的是主库的统计），只抽样有限行数，开销与归档库大小无关
+        c.execute('PRAGMA analysis_limit = 1000')
+        c.execute('ANALYZE archive.ideas')
+        c.execute('PRAGMA analysis_limit = 0')
+        return len(ids)
+
+    def promote(self, ids):
+        """把 ids 中位于归档库的笔记移回主库，返回实际移回的 ID 列表"""
+        if not self.available or not ids: return []
+        c = self.db.get_cursor()
+        ids = list(ids)
+        c.execute(f'SELECT id FROM archive.ideas WHERE id IN ({self._placeholders(ids)})', ids)
+        archived = [r[0] for r in c.fetchall()]
+        if not archived: return []
+        self._move(archived, 'archive', 'main')
+        c.executemany('INSERT OR REPLACE INTO archive_holds (idea_id) VALUES (?)', [(i,) for i in archived])
+        self.db.commit()
+        return archived
+
+    def _move(self, ids, source, target):
+        """
+        分步搬移，每步只写一个库文件就提交：WAL 模式下一个事务跨两个库提交时不是原子的，
+        崩溃时可能只有一边生效，记录就丢了。按下面的顺序，任何一步中断最多留下两边各一份，
+        由 _resolve_interrupted() 收尾。
+        """
+        c = self.db.get_cursor()
+        marks = self._placeholders(ids)
+        try:
+            c.executemany('INSERT OR IGNORE INTO archive_moving (idea_id) VALUES (?)', [(i,) for i in ids])
+            self.db.commit()
+            c.execute(
+                f'INSERT INTO {target}.ideas ({_COLUMNS}) SELECT {_COLUMNS} FROM {source}.ideas WHERE id IN ({marks})', ids
+            )
+            # 主库的全文索引由 ideas 上的触发器维护；归档库没有触发器，索引行随记录一起搬
+            if self.db.search_index and target == 'archive':
+                c.execute(
+                    'INSERT INTO archive.ideas_search (rowid, title, tags, content) '
+                    f'SELECT rowid, title, tags, content FROM main.ideas_search WHERE rowid IN ({marks})', ids
+                )
+            self.db.commit()
+            if self.db.search_index and source == 'archive':
+                c.execute(f'DELETE FROM archive.ideas_search WHERE rowid IN ({marks})', ids)
+            c.execute(f'DELETE FROM {source}.ideas WHERE id IN ({marks})', ids)
+            self.db.commit()
+            c.execute(f'DELETE FROM archive_moving WHERE idea_id IN ({marks})', ids)
+            self.db.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+
+    def _resolve_interrupted(self):
+        """
+        上次搬移中途中断时收尾：两边都有的记录以主库为准，删掉归档库的副本，再清空 archive_moving。
+        只在归档的进程里、两次搬移之间调用；守护进程只会取回记录，以主库为准与它的下一步一致。
+        """
+        c = self.db.get_cursor()
+        c.execute('SELECT idea_id FROM archive_moving')
+        ids = [r[0] for r in c.fetchall()]
+        if not ids: return
+        marks = self._placeholders(ids)
+        c.execute(f'SELECT id FROM main.ideas WHERE id IN ({marks})', ids)
+        both = [r[0] for r in c.fetchall()]
+        if both:
+            both_marks = self._placeholders(both)
+            if self.db.search_index:
+                c.execute(f'DELETE FROM archive.ideas_search WHERE rowid IN ({both_marks})', both)
+            c.execute(f'DELETE FROM archive.ideas WHERE id IN ({both_marks})', both)
+            self.db.commit()
+        c.execute(f'DELETE FROM archive_moving WHERE idea_id IN ({marks})', ids)
+        self.db.commit()
+        logging.warning(f"Resolved {len(ids)} interrupted archive moves")
+
+    def find_by_hash(self, content_hash):
+        if not self.available: return None
+        c = self.db.get_cursor()
+        c.execute('SELECT id FROM archive.ideas WHERE content_hash = ?', (content_hash,))
+        return c.fetchone()
+
+    def count(self):
+        if not self.available: return 0
+        c = self.db.get_cursor()
+        c.execute('SELECT COUNT(*) FROM archive.ideas')
+        return c.fetchone()[0]
@@ -2,9 +2,12 @@
 # data/repositories/category_repository.py
 import random
 
+from data.repositories.archive_repository import ArchiveRepository
+
 class CategoryRepository:
     def __init__(self, db_context):
         self.db = db_context
+        self.archive = ArchiveRepository(db_context)
 
     def get_all(self):
         c = self.db.get_cursor()
@@ -39,6 +42,16 @@ class CategoryRepository:
         c.execute('UPDATE categories SET name=? WHERE id=?', (new_name, cat_id))
         self.db.commit()
 
+    def promote_archived(self, cat_ids):
+        """
+        分类下已归档的笔记先取回主库再修改：直接改归档库不经过触发器，
+        不会记变更日志、刷新 modified_at，也不会让记录缓存失效
+        """
+        if not self.archive.available or not cat_ids: return
+        c = self.db.get_cursor()
+        c.execute(f"SELECT id FROM archive.ideas WHERE category_id IN ({','.join('?' * len(cat_ids))})", cat_ids)
+        self.archive.promote([r[0] for r in c.fetchall()])
+
     def set_color(self, cat_id, color):
         c = self.db.get_cursor()
         try:
@@ -54,6 +67,7 @@ class CategoryRepository:
             all_ids = [row[0] for row in c.fetchall()]
 
             if all_ids:
+                self.promote_archived(all_ids)
                 placeholders = ','.join('?' * len(all_ids))
                 c.execute(f"UPDATE ideas SET color = ? WHERE category_id IN ({placeholders})", (color, *all_ids))
                 c.execute(f"UPDATE categories SET color = ? WHERE id IN ({placeholders})", (color, *all_ids))
@@ -62,6 +76,7 @@ class CategoryRepository:
             self.db.conn.rollback()
 
     def delete(self, cid):
+        self.promote_archived([cid])
         c = self.db.get_cursor()
         c.execute('UPDATE ideas SET category_id=NULL WHERE category_id=?', (cid,))
         c.execute('DELETE FROM categories WHERE id=?', (cid,))
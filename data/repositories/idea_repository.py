@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
 # data/repositories/idea_repository.py
 from core.config import COLORS
+from data.time_ranges import day_range, date_option_range
+from data.query_parser import parse_query
+from data.query_compiler import compile_query, compile_match
+from data.query_cancel import fetch_within_budget
+from data.regex_search import prefilter_match
+from data.records import MetadataTable, detail_from_row
 
 class IdeaRepository:
     # SQL字段白名单 - 防止SQL注入
@@ -8,113 +14,238 @@ class IdeaRepository:
         'title', 'content', 'color', 'category_id', 'item_type', 
         'is_pinned', 'is_favorite', 'is_deleted', 'is_locked', 'rating'
     }
+
+    # 列表查询返回的列（UI 按列名读取，顺序也请保持不变）
+    LIST_COLUMNS = '''
+        i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, 
+        i.created_at, i.updated_at, i.category_id, i.is_deleted, 
+        i.item_type, i.data_blob, i.content_hash, i.is_locked, i.rating
+    '''
     
     def __init__(self, db_context):
         # 【关键修改】这里必须是 self.db，不能是 self.conn
         self.db = db_context
 
-    def get_count_by_filter(self, search, f_type, f_val, tag_filter=None, criteria=None):
-        c = self.db.get_cursor()
-        q, p = self._build_query(search, f_type, f_val, tag_filter, criteria, count_only=True)
-        c.execute(q, p)
-        return c.fetchone()[0]
+    def _schemas(self, search, f_type, include_archive=False):
+        """
+        查询涉及的库：默认视图只查主库；有搜索条件或要求显示归档时连同归档库一起查。
+        归档库里只有未删除、未收藏的笔记，回收站和收藏视图不必查它。
+        """
+        if not self.db.archive or f_type in ('trash', 'bookmark'): return ('main',)
+        if search or include_archive: return ('main', 'archive')
+        return ('main',)
 
-    def get_list_by_filter(self, search, f_type, f_val, page, page_size, tag_filter=None, criteria=None):
-        c = self.db.get_cursor()
-        q, p = self._build_query(search, f_type, f_val, tag_filter, criteria, count_only=False)
-        
-        if f_type == 'trash':
-            q += ' ORDER BY i.updated_at DESC'
-        else:
-            q += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
-            
+    def get_count_by_filter(self, search, f_type, f_val, tag_filter=None, criteria=None, token=None, include_archive=False):
+        """token 为 CancelToken 时可被取消；超出时间预算返回 None"""
+        total = 0
+        for schema in self._schemas(search, f_type, include_archive):
+            q, p = self._build_query(search, f_type, f_val, tag_filter, criteria, count_only=True, schema=schema)
+            rows = self._fetch_all(q, p, token)
+            if not rows: return None
+            total += rows[0][0]
+        return total
+
+    def get_list_by_filter(self, search, f_type, f_val, page, page_size, tag_filter=None, criteria=None, ranked=False, token=None, include_archive=False):
+        schemas = self._schemas(search, f_type, include_archive)
+        limit = offset = None
         if page is not None and page_size is not None:
             limit = page_size
             offset = (page - 1) * page_size
+
+        if ranked and self.fts_match(search):
+            return self._fetch_ranked(self.LIST_COLUMNS, search, f_type, f_val, tag_filter, criteria, schemas, limit, offset, token)
+
+        q, p = self._union(
+            [self._build_query(search, f_type, f_val, tag_filter, criteria, schema=s) for s in schemas], f_type
+        )
+        if limit is not None:
             q += ' LIMIT ? OFFSET ?'
             p.extend([limit, offset])
-        
+        return self._fetch_all(q, p, token)
+
+    def _union(self, queries, f_type):
+        """[(sql, params), ...] 合并为一个按列表顺序排序的查询；跨库时用 UNION ALL，排序由两边的索引归并完成"""
+        if len(queries) == 1:
+            q, p = queries[0]
+            return q + self._order_clause(f_type), list(p)
+        params = []
+        for _, p in queries: params.extend(p)
+        return ' UNION ALL '.join(q for q, _ in queries) + self._order_clause(f_type, alias=''), params
+
+    def _fetch_ranked(self, columns, search, f_type, f_val, tag_filter, criteria, schemas, limit=None, offset=None, token=None):
+        """
+        相关度排序：各库分别由全文索引按 bm25 排序，主库的结果排在归档库之前。
+        分页时先从主库取，主库不够一页再从归档库接着取。
+        """
+        rows, offset = [], offset or 0
+        for schema in schemas:
+            q, p = self._build_ranked_query(columns, search, f_type, f_val, tag_filter, criteria, schema)
+            if limit is not None:
+                q += ' LIMIT ? OFFSET ?'
+                p.extend([limit - len(rows), offset])
+            part = self._fetch_all(q, p, token)
+            rows.extend(part)
+            if token is not None and token.partial: break
+            if limit is None: continue
+            if len(rows) >= limit: break
+            if part: offset = 0
+            elif offset:
+                # 本库的命中全部在偏移之前，下一个库的偏移扣除本库命中数
+                cq, cp = self._build_query(search, f_type, f_val, tag_filter, criteria, count_only=True, schema=schema)
+                counted = self._fetch_all(cq, cp, token)
+                # 计数被时间预算打断时不知道该扣多少，不再往下一个库翻页，按部分结果返回
+                if not counted or (token is not None and token.partial): break
+                offset = max(0, offset - counted[0][0])
+        return rows
+
+    def _fetch_all(self, q, p, token=None):
+        """token 为 CancelToken 时分批读取，超出预算返回部分结果（见 data/query_cancel.py）"""
+        if token is not None:
+            return fetch_within_budget(self.db.conn, q, p, token)
+        c = self.db.get_cursor()
         c.execute(q, p)
         return c.fetchall()
 
-    def _build_query(self, search, f_type, f_val, tag_filter, criteria, count_only=False):
+    def get_list_by_ids(self, id_list):
+        """按给定 ID 顺序返回与 get_list_by_filter 相同列的行（含已归档的记录）"""
+        if not id_list: return []
+        row_map = self._fetch_by_ids(f"SELECT {self.LIST_COLUMNS} FROM {{schema}}.ideas i WHERE i.id IN ({{ids}})", id_list)
+        return [row_map[iid] for iid in id_list if iid in row_map]
+
+    def _fetch_by_ids(self, sql, id_list):
+        """
+        按 ID 查询，返回 {id: 行}。sql 中 {schema} 为库名、{ids} 为占位符；
+        主库没有的 ID 再到归档库查找（搜索结果或显示归档时会出现归档记录）。
+        """
+        c = self.db.get_cursor()
+        result, missing = {}, list(id_list)
+        for schema in ('main', 'archive') if self.db.archive else ('main',):
+            if not missing: break
+            c.execute(sql.format(schema=schema, ids=','.join('?' * len(missing))), missing)
+            for r in c.fetchall():
+                result[r[0]] = r
+            missing = [iid for iid in missing if iid not in result]
+        return result
+
+    def _build_query(self, search, f_type, f_val, tag_filter, criteria, count_only=False, schema='main'):
         if count_only:
-            q = "SELECT COUNT(DISTINCT i.id) FROM ideas i "
+            q = f"SELECT COUNT(*) FROM {schema}.ideas i "
         else:
-            q = """
-                SELECT DISTINCT 
-                    i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, 
-                    i.created_at, i.updated_at, i.category_id, i.is_deleted, 
-                    i.item_type, i.data_blob, i.content_hash, i.is_locked, i.rating
-                FROM ideas i 
-            """
-            
-        q += "LEFT JOIN idea_tags it ON i.id=it.idea_id LEFT JOIN tags t ON it.tag_id=t.id WHERE 1=1"
+            q = f"SELECT {self.LIST_COLUMNS} FROM {schema}.ideas i "
+        where, p = self._build_where(search, f_type, f_val, tag_filter, criteria, schema=schema)
+        return q + "WHERE " + where, p
+
+    def _build_ranked_query(self, columns, search, f_type, f_val, tag_filter=None, criteria=None, schema='main'):
+        """
+        相关度排序：从全文索引出发按 bm25 排序（列权重见 search_index.RANK_WEIGHTS），
+        排序由 FTS5 在索引查询内部完成，不需要把全部命中取回再排序。
+        """
+        where, p = self._build_where(search, f_type, f_val, tag_filter, criteria, include_match=False)
+        q = (
+            f"SELECT {columns} FROM {schema}.ideas_search JOIN {schema}.ideas i ON i.id = ideas_search.rowid "
+            f"WHERE ideas_search MATCH ? AND {where} ORDER BY ideas_search.rank"
+        )
+        return q, [self.fts_match(search)] + p
+
+    def fts_match(self, search):
+        """搜索文本中可以走全文索引的部分（FTS5 匹配式），没有则返回 None"""
+        return compile_match(parse_query(search), self.db.search_index)
+
+    def _resolve_category_path(self, path):
+        """
+        in: 条件的分类路径 -> 该分类及其全部子孙的 ID。
+        路径按 "/" 分级、不区分大小写，只需匹配末尾几级（in:Alpha 与 in:Projects/Alpha 都可以）。
+        """
+        parts = [x.strip().lower() for x in path.split('/') if x.strip()]
+        if not parts: return []
+        c = self.db.get_cursor()
+        c.execute('SELECT id, name, parent_id FROM categories')
+        nodes = {r[0]: (r[1] or '', r[2]) for r in c.fetchall()}
+        children = {}
+        for cid, (_, parent_id) in nodes.items():
+            children.setdefault(parent_id, []).append(cid)
+
+        def path_matches(cid):
+            for name in reversed(parts):
+                if cid not in nodes or nodes[cid][0].lower() != name: return False
+                cid = nodes[cid][1]
+            return True
+
+        result, stack = set(), [cid for cid in nodes if path_matches(cid)]
+        while stack:
+            cid = stack.pop()
+            if cid in result: continue
+            result.add(cid)
+            stack.extend(children.get(cid, []))
+        return sorted(result)
+
+    @staticmethod
+    def _order_clause(f_type, alias='i.'):
+        # 末尾按 id 决胜：时间相同的记录在不同查询计划下顺序也固定（索引项末尾即 rowid，不需要额外排序）
+        if f_type == 'trash': return f' ORDER BY {alias}updated_at DESC, {alias}id DESC'
+        return f' ORDER BY {alias}is_pinned DESC, {alias}updated_at DESC, {alias}id DESC'
+
+    def _build_where(self, search, f_type, f_val, tag_filter=None, criteria=None, include_match=True, schema='main'):
+        """
+        构造 ideas i 的过滤条件，返回 (where_sql, params)。
+        所有条件都写成可走索引的形式：日期用 *_ts 时间戳区间，
+        标签匹配用子查询代替 LEFT JOIN + DISTINCT。
+        search 按查询语法解析（见 data/query_parser.py），结构化条件在前，全文匹配和 LIKE 扫描在后。
+        """
+        clauses = ['i.is_deleted=1' if f_type == 'trash' else 'i.is_deleted=0']
         p = []
 
-        if f_type == 'trash': q += ' AND i.is_deleted=1'
-        else: q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        
         if f_type == 'category':
-            if f_val is None: q += ' AND i.category_id IS NULL'
-            else: q += ' AND i.category_id=?'; p.append(f_val)
-        elif f_type == 'today': q += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == 'untagged': q += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == 'bookmark': q += ' AND i.is_favorite=1'
+            if f_val is None: clauses.append('i.category_id IS NULL')
+            else: clauses.append('i.category_id=?'); p.append(f_val)
+        elif f_type == 'today':
+            clauses.append('i.updated_ts>=? AND i.updated_ts<?'); p.extend(day_range())
+        elif f_type == 'untagged': clauses.append('i.id NOT IN (SELECT idea_id FROM idea_tags)')
+        elif f_type == 'bookmark': clauses.append('i.is_favorite=1')
         
-        if search:
-            q += ' AND (i.title LIKE ? OR i.content LIKE ? OR t.name LIKE ?)'
-            p.extend([f'%{search}%']*3)
-
         if tag_filter:
-            q += " AND i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))"
+            clauses.append("i.id IN (SELECT idea_id FROM idea_tags WHERE tag_id = (SELECT id FROM tags WHERE name = ?))")
             p.append(tag_filter)
             
         if criteria:
-            if 'stars' in criteria:
-                stars = criteria['stars']
-                placeholders = ','.join('?' * len(stars))
-                q += f" AND i.rating IN ({placeholders})"
-                p.extend(stars)
-            if 'colors' in criteria:
-                colors = criteria['colors']
-                placeholders = ','.join('?' * len(colors))
-                q += f" AND i.color IN ({placeholders})"
-                p.extend(colors)
-            if 'types' in criteria:
-                types = criteria['types']
-                placeholders = ','.join('?' * len(types))
-                q += f" AND i.item_type IN ({placeholders})"
-                p.extend(types)
+            for key, column in (('stars', 'i.rating'), ('colors', 'i.color'), ('types', 'i.item_type')):
+                if key in criteria:
+                    values = criteria[key]
+                    clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                    p.extend(values)
             if 'tags' in criteria:
                 tags = criteria['tags']
                 tag_placeholders = ','.join('?' * len(tags))
-                q += f" AND i.id IN (SELECT idea_id FROM idea_tags JOIN tags ON idea_tags.tag_id = tags.id WHERE tags.name IN ({tag_placeholders}))"
+                clauses.append(f"i.id IN (SELECT idea_id FROM idea_tags JOIN tags ON idea_tags.tag_id = tags.id WHERE tags.name IN ({tag_placeholders}))")
                 p.extend(tags)
             if 'date_create' in criteria:
                 date_conditions = []
                 for d_opt in criteria['date_create']:
-                    if d_opt == 'today': date_conditions.append("date(i.created_at,'localtime')=date('now','localtime')")
-                    elif d_opt == 'yesterday': date_conditions.append("date(i.created_at,'localtime')=date('now','-1 day','localtime')")
-                    elif d_opt == 'week': date_conditions.append("date(i.created_at,'localtime')>=date('now','-6 days','localtime')")
-                    elif d_opt == 'month': date_conditions.append("strftime('%Y-%m',i.created_at,'localtime')=strftime('%Y-%m','now','localtime')")
+                    rng = date_option_range(d_opt)
+                    if rng:
+                        date_conditions.append('(i.created_ts>=? AND i.created_ts<?)')
+                        p.extend(rng)
                 if date_conditions:
-                    q += " AND (" + " OR ".join(date_conditions) + ")"
+                    clauses.append("(" + " OR ".join(date_conditions) + ")")
+
+        if search:
+            plan = compile_query(parse_query(search), self.db.search_index, self._resolve_category_path)
+            search_clauses, search_params = plan.where(include_match, schema)
+            clauses.extend(search_clauses)
+            p.extend(search_params)
         
-        return q, p
+        return ' AND '.join(clauses), p
 
     def get_by_id(self, iid, include_blob=False):
-        c = self.db.get_cursor()
-        if include_blob:
-            c.execute('SELECT * FROM ideas WHERE id=?', (iid,))
-        else:
-            c.execute('''
-                SELECT id, title, content, color, is_pinned, is_favorite, 
-                       created_at, updated_at, category_id, is_deleted, item_type, 
-                       NULL as data_blob, NULL as content_hash, is_locked, rating
-                FROM ideas WHERE id=?
-            ''', (iid,))
-        return c.fetchone()
+        """主库没有时到归档库查找（只读取，不取回主库）"""
+        blob = 'data_blob, content_hash' if include_blob else 'NULL as data_blob, NULL as content_hash'
+        row = self._fetch_by_ids(f'''
+            SELECT id, title, content, color, is_pinned, is_favorite,
+                   created_at, updated_at, category_id, is_deleted, item_type,
+                   {blob}, is_locked, rating
+            FROM {{schema}}.ideas WHERE id IN ({{ids}})
+        ''', [iid])
+        return row.get(iid)
 
     def add(self, title, content, color, category_id, item_type, data_blob, content_hash=None):
         c = self.db.get_cursor()
@@ -161,87 +292,80 @@ class IdeaRepository:
         c.execute("UPDATE ideas SET updated_at = CURRENT_TIMESTAMP WHERE id = ?", (iid,))
         self.db.commit()
 
-    def get_counts(self):
+    def get_counts(self, include_archive=False):
+        """侧栏各视图的数量；与列表一致，include_archive=True 时连同归档库计数（见 _schemas）"""
         c = self.db.get_cursor()
         d = {}
         queries = {
-            'all': "is_deleted=0 OR is_deleted IS NULL",
-            'today': "(is_deleted=0 OR is_deleted IS NULL) AND date(updated_at,'localtime')=date('now','localtime')",
-            'uncategorized': "(is_deleted=0 OR is_deleted IS NULL) AND category_id IS NULL",
-            'untagged': "(is_deleted=0 OR is_deleted IS NULL) AND id NOT IN (SELECT idea_id FROM idea_tags)",
-            'bookmark': "(is_deleted=0 OR is_deleted IS NULL) AND is_favorite=1",
-            'trash': "is_deleted=1"
+            'all': ("is_deleted=0", ()),
+            'today': ("is_deleted=0 AND updated_ts>=? AND updated_ts<?", day_range()),
+            'uncategorized': ("is_deleted=0 AND category_id IS NULL", ()),
+            'untagged': ("is_deleted=0 AND id NOT IN (SELECT idea_id FROM idea_tags)", ()),
+            'bookmark': ("is_deleted=0 AND is_favorite=1", ()),
+            'trash': ("is_deleted=1", ())
         }
-        for k, v in queries.items():
-            c.execute(f"SELECT COUNT(*) FROM ideas WHERE {v}")
-            d[k] = c.fetchone()[0]
-        
-        c.execute("SELECT category_id, COUNT(*) FROM ideas WHERE (is_deleted=0 OR is_deleted IS NULL) GROUP BY category_id")
-        d['categories'] = dict(c.fetchall())
+        for k, (where, params) in queries.items():
+            d[k] = 0
+            for schema in self._schemas(None, k, include_archive):
+                c.execute(f"SELECT COUNT(*) FROM {schema}.ideas WHERE {where}", params)
+                d[k] += c.fetchone()[0]
+
+        d['categories'] = {}
+        for schema in self._schemas(None, 'category', include_archive):
+            c.execute(f"SELECT category_id, COUNT(*) FROM {schema}.ideas WHERE is_deleted=0 GROUP BY category_id")
+            for cat_id, n in c.fetchall():
+                d['categories'][cat_id] = d['categories'].get(cat_id, 0) + n
         return d
         
-    def get_filter_stats(self, search_text, filter_type, filter_value):
+    def get_filter_stats(self, search_text, filter_type, filter_value, include_archive=False):
+        """
+        筛选面板的统计，范围与列表相同：有搜索条件或 include_archive=True 时包含归档库。
+        各库分别按索引统计后相加，标签按合计数量从多到少排列。
+        """
         c = self.db.get_cursor()
         stats = {'stars': {}, 'colors': {}, 'types': {}, 'tags': [], 'date_create': {}}
-        
-        where_clauses = ["1=1"]
-        params = []
-        
-        if filter_type == 'trash': where_clauses.append("i.is_deleted=1")
-        else: where_clauses.append("(i.is_deleted=0 OR i.is_deleted IS NULL)")
-            
-        if filter_type == 'category':
-            if filter_value is None: where_clauses.append("i.category_id IS NULL")
-            else: where_clauses.append("i.category_id=?"); params.append(filter_value)
-        elif filter_type == 'today': where_clauses.append("date(i.updated_at,'localtime')=date('now','localtime')")
-        elif filter_type == 'untagged': where_clauses.append("i.id NOT IN (SELECT idea_id FROM idea_tags)")
-        elif filter_type == 'bookmark': where_clauses.append("i.is_favorite=1")
-        
-        if search_text:
-            where_clauses.append("(i.title LIKE ? OR i.content LIKE ?)")
-            params.extend([f'%{search_text}%', f'%{search_text}%'])
-            
-        where_str = " AND ".join(where_clauses)
-        
-        c.execute(f"SELECT i.rating, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.rating", params)
-        stats['stars'] = dict(c.fetchall())
-
-        c.execute(f"SELECT i.color, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.color", params)
-        stats['colors'] = dict(c.fetchall())
-
-        c.execute(f"SELECT i.item_type, COUNT(*) FROM ideas i WHERE {where_str} GROUP BY i.item_type", params)
-        stats['types'] = dict(c.fetchall())
-
-        tag_sql = f"""
-            SELECT t.name, COUNT(it.idea_id) as cnt
-            FROM tags t
-            JOIN idea_tags it ON t.id = it.tag_id
-            JOIN ideas i ON it.idea_id = i.id
-            WHERE {where_str}
-            GROUP BY t.id
-            ORDER BY cnt DESC
-        """
-        c.execute(tag_sql, params)
-        stats['tags'] = c.fetchall()
-
-        base_date_sql = f"SELECT COUNT(*) FROM ideas i WHERE {where_str} AND "
-        c.execute(base_date_sql + "date(i.created_at, 'localtime') = date('now', 'localtime')", params)
-        stats['date_create']['today'] = c.fetchone()[0]
-        c.execute(base_date_sql + "date(i.created_at, 'localtime') = date('now', '-1 day', 'localtime')", params)
-        stats['date_create']['yesterday'] = c.fetchone()[0]
-        c.execute(base_date_sql + "date(i.created_at, 'localtime') >= date('now', '-6 days', 'localtime')", params)
-        stats['date_create']['week'] = c.fetchone()[0]
-        c.execute(base_date_sql + "strftime('%Y-%m', i.created_at, 'localtime') = strftime('%Y-%m', 'now', 'localtime')", params)
-        stats['date_create']['month'] = c.fetchone()[0]
+        tag_counts = {}
+
+        def add_counts(target, rows):
+            for key, n in rows:
+                target[key] = target.get(key, 0) + n
+
+        for schema in self._schemas(search_text, filter_type, include_archive):
+            where_str, params = self._build_where(search_text, filter_type, filter_value, schema=schema)
+
+            c.execute(f"SELECT i.rating, COUNT(*) FROM {schema}.ideas i WHERE {where_str} GROUP BY i.rating", params)
+            add_counts(stats['stars'], c.fetchall())
 
+            c.execute(f"SELECT i.color, COUNT(*) FROM {schema}.ideas i WHERE {where_str} GROUP BY i.color", params)
+            add_counts(stats['colors'], c.fetchall())
+
+            c.execute(f"SELECT i.item_type, COUNT(*) FROM {schema}.ideas i WHERE {where_str} GROUP BY i.item_type", params)
+            add_counts(stats['types'], c.fetchall())
+
+            tag_sql = f"""
+                SELECT t.name, COUNT(it.idea_id) as cnt
+                FROM tags t
+                JOIN idea_tags it ON t.id = it.tag_id
+                JOIN {schema}.ideas i ON it.idea_id = i.id
+                WHERE {where_str}
+                GROUP BY t.id
+                ORDER BY cnt DESC
+            """
+            c.execute(tag_sql, params)
+            add_counts(tag_counts, c.fetchall())
+
+            base_date_sql = f"SELECT COUNT(*) FROM {schema}.ideas i WHERE {where_str} AND i.created_ts>=? AND i.created_ts<?"
+            for d_opt in ('today', 'yesterday', 'week', 'month'):
+                c.execute(base_date_sql, [*params, *date_option_range(d_opt)])
+                add_counts(stats['date_create'], [(d_opt, c.fetchone()[0])])
+
+        stats['tags'] = sorted(tag_counts.items(), key=lambda item: -item[1])
         return stats
     
     def get_lock_status(self, idea_ids):
         if not idea_ids: return {}
-        c = self.db.get_cursor()
-        placeholders = ','.join('?' * len(idea_ids))
-        c.execute(f'SELECT id, is_locked FROM ideas WHERE id IN ({placeholders})', tuple(idea_ids))
-        return dict(c.fetchall())
+        rows = self._fetch_by_ids('SELECT id, is_locked FROM {schema}.ideas WHERE id IN ({ids})', list(idea_ids))
+        return {iid: r[1] for iid, r in rows.items()}
         
     def set_locked(self, idea_ids, state):
         if not idea_ids: return
@@ -256,152 +380,101 @@ class IdeaRepository:
         c.execute("SELECT id FROM ideas WHERE content_hash = ?", (content_hash,))
         return c.fetchone()
 
+    def get_blob(self, iid):
+        row = self._fetch_by_ids('SELECT id, data_blob FROM {schema}.ideas WHERE id IN ({ids})', [iid]).get(iid)
+        return row[1] if row else None
+
     # --- New Methods for Smart Caching Architecture ---
     
-    def get_metadata_by_filter(self, search, f_type, f_val):
+    # 元数据查询的列：标签用相关子查询聚合，不需要 GROUP BY，排序可以直接走索引
+    METADATA_COLUMNS = """
+            i.id, i.title, i.color, i.is_pinned, i.is_favorite, 
+            i.created_at, i.updated_at, i.item_type, i.rating, i.is_locked,
+            (SELECT GROUP_CONCAT(t.name) FROM idea_tags it JOIN tags t ON t.id=it.tag_id
+             WHERE it.idea_id=i.id) as tag_names,
+            {content} as content
+    """
+
+    def get_metadata_by_filter(self, search, f_type, f_val, include_content=False, limit=None, ranked=False, token=None, include_archive=False):
         """
         获取符合条件的所有数据的轻量级元数据。
         不包含 data_blob, content 等重字段。
         用于前端瞬间加载和客户端筛选。
+        返回列式存储的 MetadataTable，逐行取出为 IdeaMeta。
+        include_content=True 时额外附带 content 列（供增量搜索在内存中匹配）。
+        ranked=True 且关键词可走全文索引时按相关度排序。
+        token 为 CancelToken 时可被取消，超出时间预算则只返回已取到的前一部分。
+        有搜索条件或 include_archive=True 时连同归档库一起查（见 _schemas）。
         """
-        c = self.db.get_cursor()
-        
-        # 基础查询，只查轻量字段
-        q = """
-            SELECT DISTINCT 
-                i.id, i.title, i.color, i.is_pinned, i.is_favorite, 
-                i.created_at, i.updated_at, i.item_type, i.rating, i.is_locked
-            FROM ideas i 
-            LEFT JOIN idea_tags it ON i.id=it.idea_id 
-            LEFT JOIN tags t ON it.tag_id=t.id 
-            WHERE 1=1
-        """
-        p = []
+        columns = self.METADATA_COLUMNS.format(content='i.content' if include_content else 'NULL')
+        schemas = self._schemas(search, f_type, include_archive)
+        if ranked and self.fts_match(search):
+            rows = self._fetch_ranked(columns, search, f_type, f_val, None, None, schemas, limit, None, token)
+            return MetadataTable.from_rows(rows, include_content)
+        queries = []
+        for schema in schemas:
+            where, p = self._build_where(search, f_type, f_val, schema=schema)
+            queries.append((f"SELECT {columns} FROM {schema}.ideas i WHERE {where}", p))
+        q, p = self._union(queries, f_type)
+        if limit is not None:
+            q += ' LIMIT ?'; p.append(limit)
+        rows = self._fetch_all(q, p, token)
+        return MetadataTable.from_rows(rows, include_content)
 
-        if f_type == 'trash': q += ' AND i.is_deleted=1'
-        else: q += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        
-        if f_type == 'category':
-            if f_val is None: q += ' AND i.category_id IS NULL'
-            else: q += ' AND i.category_id=?'; p.append(f_val)
-        elif f_type == 'today': q += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == 'untagged': q += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == 'bookmark': q += ' AND i.is_favorite=1'
-        
-        if search:
-            q += ' AND (i.title LIKE ? OR i.content LIKE ? OR t.name LIKE ?)'
-            p.extend([f'%{search}%']*3)
-            
-        # 默认排序
-        if f_type == 'trash':
-            q += ' ORDER BY i.updated_at DESC'
-        else:
-            q += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
-
-        c.execute(q, p)
-        rows = c.fetchall()
-        
-        # 为了高效，直接返回字典列表，包含后续筛选所需的所有字段
-        result = []
-        # 注意：fetchall 返回的是 tuple，需要配合 description 映射或按索引取
-        # 这里的索引顺序: 0:id, 1:title, 2:color, 3:pinned, 4:fav, 5:created, 6:updated, 7:type, 8:rating, 9:locked
-        
-        # 额外步骤：为了支持Tag筛选，我们需要知道每个idea的tags
-        # 但在 SQL 里 join 会导致重复行。
-        # 策略：先拿到 ideas，再批量查 tags? 或者在 python 层不做 tag 聚合，
-        # 而是为了性能，我们在 SQL 里 GROUP_CONCAT tags?
-        #由于 sqlite group_concat 简单，我们用它
-        
-        # 重写查询以支持 tags 聚合
-        q_grouped = f"""
-            SELECT 
-                i.id, i.title, i.color, i.is_pinned, i.is_favorite, 
-                i.created_at, i.updated_at, i.item_type, i.rating, i.is_locked,
-                GROUP_CONCAT(t.name) as tag_names
-            FROM ideas i 
-            LEFT JOIN idea_tags it ON i.id=it.idea_id 
-            LEFT JOIN tags t ON it.tag_id=t.id 
-            WHERE 1=1
+    def get_metadata_by_regex(self, pattern, f_type, f_val, token=None, on_batch=None):
         """
-        # ... 复用上面的 where 条件构造逻辑 ...
-        # (为了代码简洁，上面那个 blocks 其实可以重构，但这里为了最小化修改风险，我们拷贝逻辑)
-        
-        where_clause = "1=1"
-        p_grp = []
-        if f_type == 'trash': where_clause += ' AND i.is_deleted=1'
-        else: where_clause += ' AND (i.is_deleted=0 OR i.is_deleted IS NULL)'
-        if f_type == 'category':
-            if f_val is None: where_clause += ' AND i.category_id IS NULL'
-            else: where_clause += ' AND i.category_id=?'; p_grp.append(f_val)
-        elif f_type == 'today': where_clause += " AND date(i.updated_at,'localtime')=date('now','localtime')"
-        elif f_type == 'untagged': where_clause += ' AND i.id NOT IN (SELECT idea_id FROM idea_tags)'
-        elif f_type == 'bookmark': where_clause += ' AND i.is_favorite=1'
-        
-        if search:
-            where_clause += ' AND (i.title LIKE ? OR i.content LIKE ?)' 
-            # 注意：search 如果包含 tag 搜索，上面的 join 逻辑是必要的。
-            # 如果只搜 title/content，可以不需要 left join tags。
-            # 但为了统一逻辑，假设 search 也能搜 tags。
-            p_grp.extend([f'%{search}%', f'%{search}%'])
-
-        q_grouped += " AND " + where_clause
-        q_grouped += " GROUP BY i.id"
-        
-        if f_type == 'trash': q_grouped += ' ORDER BY i.updated_at DESC'
-        else: q_grouped += ' ORDER BY i.is_pinned DESC, i.updated_at DESC'
-            
-        c.execute(q_grouped, p_grp)
-        rows = c.fetchall()
-        
-        res_list = []
-        for r in rows:
-            res_list.append({
-                'id': r[0], 'title': r[1], 'color': r[2], 'is_pinned': r[3],
-                'is_favorite': r[4], 'created_at': r[5], 'updated_at': r[6],
-                'item_type': r[7], 'rating': r[8], 'is_locked': r[9],
-                'tags': r[10].split(',') if r[10] else []
-            })
-        return res_list
-
-    def get_details_by_ids(self, id_list):
+        正则搜索（标题、正文、标签任一匹配），返回与 get_metadata_by_filter 相同结构的元数据。
+        先用模式中必含的字面子串走全文索引筛出候选，再逐行执行 REGEXP。归档库一并搜索。
+        on_batch(items) 在每批结果取到后调用，需配合 token 使用。
+        """
+        columns = self.METADATA_COLUMNS.format(content='NULL')
+        match = prefilter_match(pattern) if self.db.search_index else None
+        queries = []
+        for schema in self._schemas(pattern, f_type):
+            where, p = self._build_where('', f_type, f_val)
+            clauses = [where]
+            if match:
+                clauses.append(f'i.id IN (SELECT rowid FROM {schema}.ideas_search WHERE ideas_search MATCH ?)')
+                p.append(match)
+            clauses.append(
+                '(i.title REGEXP ? OR i.content REGEXP ? OR EXISTS ('
+                'SELECT 1 FROM idea_tags it JOIN tags t ON t.id=it.tag_id WHERE it.idea_id=i.id AND t.name REGEXP ?))'
+            )
+            p.extend([pattern] * 3)
+            queries.append((f"SELECT {columns} FROM {schema}.ideas i WHERE {' AND '.join(clauses)}", p))
+        q, p = self._union(queries, f_type)
+        if token is None:
+            return MetadataTable.from_rows(self._fetch_all(q, p))
+        callback = (lambda chunk: on_batch(MetadataTable.from_rows(chunk))) if on_batch else None
+        return MetadataTable.from_rows(fetch_within_budget(self.db.conn, q, p, token, on_batch=callback))
+
+    def get_details_by_ids(self, id_list, include_blob=True):
         """
         根据 ID 列表批量获取完整详情（包含 content, data_blob 等）。
         同时使用 GROUP_CONCAT 聚合标签，解决 N+1 查询问题。
-        用于分页渲染。
+        用于分页渲染，返回不可变的 IdeaDetail 记录。
+        include_blob=False 时 data_blob 为 None，图片数据由 get_blob 逐条读取。
         """
         if not id_list: return []
-        c = self.db.get_cursor()
-        placeholders = ','.join('?' * len(id_list))
-        
+        blob = 'i.data_blob' if include_blob else 'NULL'
         q = f"""
             SELECT 
                 i.id, i.title, i.content, i.color, i.is_pinned, i.is_favorite, 
                 i.created_at, i.updated_at, i.category_id, i.is_deleted, i.item_type, 
-                i.data_blob, i.content_hash, i.is_locked, i.rating,
+                {blob}, i.content_hash, i.is_locked, i.rating,
                 GROUP_CONCAT(t.name) as tag_names
-            FROM ideas i
+            FROM {{schema}}.ideas i
             LEFT JOIN idea_tags it ON i.id = it.idea_id
             LEFT JOIN tags t ON it.tag_id = t.id
-            WHERE i.id IN ({placeholders})
+            WHERE i.id IN ({{ids}})
             GROUP BY i.id
         """
-        c.execute(q, list(id_list))
-        rows = c.fetchall()
+        rows = self._fetch_by_ids(q, list(id_list)).values()
         
-        # 转为 list of dict
-        results = []
-        for r in rows:
-            results.append({
-                'id': r[0], 'title': r[1], 'content': r[2], 'color': r[3],
-                'is_pinned': r[4], 'is_favorite': r[5], 'created_at': r[6],
-                'updated_at': r[7], 'category_id': r[8], 'is_deleted': r[9],
-                'item_type': r[10], 'data_blob': r[11], 'content_hash': r[12],
-                'is_locked': r[13], 'rating': r[14],
-                'tags': r[15].split(',') if r[15] else []
-            })
-            
+        results = [detail_from_row(r) for r in rows]
+
         # 按 id_list 顺序重排
-        res_map = {d['id']: d for d in results}
+        res_map = {d.id: d for d in results}
         ordered_res = []
         for iid in id_list:
             if iid in res_map:
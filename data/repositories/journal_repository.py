@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# data/repositories/journal_repository.py
+from collections import namedtuple
+
+# 未被任何消费者确认的条目最多保留的天数；超期的照常压缩，落后的消费者会收到 JournalTruncated
+JOURNAL_KEEP_DAYS = 30
+
+JournalEntry = namedtuple('JournalEntry', 'seq idea_id op fields changed_at')
+
+
+class JournalTruncated(Exception):
+    """请求的起点之后有条目已被压缩，消费者需要全量重扫后从 latest_seq() 重新开始"""
+
+
+class JournalRepository:
+    """
+    change_journal 变更日志的读取、消费者检查点与压缩。
+    日志由数据库触发器在每次修改 ideas / idea_tags / tags 时写入（见 v5 迁移），
+    op 为 insert / update / delete，fields 为变化的字段名（标签变化记为 tags）。
+
+    增量任务的用法：首次运行全量处理后记下 latest_seq()；之后每次
+    changes_since(检查点) 只处理新增部分，处理完 set_checkpoint()。
+    """
+
+    def __init__(self, db_context):
+        self.db = db_context
+
+    def latest_seq(self):
+        """已分配的最大序号（条目被压缩后仍然有效）"""
+        c = self.db.get_cursor()
+        c.execute("SELECT seq FROM sqlite_sequence WHERE name='change_journal'")
+        row = c.fetchone()
+        return row[0] if row else 0
+
+    def changes_since(self, seq, limit=1000):
+        """seq 之后的条目（按序号升序，最多 limit 条）；其间有条目已被压缩时抛出 JournalTruncated"""
+        c = self.db.get_cursor()
+        c.execute(
+            'SELECT seq, idea_id, op, fields, changed_at FROM change_journal WHERE seq > ? ORDER BY seq LIMIT ?',
+            (seq, limit)
+        )
+        rows = c.fetchall()
+        # 序号连续分配，第一条与起点之间出现空缺说明中间的条目已被删除
+        first = rows[0][0] if rows else self.latest_seq() + 1
+        if first > seq + 1:
+            raise JournalTruncated(f"journal compacted past seq {seq}")
+        return [
+            JournalEntry(r[0], r[1], r[2], tuple(r[3].split(',')) if r[3] else (), r[4]) for r in rows
+        ]
+
+    def changed_ids_since(self, seq, limit=1000):
+        """合并后的结果：{idea_id: 最后一次操作}，以及本批最后一个序号"""
+        entries = self.changes_since(seq, limit)
+        changed = {}
+        for e in entries:
+            # 新建后的修改仍算新建；删除后残留的标签清理不改变删除结论
+            if e.op == 'update' and changed.get(e.idea_id) in ('insert', 'delete'): continue
+            changed[e.idea_id] = e.op
+        return changed, (entries[-1].seq if entries else seq)
+
+    def get_checkpoint(self, consumer):
+        c = self.db.get_cursor()
+        c.execute('SELECT seq FROM journal_checkpoints WHERE consumer=?', (consumer,))
+        row = c.fetchone()
+        return row[0] if row else None
+
+    def set_checkpoint(self, consumer, seq):
+        c = self.db.get_cursor()
+        c.execute(
+            'INSERT INTO journal_checkpoints (consumer, seq) VALUES (?, ?) '
+            'ON CONFLICT(consumer) DO UPDATE SET seq=excluded.seq', (consumer, seq)
+        )
+        self.db.commit()
+
+    def compact(self, keep_days=JOURNAL_KEEP_DAYS):
+        """
+        删除所有消费者都已处理过的条目，以及超过 keep_days 天的条目。
+        没有登记消费者时只按天数删除。返回删除的条数。
+        """
+        c = self.db.get_cursor()
+        c.execute('SELECT MIN(seq) FROM journal_checkpoints')
+        consumed = c.fetchone()[0]
+        # 序号与时间同向增长：找到保留期内的第一条，它之前的都已超期
+        c.execute(
+            "SELECT seq FROM change_journal WHERE changed_at >= datetime('now', ?) ORDER BY seq LIMIT 1",
+            (f'-{int(keep_days)} days',)
+        )
+        row = c.fetchone()
+        expired = (row[0] - 1) if row else self.latest_seq()
+        cutoff = expired if consumed is None else max(consumed, expired)
+        c.execute('DELETE FROM change_journal WHERE seq <= ?', (cutoff,))
+        deleted = c.rowcount
+        self.db.commit()
+        return deleted
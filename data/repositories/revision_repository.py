@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# data/repositories/revision_repository.py
+from data.revisions import (
+    KIND_SNAPSHOT, PRUNE_EVERY, KEEP_RECENT, encode_revision, decode_revision, select_retained,
+)
+
+
+class RevisionRepository:
+    """
+    笔记历史版本：idea_revisions 表按 (idea_id, seq) 存储，与 ideas 表分开，列表查询不受影响。
+    编码与保留策略见 data/revisions.py。
+    """
+
+    def __init__(self, db_context):
+        self.db = db_context
+
+    def list(self, iid):
+        """版本列表（新到旧），不读取载荷内容"""
+        c = self.db.get_cursor()
+        c.execute(
+            'SELECT seq, title, created_at, kind, length(payload) AS size FROM idea_revisions '
+            'WHERE idea_id=? ORDER BY seq DESC', (iid,)
+        )
+        return c.fetchall()
+
+    def get(self, iid, seq):
+        """重建第 seq 个版本，返回 (标题, 正文)；不存在时返回 None"""
+        c = self.db.get_cursor()
+        # 从不晚于 seq 的最近一个快照开始，沿增量链依次应用
+        c.execute(
+            'SELECT seq, kind, title, payload FROM idea_revisions WHERE idea_id=? AND seq<=? AND seq>=('
+            'SELECT MAX(seq) FROM idea_revisions WHERE idea_id=? AND seq<=? AND kind=?) ORDER BY seq',
+            (iid, seq, iid, seq, KIND_SNAPSHOT)
+        )
+        rows = c.fetchall()
+        if not rows or rows[-1]['seq'] != seq: return None
+        text = None
+        for r in rows:
+            text = decode_revision(r['kind'], r['payload'], text)
+        return rows[-1]['title'], text
+
+    def _latest(self, iid):
+        c = self.db.get_cursor()
+        c.execute('SELECT seq, depth FROM idea_revisions WHERE idea_id=? ORDER BY seq DESC LIMIT 1', (iid,))
+        return c.fetchone()
+
+    def _insert(self, c, iid, seq, kind, depth, title, payload, created_at=None):
+        c.execute(
+            'INSERT INTO idea_revisions (idea_id, seq, kind, depth, title, payload, created_at) '
+            'VALUES (?,?,?,?,?,?,COALESCE(?, CURRENT_TIMESTAMP))',
+            (iid, seq, kind, depth, title, payload, created_at)
+        )
+
+    def record_edit(self, iid, title, content):
+        """
+        在覆盖 ideas 中的标题与正文之前调用：首次编辑时先把原内容存为第一个版本，
+        再追加新内容。内容未变化时不新增版本。
+        不提交：版本与随后对 ideas 的更新在同一事务中由调用方提交，提交后再调用 prune_if_due()。
+        返回最新版本的 seq（记录不存在时为 None）。
+        """
+        c = self.db.get_cursor()
+        c.execute('SELECT title, content, updated_at FROM ideas WHERE id=?', (iid,))
+        current = c.fetchone()
+        if current is None: return None
+        content = content or ''
+        current_text = current['content'] or ''
+
+        latest = self._latest(iid)
+        if latest is None:
+            seq, depth = 1, 0
+            base = current_text
+            kind, depth, payload = encode_revision(None, base, 0)
+            self._insert(c, iid, seq, kind, depth, current['title'], payload, current['updated_at'])
+            base_title = current['title']
+        else:
+            seq, depth = latest['seq'], latest['depth']
+            base_title, base = self.get(iid, seq)
+            # 经由其它途径修改过的内容也补记一个版本，历史保持连续
+            if (base_title, base) != (current['title'], current_text):
+                seq += 1
+                kind, depth, payload = encode_revision(base, current_text, depth)
+                self._insert(c, iid, seq, kind, depth, current['title'], payload, current['updated_at'])
+                base_title, base = current['title'], current_text
+
+        if (title, content) != (base_title, base):
+            seq += 1
+            kind, depth, payload = encode_revision(base, content, depth)
+            self._insert(c, iid, seq, kind, depth, title, payload)
+        return seq
+
+    def prune_if_due(self, iid, seq):
+        """每新增 PRUNE_EVERY 个版本精简一次；seq 为 record_edit() 的返回值"""
+        if seq and seq % PRUNE_EVERY == 0: return self.prune(iid)
+        return 0
+
+    def prune(self, iid, now=None):
+        """按保留策略删除旧版本；被删版本之后的版本改为相对仍保留的前一版本重新编码"""
+        c = self.db.get_cursor()
+        c.execute('SELECT seq, created_at FROM idea_revisions WHERE idea_id=? ORDER BY seq', (iid,))
+        revisions = [(r['seq'], r['created_at']) for r in c.fetchall()]
+        if len(revisions) <= KEEP_RECENT: return 0
+        keep = select_retained(revisions, now)
+        dropped = [seq for seq, _ in revisions if seq not in keep]
+        if not dropped: return 0
+
+        # 第一个被删版本之前的链不受影响；之后的全文依次重建，保留的版本重新编码
+        first_dropped = dropped[0]
+        c.execute(
+            'SELECT seq, kind, depth, title, payload FROM idea_revisions WHERE idea_id=? ORDER BY seq', (iid,)
+        )
+        rows = c.fetchall()
+        text, prev_text, prev_depth = None, None, 0
+        for r in rows:
+            text = decode_revision(r['kind'], r['payload'], text)
+            seq = r['seq']
+            if seq < first_dropped:
+                prev_text, prev_depth = text, r['depth']
+                continue
+            if seq not in keep: continue
+            kind, depth, payload = encode_revision(prev_text, text, prev_depth)
+            c.execute(
+                'UPDATE idea_revisions SET kind=?, depth=?, payload=? WHERE idea_id=? AND seq=?',
+                (kind, depth, payload, iid, seq)
+            )
+            prev_text, prev_depth = text, depth
+        c.executemany('DELETE FROM idea_revisions WHERE idea_id=? AND seq=?', [(iid, seq) for seq in dropped])
+        self.db.commit()
+        return len(dropped)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# data/repositories/sync_repository.py
+from data.repositories.archive_repository import ArchiveRepository
+
+# 随同步包传递的 ideas 列；category_id 换成分类路径，data_blob 作为帧附件单独写
+SYNC_FIELDS = (
+    'uuid', 'title', 'content', 'color', 'is_pinned', 'is_favorite', 'created_at', 'updated_at',
+    'modified_at', 'is_deleted', 'item_type', 'content_hash', 'is_locked', 'rating',
+)
+
+
+class SyncRepository:
+    """
+    同步包导出与合并用到的读写。写操作不提交事务，由调用方按批提交。
+    记录以 uuid 识别；分类按从根开始的名称路径识别，标签按名称识别。
+    已归档的记录同样导出和参与合并，需要改写时先取回主库。
+    """
+
+    def __init__(self, db_context):
+        self.db = db_context
+        self.archive = ArchiveRepository(db_context)
+        self._category_ids = None
+
+    def _tables(self):
+        return ('main.ideas', 'archive.ideas') if self.db.archive else ('main.ideas',)
+
+    def _all_ideas(self, columns):
+        """主库与归档库的记录合在一起，作为子查询使用"""
+        return '(' + ' UNION ALL '.join(f'SELECT {columns} FROM {t}' for t in self._tables()) + ')'
+
+    # --- 导出 ---
+    def category_rows(self):
+        """全部分类及其路径，父分类在子分类之前"""
+        c = self.db.get_cursor()
+        c.execute('SELECT id, name, parent_id, color, sort_order, preset_tags FROM categories')
+        rows = {r['id']: r for r in c.fetchall()}
+        paths = {}
+
+        def path_of(cid, seen=()):
+            if cid not in paths:
+                row = rows[cid]
+                parent = row['parent_id']
+                # 父分类不存在或成环时按根分类处理
+                if parent in rows and parent not in seen:
+                    paths[cid] = path_of(parent, seen + (cid,)) + [row['name']]
+                else:
+                    paths[cid] = [row['name']]
+            return paths[cid]
+
+        result = [(path_of(cid), row) for cid, row in rows.items()]
+        result.sort(key=lambda item: len(item[0]))
+        return result
+
+    def idea_ids_after(self, last_id, limit):
+        c = self.db.get_cursor()
+        ids = []
+        for table in self._tables():
+            c.execute(f'SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (last_id, limit))
+            ids.extend(r[0] for r in c.fetchall())
+        return sorted(ids)[:limit]
+
+    def changed_idea_ids(self, since_seq, until_seq):
+        """日志 (since_seq, until_seq] 区间内有变化、且目前仍存在的记录 ID（升序）"""
+        c = self.db.get_cursor()
+        c.execute(
+            f'SELECT DISTINCT j.idea_id FROM change_journal j JOIN {self._all_ideas("id")} i ON i.id = j.idea_id '
+            'WHERE j.seq > ? AND j.seq <= ? ORDER BY j.idea_id', (since_seq, until_seq)
+        )
+        return [r[0] for r in c.fetchall()]
+
+    def deleted_since(self, since_seq, until_seq):
+        """区间内被彻底删除、本地也没有再出现的记录：[(uuid, 删除时间)]"""
+        c = self.db.get_cursor()
+        c.execute(
+            "SELECT j.uuid, MAX(j.changed_at) FROM change_journal j "
+            "WHERE j.seq > ? AND j.seq <= ? AND j.op = 'delete' AND j.uuid IS NOT NULL "
+            f"AND NOT EXISTS (SELECT 1 FROM {self._all_ideas('uuid')} i WHERE i.uuid = j.uuid) GROUP BY j.uuid",
+            (since_seq, until_seq)
+        )
+        return [(r[0], r[1]) for r in c.fetchall()]
+
+    def get_ideas(self, ids):
+        """按 ID 读取记录与标签名列表，顺序与 ids 一致；data_blob 只给出长度，内容由 get_blob 逐条读取"""
+        if not ids: return []
+        placeholders = ','.join('?' * len(ids))
+        c = self.db.get_cursor()
+        rows = {}
+        for table in self._tables():
+            c.execute(
+                f"SELECT id, category_id, length(data_blob) AS blob_size, {', '.join(SYNC_FIELDS)} "
+                f"FROM {table} WHERE id IN ({placeholders})", ids
+            )
+            rows.update((r['id'], r) for r in c.fetchall())
+        c.execute(
+            f'SELECT it.idea_id, t.name FROM idea_tags it JOIN tags t ON t.id = it.tag_id '
+            f'WHERE it.idea_id IN ({placeholders}) ORDER BY t.name', ids
+        )
+        tags = {}
+        for iid, name in c.fetchall():
+            tags.setdefault(iid, []).append(name)
+        return [(rows[i], tags.get(i, [])) for i in ids if i in rows]
+
+    def get_blob(self, iid):
+        c = self.db.get_cursor()
+        for table in self._tables():
+            c.execute(f'SELECT data_blob FROM {table} WHERE id=?', (iid,))
+            row = c.fetchone()
+            if row: return row[0]
+        return None
+
+    # --- 合并 ---
+    def clear_cache(self):
+        """事务回滚后新建的分类 ID 作废"""
+        self._category_ids = None
+
+    def find(self, uuid, content_hash=None):
+        """按 uuid 查找本地记录（含已归档的）；找不到且给出 content_hash 时按内容哈希查找"""
+        c = self.db.get_cursor()
+        ideas = self._all_ideas('id, uuid, modified_at, content_hash')
+        c.execute(f'SELECT id, uuid, modified_at FROM {ideas} WHERE uuid=?', (uuid,))
+        row = c.fetchone()
+        if row is None and content_hash:
+            c.execute(
+                f'SELECT id, uuid, modified_at FROM {ideas} WHERE content_hash=? ORDER BY id LIMIT 1',
+                (content_hash,)
+            )
+            row = c.fetchone()
+        return row
+
+    def set_uuid(self, iid, uuid):
+        """
+        改用合并后的 uuid。uuid 不在触发器记录的字段中，这里手动记一条变更日志，
+        即使本地版本较新、记录没有被覆盖，下次增量导出也会带上它，对方据此改用同一个 uuid
+        """
+        self.archive.promote([iid])
+        c = self.db.get_cursor()
+        c.execute('UPDATE ideas SET uuid=? WHERE id=?', (uuid, iid))
+        c.execute("INSERT INTO change_journal (idea_id, op, fields) VALUES (?, 'update', 'uuid')", (iid,))
+
+    def ensure_category(self, path, color=None, sort_order=None, preset_tags=None):
+        """按名称路径找到或逐级创建分类，返回最末一级的 ID；新建的分类使用传入的属性"""
+        if self._category_ids is None:
+            self._category_ids = {tuple(p): row['id'] for p, row in self.category_rows()}
+        path = tuple(path)
+        if path in self._category_ids: return self._category_ids[path]
+        parent_id = self.ensure_category(path[:-1]) if len(path) > 1 else None
+        c = self.db.get_cursor()
+        c.execute(
+            'INSERT INTO categories (name, parent_id, color, sort_order, preset_tags) '
+            'VALUES (?, ?, COALESCE(?, "#808080"), COALESCE(?, 0), ?)',
+            (path[-1], parent_id, color, sort_order, preset_tags)
+        )
+        self._category_ids[path] = c.lastrowid
+        return c.lastrowid
+
+    def write_idea(self, iid, values, category_id, data_blob, tags):
+        """
+        插入（iid 为 None）或整体覆盖一条记录，返回其 ID。
+        modified_at 最后写入：标签变化会由触发器刷新 modified_at，这里恢复为同步包中的值。
+        """
+        if iid is not None: self.archive.promote([iid])
+        c = self.db.get_cursor()
+        cols = [f for f in SYNC_FIELDS if f != 'modified_at']
+        params = [values.get(f) for f in cols] + [category_id, data_blob]
+        if iid is None:
+            c.execute(
+                f"INSERT INTO ideas ({', '.join(cols)}, category_id, data_blob) "
+                f"VALUES ({','.join('?' * (len(cols) + 2))})", params
+            )
+            iid = c.lastrowid
+        else:
+            assignments = ', '.join(f'{f}=?' for f in cols)
+            c.execute(f'UPDATE ideas SET {assignments}, category_id=?, data_blob=? WHERE id=?', params + [iid])
+
+        c.execute('SELECT t.name FROM tags t JOIN idea_tags it ON t.id = it.tag_id WHERE it.idea_id=?', (iid,))
+        if sorted(r[0] for r in c.fetchall()) != sorted(tags):
+            c.execute('DELETE FROM idea_tags WHERE idea_id=?', (iid,))
+            for name in tags:
+                c.execute('INSERT OR IGNORE INTO tags (name) VALUES (?)', (name,))
+                c.execute('INSERT OR IGNORE INTO idea_tags (idea_id, tag_id) SELECT ?, id FROM tags WHERE name=?', (iid, name))
+        c.execute('UPDATE ideas SET modified_at=? WHERE id=?', (values.get('modified_at'), iid))
+        return iid
+
+    def delete(self, iid):
+        self.archive.promote([iid])
+        c = self.db.get_cursor()
+        c.execute('DELETE FROM ideas WHERE id=?', (iid,))
+        c.execute('DELETE FROM idea_tags WHERE idea_id=?', (iid,))
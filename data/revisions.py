@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# data/revisions.py
+"""
+笔记历史版本的编码与保留策略（纯函数，不访问数据库）。
+
+每个版本存标题原文和正文的压缩载荷：
+- 全文快照：zlib(正文)
+- 行增量：相对上一个版本的按行差异，zlib(JSON)。[起, 止] 表示复用上一版本的第 起..止-1 行，
+  字符串表示新写入的文本。
+每条增量链最长 SNAPSHOT_INTERVAL - 1 个增量，重建任一版本最多解压一个快照并应用这么多增量。
+"""
+import json
+import zlib
+from datetime import datetime, timedelta
+from difflib import SequenceMatcher
+
+KIND_SNAPSHOT = 0
+KIND_DELTA = 1
+SNAPSHOT_INTERVAL = 16
+# 首尾相同的行去掉后，中间部分行数乘积超过此值时不再逐行比对，整段作为新文本（避免超长日志比对过慢）
+MAX_DIFF_WORK = 1000000
+# 增量载荷小于此值时不再与快照比较大小
+SMALL_DELTA_BYTES = 1024
+
+# 保留策略：最近 KEEP_RECENT 个版本全部保留；更早的版本在 KEEP_DAILY_DAYS 天内每天保留最后一个，
+# 再早的每周保留最后一个
+KEEP_RECENT = 20
+KEEP_DAILY_DAYS = 30
+# 每新增这么多个版本检查一次是否需要精简
+PRUNE_EVERY = 10
+
+
+def _lines(text):
+    return (text or '').splitlines(keepends=True)
+
+
+def encode_snapshot(text):
+    return zlib.compress((text or '').encode('utf-8'))
+
+
+def encode_delta(base, text):
+    a, b = _lines(base), _lines(text)
+    n = min(len(a), len(b))
+    prefix = 0
+    while prefix < n and a[prefix] == b[prefix]: prefix += 1
+    suffix = 0
+    while suffix < n - prefix and a[-1 - suffix] == b[-1 - suffix]: suffix += 1
+
+    ops = []
+    if prefix: ops.append([0, prefix])
+    mid_a, mid_b = a[prefix:len(a) - suffix], b[prefix:len(b) - suffix]
+    if mid_a and mid_b and len(mid_a) * len(mid_b) <= MAX_DIFF_WORK:
+        for tag, i1, i2, j1, j2 in SequenceMatcher(None, mid_a, mid_b, autojunk=False).get_opcodes():
+            if tag == 'equal': ops.append([prefix + i1, prefix + i2])
+            elif j2 > j1: ops.append(''.join(mid_b[j1:j2]))
+    elif mid_b:
+        ops.append(''.join(mid_b))
+    if suffix: ops.append([len(a) - suffix, len(a)])
+    return zlib.compress(json.dumps(ops, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def encode_revision(base, text, depth):
+    """
+    相对上一版本 base（链深 depth，None 表示没有上一版本）编码 text，
+    返回 (kind, 新链深, 载荷)。链到达上限或增量不比快照小时存快照。
+    """
+    if base is None or depth + 1 >= SNAPSHOT_INTERVAL:
+        return KIND_SNAPSHOT, 0, encode_snapshot(text)
+    delta = encode_delta(base, text)
+    if len(delta) > SMALL_DELTA_BYTES:
+        snapshot = encode_snapshot(text)
+        if len(snapshot) <= len(delta): return KIND_SNAPSHOT, 0, snapshot
+    return KIND_DELTA, depth + 1, delta
+
+
+def apply_delta(base, payload):
+    a = _lines(base)
+    parts = []
+    for op in json.loads(zlib.decompress(payload).decode('utf-8')):
+        parts.append(''.join(a[op[0]:op[1]]) if isinstance(op, list) else op)
+    return ''.join(parts)
+
+
+def decode_revision(kind, payload, base=None):
+    if kind == KIND_SNAPSHOT: return zlib.decompress(payload).decode('utf-8')
+    return apply_delta(base, payload)
+
+
+def select_retained(revisions, now=None):
+    """
+    revisions 为按 seq 升序的 (seq, created_at) 列表（created_at 为 SQLite CURRENT_TIMESTAMP 文本），
+    返回按保留策略应保留的 seq 集合。
+    """
+    now = now or datetime.utcnow()
+    keep = {seq for seq, _ in revisions[-KEEP_RECENT:]}
+    daily_since = now - timedelta(days=KEEP_DAILY_DAYS)
+    buckets = {}
+    for seq, created_at in revisions[:-KEEP_RECENT]:
+        try:
+            ts = datetime.strptime(str(created_at)[:19], '%Y-%m-%d %H:%M:%S')
+        except ValueError:
+            keep.add(seq)
+            continue
+        bucket = ts.date() if ts >= daily_since else tuple(ts.isocalendar()[:2])
+        # 升序遍历，同一桶内后出现的覆盖先出现的，留下的是该桶最后一个版本
+        buckets[bucket] = seq
+    keep.update(buckets.values())
+    return keep
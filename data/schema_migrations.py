@@ -1,5 +1,7 @@
 # data/schema_migrations.py
 import logging
+import sqlite3
+from data.search_index import RANK_WEIGHTS
 
 logger = logging.getLogger(__name__)
 
@@ -32,12 +34,38 @@ class SchemaMigration:
             SchemaMigration._set_db_version(conn, 1)
             logger.info("数据库迁移到 v1")
         
+        if current_version < 2:
+            SchemaMigration._migrate_to_v2(conn)
+            SchemaMigration._set_db_version(conn, 2)
+            logger.info("数据库迁移到 v2")
+
+        if current_version < 3:
+            SchemaMigration._migrate_to_v3(conn)
+            SchemaMigration._set_db_version(conn, 3)
+            logger.info("数据库迁移到 v3")
+
+        if current_version < 4:
+            SchemaMigration._migrate_to_v4(conn)
+            SchemaMigration._set_db_version(conn, 4)
+            logger.info("数据库迁移到 v4")
+
+        if current_version < 5:
+            SchemaMigration._migrate_to_v5(conn)
+            SchemaMigration._set_db_version(conn, 5)
+            logger.info("数据库迁移到 v5")
+
+        if current_version < 6:
+            SchemaMigration._migrate_to_v6(conn)
+            SchemaMigration._set_db_version(conn, 6)
+            logger.info("数据库迁移到 v6")
+
+        if current_version < 7:
+            SchemaMigration._migrate_to_v7(conn)
+            SchemaMigration._set_db_version(conn, 7)
+            logger.info("数据库迁移到 v7")
+
         # Add future migrations here
-        # if current_version < 2:
-        #     SchemaMigration._migrate_to_v2(conn)
-        #     SchemaMigration._set_db_version(conn, 2)
-        #     logger.info("数据库迁移到 v2")
-            
+
         logger.info("数据库结构检查完成。")
 
     @staticmethod
@@ -93,3 +121,327 @@ class SchemaMigration:
             except: pass
             
         conn.commit()
+
+    @staticmethod
+    def _migrate_to_v2(conn):
+        c = conn.cursor()
+
+        logger.info("v2 迁移: 规范 is_deleted 取值...")
+        # 之后的查询统一写 is_deleted=0，不再需要 OR is_deleted IS NULL
+        c.execute('UPDATE ideas SET is_deleted = 0 WHERE is_deleted IS NULL')
+
+        logger.info("v2 迁移: 添加整数时间戳生成列...")
+        # 生成列只出现在 table_xinfo 中
+        c.execute("PRAGMA table_xinfo(ideas)")
+        cols = [i[1] for i in c.fetchall()]
+        for col, source in (('created_ts', 'created_at'), ('updated_ts', 'updated_at')):
+            if col not in cols:
+                c.execute(
+                    f"ALTER TABLE ideas ADD COLUMN {col} INTEGER "
+                    f"GENERATED ALWAYS AS (CAST(strftime('%s', {source}) AS INTEGER)) VIRTUAL"
+                )
+
+        logger.info("v2 迁移: 创建复合索引...")
+        indexes = (
+            # 默认列表：未删除 + 置顶优先 + 按更新时间倒序
+            'CREATE INDEX IF NOT EXISTS idx_ideas_live_order ON ideas(is_deleted, is_pinned, updated_at)',
+            'CREATE INDEX IF NOT EXISTS idx_ideas_category ON ideas(is_deleted, category_id, is_pinned, updated_at)',
+            'CREATE INDEX IF NOT EXISTS idx_ideas_favorite ON ideas(is_deleted, is_favorite, is_pinned, updated_at)',
+            'CREATE INDEX IF NOT EXISTS idx_ideas_trash ON ideas(updated_at) WHERE is_deleted = 1',
+            'CREATE INDEX IF NOT EXISTS idx_ideas_updated_ts ON ideas(is_deleted, updated_ts)',
+            'CREATE INDEX IF NOT EXISTS idx_ideas_created_ts ON ideas(is_deleted, created_ts)',
+            'CREATE INDEX IF NOT EXISTS idx_idea_tags_tag ON idea_tags(tag_id, idea_id)',
+        )
+        for sql in indexes:
+            c.execute(sql)
+        c.execute('ANALYZE')
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v3(conn):
+        c = conn.cursor()
+
+        logger.info("v3 迁移: 移除旧版 ideas_fts 全文索引...")
+        # 旧版 db_manager 建的 ideas_fts 只索引标题和正文，且是默认分词器，中文无法按子串命中
+        for trigger in ('ideas_after_insert', 'ideas_after_delete', 'ideas_after_update'):
+            c.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        c.execute('DROP TABLE IF EXISTS ideas_fts')
+
+        logger.info("v3 迁移: 创建 ideas_search 全文索引...")
+        try:
+            c.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS ideas_search "
+                "USING fts5(title, tags, content, tokenize='trigram')"
+            )
+        except sqlite3.OperationalError as e:
+            # SQLite < 3.34 没有 trigram 分词器：不建索引，搜索继续走 LIKE
+            logger.warning(f"v3 迁移: 无法创建全文索引，搜索将使用 LIKE: {e}")
+            conn.commit()
+            return
+
+        weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+        c.execute("INSERT INTO ideas_search(ideas_search, rank) VALUES ('rank', ?)", (f'bm25({weights})',))
+
+        # 标签列：该笔记全部标签名以换行拼接（搜索框输入不了换行，短语不会跨标签命中）
+        tag_names = (
+            "(SELECT GROUP_CONCAT(t.name, char(10)) FROM idea_tags it JOIN tags t ON t.id = it.tag_id "
+            "WHERE it.idea_id = {0})"
+        )
+        triggers = (
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_search_ai AFTER INSERT ON ideas BEGIN
+                INSERT INTO ideas_search(rowid, title, tags, content)
+                VALUES (new.id, new.title, {tag_names.format('new.id')}, new.content);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS ideas_search_au AFTER UPDATE OF title, content ON ideas BEGIN
+                UPDATE ideas_search SET title = new.title, content = new.content WHERE rowid = new.id;
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS ideas_search_ad AFTER DELETE ON ideas BEGIN
+                DELETE FROM ideas_search WHERE rowid = old.id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS idea_tags_search_ai AFTER INSERT ON idea_tags BEGIN
+                UPDATE ideas_search SET tags = {tag_names.format('new.idea_id')} WHERE rowid = new.idea_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS idea_tags_search_ad AFTER DELETE ON idea_tags BEGIN
+                UPDATE ideas_search SET tags = {tag_names.format('old.idea_id')} WHERE rowid = old.idea_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS tags_search_au AFTER UPDATE OF name ON tags BEGIN
+                UPDATE ideas_search SET tags = {tag_names.format('ideas_search.rowid')}
+                WHERE rowid IN (SELECT idea_id FROM idea_tags WHERE tag_id = new.id);
+            END""",
+        )
+        for sql in triggers:
+            c.execute(sql)
+
+        logger.info("v3 迁移: 回填全文索引...")
+        c.execute('DELETE FROM ideas_search')
+        c.execute(f"""
+            INSERT INTO ideas_search(rowid, title, tags, content)
+            SELECT i.id, i.title, {tag_names.format('i.id')}, i.content FROM ideas i
+        """)
+        c.execute("INSERT INTO ideas_search(ideas_search) VALUES ('optimize')")
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v4(conn):
+        c = conn.cursor()
+
+        logger.info("v4 迁移: 创建 idea_revisions 历史版本表...")
+        # 独立的表，按 (idea_id, seq) 读取；列表查询只读 ideas，不受版本数量影响
+        c.execute('''CREATE TABLE IF NOT EXISTS idea_revisions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            kind INTEGER NOT NULL,
+            depth INTEGER NOT NULL DEFAULT 0,
+            title TEXT,
+            payload BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_revisions_idea_seq ON idea_revisions(idea_id, seq)')
+        # 笔记被彻底删除时一并删除其历史
+        c.execute("""CREATE TRIGGER IF NOT EXISTS ideas_revisions_ad AFTER DELETE ON ideas BEGIN
+            DELETE FROM idea_revisions WHERE idea_id = old.id;
+        END""")
+        conn.commit()
+
+    # 变更日志记录的 ideas 字段；UPDATE 时逐列比较，只记下真正变化的列
+    JOURNAL_FIELDS = (
+        'title', 'content', 'color', 'is_pinned', 'is_favorite', 'created_at', 'updated_at',
+        'category_id', 'is_deleted', 'item_type', 'data_blob', 'content_hash', 'is_locked', 'rating',
+    )
+
+    @staticmethod
+    def _migrate_to_v5(conn):
+        c = conn.cursor()
+
+        logger.info("v5 迁移: 创建 change_journal 变更日志...")
+        # AUTOINCREMENT 保证 seq 单调递增、压缩删除后也不复用
+        c.execute('''CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            idea_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            fields TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+        c.execute('CREATE TABLE IF NOT EXISTS journal_checkpoints (consumer TEXT PRIMARY KEY, seq INTEGER NOT NULL)')
+
+        # 由触发器写入，与引起变更的语句处于同一事务：回滚时日志一起回滚，
+        # 各仓库与服务层直接执行的 SQL 都会被记录
+        changed = ' || '.join(
+            f"(CASE WHEN old.{f} IS NOT new.{f} THEN '{f},' ELSE '' END)" for f in SchemaMigration.JOURNAL_FIELDS
+        )
+        all_fields = ','.join(SchemaMigration.JOURNAL_FIELDS)
+        triggers = (
+            f"""CREATE TRIGGER IF NOT EXISTS journal_ideas_ai AFTER INSERT ON ideas BEGIN
+                INSERT INTO change_journal(idea_id, op, fields) VALUES (new.id, 'insert', '{all_fields}');
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS journal_ideas_au AFTER UPDATE ON ideas BEGIN
+                INSERT INTO change_journal(idea_id, op, fields)
+                SELECT new.id, 'update', rtrim(f, ',') FROM (SELECT {changed} AS f) WHERE f <> '';
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS journal_ideas_ad AFTER DELETE ON ideas BEGIN
+                INSERT INTO change_journal(idea_id, op, fields) VALUES (old.id, 'delete', NULL);
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS journal_idea_tags_ai AFTER INSERT ON idea_tags BEGIN
+                INSERT INTO change_journal(idea_id, op, fields) VALUES (new.idea_id, 'update', 'tags');
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS journal_idea_tags_ad AFTER DELETE ON idea_tags BEGIN
+                INSERT INTO change_journal(idea_id, op, fields) VALUES (old.idea_id, 'update', 'tags');
+            END""",
+            """CREATE TRIGGER IF NOT EXISTS journal_tags_au AFTER UPDATE OF name ON tags BEGIN
+                INSERT INTO change_journal(idea_id, op, fields)
+                SELECT idea_id, 'update', 'tags' FROM idea_tags WHERE tag_id = new.id;
+            END""",
+        )
+        for sql in triggers:
+            c.execute(sql)
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v6(conn):
+        c = conn.cursor()
+
+        logger.info("v6 迁移: 添加同步用的 uuid / modified_at 列...")
+        # uuid：跨机器不变的记录标识；modified_at：任何字段或标签变化的毫秒级时间，
+        # 同步合并时据此判断两份记录哪一份较新（只改了置顶、收藏、标签也会刷新）
+        c.execute("PRAGMA table_info(ideas)")
+        cols = [i[1] for i in c.fetchall()]
+        if 'uuid' not in cols:
+            c.execute('ALTER TABLE ideas ADD COLUMN uuid TEXT')
+        if 'modified_at' not in cols:
+            c.execute('ALTER TABLE ideas ADD COLUMN modified_at TEXT')
+        c.execute('UPDATE ideas SET uuid = lower(hex(randomblob(16))) WHERE uuid IS NULL')
+        c.execute('UPDATE ideas SET modified_at = updated_at WHERE modified_at IS NULL')
+        c.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_ideas_uuid ON ideas(uuid)')
+
+        now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        changed = ' OR '.join(f"old.{f} IS NOT new.{f}" for f in SchemaMigration.JOURNAL_FIELDS)
+        triggers = (
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_uuid_ai AFTER INSERT ON ideas WHEN new.uuid IS NULL BEGIN
+                UPDATE ideas SET uuid = lower(hex(randomblob(16))), modified_at = COALESCE(new.modified_at, {now})
+                WHERE id = new.id;
+            END""",
+            # 语句自己写了 modified_at（同步导入）时保留写入的值
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_modified_au AFTER UPDATE ON ideas
+                WHEN new.modified_at IS old.modified_at AND ({changed}) BEGIN
+                UPDATE ideas SET modified_at = {now} WHERE id = new.id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_modified_tags_ai AFTER INSERT ON idea_tags BEGIN
+                UPDATE ideas SET modified_at = {now} WHERE id = new.idea_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_modified_tags_ad AFTER DELETE ON idea_tags BEGIN
+                UPDATE ideas SET modified_at = {now} WHERE id = old.idea_id;
+            END""",
+            f"""CREATE TRIGGER IF NOT EXISTS ideas_modified_tags_au AFTER UPDATE OF name ON tags BEGIN
+                UPDATE ideas SET modified_at = {now} WHERE id IN (SELECT idea_id FROM idea_tags WHERE tag_id = new.id);
+            END""",
+        )
+        for sql in triggers:
+            c.execute(sql)
+
+        logger.info("v6 迁移: 删除日志记录被删记录的 uuid...")
+        # 彻底删除的记录只剩日志里的 uuid，导出同步包时作为删除标记
+        c.execute("PRAGMA table_info(change_journal)")
+        if 'uuid' not in [i[1] for i in c.fetchall()]:
+            c.execute('ALTER TABLE change_journal ADD COLUMN uuid TEXT')
+        # 删除时间精确到毫秒，合并时与对方记录的 modified_at 比较先后
+        c.execute('DROP TRIGGER IF EXISTS journal_ideas_ad')
+        c.execute(f"""CREATE TRIGGER journal_ideas_ad AFTER DELETE ON ideas BEGIN
+            INSERT INTO change_journal(idea_id, op, fields, uuid, changed_at)
+            VALUES (old.id, 'delete', NULL, old.uuid, {now});
+        END""")
+        conn.commit()
+
+    @staticmethod
+    def _migrate_to_v7(conn):
+        c = conn.cursor()
+
+        logger.info("v7 迁移: 归档相关的表与触发器...")
+        # archive_moving：正在移入 / 移出归档库的记录 ID，只在搬移期间有内容。
+        # 搬移不是增删：不写变更日志（否则同步会把归档当成删除），也不删除历史版本
+        c.execute('CREATE TABLE IF NOT EXISTS archive_moving (idea_id INTEGER PRIMARY KEY)')
+        # archive_holds：从归档库取回的记录，在阈值天数内不再被归档
+        c.execute('CREATE TABLE IF NOT EXISTS archive_holds (idea_id INTEGER PRIMARY KEY, held_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)')
+
+        all_fields = ','.join(SchemaMigration.JOURNAL_FIELDS)
+        now = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+        for trigger in ('journal_ideas_ai', 'journal_ideas_ad', 'ideas_revisions_ad'):
+            c.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        triggers = (
+            f"""CREATE TRIGGER journal_ideas_ai AFTER INSERT ON ideas
+                WHEN new.id NOT IN (SELECT idea_id FROM archive_moving) BEGIN
+                INSERT INTO change_journal(idea_id, op, fields) VALUES (new.id, 'insert', '{all_fields}');
+            END""",
+            f"""CREATE TRIGGER journal_ideas_ad AFTER DELETE ON ideas
+                WHEN old.id NOT IN (SELECT idea_id FROM archive_moving) BEGIN
+                INSERT INTO change_journal(idea_id, op, fields, uuid, changed_at)
+                VALUES (old.id, 'delete', NULL, old.uuid, {now});
+            END""",
+            """CREATE TRIGGER ideas_revisions_ad AFTER DELETE ON ideas
+                WHEN old.id NOT IN (SELECT idea_id FROM archive_moving) BEGIN
+                DELETE FROM idea_revisions WHERE idea_id = old.id;
+            END""",
+        )
+        for sql in triggers:
+            c.execute(sql)
+        conn.commit()
+
+    # 归档库 ideas 表的存储列（不含生成列），与主库同名列一一对应
+    ARCHIVE_COLUMNS = (
+        'id', 'title', 'content', 'color', 'is_pinned', 'is_favorite', 'created_at', 'updated_at',
+        'category_id', 'is_deleted', 'item_type', 'data_blob', 'content_hash', 'is_locked', 'rating',
+        'uuid', 'modified_at',
+    )
+
+    @staticmethod
+    def ensure_archive(conn, schema, with_search_index):
+        """在已挂载为 schema 的归档库中建表（已存在则跳过）；with_search_index 与主库是否有全文索引一致"""
+        c = conn.cursor()
+        # id 沿用主库分配的 ID（主库 AUTOINCREMENT 不复用），两库合并查询时 ID 不冲突
+        c.execute(f'''CREATE TABLE IF NOT EXISTS {schema}.ideas (
+            id INTEGER PRIMARY KEY,
+            title TEXT NOT NULL, content TEXT, color TEXT,
+            is_pinned INTEGER DEFAULT 0, is_favorite INTEGER DEFAULT 0,
+            created_at TIMESTAMP, updated_at TIMESTAMP,
+            category_id INTEGER, is_deleted INTEGER DEFAULT 0,
+            item_type TEXT DEFAULT 'text', data_blob BLOB,
+            content_hash TEXT, is_locked INTEGER DEFAULT 0, rating INTEGER DEFAULT 0,
+            uuid TEXT, modified_at TEXT,
+            created_ts INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', created_at) AS INTEGER)) VIRTUAL,
+            updated_ts INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', updated_at) AS INTEGER)) VIRTUAL
+        )''')
+        # 与主库相同的查询形状（见 v2 迁移），合并查询时两边都能走索引
+        indexes = (
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_live_order ON ideas(is_deleted, is_pinned, updated_at)',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_category ON ideas(is_deleted, category_id, is_pinned, updated_at)',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_favorite ON ideas(is_deleted, is_favorite, is_pinned, updated_at)',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_trash ON ideas(updated_at) WHERE is_deleted = 1',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_updated_ts ON ideas(is_deleted, updated_ts)',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_created_ts ON ideas(is_deleted, created_ts)',
+            f'CREATE INDEX IF NOT EXISTS {schema}.idx_archive_hash ON ideas(content_hash)',
+            f'CREATE UNIQUE INDEX IF NOT EXISTS {schema}.idx_archive_uuid ON ideas(uuid)',
+        )
+        for sql in indexes:
+            c.execute(sql)
+        # 新建的归档库没有统计信息，查询规划会选错索引、多出临时排序；
+        # 先借用主库同名形状索引的统计，归档库有数据后由 archive_batch 重新统计
+        c.execute(f'ANALYZE {schema}.sqlite_master')
+        c.execute(f"SELECT 1 FROM {schema}.sqlite_stat1 WHERE tbl='ideas' LIMIT 1")
+        if c.fetchone() is None:
+            c.execute(
+                f"INSERT INTO {schema}.sqlite_stat1 (tbl, idx, stat) "
+                "SELECT tbl, replace(idx, 'idx_ideas_', 'idx_archive_'), stat FROM main.sqlite_stat1 "
+                "WHERE tbl='ideas' AND idx LIKE 'idx_ideas_%'"
+            )
+            c.execute(f'ANALYZE {schema}.sqlite_master')  # 重新载入统计
+        if with_search_index:
+            c.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE name='ideas_search'")
+            if c.fetchone() is None:
+                c.execute(
+                    f"CREATE VIRTUAL TABLE {schema}.ideas_search USING fts5(title, tags, content, tokenize='trigram')"
+                )
+                weights = ', '.join(str(w) for w in RANK_WEIGHTS)
+                c.execute(
+                    f"INSERT INTO {schema}.ideas_search(ideas_search, rank) VALUES ('rank', ?)", (f'bm25({weights})',)
+                )
+        conn.commit()
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# data/search_index.py
+"""
+全文索引 ideas_search（FTS5 trigram 分词）相关的常量与辅助函数。
+
+trigram 分词把文本切成连续的三字符片段，因此 "..." 短语匹配等价于子串匹配，
+中英文都适用；但少于 3 个字符的关键词无法命中索引，只能退回 LIKE。
+结果页的命中位置用控制字符 HL_START / HL_END 标记，由界面层转成 HTML 高亮。
+"""
+import string
+
+MIN_TERM_LEN = 3
+# bm25 列权重：标题 > 标签 > 正文
+RANK_WEIGHTS = (10.0, 4.0, 1.0)
+SNIPPET_CHARS = 60
+ELLIPSIS = '…'
+
+HL_START = '\x02'
+HL_END = '\x03'
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_LIKE_WILDCARDS = ('%', '_')
+
+
+def like_fold(text):
+    """按 SQLite LIKE 的规则做大小写折叠：只折叠 ASCII 字母，中文等其它字符保持原样"""
+    return (text or '').translate(_ASCII_LOWER)
+
+
+def has_like_wildcard(term):
+    return any(w in term for w in _LIKE_WILDCARDS)
+
+
+def match_expression(search):
+    """
+    把搜索框文本转成 FTS5 短语匹配式（整体作为一个子串）。
+    过短、含 LIKE 通配符（原有语义是模糊匹配）或含 NUL（FTS5 查询解析器视为结束符）时
+    返回 None，调用方应退回 LIKE。
+    """
+    if not search or len(search) < MIN_TERM_LEN or has_like_wildcard(search) or '\x00' in search:
+        return None
+    return '"' + search.replace('"', '""') + '"'
+
+
+def mark_text(text, terms, width=None):
+    """
+    按 LIKE 的大小写规则标记 text 中出现的各个关键词 terms。
+    width 为 None 时标记全文，否则截取第一处命中附近约 width 个字符的片段。
+    未命中时返回 None。
+    """
+    if not text or not terms:
+        return None
+    haystack = like_fold(text)
+    spans = []
+    for needle in {like_fold(t) for t in terms if t}:
+        pos = haystack.find(needle)
+        while pos >= 0:
+            spans.append((pos, pos + len(needle)))
+            pos = haystack.find(needle, pos + len(needle))
+    return _mark_spans(text, spans, width)
+
+
+def mark_pattern(text, regex, width=None):
+    """与 mark_text 相同，命中位置由编译好的正则 regex 给出（忽略零宽匹配）"""
+    if not text:
+        return None
+    spans = [m.span() for m in regex.finditer(text) if m.end() > m.start()]
+    return _mark_spans(text, spans, width)
+
+
+def _mark_spans(text, spans, width):
+    if not spans:
+        return None
+
+    # 合并重叠的命中区间
+    spans.sort()
+    merged = [list(spans[0])]
+    for s_start, s_end in spans[1:]:
+        if s_start <= merged[-1][1]: merged[-1][1] = max(merged[-1][1], s_end)
+        else: merged.append([s_start, s_end])
+
+    start, end = 0, len(text)
+    if width is not None and len(text) > width:
+        first_start, first_end = merged[0]
+        start = max(0, first_start - max(0, width - (first_end - first_start)) // 2)
+        end = min(len(text), start + width)
+        start = max(0, end - width)
+
+    parts, pos = [], start
+    for s_start, s_end in merged:
+        s_start, s_end = max(s_start, start), min(s_end, end)
+        if s_start >= s_end: continue
+        parts.append(text[pos:s_start])
+        parts.append(HL_START + text[s_start:s_end] + HL_END)
+        pos = s_end
+    parts.append(text[pos:end])
+
+    marked = ''.join(parts)
+    if start > 0: marked = ELLIPSIS + marked
+    if end < len(text): marked += ELLIPSIS
+    return marked
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# data/time_ranges.py
+"""
+本地日期范围 -> Unix 时间戳区间 [start, end)。
+
+数据库中的 created_at/updated_at 以 UTC 文本存储，对应的 created_ts/updated_ts
+是整数时间戳列。把 "今天/昨天/近 7 天/本月" 在 Python 里换算成时间戳区间，
+查询就能写成 ts >= ? AND ts < ? 的范围条件，从而走索引。
+"""
+from datetime import datetime, timedelta
+
+
+def _local_midnight(now):
+    return datetime(now.year, now.month, now.day)
+
+
+def _epoch(local_dt):
+    # naive datetime 的 timestamp() 按本地时区解释，夏令时切换日也能得到正确的本地零点
+    return int(local_dt.timestamp())
+
+
+def day_start(day):
+    """某个本地日期 (date) 零点的时间戳"""
+    return _epoch(datetime(day.year, day.month, day.day))
+
+
+def day_range(days_ago=0, now=None):
+    """某一本地自然日，days_ago=0 为今天，1 为昨天"""
+    start = _local_midnight(now or datetime.now()) - timedelta(days=days_ago)
+    return _epoch(start), _epoch(start + timedelta(days=1))
+
+
+def recent_days_range(days, now=None):
+    """包含今天在内的最近 days 个本地自然日"""
+    today = _local_midnight(now or datetime.now())
+    return _epoch(today - timedelta(days=days - 1)), _epoch(today + timedelta(days=1))
+
+
+def month_range(now=None):
+    """当前本地自然月"""
+    now = now or datetime.now()
+    start = datetime(now.year, now.month, 1)
+    next_month = datetime(now.year + 1, 1, 1) if now.month == 12 else datetime(now.year, now.month + 1, 1)
+    return _epoch(start), _epoch(next_month)
+
+
+def date_option_range(option, now=None):
+    """筛选面板的日期选项 ('today' / 'yesterday' / 'week' / 'month') 对应的区间"""
+    if option == 'today': return day_range(0, now)
+    if option == 'yesterday': return day_range(1, now)
+    if option == 'week': return recent_days_range(7, now)
+    if option == 'month': return month_range(now)
+    return None
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+# services/background_task.py
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+
+class BackgroundTask(QObject):
+    """
+    一次性的长任务（如导出 / 导入同步包）放到工作线程执行，界面保持响应。
+
+    job(progress) 在工作线程中执行，不能访问界面对象；调用 progress(value) 发出 progress 信号。
+    返回值经 finished、异常经 failed 回到界面线程。
+    """
+    progress = pyqtSignal(object)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(object)  # 异常对象
+
+    def __init__(self, job, name='background-task', parent=None):
+        super().__init__(parent)
+        self._job = job
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    @property
+    def running(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        try:
+            result = self._job(self.progress.emit)
+        except Exception as e:
+            logging.error(f"Background task {self._thread.name} failed: {e}", exc_info=True)
+            self.failed.emit(e)
+            return
+        self.finished.emit(result)
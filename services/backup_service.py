@@ -1,2 +1,2 @@
 ﻿# -*- coding: utf-8 -*-
-# services/backup_service.pyimport osimport shutilfrom datetime import datetimefrom core.config import DB_NAME, BACKUP_DIRclass BackupService:    @staticmethod    def run_backup():        """执行数据库备份并清理旧文件"""        if not os.path.exists(BACKUP_DIR):            os.makedirs(BACKUP_DIR)                if os.path.exists(DB_NAME):            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')            target = os.path.join(BACKUP_DIR, f'ideas_{timestamp}.db')            try:                shutil.copy2(DB_NAME, target)                BackupService._clean_old_backups()                print(f"[System] Backup created: {target}")            except Exception as e:                print(f"[System] Backup failed: {e}")    @staticmethod    def _clean_old_backups(keep=20):        try:            files = sorted(                [os.path.join(BACKUP_DIR, f) for f in os.listdir(BACKUP_DIR)],                key=os.path.getmtime            )            while len(files) > keep:                os.remove(files.pop(0))        except Exception:            pass
\ No newline at end of file
+# services/backup_service.pyimport osimport sqlite3from datetime import datetimefrom core.config import DB_NAME, ARCHIVE_DB_NAME, BACKUP_DIR# 每次备份的文件：主库与归档库同一时间戳，一起保留、一起清理_BACKUP_PREFIXES = (('ideas_', DB_NAME), ('archive_', ARCHIVE_DB_NAME))class BackupService:    @staticmethod    def run_backup():        """执行数据库备份并清理旧文件"""        if not os.path.exists(BACKUP_DIR):            os.makedirs(BACKUP_DIR)                if os.path.exists(DB_NAME):            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')            targets = [                (source, os.path.join(BACKUP_DIR, f'{prefix}{timestamp}.db'))                for prefix, source in _BACKUP_PREFIXES if os.path.exists(source)            ]            try:                for source, target in targets:                    BackupService._copy_db(source, target)                BackupService._clean_old_backups()                print(f"[System] Backup created: {', '.join(t for _, t in targets)}")            except Exception as e:                # 不留下只有一半的备份                for _, target in targets:                    if os.path.exists(target): os.remove(target)                print(f"[System] Backup failed: {e}")    @staticmethod    def _copy_db(source, target):        # 使用 SQLite 在线备份：WAL 模式下已提交的数据可能还在 -wal 文件里，直接复制数据库文件会丢数据        src = sqlite3.connect(source)        try:            dst = sqlite3.connect(target)            try:                src.backup(dst)            finally:                dst.close()        finally:            src.close()    @staticmethod    def _clean_old_backups(keep=20):        """保留最近 keep 次备份；同一时间戳的主库与归档库按一次计"""        try:            groups = {}            for f in os.listdir(BACKUP_DIR):                for prefix, _ in _BACKUP_PREFIXES:                    if f.startswith(prefix) and f.endswith('.db'):                        groups.setdefault(f[len(prefix):-3], []).append(os.path.join(BACKUP_DIR, f))            for timestamp in sorted(groups)[:-keep]:                for path in groups[timestamp]:                    os.remove(path)        except Exception:            pass
\ No newline at end of file
@@ -0,0 +1,426 @@
+# -*- coding: utf-8 -*-
+# services/capture_daemon.py
+"""
+剪贴板采集守护进程。
+
+剪贴板监听与写库放在一个不带界面的独立进程里，界面线程被长时间加载或对话框阻塞时
+复制内容照常入库；界面进程关闭后守护进程继续记录，下次启动界面时从数据库读到。
+
+进程间用 QLocalSocket 传递一行一条的文本消息 "命令 [参数]\\n"：
+- 守护进程 -> 界面（界面的单实例通道 SERVER_NAME）：
+  CAPTURED <id> 新记录入库；UPDATED <id> 已有记录刷新了时间戳
+- 界面 -> 守护进程（CAPTURE_SERVER_NAME）：
+  PING（回复 PONG）；UI_ACTIVE 1/0 界面窗口是否在前台（前台时不采集，避免记录应用内部的复制）；EXIT
+界面的单实例通道原有的 SHOW / EXIT 消息不带换行，连接断开时按一条消息处理，旧版本照常可用。
+"""
+import logging
+import os
+import sys
+
+from PyQt5.QtCore import QObject, QTimer, QProcess, pyqtSignal
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
+from PyQt5.QtWidgets import QApplication
+
+from core.config import SERVER_NAME, CAPTURE_SERVER_NAME
+from services.clipboard import ClipboardManager
+
+DAEMON_FLAG = '--capture-daemon'
+# 界面未运行时暂存的通知条数上限；界面启动后会从数据库完整加载，丢弃不影响数据
+MAX_PENDING_MESSAGES = 200
+CONNECT_TIMEOUT_MS = 300
+# 拉起守护进程后等待其就绪的轮询间隔与次数
+STARTUP_POLL_MS = 200
+STARTUP_POLL_ATTEMPTS = 25
+# 守护进程意外退出后自动重启的次数上限，超过后留在界面进程内采集
+MAX_DAEMON_RESTARTS = 3
+
+
+def encode_message(command, arg=None):
+    line = command if arg is None else f"{command} {arg}"
+    return (line + "\n").encode('utf-8')
+
+
+def decode_message(line):
+    """'CAPTURED 12' -> ('CAPTURED', '12')；空行返回 None"""
+    line = line.strip()
+    if not line: return None
+    command, _, arg = line.partition(' ')
+    return command, arg
+
+
+def daemon_command(script=None):
+    """启动守护进程的 (程序, 参数)；打包后的可执行文件直接带参数运行自身"""
+    if getattr(sys, 'frozen', False):
+        return sys.executable, [DAEMON_FLAG]
+    return sys.executable, [os.path.abspath(script or sys.argv[0]), DAEMON_FLAG]
+
+
+class DaemonProbe(QObject):
+    """
+    不阻塞事件循环的探测：连上 server_name 后发送 PING，收到 PONG 即认为存活。
+    连接失败、对方不应答或超时都按未运行处理；只发出一次 finished(是否存活)，之后自行释放。
+    """
+    finished = pyqtSignal(bool)
+
+    def __init__(self, server_name, timeout_ms=CONNECT_TIMEOUT_MS, parent=None):
+        super().__init__(parent)
+        self.server_name = server_name
+        self._reply = b''
+        self._done = False
+        self._socket = QLocalSocket(self)
+        self._socket.connected.connect(self._on_connected)
+        self._socket.readyRead.connect(self._on_ready_read)
+        self._socket.error.connect(self._on_error)
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(timeout_ms)
+        self._timer.timeout.connect(self._on_timeout)
+
+    def start(self):
+        # 推迟到事件循环中连接，结果不会在 start() 返回前发出
+        self._timer.start()
+        QTimer.singleShot(0, self._connect)
+
+    def cancel(self):
+        """放弃探测，不再发出 finished"""
+        self._close()
+
+    def _connect(self):
+        if not self._done: self._socket.connectToServer(self.server_name)
+
+    def _on_connected(self):
+        self._socket.write(encode_message('PING'))
+        self._socket.flush()
+
+    def _on_ready_read(self):
+        self._reply += self._socket.readAll().data()
+        if b'PONG' in self._reply: self._finish(True)
+
+    def _on_error(self, error):
+        self._finish(False)
+
+    def _on_timeout(self):
+        self._finish(False)
+
+    def _finish(self, alive):
+        if self._close(): self.finished.emit(alive)
+
+    def _close(self):
+        if self._done: return False
+        self._done = True
+        self._timer.stop()
+        self._socket.connected.disconnect(self._on_connected)
+        self._socket.readyRead.disconnect(self._on_ready_read)
+        self._socket.error.disconnect(self._on_error)
+        self._socket.abort()
+        self.deleteLater()
+        return True
+
+
+def ping(server_name, callback, timeout_ms=CONNECT_TIMEOUT_MS, parent=None):
+    """
+    探测 server_name 上是否有进程在监听并应答；结果经 callback(是否存活) 在事件循环中返回。
+    没有 parent 时调用方需持有返回的探测对象直到出结果。
+    """
+    probe = DaemonProbe(server_name, timeout_ms, parent)
+    probe.finished.connect(callback)
+    probe.start()
+    return probe
+
+
+class MessageServer(QObject):
+    """
+    QLocalServer 的行消息封装：每个连接各自缓冲，收齐一行发出一次 message(命令, 参数, 连接)。
+    不阻塞事件循环，可同时保持多个长连接。
+    """
+    message = pyqtSignal(str, str, object)
+
+    def __init__(self, name, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self._server = QLocalServer(self)
+        self._server.newConnection.connect(self._on_new_connection)
+        self._buffers = {}
+
+    def listen(self):
+        """监听 name；同名的残留套接字文件先移除（调用方已确认没有存活的实例）"""
+        QLocalServer.removeServer(self.name)
+        if not self._server.listen(self.name):
+            logging.error(f"Failed to listen on {self.name}: {self._server.errorString()}")
+            return False
+        return True
+
+    def close(self):
+        """停止监听并断开所有已接受的连接；断开前先解除信号，关闭过程中不再派发消息"""
+        self._server.close()
+        for conn in list(self._buffers):
+            self._release(conn)
+            conn.abort()
+        self._buffers.clear()
+
+    def _on_new_connection(self):
+        while self._server.hasPendingConnections():
+            conn = self._server.nextPendingConnection()
+            self._buffers[conn] = b''
+            conn.readyRead.connect(self._on_ready_read)
+            conn.disconnected.connect(self._on_disconnected)
+            if conn.bytesAvailable(): self._read(conn)
+
+    def _release(self, conn):
+        conn.readyRead.disconnect(self._on_ready_read)
+        conn.disconnected.disconnect(self._on_disconnected)
+        conn.deleteLater()
+
+    def _on_ready_read(self):
+        self._read(self.sender())
+
+    def _read(self, conn):
+        if conn not in self._buffers: return
+        data = self._buffers[conn] + conn.readAll().data()
+        *lines, rest = data.split(b'\n')
+        self._buffers[conn] = rest
+        for line in lines:
+            self._dispatch(line, conn)
+
+    def _on_disconnected(self):
+        conn = self.sender()
+        if conn not in self._buffers: return
+        rest = self._buffers.pop(conn)
+        if rest: self._dispatch(rest, conn)
+        self._release(conn)
+
+    def _dispatch(self, line, conn):
+        msg = decode_message(line.decode('utf-8', errors='replace'))
+        if msg: self.message.emit(msg[0], msg[1], conn)
+
+
+class MessageClient(QObject):
+    """
+    到 server_name 的长连接：未连通时消息暂存，连上后按顺序发出；对方不在时丢弃暂存。
+    已建立的连接断开（对方进程退出或崩溃）时发出 disconnected。
+    """
+    disconnected = pyqtSignal()
+
+    def __init__(self, server_name, parent=None):
+        super().__init__(parent)
+        self.server_name = server_name
+        self._pending = []
+        self._socket = QLocalSocket(self)
+        self._socket.connected.connect(self._flush)
+        self._socket.error.connect(self._on_error)
+        self._socket.disconnected.connect(self.disconnected)
+
+    def open(self):
+        """未连接时发起连接，不发送消息"""
+        if self._socket.state() == QLocalSocket.UnconnectedState:
+            self._socket.connectToServer(self.server_name)
+
+    def send(self, command, arg=None):
+        self._pending.append(encode_message(command, arg))
+        del self._pending[:-MAX_PENDING_MESSAGES]
+        if self._socket.state() == QLocalSocket.ConnectedState: self._flush()
+        else: self.open()
+
+    def close(self):
+        self._socket.disconnectFromServer()
+
+    def _flush(self):
+        for data in self._pending:
+            self._socket.write(data)
+        self._pending = []
+        self._socket.flush()
+
+    def _on_error(self, error):
+        if error != QLocalSocket.PeerClosedError:
+            self._pending = []
+        self._socket.abort()
+
+
+class CaptureDaemon(QObject):
+    """守护进程本体：监听剪贴板，经 ClipboardManager 写库，把新记录的 ID 推送给界面进程"""
+
+    def __init__(self, service, clipboard=None, server_name=CAPTURE_SERVER_NAME, ui_server_name=SERVER_NAME, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.clipboard = clipboard or QApplication.clipboard()
+        self.ui_active = False
+        self.cm = ClipboardManager(service)
+        self.cm.data_captured.connect(lambda iid: self.ui.send('CAPTURED', iid))
+        self.cm.data_updated.connect(lambda iid: self.ui.send('UPDATED', iid))
+        self.ui = MessageClient(ui_server_name, self)
+        self.server = MessageServer(server_name, self)
+        self.server.message.connect(self._on_message)
+        self._ui_conn = None
+        self._processing = False
+
+    def start(self):
+        if not self.server.listen(): return False
+        self.clipboard.dataChanged.connect(self._on_clipboard_changed)
+        logging.info(f"Capture daemon listening on {self.server.name}")
+        return True
+
+    def stop(self):
+        try:
+            self.clipboard.dataChanged.disconnect(self._on_clipboard_changed)
+        except TypeError:
+            pass
+        self.server.close()
+        self.ui.close()
+
+    def _on_clipboard_changed(self):
+        # 界面窗口在前台时的复制来自应用自身（如复制某条笔记），与原先只屏蔽自身窗口的规则一致
+        if self._processing or self.ui_active: return
+        self._processing = True
+        try:
+            self.cm.process_clipboard(self.clipboard.mimeData(), None)
+        finally:
+            self._processing = False
+
+    def _on_ui_disconnected(self):
+        if self.sender() is self._ui_conn:
+            self._ui_conn = None
+            self.ui_active = False
+
+    def _on_message(self, command, arg, conn):
+        if command == 'PING':
+            conn.write(encode_message('PONG')); conn.flush()
+        elif command == 'UI_ACTIVE':
+            self.ui_active = arg == '1'
+            # 界面进程退出或崩溃时连接断开，恢复采集
+            if conn is not self._ui_conn:
+                if self._ui_conn is not None: self._ui_conn.disconnected.disconnect(self._on_ui_disconnected)
+                self._ui_conn = conn
+                conn.disconnected.connect(self._on_ui_disconnected)
+        elif command == 'EXIT':
+            logging.info("Capture daemon exit requested")
+            self.stop()
+            QApplication.quit()
+
+
+class CaptureLink(QObject):
+    """
+    界面进程一侧：确保守护进程在运行，转告界面的前台状态，接收采集通知。
+    守护进程无法启动时 available 保持 False，由调用方继续在本进程内采集。
+    就绪后保持一条到守护进程的长连接，连接断开即认为守护进程已退出：发出 lost 并尝试重启，
+    调用方在 lost 之后恢复本进程内采集，重新 ready 后再关闭。
+    """
+    captured = pyqtSignal(int)
+    updated = pyqtSignal(int)
+    ready = pyqtSignal()
+    lost = pyqtSignal()
+
+    def __init__(self, server_name=CAPTURE_SERVER_NAME, parent=None):
+        super().__init__(parent)
+        self.server_name = server_name
+        self.available = False
+        self.daemon = MessageClient(server_name, self)
+        self.daemon.disconnected.connect(self._on_daemon_disconnected)
+        self._command = None
+        self._probe = None
+        self._restarts = 0
+        self._attempts = 0
+        self._poll_timer = QTimer(self)
+        self._poll_timer.setInterval(STARTUP_POLL_MS)
+        self._poll_timer.timeout.connect(self._poll)
+
+    def start(self, program, args):
+        """先探测守护进程；已在运行则发出 ready，否则拉起并在后台轮询，就绪后发出 ready"""
+        self._command = (program, args)
+        self._send_probe(self._on_start_probe, CONNECT_TIMEOUT_MS)
+
+    def _send_probe(self, callback, timeout_ms):
+        self._cancel_probe()
+        self._probe = ping(self.server_name, callback, timeout_ms, self)
+
+    def _cancel_probe(self):
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+
+    def _on_start_probe(self, alive):
+        self._probe = None
+        if alive:
+            self._set_ready()
+            return
+        program, args = self._command
+        if not QProcess.startDetached(program, args, os.getcwd()):
+            logging.error("Failed to start capture daemon; capturing in the UI process")
+            return
+        self._attempts = 0
+        self._poll_timer.start()
+
+    def _poll(self):
+        # 上一次探测还没有结果时不重复发起
+        if self._probe is not None: return
+        self._attempts += 1
+        self._send_probe(self._on_poll_probe, 50)
+
+    def _on_poll_probe(self, alive):
+        self._probe = None
+        if alive:
+            self._poll_timer.stop()
+            self._set_ready()
+        elif self._attempts >= STARTUP_POLL_ATTEMPTS:
+            self._poll_timer.stop()
+            logging.error("Capture daemon did not come up; capturing in the UI process")
+
+    def _set_ready(self):
+        self.available = True
+        self.daemon.open()
+        self.ready.emit()
+
+    def _on_daemon_disconnected(self):
+        # stop_daemon() 主动结束时 available 已先置为 False
+        if not self.available: return
+        self.available = False
+        logging.error("Capture daemon went away; capturing in the UI process")
+        self.lost.emit()
+        if self._command and self._restarts < MAX_DAEMON_RESTARTS:
+            self._restarts += 1
+            self.start(*self._command)
+
+    def set_ui_active(self, active):
+        if self.available: self.daemon.send('UI_ACTIVE', 1 if active else 0)
+
+    def stop_daemon(self):
+        self._poll_timer.stop()
+        self._cancel_probe()
+        if not self.available: return
+        self.available = False
+        socket = QLocalSocket()
+        socket.connectToServer(self.server_name)
+        if socket.waitForConnected(CONNECT_TIMEOUT_MS):
+            socket.write(encode_message('EXIT')); socket.flush(); socket.waitForBytesWritten(1000)
+            socket.disconnectFromServer()
+
+    def handle_message(self, command, arg):
+        """界面单实例通道上收到的采集通知；返回是否已处理"""
+        if command not in ('CAPTURED', 'UPDATED'): return False
+        try:
+            iid = int(arg)
+        except ValueError:
+            logging.warning(f"Malformed capture notification: {command} {arg!r}")
+            return True
+        (self.captured if command == 'CAPTURED' else self.updated).emit(iid)
+        return True
+
+
+def run_daemon():
+    """守护进程入口：单实例，已有守护进程在运行时直接退出"""
+    from core.container import AppContainer
+
+    app = QApplication.instance() or QApplication(sys.argv)
+    app.setQuitOnLastWindowClosed(False)
+    daemons = []
+
+    def on_probe(alive):
+        if alive:
+            logging.info("Capture daemon already running")
+            app.exit(0)
+            return
+        daemon = CaptureDaemon(AppContainer().service)
+        daemons.append(daemon)
+        if not daemon.start(): app.exit(1)
+
+    ping(CAPTURE_SERVER_NAME, on_probe, parent=app)
+    return app.exec_()
@@ -14,6 +14,8 @@ class ClipboardManager(QObject):
     管理剪贴板数据,处理数据并将其存入数据库。
     """
     data_captured = pyqtSignal(int)
+    # 内容已存在、只刷新了时间戳
+    data_updated = pyqtSignal(int)
 
     def __init__(self, db_manager):
         super().__init__()
@@ -101,6 +103,8 @@ class ClipboardManager(QObject):
                                 if is_new:
                                     # 注意：不再将扩展名作为标签添加
                                     self.data_captured.emit(idea_id)
+                                else:
+                                    self.data_updated.emit(idea_id)
                         except Exception as e:
                             logging.error(f"Failed to save file clipboard item: {e}", exc_info=True)
                         return
@@ -125,6 +129,8 @@ class ClipboardManager(QObject):
                             idea_id, is_new = result
                             if is_new:
                                 self.data_captured.emit(idea_id)
+                            else:
+                                self.data_updated.emit(idea_id)
                         return
                 except Exception as e:
                     logging.error(f"Failed to process image from clipboard: {e}", exc_info=True)
@@ -163,6 +169,8 @@ class ClipboardManager(QObject):
                                     except Exception as e:
                                         logging.error(f"Failed to add tags to idea {idea_id}: {e}", exc_info=True)
                                 self.data_captured.emit(idea_id)
+                            else:
+                                self.data_updated.emit(idea_id)
                         return
                 except Exception as e:
                     logging.error(f"Failed to process text from clipboard: {e}", exc_info=True)
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# services/entity_cache.py
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 5000
+# 含图片等二进制数据的条目单独按字节计预算，避免翻几页图片就占满内存
+MAX_BLOB_BYTES = 64 * 1024 * 1024
+
+
+def _blob_size(value):
+    try:
+        blob = value['data_blob']
+    except (KeyError, IndexError, TypeError):
+        return 0
+    return len(blob) if blob else 0
+
+
+def _shallow_copy(value):
+    # 字典会被调用方修改，交出副本；sqlite3.Row 与 IdeaDetail 等记录不可变，可直接共享
+    return dict(value) if isinstance(value, dict) else value
+
+
+class EntityCache:
+    """
+    单条记录的读穿缓存，由 IdeaService 持有，所有窗口与面板共用。
+    键为 (种类, idea_id)，同一条记录可按不同形状缓存（有无 blob、是否带标签的详情）。
+    普通条目按条数 LRU 淘汰，含二进制数据的条目另按字节数 LRU 淘汰。
+    失效按 ID 进行：数据库连接上的临时触发器在该记录或其标签变化时调用 invalidate(idea_id)。
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_blob_bytes=MAX_BLOB_BYTES):
+        self.max_entries = max_entries
+        self.max_blob_bytes = max_blob_bytes
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._blobs = OrderedDict()
+        self._blob_bytes = 0
+        self._keys_by_id = {}
+        # 每次失效加一：加载期间发生过失效的结果不放入缓存
+        self._version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, kind, iid, loader):
+        """loader() 返回该记录或 None（不存在的记录不缓存）"""
+        key = (kind, iid)
+        with self._lock:
+            value = self._lookup_locked(key)
+            if value is not None:
+                self.hits += 1
+                return _shallow_copy(value)
+            self.misses += 1
+            version = self._version
+
+        value = loader()
+        if value is not None:
+            with self._lock:
+                if version == self._version:
+                    self._store_locked(key, value)
+        return _shallow_copy(value)
+
+    def get_many(self, kind, id_list, loader):
+        """
+        批量读取：loader(缺失的 id 列表) 返回带 'id' 字段的记录列表。
+        结果按 id_list 顺序排列，不存在的记录被跳过。
+        """
+        found, missing = {}, []
+        with self._lock:
+            for iid in id_list:
+                value = self._lookup_locked((kind, iid))
+                if value is None: missing.append(iid)
+                else: found[iid] = value
+            self.hits += len(found)
+            self.misses += len(missing)
+            version = self._version
+
+        if missing:
+            loaded = loader(missing)
+            with self._lock:
+                store = version == self._version
+                for value in loaded:
+                    found[value['id']] = value
+                    if store: self._store_locked((kind, value['id']), value)
+        return [_shallow_copy(found[iid]) for iid in id_list if iid in found]
+
+    def invalidate(self, iid):
+        with self._lock:
+            self._version += 1
+            for key in self._keys_by_id.pop(iid, ()):
+                self._remove_locked(key)
+
+    def clear(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._blobs.clear()
+            self._blob_bytes = 0
+            self._keys_by_id.clear()
+
+    def _lookup_locked(self, key):
+        for store in (self._entries, self._blobs):
+            if key in store:
+                store.move_to_end(key)
+                return store[key][0] if store is self._blobs else store[key]
+        return None
+
+    def _store_locked(self, key, value):
+        self._remove_locked(key)
+        size = _blob_size(value)
+        if size > self.max_blob_bytes:
+            return
+        if size:
+            self._blobs[key] = (value, size)
+            self._blob_bytes += size
+        else:
+            self._entries[key] = value
+        self._keys_by_id.setdefault(key[1], set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            old_key, _ = self._entries.popitem(last=False)
+            self._forget_key_locked(old_key)
+        while self._blob_bytes > self.max_blob_bytes:
+            old_key, (_, old_size) = self._blobs.popitem(last=False)
+            self._blob_bytes -= old_size
+            self._forget_key_locked(old_key)
+
+    def _remove_locked(self, key):
+        if key in self._entries:
+            del self._entries[key]
+        elif key in self._blobs:
+            self._blob_bytes -= self._blobs.pop(key)[1]
+
+    def _forget_key_locked(self, key):
+        keys = self._keys_by_id.get(key[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys: del self._keys_by_id[key[1]]
@@ -2,33 +2,145 @@
 # services/idea_service.py
 from core.config import COLORS
 from core.signals import app_signals
+from services.search_session import SearchSession
+from services.search_executor import SearchExecutor
+from services.query_cache import QueryCache
+from services.entity_cache import EntityCache
+from data.repositories.revision_repository import RevisionRepository
+from data.repositories.journal_repository import JournalRepository
+from data.repositories.archive_repository import ArchiveRepository
+from data.search_index import mark_text, mark_pattern, SNIPPET_CHARS
+from data.regex_search import build_pattern, compile_pattern, pattern_error
+from data.query_parser import parse_query
 import hashlib
 import os
+from datetime import date
 
 class IdeaService:
-    def __init__(self, idea_repo, category_repo, tag_repo):
+    def __init__(self, idea_repo, category_repo, tag_repo, revision_repo=None, journal_repo=None, archive_repo=None):
         self.idea_repo = idea_repo
         self.category_repo = category_repo
         self.tag_repo = tag_repo
+        self.revision_repo = revision_repo or RevisionRepository(idea_repo.db)
+        # 变更日志：增量任务按检查点读取 seq 之后的变化，不必重扫 ideas
+        self.journal = journal_repo or JournalRepository(idea_repo.db)
+        # 归档库：冷数据移出主库；被打开或修改的归档笔记先取回主库
+        self.archive = archive_repo or ArchiveRepository(idea_repo.db)
         self.conn = self.idea_repo.db.conn # 用于暴露给需要直接访问 conn 的旧代码(如 AdvancedTagSelector)
+        self.profiler = self.idea_repo.db.profiler
+        # 高频只读查询的结果缓存：数据库任何写入都会使其整体失效；
+        # "今天/本周" 等统计依赖日期，跨过零点也要失效
+        self.query_cache = QueryCache(lambda: self.generation)
+        # 单条记录缓存：所有窗口共用，记录或其标签被修改时按 ID 失效
+        self.entities = EntityCache()
+        self.idea_repo.db.watch_idea_changes(self.entities.invalidate)
+
+    @property
+    def generation(self):
+        """数据版本号：数据库写入或跨过零点都会变化，内存中保存的查询结果据此判断是否过期"""
+        return (self.idea_repo.db.generation, date.today())
+
+    def notify_external_change(self, iid=None):
+        """其它进程修改了记录 iid（None 表示不确定范围）：本进程的缓存不会被触发器通知，在此作废"""
+        self.idea_repo.db.mark_external_change()
+        if iid is None: self.entities.clear()
+        else: self.entities.invalidate(iid)
+        app_signals.data_changed.emit()
+
+    def span(self, name):
+        """把一次 UI 动作期间执行的查询归到 name 名下，用于定位慢操作"""
+        return self.profiler.span(name)
 
     # --- Idea Operations ---
-    def get_ideas(self, search, f_type, f_val, page=1, page_size=100, tag_filter=None, filter_criteria=None):
-        return self.idea_repo.get_list_by_filter(search, f_type, f_val, page, page_size, tag_filter, filter_criteria)
+    def get_ideas(self, search, f_type, f_val, page=1, page_size=100, tag_filter=None, filter_criteria=None, ranked=False, include_archive=False):
+        return self.idea_repo.get_list_by_filter(
+            search, f_type, f_val, page, page_size, tag_filter, filter_criteria, ranked, include_archive=include_archive
+        )
+
+    def get_ideas_count(self, search, f_type, f_val, tag_filter=None, filter_criteria=None, include_archive=False):
+        return self.query_cache.get_or_load(
+            'get_ideas_count', (search, f_type, f_val, tag_filter, filter_criteria, include_archive),
+            lambda: self.idea_repo.get_count_by_filter(
+                search, f_type, f_val, tag_filter, filter_criteria, include_archive=include_archive
+            )
+        )
 
-    def get_ideas_count(self, search, f_type, f_val, tag_filter=None, filter_criteria=None):
-        return self.idea_repo.get_count_by_filter(search, f_type, f_val, tag_filter, filter_criteria)
+    def get_ideas_by_ids(self, id_list):
+        return self.idea_repo.get_list_by_ids(id_list)
+
+    def create_search_session(self):
+        """每个搜索框持有一个独立的会话，互不干扰"""
+        return SearchSession(self.idea_repo)
+
+    def create_search_executor(self, parent=None):
+        """每个窗口持有一个后台搜索执行器（独立只读连接），新搜索会中断该窗口尚未完成的旧搜索"""
+        return SearchExecutor(self.idea_repo.db, parent=parent)
 
     # --- Smart Caching Methods ---
-    def get_metadata(self, search, f_type, f_val):
-        return self.idea_repo.get_metadata_by_filter(search, f_type, f_val)
+    def get_metadata(self, search, f_type, f_val, ranked=False, include_archive=False):
+        return self.query_cache.get_or_load(
+            'get_metadata', (search, f_type, f_val, ranked, include_archive),
+            lambda: self.idea_repo.get_metadata_by_filter(
+                search, f_type, f_val, ranked=ranked, include_archive=include_archive
+            )
+        )
+
+    def get_metadata_by_regex(self, pattern, f_type, f_val):
+        """正则 / 全字匹配搜索（pattern 由 regex_search.build_pattern 生成）"""
+        return self.query_cache.get_or_load(
+            'get_metadata_by_regex', (pattern, f_type, f_val),
+            lambda: self.idea_repo.get_metadata_by_regex(pattern, f_type, f_val)
+        )
+
+    def get_search_highlights(self, search, items, mode='plain'):
+        """
+        当前页条目的搜索高亮 {id: (标记后的标题, 正文命中片段)}，命中处以控制字符标记。
+        只处理一页数据，直接在内存中标记；FTS5 的 snippet() 需要重新解析整个匹配，反而更慢。
+        items 需包含 id、title、content。mode 为搜索模式（见 regex_search.SEARCH_MODES）。
+        """
+        if mode == 'plain':
+            terms = parse_query(search).terms
+            if not terms: return {}
+            mark = lambda text, width=None: mark_text(text, terms, width)
+        else:
+            pattern = build_pattern(search, mode)
+            if pattern is None or pattern_error(pattern): return {}
+            regex = compile_pattern(pattern)
+            mark = lambda text, width=None: mark_pattern(text, regex, width)
+        result = {}
+        for it in items:
+            title = mark(it['title'])
+            snippet = mark(it['content'], SNIPPET_CHARS)
+            if title or snippet:
+                result[it['id']] = (title or it['title'], snippet)
+        return result
         
     def get_details(self, id_list):
-        return self.idea_repo.get_details_by_ids(id_list)
+        """卡片渲染用的详情；由主界面的翻页预取放进缓存的记录中，图片 data_blob 为卡片尺寸的缩略图"""
+        return self.entities.get_many('details', id_list, self.idea_repo.get_details_by_ids)
     # -----------------------------
 
     def get_idea(self, iid, include_blob=False):
-        return self.idea_repo.get_by_id(iid, include_blob)
+        return self.entities.get(
+            'idea_blob' if include_blob else 'idea', iid,
+            lambda: self.idea_repo.get_by_id(iid, include_blob)
+        )
+
+    def open_idea(self, iid, include_blob=True):
+        """用户打开一条笔记（编辑、预览）：位于归档库时先取回主库，再读取"""
+        if self._promote([iid]): app_signals.data_changed.emit()
+        return self.get_idea(iid, include_blob)
+
+    # --- Archive ---
+    def _promote(self, ids):
+        """修改记录前调用：归档库中的记录先取回主库，之后的写入都只针对主库"""
+        return self.archive.promote(ids)
+
+    def archive_cold_ideas(self, emit_signal=True):
+        """移入一批冷数据，返回移入条数；由界面在空闲时反复调用，直到返回 0"""
+        moved = self.archive.archive_batch()
+        if moved and emit_signal: app_signals.data_changed.emit()
+        return moved
 
     def add_idea(self, title, content, color, tags, category_id=None, item_type='text', data_blob=None):
         if color is None: color = COLORS['default_note']
@@ -38,23 +150,54 @@ class IdeaService:
         return iid
 
     def update_idea(self, iid, title, content, color, tags, category_id=None, item_type='text', data_blob=None):
-        self.idea_repo.update(iid, title, content, color, category_id, item_type, data_blob)
+        self._promote([iid])
+        # 覆盖前记录历史版本（图片笔记的正文只是占位文字，不记录）；版本与更新在同一事务中提交
+        seq = None
+        try:
+            if item_type != 'image': seq = self.revision_repo.record_edit(iid, title, content)
+            self.idea_repo.update(iid, title, content, color, category_id, item_type, data_blob)
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.revision_repo.prune_if_due(iid, seq)
         self.tag_repo.update_tags(iid, tags)
         app_signals.data_changed.emit()
 
+    # --- Change Journal ---
+    def get_changes_since(self, seq, limit=1000):
+        return self.journal.changes_since(seq, limit)
+
+    def latest_change_seq(self):
+        return self.journal.latest_seq()
+
+    def compact_journal(self):
+        return self.journal.compact()
+
+    # --- Revisions ---
+    def get_revisions(self, iid):
+        return self.revision_repo.list(iid)
+
+    def get_revision(self, iid, seq):
+        """重建历史版本，返回 (标题, 正文) 或 None"""
+        return self.revision_repo.get(iid, seq)
+
     def update_field(self, iid, field, value):
+        self._promote([iid])
         self.idea_repo.update_field(iid, field, value)
         app_signals.data_changed.emit()
 
     def toggle_field(self, iid, field):
+        self._promote([iid])
         self.idea_repo.toggle_field(iid, field)
         app_signals.data_changed.emit()
 
     def set_favorite(self, iid, state):
+        self._promote([iid])
         self.idea_repo.update_field(iid, 'is_favorite', 1 if state else 0)
         app_signals.data_changed.emit()
 
     def set_deleted(self, iid, state, emit_signal=True):
+        self._promote([iid])
         val = 1 if state else 0
         self.idea_repo.update_field(iid, 'is_deleted', val)
         if state:
@@ -66,14 +209,17 @@ class IdeaService:
             app_signals.data_changed.emit()
 
     def set_rating(self, iid, rating):
+        self._promote([iid])
         self.idea_repo.update_field(iid, 'rating', rating)
         app_signals.data_changed.emit()
 
     def delete_permanent(self, iid):
+        self._promote([iid])
         self.idea_repo.delete_permanent(iid)
         app_signals.data_changed.emit()
 
     def move_category(self, iid, cat_id, emit_signal=True):
+        self._promote([iid])
         self.idea_repo.update_field(iid, 'category_id', cat_id)
         self.idea_repo.update_field(iid, 'is_deleted', 0)
         # 如果移动到分类，应应用分类颜色（略）
@@ -84,11 +230,15 @@ class IdeaService:
         return self.idea_repo.get_lock_status(ids)
 
     def set_locked(self, ids, state):
+        self._promote(ids)
         self.idea_repo.set_locked(ids, state)
         app_signals.data_changed.emit()
 
-    def get_filter_stats(self, search, f_type, f_val):
-        return self.idea_repo.get_filter_stats(search, f_type, f_val)
+    def get_filter_stats(self, search, f_type, f_val, include_archive=False):
+        return self.query_cache.get_or_load(
+            'get_filter_stats', (search, f_type, f_val, include_archive),
+            lambda: self.idea_repo.get_filter_stats(search, f_type, f_val, include_archive)
+        )
         
     def empty_trash(self):
         c = self.idea_repo.db.get_cursor()
@@ -107,6 +257,10 @@ class IdeaService:
         content_hash = hasher.hexdigest()
 
         existing = self.idea_repo.find_by_hash(content_hash)
+        if not existing:
+            existing = self.archive.find_by_hash(content_hash)
+            # 再次复制了已归档的内容：取回主库，之后与主库中的重复内容一样只刷新时间
+            if existing: self._promote([existing[0]])
         if existing:
             # 【修复】使用专门的时间戳更新方法
             self.idea_repo.update_timestamp(existing[0])
@@ -130,10 +284,12 @@ class IdeaService:
         return self.tag_repo.get_all()
 
     def add_tags_to_multiple_ideas(self, idea_ids, tags):
+        self._promote(idea_ids)
         self.tag_repo.add_to_multiple(idea_ids, tags)
         app_signals.data_changed.emit()
         
     def remove_tag_from_multiple_ideas(self, idea_ids, tag_name):
+        self._promote(idea_ids)
         self.tag_repo.remove_from_multiple(idea_ids, tag_name)
         app_signals.data_changed.emit()
         
@@ -145,10 +301,12 @@ class IdeaService:
         return self.category_repo.get_all()
 
     def get_partitions_tree(self):
-        return self.category_repo.get_tree()
+        return self.query_cache.get_or_load('get_partitions_tree', (), self.category_repo.get_tree)
 
-    def get_counts(self):
-        return self.idea_repo.get_counts()
+    def get_counts(self, include_archive=False):
+        return self.query_cache.get_or_load(
+            'get_counts', (include_archive,), lambda: self.idea_repo.get_counts(include_archive)
+        )
         
     def add_category(self, name, parent_id=None):
         new_id = self.category_repo.add(name, parent_id)
@@ -175,7 +333,8 @@ class IdeaService:
         return self.category_repo.get_preset_tags(cat_id)
         
     def apply_preset_tags_to_category_items(self, cat_id, tags_list):
-        # 复杂逻辑：先找 idea ids，再加 tags
+        # 复杂逻辑：先找 idea ids，再加 tags；已归档的先取回主库，标签改动才会记入变更日志
+        self.category_repo.promote_archived([cat_id])
         c = self.idea_repo.db.get_cursor()
         c.execute('SELECT id FROM ideas WHERE category_id=? AND is_deleted=0', (cat_id,))
         ids = [r[0] for r in c.fetchall()]
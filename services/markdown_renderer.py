@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# services/markdown_renderer.py
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import markdown2
+from PyQt5.QtCore import QObject, pyqtSignal
+
+MARKDOWN_EXTRAS = ["fenced-code-blocks", "tables", "strike", "task_list"]
+# 渲染结果按内容摘要缓存的文档数
+MAX_CACHED_DOCUMENTS = 32
+
+# 预览样式 CSS
+PREVIEW_CSS = """
+<style>
+    body { font-family: "Microsoft YaHei"; color: #ddd; font-size: 14px; }
+    code { background-color: #333; padding: 2px 4px; border-radius: 3px; font-family: Consolas; color: #98C379; }
+    pre { background-color: #1e1e1e; padding: 10px; border-radius: 5px; border: 1px solid #444; color: #ccc; }
+    blockquote { border-left: 4px solid #569CD6; padding-left: 10px; color: #888; background: #252526; }
+    a { color: #4a90e2; text-decoration: none; }
+    table { border-collapse: collapse; width: 100%; }
+    th, td { border: 1px solid #444; padding: 6px; }
+    th { background-color: #333; }
+</style>
+"""
+
+
+def content_key(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def render_markdown(text):
+    """Markdown 源码 -> 带预览样式的 HTML"""
+    return PREVIEW_CSS + markdown2.markdown(text, extras=MARKDOWN_EXTRAS)
+
+
+class _HtmlCache:
+    def __init__(self, max_entries=MAX_CACHED_DOCUMENTS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None: self._entries.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._entries[key] = html
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class MarkdownRenderer(QObject):
+    """
+    在后台线程把 Markdown 转成 HTML，结果按内容摘要缓存，所有编辑器共用一个工作线程和缓存。
+    request() 命中缓存时直接返回 HTML；否则返回 None，渲染完成后发出 rendered(序号, HTML)。
+    只有最近一次请求的结果会发出，切换过程中的旧请求被丢弃。
+    """
+    rendered = pyqtSignal(int, str)
+    failed = pyqtSignal(int, str)
+
+    _executor = None
+    _executor_lock = threading.Lock()
+    _cache = _HtmlCache()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._seq = 0
+
+    @classmethod
+    def _shared_executor(cls):
+        with cls._executor_lock:
+            if cls._executor is None:
+                cls._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='markdown')
+            return cls._executor
+
+    def request(self, text):
+        """返回 (序号, HTML 或 None)"""
+        self._seq += 1
+        seq = self._seq
+        key = content_key(text)
+        html = self._cache.get(key)
+        if html is None:
+            self._shared_executor().submit(self._render, seq, key, text)
+        return seq, html
+
+    def cancel(self):
+        self._seq += 1
+
+    def _render(self, seq, key, text):
+        try:
+            html = self._cache.get(key)
+            if html is None:
+                # 排队期间已被新请求取代，不必再渲染
+                if seq != self._seq: return
+                html = render_markdown(text)
+                self._cache.put(key, html)
+            if seq == self._seq: self.rendered.emit(seq, html)
+        except RuntimeError:
+            # 编辑器已销毁
+            pass
+        except Exception as e:
+            logging.error(f"Markdown render failed: {e}", exc_info=True)
+            try:
+                self.failed.emit(seq, str(e))
+            except RuntimeError:
+                pass
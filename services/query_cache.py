@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+# services/query_cache.py
+import copy
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from data.records import MetadataTable
+
+MAX_ENTRIES = 64
+# 列表型结果（如元数据）按行数计入预算，避免同时缓存多个超大范围
+MAX_CACHED_ROWS = 200000
+
+
+def _freeze(value):
+    """把参数规范成可哈希的键：None 与空串视为相同，dict/list/set 转为有序元组"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (set, frozenset)):
+        return tuple(sorted(_freeze(v) for v in value))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _weight(value):
+    return len(value) if isinstance(value, (list, MetadataTable)) else 1
+
+
+# 可以直接共用的不可变值（IdeaMeta 等具名元组也是 tuple）
+_IMMUTABLE = (str, int, float, bytes, type(None), tuple, sqlite3.Row)
+
+
+def _copy(value):
+    """
+    调用方常对返回的列表/字典做 extend、赋值等修改，不能把缓存对象交出去，
+    嵌套的字典、列表（如 get_counts 的 categories、分类树的 children）也要逐层复制
+    """
+    if isinstance(value, _IMMUTABLE): return value
+    if isinstance(value, list): return [v if isinstance(v, _IMMUTABLE) else _copy(v) for v in value]
+    if isinstance(value, dict): return {k: v if isinstance(v, _IMMUTABLE) else _copy(v) for k, v in value.items()}
+    if isinstance(value, MetadataTable): return value.copy()
+    return copy.deepcopy(value)
+
+
+class QueryCache:
+    """
+    读查询结果缓存：键为 (方法名, 规范化参数)，按 LRU 淘汰。
+    每个条目记录写入时的数据库版本号 generation，任何写操作都会让版本号变化，
+    版本号一变整个缓存作废，因此命中的结果一定与数据库一致。
+    """
+
+    def __init__(self, generation_source, max_entries=MAX_ENTRIES, max_rows=MAX_CACHED_ROWS):
+        self._generation_source = generation_source
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generation = None
+        self._rows = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_load(self, method, args, loader):
+        key = (method, _freeze(args))
+        generation = self._generation_source()
+        with self._lock:
+            if generation != self._generation:
+                self._clear_locked()
+                self._generation = generation
+            elif key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy(self._entries[key])
+            self.misses += 1
+
+        value = loader()
+
+        with self._lock:
+            # 加载期间发生了写入，结果可能已过期，不放入缓存
+            if self._generation_source() == generation == self._generation:
+                self._store_locked(key, value)
+        return _copy(value)
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._rows = 0
+
+    def _store_locked(self, key, value):
+        weight = _weight(value)
+        if weight > self.max_rows:
+            return
+        if key in self._entries:
+            self._rows -= _weight(self._entries.pop(key))
+        self._entries[key] = value
+        self._rows += weight
+        while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+            _, evicted = self._entries.popitem(last=False)
+            self._rows -= _weight(evicted)
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# services/search_executor.py
+import logging
+import threading
+
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core.config import SEARCH_TIME_BUDGET_MS
+from data.query_cancel import CancelToken, QueryCancelled
+from data.repositories.idea_repository import IdeaRepository
+
+
+class SearchExecutor(QObject):
+    """
+    后台搜索执行器：一个工作线程 + 一个独立的只读连接，始终只执行最新的请求。
+
+    submit() 提交新请求时，尚未开始的旧请求直接丢弃，正在执行的旧请求通过
+    CancelToken 与 Connection.interrupt() 立即中止，因此连续输入时不必等旧查询跑完。
+    每个请求有时间预算，超出后返回已取到的部分结果（finished 的 partial 参数为 True）。
+
+    job(repo, token) 在工作线程中执行，repo 是绑定在只读连接上的 IdeaRepository，
+    查询时把 token 传给仓库方法即可被取消。结果通过 finished 信号回到界面线程，
+    被取代的请求不会发出任何信号。
+    """
+    finished = pyqtSignal(int, object, bool)  # (请求序号, 结果, 是否为部分结果)
+    progress = pyqtSignal(int, object)        # (请求序号, 已找到的一批结果)，由 job 调用 token.report() 发出
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, db_context, budget_ms=SEARCH_TIME_BUDGET_MS, parent=None):
+        super().__init__(parent)
+        self.budget_ms = budget_ms
+        self._reader = db_context.open_reader()
+        self._repo = IdeaRepository(self._reader) if self._reader else None
+        self._cond = threading.Condition()
+        self._seq = 0
+        self._pending = None   # (seq, job, token)
+        self._running = None   # 正在执行的 token
+        self._closed = False
+        self._thread = None
+        # 所属窗口或组件被销毁时一并结束工作线程、关闭只读连接
+        if parent is not None: parent.destroyed.connect(self.shutdown)
+
+    @property
+    def available(self):
+        """数据库无法打开第二个连接（如内存数据库）时不可用，调用方应同步查询"""
+        return self._repo is not None
+
+    def submit(self, job, budget_ms=None):
+        """提交请求并返回序号；之前的请求全部作废。budget_ms 覆盖默认的时间预算"""
+        with self._cond:
+            self._seq += 1
+            self._cancel_locked()
+            seq = self._seq
+            token = CancelToken(budget_ms or self.budget_ms)
+            token.on_progress = lambda value: self.progress.emit(seq, value)
+            self._pending = (seq, job, token)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='search-executor', daemon=True)
+                self._thread.start()
+            self._cond.notify()
+            return seq
+
+    def cancel(self):
+        """作废所有请求（例如界面改为同步加载了别的数据）"""
+        with self._cond:
+            self._seq += 1
+            self._cancel_locked()
+
+    def is_current(self, seq):
+        return seq == self._seq
+
+    def shutdown(self):
+        """结束工作线程并关闭只读连接；可重复调用"""
+        with self._cond:
+            if self._closed: return
+            self._closed = True
+            self._cancel_locked()
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+        if self._reader is not None:
+            self._reader.close()
+
+    def _cancel_locked(self):
+        self._pending = None
+        if self._running is not None:
+            self._running.cancel()
+            self._reader.interrupt()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed: return
+                seq, job, token = self._pending
+                self._pending = None
+                self._running = token
+
+            token.install(self._reader.conn)
+            try:
+                result = job(self._repo, token)
+                token.check()
+            except QueryCancelled:
+                continue
+            except Exception as e:
+                if not token.cancelled:
+                    logging.error(f"Background search failed: {e}", exc_info=True)
+                    self.failed.emit(seq, str(e))
+                continue
+            finally:
+                token.uninstall(self._reader.conn)
+                with self._cond:
+                    self._running = None
+
+            # 发出信号前再确认一次，避免刚被取代的结果闪现在界面上
+            if self.is_current(seq):
+                self.finished.emit(seq, result, token.partial)
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# services/search_session.py
+from data.search_index import like_fold, has_like_wildcard
+from data.query_parser import parse_query
+
+MAX_CACHED_ROWS = 20000
+
+
+class SearchSession:
+    """
+    增量搜索会话：记住上一次搜索的范围、关键词和结果（按显示顺序的轻量元数据）。
+    新关键词包含旧关键词时，新结果必然是旧结果的子集，直接在内存中收窄；
+    关键词被删短、换成别的词、范围变化或数据库有写入时，才重新查询数据库。
+
+    lookup() 返回 None 表示本次不适合走会话（不是单个关键词、含 LIKE 通配符、结果过多、
+    按相关度排序——收窄后的旧顺序不等于新关键词的排名），调用方应回退到原来的查询方式。
+    """
+
+    def __init__(self, idea_repo, max_cached_rows=MAX_CACHED_ROWS):
+        self.idea_repo = idea_repo
+        self.max_cached_rows = max_cached_rows
+        self._reset()
+
+    def _reset(self):
+        self._scope = None
+        self._term = None
+        self._generation = None
+        self._rows = None
+        self._texts = None
+
+    def lookup(self, search, f_type, f_val, ranked=False):
+        # 只有 "单个关键词" 的查询才能按子串关系收窄；带结构化条件或多个关键词的查询直接查库
+        term = parse_query(search).simple_term
+        if not term or has_like_wildcard(term) or (ranked and self.idea_repo.fts_match(search)):
+            self._reset()
+            return None
+
+        scope = (f_type, f_val)
+        if self._can_narrow(scope, term):
+            if term != self._term:
+                needle = like_fold(term)
+                texts = self._texts
+                self._rows = self._rows.filter(lambda r: self._matches(texts[r.id], needle))
+                self._term = term
+            return self._rows.copy()
+
+        generation = self.idea_repo.db.generation
+        rows = self.idea_repo.get_metadata_by_filter(
+            search, f_type, f_val, include_content=True, limit=self.max_cached_rows + 1
+        )
+        if len(rows) > self.max_cached_rows:
+            self._reset()
+            return None
+
+        texts = {}
+        for r, content in zip(rows, rows.pop_content()):
+            texts[r.id] = (like_fold(r.title), like_fold(content), [like_fold(t) for t in r.tags])
+        self._scope, self._term, self._generation = scope, term, generation
+        self._rows, self._texts = rows, texts
+        return rows.copy()
+
+    def _can_narrow(self, scope, term):
+        return (
+            self._rows is not None
+            and scope == self._scope
+            and self._generation == self.idea_repo.db.generation
+            and like_fold(self._term) in like_fold(term)
+        )
+
+    @staticmethod
+    def _matches(text, needle):
+        title, content, tags = text
+        return needle in title or needle in content or any(needle in t for t in tags)
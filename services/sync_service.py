@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# services/sync_service.py
+"""
+离线多机同步：导出同步包 / 合并同步包，不需要服务器。
+
+- 导出：变更日志中水位线（日志序号）之后有变化的笔记、被彻底删除的笔记，连同全部分类写入一个文件。
+  没有水位线或日志已被压缩过水位线时导出全部笔记。
+- 合并：按 uuid 识别记录（两台机器各自采集的同一内容按 content_hash 认作同一条），
+  冲突时 modified_at（任何字段或标签变化的毫秒级时间）较新的一方胜出，只改了置顶、收藏、标签的也算；
+  updated_at 只是显示用的编辑时间，不参与比较。
+  逐帧读取、按批提交，内存占用与同步包大小无关；重复导入同一个包不会产生变化。
+"""
+import logging
+import os
+from datetime import datetime
+
+from data.changeset import ChangesetWriter, read_frames
+from data.repositories.journal_repository import JournalTruncated
+from data.repositories.sync_repository import SYNC_FIELDS
+
+SYNC_CONSUMER = 'sync'
+EXPORT_BATCH_SIZE = 200
+IMPORT_BATCH_SIZE = 500
+
+
+def _version(row):
+    return str(row['modified_at'] or '')
+
+
+class SyncService:
+    def __init__(self, sync_repo, journal_repo, batch_size=IMPORT_BATCH_SIZE):
+        self.repo = sync_repo
+        self.journal = journal_repo
+        self.batch_size = batch_size
+
+    # --- 导出 ---
+    def export_changeset(self, path, since_seq=None, progress=None):
+        """
+        把 since_seq 之后的变化写入 path（None 表示上次导出的位置），成功后记下新的水位线。
+        返回 {'ideas', 'deleted', 'full', 'seq'}。progress(已导出条数) 每写完一批调用一次。
+        """
+        if since_seq is None:
+            since_seq = self.journal.get_checkpoint(SYNC_CONSUMER)
+        until = self.journal.latest_seq()
+        full = since_seq is None
+        if not full:
+            try:
+                self.journal.changes_since(since_seq, limit=1)
+            except JournalTruncated:
+                logging.info(f"Journal compacted past seq {since_seq}; exporting all notes")
+                full = True
+
+        stats = {'ideas': 0, 'deleted': 0, 'full': full, 'seq': until}
+        # 先写临时文件，中途失败时删除，不会留下半个同步包
+        tmp_path = path + '.part'
+        try:
+            self._write_changeset(tmp_path, since_seq, until, full, stats, progress)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.journal.set_checkpoint(SYNC_CONSUMER, until)
+        logging.info(f"Exported changeset {path}: {stats}")
+        return stats
+
+    def _write_changeset(self, tmp_path, since_seq, until, full, stats, progress):
+        with ChangesetWriter(tmp_path) as writer:
+            writer.write({
+                'type': 'meta', 'since': None if full else since_seq, 'until': until,
+                'created_at': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'),
+            })
+            paths = {}
+            for cat_path, row in self.repo.category_rows():
+                paths[row['id']] = cat_path
+                writer.write({
+                    'type': 'category', 'path': cat_path, 'color': row['color'],
+                    'sort_order': row['sort_order'], 'preset_tags': row['preset_tags'],
+                })
+
+            for batch in self._export_batches(None if full else since_seq, until):
+                for row, tags in self.repo.get_ideas(batch):
+                    blob = self.repo.get_blob(row['id']) if row['blob_size'] is not None else None
+                    writer.write({
+                        'type': 'idea', 'idea': {f: row[f] for f in SYNC_FIELDS},
+                        'category': paths.get(row['category_id']), 'tags': tags,
+                    }, blob)
+                    stats['ideas'] += 1
+                if progress: progress(stats['ideas'])
+
+            for uuid, deleted_at in self.repo.deleted_since(since_seq if not full else 0, until):
+                writer.write({'type': 'tombstone', 'uuid': uuid, 'deleted_at': deleted_at})
+                stats['deleted'] += 1
+            writer.write({'type': 'end', 'ideas': stats['ideas'], 'deleted': stats['deleted']})
+
+    def _export_batches(self, since_seq, until_seq):
+        if since_seq is None:
+            last_id = 0
+            while True:
+                batch = self.repo.idea_ids_after(last_id, EXPORT_BATCH_SIZE)
+                if not batch: return
+                yield batch
+                last_id = batch[-1]
+        else:
+            ids = self.repo.changed_idea_ids(since_seq, until_seq)
+            for i in range(0, len(ids), EXPORT_BATCH_SIZE):
+                yield ids[i:i + EXPORT_BATCH_SIZE]
+
+    # --- 合并 ---
+    def import_changeset(self, path, progress=None):
+        """
+        合并同步包，返回 {'inserted', 'updated', 'skipped', 'deleted'}。
+        文件损坏时抛出 ChangesetError：已提交的批次保留（合并可重复执行），当前批次回滚。
+        progress(已处理帧数) 每提交一批调用一次。
+        """
+        stats = {'inserted': 0, 'updated': 0, 'skipped': 0, 'deleted': 0}
+        db = self.repo.db
+        self.repo.clear_cache()
+        pending = done = 0
+        try:
+            for header, blob in read_frames(path):
+                kind = header.get('type')
+                if kind == 'category':
+                    self.repo.ensure_category(
+                        header['path'], header.get('color'), header.get('sort_order'), header.get('preset_tags')
+                    )
+                elif kind == 'idea':
+                    self._merge_idea(header, blob, stats)
+                elif kind == 'tombstone':
+                    self._apply_tombstone(header, stats)
+                else:
+                    continue
+                pending += 1
+                if pending >= self.batch_size:
+                    db.commit()
+                    done += pending
+                    pending = 0
+                    if progress: progress(done)
+            db.commit()
+        except Exception:
+            db.conn.rollback()
+            self.repo.clear_cache()
+            raise
+        logging.info(f"Imported changeset {path}: {stats}")
+        return stats
+
+    def _merge_idea(self, header, blob, stats):
+        values = dict(header['idea'])
+        local = self.repo.find(values['uuid'], values.get('content_hash'))
+        if local is not None and local['uuid'] != values['uuid']:
+            # 两台机器各自记录了同一内容：双方都改用较小的 uuid，下次反向同步后标识一致
+            values['uuid'] = min(local['uuid'] or values['uuid'], values['uuid'])
+            if values['uuid'] != local['uuid']: self.repo.set_uuid(local['id'], values['uuid'])
+
+        if local is not None and _version(local) >= _version(values):
+            stats['skipped'] += 1
+            return
+        category = header.get('category')
+        category_id = self.repo.ensure_category(category) if category else None
+        self.repo.write_idea(None if local is None else local['id'], values, category_id, blob, header.get('tags') or [])
+        stats['inserted' if local is None else 'updated'] += 1
+
+    def _apply_tombstone(self, header, stats):
+        local = self.repo.find(header['uuid'])
+        if local is None: return
+        # 删除之后本地又修改过的记录保留
+        if _version(local) > str(header.get('deleted_at') or ''): return
+        self.repo.delete(local['id'])
+        stats['deleted'] += 1
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+# tests/conftest.py
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from benchmarks.dataset import generate_dataset
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+
+SEEDED_DB_SIZE = 3000
+
+
+@pytest.fixture(scope='session')
+def seeded_db_path(tmp_path_factory):
+    """整个测试会话共用的合成数据库（只读用例使用）"""
+    path = str(tmp_path_factory.mktemp('db') / 'seeded.db')
+    generate_dataset(path, SEEDED_DB_SIZE, seed=7)
+    return path
+
+
+@pytest.fixture
+def db(tmp_path):
+    """每个用例独立的空数据库"""
+    db = DBContext(str(tmp_path / 'notes.db'), QueryProfiler(enabled=False))
+    yield db
+    db.close()
+
+
+@pytest.fixture(scope='session')
+def qapp():
+    """整个测试会话共用一个 QApplication：它被销毁后全局的 app_signals 也随之失效"""
+    pytest.importorskip('PyQt5.QtWidgets')
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication(['tests'])
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+# tests/test_archive.py
+"""
+归档测试：冷数据移入归档库后默认视图不再列出，搜索和"显示已归档"仍能查到，取回后恢复原样。
+"""
+import pytest
+
+from data.db_context import DBContext
+from data.query_cancel import CancelToken
+from data.query_profiler import QueryProfiler
+from data.repositories.archive_repository import ArchiveRepository
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.journal_repository import JournalRepository
+from data.repositories.tag_repository import TagRepository
+
+
+def _add(db, title, content, updated_at, tags=(), **flags):
+    iid = IdeaRepository(db).add(title, content, '#4a90e2', None, 'text', None)
+    if tags: TagRepository(db).update_tags(iid, list(tags))
+    assignments = ''.join(f', {k}={int(v)}' for k, v in flags.items())
+    db.conn.execute(f'UPDATE ideas SET updated_at=?{assignments} WHERE id=?', (updated_at, iid))
+    db.commit()
+    return iid
+
+
+def _ids(rows):
+    return [r['id'] for r in rows]
+
+
+def test_cold_notes_move_to_archive_and_stay_searchable(db):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    old = _add(db, 'old report', 'quarterly numbers', '2020-01-01 00:00:00', tags=['work'])
+    pinned = _add(db, 'old pinned', 'quarterly plan', '2020-01-02 00:00:00', is_pinned=True)
+    favorite = _add(db, 'old favorite', 'quarterly review', '2020-01-03 00:00:00', is_favorite=True)
+    recent = _add(db, 'recent', 'quarterly draft', '2999-01-01 00:00:00')
+    seq = JournalRepository(db).latest_seq()
+
+    assert archive.archive_batch(limit=10) == 1
+    assert archive.archive_batch(limit=10) == 0
+    assert archive.count() == 1
+    # 搬移不写变更日志，增量同步不会把它当作删除
+    assert JournalRepository(db).latest_seq() == seq
+
+    # 默认视图和计数只查主库
+    assert _ids(ideas.get_list_by_filter('', 'all', None, 1, 50)) == [pinned, recent, favorite]
+    assert ideas.get_count_by_filter('', 'all', None) == 3
+    # 显示归档：两库合并后仍按置顶、更新时间排序
+    merged = ideas.get_list_by_filter('', 'all', None, 1, 50, include_archive=True)
+    assert _ids(merged) == [pinned, recent, favorite, old]
+    assert ideas.get_count_by_filter('', 'all', None, include_archive=True) == 4
+
+    # 搜索总是包含归档库；标签仍留在主库，tag: 条件同样有效
+    assert set(_ids(ideas.get_list_by_filter('quarterly', 'all', None, 1, 50))) == {old, pinned, favorite, recent}
+    ranked = ideas.get_list_by_filter('quarterly', 'all', None, 1, 50, ranked=True)
+    assert _ids(ranked)[-1] == old and len(ranked) == 4
+    assert _ids(ideas.get_list_by_filter('tag:work', 'all', None, 1, 50)) == [old]
+    assert list(ideas.get_metadata_by_filter('numbers', 'all', None).ids) == [old]
+
+    # 按 ID 读取时透明地落到归档库
+    assert ideas.get_by_id(old)['title'] == 'old report'
+    assert [d.id for d in ideas.get_details_by_ids([recent, old])] == [recent, old]
+    assert ideas.get_details_by_ids([old])[0].tags == ('work',)
+
+
+def test_ranked_paging_continues_into_archive(db):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    for i in range(5):
+        _add(db, f'cold {i}', 'shared words', '2020-01-01 00:00:00')
+    hot = [_add(db, f'hot {i}', 'shared words', '2999-01-01 00:00:00') for i in range(3)]
+    archive.archive_batch(limit=10)
+
+    pages = [_ids(ideas.get_list_by_filter('shared', 'all', None, p, 3, ranked=True)) for p in (1, 2, 3)]
+    assert sorted(pages[0]) == sorted(hot)
+    assert len(pages[1]) == 3 and len(pages[2]) == 2
+    assert len(set(pages[0] + pages[1] + pages[2])) == 8
+
+
+def test_ranked_paging_stops_when_count_runs_out_of_budget(db, monkeypatch):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    for i in range(5):
+        _add(db, f'cold {i}', 'shared words', '2020-01-01 00:00:00')
+    for i in range(3):
+        _add(db, f'hot {i}', 'shared words', '2999-01-01 00:00:00')
+    archive.archive_batch(limit=10)
+
+    fetch_all = ideas._fetch_all
+
+    def interrupted_count(q, p, token=None):
+        # 模拟主库计数超出预算：fetch_within_budget 被中断时返回空结果并置 partial
+        if 'COUNT(' in q.upper() and token is not None:
+            token.partial = True
+            return []
+        return fetch_all(q, p, token)
+    monkeypatch.setattr(ideas, '_fetch_all', interrupted_count)
+
+    token = CancelToken(budget_ms=60000)
+    assert ideas.get_list_by_filter('shared', 'all', None, 3, 3, ranked=True, token=token) == []
+    assert token.partial
+
+
+def test_promote_restores_note_and_holds_it(db):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    iid = _add(db, 'old note', 'searchable text', '2020-01-01 00:00:00', tags=['keep'])
+    archive.archive_batch()
+    assert ideas.get_count_by_filter('', 'all', None) == 0
+
+    assert archive.promote([iid]) == [iid]
+    assert archive.promote([iid]) == []
+    assert archive.count() == 0
+    assert _ids(ideas.get_list_by_filter('', 'all', None, 1, 50)) == [iid]
+    assert TagRepository(db).get_by_idea(iid) == ['keep']
+    # 全文索引行随记录回到主库，搜索不会重复命中
+    assert _ids(ideas.get_list_by_filter('searchable', 'all', None, 1, 50)) == [iid]
+
+    # 刚取回的笔记在冷却期内不会再被归档
+    assert archive.archive_batch() == 0
+    ideas.update_field(iid, 'title', 'edited')
+    assert ideas.get_by_id(iid)['title'] == 'edited'
+
+
+def test_interrupted_move_keeps_main_copy(db):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    iid = _add(db, 'old note', 'searchable text', '2020-01-01 00:00:00')
+    # 模拟移入归档库时在删除主库副本之前中断：两边各有一份，archive_moving 未清空
+    db.conn.execute('INSERT INTO archive_moving (idea_id) VALUES (?)', (iid,))
+    db.conn.execute('INSERT INTO archive.ideas (id, title, content) SELECT id, title, content FROM ideas WHERE id=?', (iid,))
+    db.commit()
+
+    archive._resolve_interrupted()
+    assert archive.count() == 0
+    assert db.conn.execute('SELECT COUNT(*) FROM archive_moving').fetchone()[0] == 0
+    assert _ids(ideas.get_list_by_filter('searchable', 'all', None, 1, 50, include_archive=True)) == [iid]
+    # 收尾之后照常归档，变更日志恢复记录
+    assert archive.archive_batch() == 1
+    assert ideas.get_by_id(iid)['title'] == 'old note'
+
+
+def test_backup_includes_archive_and_prunes_together(tmp_path, monkeypatch):
+    from services.backup_service import BackupService
+    monkeypatch.chdir(tmp_path)
+    db = DBContext('ideas.db', QueryProfiler(enabled=False))
+    try:
+        _add(db, 'hot', 'stays in main', '2999-01-01 00:00:00')
+        _add(db, 'cold', 'moved to archive', '2020-01-01 00:00:00')
+        ArchiveRepository(db).archive_batch()
+        # 主库处于 WAL 模式，未做检查点的提交仍要出现在备份里
+        BackupService.run_backup()
+    finally:
+        db.close()
+
+    backups = sorted(p.name for p in (tmp_path / 'backups').iterdir())
+    assert [n.split('_')[0] for n in backups] == ['archive', 'ideas']
+    assert backups[0][len('archive_'):] == backups[1][len('ideas_'):]
+    main = DBContext(str(tmp_path / 'backups' / backups[1]), QueryProfiler(enabled=False),
+                     archive_path=str(tmp_path / 'backups' / backups[0]))
+    try:
+        assert [r['title'] for r in IdeaRepository(main).get_list_by_filter('', 'all', None, 1, 50, include_archive=True)] == ['hot', 'cold']
+    finally:
+        main.close()
+
+    # 按时间戳成组清理：只有主库的旧备份也算一次
+    for stamp in ('20200101_000000', '20200102_000000', '20200103_000000'):
+        (tmp_path / 'backups' / f'ideas_{stamp}.db').write_bytes(b'')
+        (tmp_path / 'backups' / f'archive_{stamp}.db').write_bytes(b'')
+    (tmp_path / 'backups' / 'ideas_20200104_000000.db').write_bytes(b'')
+    BackupService._clean_old_backups(keep=2)
+    assert sorted(p.name for p in (tmp_path / 'backups').iterdir()) == sorted(['ideas_20200104_000000.db'] + backups)
+
+
+def test_category_changes_promote_archived_notes(db):
+    from data.repositories.category_repository import CategoryRepository
+    ideas, archive, categories = IdeaRepository(db), ArchiveRepository(db), CategoryRepository(db)
+    journal = JournalRepository(db)
+    cid = categories.add('old projects')
+    iid = _add(db, 'old note', 'text', '2020-01-01 00:00:00')
+    db.conn.execute('UPDATE ideas SET category_id=? WHERE id=?', (cid, iid))
+    db.commit()
+    archive.archive_batch()
+    assert archive.count() == 1
+    seq = journal.latest_seq()
+
+    # 改分类颜色：记录取回主库后修改，变更日志照常记录
+    categories.set_color(cid, '#123456')
+    assert archive.count() == 0
+    assert ideas.get_by_id(iid)['color'] == '#123456'
+    assert [(e.idea_id, e.fields) for e in journal.changes_since(seq)] == [(iid, ('color',))]
+
+    # 跳过冷却期再次归档，验证删除分类时同样取回
+    db.conn.execute('DELETE FROM archive_holds')
+    db.conn.execute("UPDATE ideas SET updated_at='2020-01-01 00:00:00' WHERE id=?", (iid,))
+    db.commit()
+    assert archive.archive_batch() == 1
+    seq = journal.latest_seq()
+    categories.delete(cid)
+    assert archive.count() == 0
+    assert ideas.get_by_id(iid)['category_id'] is None
+    assert (iid, ('category_id',)) in [(e.idea_id, e.fields) for e in journal.changes_since(seq)]
+
+
+def test_preset_tags_reach_archived_notes(db):
+    pytest.importorskip('PyQt5.QtCore')
+    from data.repositories.category_repository import CategoryRepository
+    from services.idea_service import IdeaService
+
+    ideas, archive, tags = IdeaRepository(db), ArchiveRepository(db), TagRepository(db)
+    service = IdeaService(ideas, CategoryRepository(db), tags)
+    cid = service.add_category('old projects')
+    iid = _add(db, 'old note', 'text', '2020-01-01 00:00:00')
+    db.conn.execute('UPDATE ideas SET category_id=? WHERE id=?', (cid, iid))
+    db.commit()
+    assert archive.archive_batch() == 1
+    seq = JournalRepository(db).latest_seq()
+
+    service.apply_preset_tags_to_category_items(cid, ['legacy'])
+    assert archive.count() == 0
+    assert tags.get_by_idea(iid) == ['legacy']
+    assert (iid, ('tags',)) in [(e.idea_id, e.fields) for e in JournalRepository(db).changes_since(seq)]
+
+
+def test_stats_and_counts_cover_the_same_notes_as_the_list(db):
+    ideas, archive = IdeaRepository(db), ArchiveRepository(db)
+    _add(db, 'old report', 'quarterly numbers', '2020-01-01 00:00:00', tags=['work'])
+    _add(db, 'new report', 'quarterly plan', '2030-01-01 00:00:00', tags=['work'])
+    assert archive.archive_batch() == 1
+
+    # 搜索时列表包含归档记录，筛选统计也一样
+    assert ideas.get_count_by_filter('quarterly', 'all', None) == 2
+    stats = ideas.get_filter_stats('quarterly', 'all', None)
+    assert stats['types'] == {'text': 2}
+    assert stats['tags'] == [('work', 2)]
+    assert ideas.get_filter_stats('', 'all', None)['types'] == {'text': 1}
+    assert ideas.get_filter_stats('', 'all', None, include_archive=True)['types'] == {'text': 2}
+
+    assert ideas.get_counts()['all'] == 1
+    counts = ideas.get_counts(include_archive=True)
+    assert counts['all'] == counts['uncategorized'] == 2
+    assert counts['categories'] == {None: 2}
+    assert counts['bookmark'] == counts['trash'] == 0
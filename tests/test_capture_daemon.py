@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+# tests/test_capture_daemon.py
+"""
+剪贴板采集守护进程测试（offscreen QPA，无需显示器）。
+
+守护进程与 "界面" 在同一个测试进程里各自持有一个数据库连接、用独立的套接字名通信，
+走的是与两个进程之间相同的 QLocalSocket 消息路径：复制 -> 守护进程写库 -> 通知界面 -> 界面缓存作废。
+"""
+import os
+import sys
+import uuid
+
+import pytest
+
+pytest.importorskip('PyQt5.QtNetwork')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtCore import QElapsedTimer
+from PyQt5.QtNetwork import QLocalSocket
+from PyQt5.QtWidgets import QApplication
+
+from data.db_context import DBContext
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.category_repository import CategoryRepository
+from data.repositories.tag_repository import TagRepository
+from services.idea_service import IdeaService
+from services.capture_daemon import CaptureDaemon, CaptureLink, MessageClient, MessageServer, ping
+
+WAIT_MS = 5000
+
+
+def _service(path):
+    ctx = DBContext(path)
+    return IdeaService(IdeaRepository(ctx), CategoryRepository(ctx), TagRepository(ctx))
+
+
+def _wait_until(qapp, predicate, timeout_ms=WAIT_MS):
+    timer = QElapsedTimer(); timer.start()
+    while not predicate() and timer.elapsed() < timeout_ms:
+        qapp.processEvents()
+    return predicate()
+
+
+def _spin(qapp, ms):
+    _wait_until(qapp, lambda: False, ms)
+
+
+@pytest.fixture
+def env(qapp, tmp_path):
+    path = str(tmp_path / 'capture.db')
+    daemon_service = _service(path)
+    ui_service = _service(path)
+    suffix = uuid.uuid4().hex[:8]
+    ui_name, daemon_name = f'rn_test_ui_{suffix}', f'rn_test_daemon_{suffix}'
+
+    ui_server = MessageServer(ui_name)
+    assert ui_server.listen()
+    link = CaptureLink(daemon_name)
+    ui_server.message.connect(lambda command, arg, conn: link.handle_message(command, arg))
+    link.captured.connect(ui_service.notify_external_change)
+    link.updated.connect(ui_service.notify_external_change)
+    captured, updated = [], []
+    link.captured.connect(captured.append)
+    link.updated.connect(updated.append)
+
+    daemon = CaptureDaemon(daemon_service, server_name=daemon_name, ui_server_name=ui_name)
+    assert daemon.start()
+    yield {
+        'daemon': daemon, 'ui_service': ui_service, 'daemon_name': daemon_name,
+        'captured': captured, 'updated': updated, 'link': link,
+    }
+    daemon.stop()
+    ui_server.close()
+    daemon_service.idea_repo.db.close()
+    ui_service.idea_repo.db.close()
+
+
+def test_copy_is_stored_and_announced_to_ui(qapp, env):
+    ui_service = env['ui_service']
+    before = ui_service.get_counts()['all']
+
+    QApplication.clipboard().setText('captured by the daemon')
+    assert _wait_until(qapp, lambda: env['captured'])
+
+    iid = env['captured'][0]
+    assert ui_service.get_idea(iid)['content'] == 'captured by the daemon'
+    # 界面侧的查询缓存在收到通知后作废，计数包含守护进程写入的记录
+    assert ui_service.get_counts()['all'] == before + 1
+
+
+def test_repeated_copy_reports_update(qapp, env):
+    clipboard = QApplication.clipboard()
+    clipboard.setText('first')
+    assert _wait_until(qapp, lambda: len(env['captured']) == 1)
+    clipboard.setText('second')
+    assert _wait_until(qapp, lambda: len(env['captured']) == 2)
+    clipboard.setText('first')
+    assert _wait_until(qapp, lambda: env['updated'])
+    assert env['updated'] == [env['captured'][0]]
+
+
+def test_no_capture_while_ui_window_is_active(qapp, env):
+    daemon = env['daemon']
+    ui = MessageClient(env['daemon_name'])
+    ui.send('UI_ACTIVE', 1)
+    assert _wait_until(qapp, lambda: daemon.ui_active)
+
+    QApplication.clipboard().setText('copied inside the app')
+    _spin(qapp, 300)
+    assert env['captured'] == []
+
+    # 界面连接断开（进程退出）后恢复采集
+    ui.close()
+    assert _wait_until(qapp, lambda: not daemon.ui_active)
+    QApplication.clipboard().setText('copied after the ui went away')
+    assert _wait_until(qapp, lambda: env['captured'])
+
+
+def test_link_notices_daemon_exit_and_restarts(qapp, env):
+    link, daemon = env['link'], env['daemon']
+    ready, lost = [], []
+    link.ready.connect(lambda: ready.append(1))
+    link.lost.connect(lambda: lost.append(1))
+    # 守护进程已在监听，探测成功后就绪，不会真的拉起进程；start 本身不等待应答
+    link.start(sys.executable, ['-c', 'pass'])
+    assert not link.available and ready == []
+    assert _wait_until(qapp, lambda: ready == [1])
+    assert link.available
+    assert _wait_until(qapp, lambda: link.daemon._socket.state() == QLocalSocket.ConnectedState)
+    _spin(qapp, 100)
+    assert daemon.server._buffers
+
+    # 模拟守护进程崩溃后被重新拉起：它那一端的连接全部断开
+    daemon.server.close()
+    assert daemon.server._buffers == {}
+    assert daemon.server.listen()
+    assert _wait_until(qapp, lambda: lost)
+    # 重启时守护进程仍在监听，探测成功后重新就绪
+    assert _wait_until(qapp, lambda: ready == [1, 1])
+    assert link.available
+
+    # 主动结束不算意外退出
+    link.stop_daemon()
+    _spin(qapp, 300)
+    assert lost == [1]
+
+
+def test_ping_reports_result_through_event_loop(qapp, env):
+    results = []
+    probes = [
+        ping(env['daemon_name'], results.append),
+        ping(f"rn_test_missing_{uuid.uuid4().hex[:8]}", results.append),
+    ]
+    # 结果只在事件循环中返回，调用本身不等待
+    assert results == []
+    assert _wait_until(qapp, lambda: len(results) == 2)
+    assert sorted(results) == [False, True]
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# tests/test_db_context.py
+"""
+连接配置测试：后台只读连接上的长时间查询进行中，另一个进程（剪贴板采集守护进程）的写入不必等待。
+"""
+import time
+
+import pytest
+
+from core.config import DB_BUSY_TIMEOUT_MS, REGEX_TIME_BUDGET_MS
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.repositories.idea_repository import IdeaRepository
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'notes.db')
+
+
+def _open(path):
+    return DBContext(path, QueryProfiler(enabled=False))
+
+
+def test_daemon_write_does_not_wait_for_open_read(path):
+    ui = _open(path)
+    repo = IdeaRepository(ui)
+    for i in range(50):
+        repo.add(f'note {i}', 'body', '#4a90e2', None, 'text', None)
+    assert ui.conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert ui.conn.execute('PRAGMA archive.journal_mode').fetchone()[0] == 'wal'
+    assert DB_BUSY_TIMEOUT_MS > REGEX_TIME_BUDGET_MS
+
+    reader = ui.open_reader()
+    daemon = _open(path)
+    try:
+        # 只取走第一行，语句保持打开，读事务一直持有
+        cursor = reader.get_cursor()
+        cursor.execute('SELECT id FROM ideas ORDER BY id')
+        assert cursor.fetchone() is not None
+
+        started = time.monotonic()
+        iid = IdeaRepository(daemon).add('captured', 'copied text', '#4a90e2', None, 'text', None)
+        assert time.monotonic() - started < 1
+
+        # 读事务看到的是开始时的快照，结束后的新查询能看到守护进程写入的记录
+        assert len(cursor.fetchall()) == 49
+        assert IdeaRepository(ui).get_by_id(iid)['title'] == 'captured'
+    finally:
+        reader.close()
+        daemon.close()
+        ui.close()
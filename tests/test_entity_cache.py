@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# tests/test_entity_cache.py
+"""
+单条记录缓存测试：按条数和二进制字节数分别 LRU 淘汰；加载期间记录被修改时旧结果不进入缓存；
+失效按 ID 清除该记录的所有形状，数据库触发器在记录或标签变化时通知失效。
+"""
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.tag_repository import TagRepository
+from services.entity_cache import EntityCache
+
+
+class Loader:
+    def __init__(self, make=lambda iid: {'id': iid}):
+        self.make = make
+        self.calls = []
+
+    def one(self, iid):
+        return lambda: self._load([iid])[0]
+
+    def many(self, ids):
+        return self._load(ids)
+
+    def _load(self, ids):
+        self.calls.append(list(ids))
+        return [self.make(iid) for iid in ids]
+
+
+def test_entries_evicted_by_count_in_lru_order():
+    cache, loader = EntityCache(max_entries=2), Loader()
+    cache.get('meta', 1, loader.one(1))
+    cache.get('meta', 2, loader.one(2))
+    cache.get('meta', 1, loader.one(1))  # 1 最近使用过
+    cache.get('meta', 3, loader.one(3))  # 淘汰 2
+    assert cache.get_many('meta', [1, 2, 3], loader.many) == [{'id': 1}, {'id': 2}, {'id': 3}]
+    assert loader.calls == [[1], [2], [3], [2]]
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+def test_blobs_evicted_by_bytes_separately():
+    def make(iid):
+        return {'id': iid, 'data_blob': b'x' * (iid * 10)}
+    cache, loader = EntityCache(max_entries=1, max_blob_bytes=50), Loader(make)
+    cache.get('blob', 1, loader.one(1))   # 10 字节
+    cache.get('blob', 2, loader.one(2))   # 20 字节
+    cache.get('meta', 9, Loader().one(9))  # 普通条目另计条数，不挤掉图片
+    cache.get('blob', 1, loader.one(1))
+    cache.get('blob', 3, loader.one(3))   # 合计 60 字节，淘汰最久未用的 2
+    cache.get('blob', 1, loader.one(1))
+    cache.get('blob', 2, loader.one(2))
+    assert loader.calls == [[1], [2], [3], [2]]
+    assert cache._blob_bytes <= 50
+
+    # 单条超出字节上限时不缓存
+    cache.get('blob', 6, loader.one(6))
+    cache.get('blob', 6, loader.one(6))
+    assert loader.calls[-2:] == [[6], [6]]
+
+
+def test_edit_during_load_keeps_stale_record_out():
+    cache = EntityCache()
+
+    def load_while_edited():
+        cache.invalidate(1)  # 另一线程在加载期间改了这条记录
+        return {'id': 1, 'title': 'stale'}
+    assert cache.get('detail', 1, load_while_edited)['title'] == 'stale'
+    assert cache.get('detail', 1, lambda: {'id': 1, 'title': 'fresh'})['title'] == 'fresh'
+
+    def load_many_while_cleared(ids):
+        cache.clear()
+        return [{'id': iid, 'title': 'stale'} for iid in ids]
+    cache.get_many('details', [2, 3], load_many_while_cleared)
+    fresh = cache.get_many('details', [2, 3], lambda ids: [{'id': iid, 'title': 'fresh'} for iid in ids])
+    assert [r['title'] for r in fresh] == ['fresh', 'fresh']
+
+
+def test_invalidate_drops_every_shape_of_the_record():
+    cache, loader = EntityCache(), Loader()
+    for kind in ('meta', 'detail', 'blob'):
+        cache.get(kind, 1, loader.one(1))
+    cache.get('meta', 2, loader.one(2))
+    cache.invalidate(1)
+    for kind in ('meta', 'detail', 'blob'):
+        cache.get(kind, 1, loader.one(1))
+    cache.get('meta', 2, loader.one(2))
+    assert len(loader.calls) == 7
+
+    # 返回副本：调用方修改不影响缓存
+    cache.get('meta', 2, loader.one(2))['title'] = 'changed'
+    assert 'title' not in cache.get('meta', 2, loader.one(2))
+
+
+def test_database_changes_invalidate_through_triggers(db):
+    ideas, tags = IdeaRepository(db), TagRepository(db)
+    cache = EntityCache()
+    db.watch_idea_changes(cache.invalidate)
+    iid = ideas.add('title', 'body', '#4a90e2', None, 'text', None)
+
+    def load():
+        return dict(ideas.get_by_id(iid))
+    assert cache.get('detail', iid, load)['title'] == 'title'
+    ideas.update_field(iid, 'title', 'renamed')
+    assert cache.get('detail', iid, load)['title'] == 'renamed'
+
+    misses = cache.misses
+    tags.update_tags(iid, ['work'])
+    cache.get('detail', iid, load)
+    assert cache.misses == misses + 1
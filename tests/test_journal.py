@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+# tests/test_journal.py
+"""
+变更日志测试：触发器记录新建、修改、删除和标签变化；增量读取与合并；
+压缩只删除所有消费者都处理过的或超期的条目，落后的消费者收到 JournalTruncated。
+"""
+import pytest
+
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.journal_repository import JournalRepository, JournalTruncated
+from data.repositories.tag_repository import TagRepository
+from data.schema_migrations import SchemaMigration
+
+
+def _add(db, title='note'):
+    return IdeaRepository(db).add(title, 'body', '#4a90e2', None, 'text', None)
+
+
+def _ops(entries):
+    return [(e.idea_id, e.op, e.fields) for e in entries]
+
+
+def test_triggers_record_each_kind_of_change(db):
+    ideas, tags, journal = IdeaRepository(db), TagRepository(db), JournalRepository(db)
+    iid = _add(db)
+    assert _ops(journal.changes_since(0)) == [(iid, 'insert', SchemaMigration.JOURNAL_FIELDS)]
+    # 让下面的整体更新确实改动 updated_at（同一秒内 CURRENT_TIMESTAMP 不变）
+    db.conn.execute("UPDATE ideas SET updated_at='2020-01-01 00:00:00' WHERE id=?", (iid,))
+    db.commit()
+    start = journal.latest_seq()
+
+    ideas.update_field(iid, 'title', 'renamed')
+    ideas.update_field(iid, 'title', 'renamed')  # 值未变化，不记录
+    ideas.update(iid, 'renamed', 'new body', '#ff0000', None, 'text', None)
+    tags.update_tags(iid, ['work'])
+    db.conn.execute("UPDATE tags SET name='job' WHERE name='work'")
+    db.commit()
+    ideas.delete_permanent(iid)
+
+    entries = journal.changes_since(start)
+    assert [e.seq for e in entries] == list(range(start + 1, start + 1 + len(entries)))
+    assert _ops(entries) == [
+        (iid, 'update', ('title',)),
+        (iid, 'update', ('content', 'color', 'updated_at')),
+        (iid, 'update', ('tags',)),
+        (iid, 'update', ('tags',)),
+        (iid, 'delete', ()),
+        (iid, 'update', ('tags',)),
+    ]
+    assert journal.latest_seq() == entries[-1].seq
+
+
+def test_changes_since_pages_and_merges(db):
+    ideas, journal = IdeaRepository(db), JournalRepository(db)
+    start = journal.latest_seq()
+    created = _add(db, 'created')
+    ideas.update_field(created, 'rating', 3)
+    edited = _add(db, 'edited')
+    checkpoint = journal.latest_seq()
+    ideas.update_field(edited, 'is_pinned', 1)
+    ideas.update_field(edited, 'color', '#000000')
+    removed = _add(db, 'removed')
+    ideas.delete_permanent(removed)
+
+    first = journal.changes_since(start, limit=2)
+    assert [e.op for e in first] == ['insert', 'update']
+    assert journal.changes_since(first[-1].seq, limit=1)[0].idea_id == edited
+    assert journal.changes_since(journal.latest_seq()) == []
+
+    changed, last = journal.changed_ids_since(start)
+    assert changed == {created: 'insert', edited: 'insert', removed: 'delete'}
+    assert last == journal.latest_seq()
+    changed, _ = journal.changed_ids_since(checkpoint)
+    assert changed == {edited: 'update', removed: 'delete'}
+    assert journal.changed_ids_since(last) == ({}, last)
+
+
+def test_compact_keeps_entries_after_oldest_checkpoint(db):
+    ideas, journal = IdeaRepository(db), JournalRepository(db)
+    iid = _add(db)
+    for rating in range(1, 6):
+        ideas.update_field(iid, 'rating', rating)
+    latest = journal.latest_seq()
+    journal.set_checkpoint('search', latest - 3)
+    journal.set_checkpoint('sync', latest - 1)
+
+    assert journal.compact() == latest - 3
+    assert [e.seq for e in journal.changes_since(latest - 3)] == [latest - 2, latest - 1, latest]
+    with pytest.raises(JournalTruncated):
+        journal.changes_since(latest - 4)
+    with pytest.raises(JournalTruncated):
+        journal.changed_ids_since(0)
+
+    # 所有消费者都处理完后全部删除，序号不复用
+    journal.set_checkpoint('search', latest)
+    journal.set_checkpoint('sync', latest)
+    assert journal.compact() == 3
+    assert journal.latest_seq() == latest
+    assert journal.changes_since(latest) == []
+    ideas.update_field(iid, 'rating', 0)
+    assert journal.changes_since(latest)[0].seq == latest + 1
+
+
+def test_compact_without_consumers_drops_only_expired(db):
+    ideas, journal = IdeaRepository(db), JournalRepository(db)
+    iid = _add(db)
+    ideas.update_field(iid, 'title', 'old edit')
+    old = journal.latest_seq()
+    ideas.update_field(iid, 'title', 'recent edit')
+    db.conn.execute("UPDATE change_journal SET changed_at = datetime('now', '-60 days') WHERE seq <= ?", (old,))
+    db.commit()
+
+    assert journal.compact(keep_days=30) == old
+    assert [e.fields for e in journal.changes_since(old)] == [('title',)]
+    with pytest.raises(JournalTruncated):
+        journal.changes_since(0)
+    assert journal.compact(keep_days=30) == 0
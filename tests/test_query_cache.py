@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+# tests/test_query_cache.py
+"""
+查询缓存测试：相同参数命中缓存；返回值（包括嵌套的字典、列表）与缓存互不影响；
+数据库写入、其它进程的写入通知和跨过零点都让缓存作废；条目数和行数超出上限时按 LRU 淘汰。
+"""
+import datetime
+
+import pytest
+
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.records import MetadataTable
+from data.repositories.idea_repository import IdeaRepository
+from services.query_cache import QueryCache
+
+
+class Loader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+
+def test_same_arguments_hit_cache():
+    cache = QueryCache(lambda: 0)
+    loader = Loader(['a', 'b'])
+    assert cache.get_or_load('list', ('x', None, {'stars': [5]}), loader) == ['a', 'b']
+    # None 与空串、字典顺序不影响命中
+    assert cache.get_or_load('list', ('x', '', {'stars': [5]}), loader) == ['a', 'b']
+    assert loader.calls == 1 and (cache.hits, cache.misses) == (1, 1)
+    cache.get_or_load('list', ('y', None, None), loader)
+    assert loader.calls == 2
+
+
+def test_returned_values_do_not_share_nested_objects():
+    cache = QueryCache(lambda: 0)
+    counts = {'all': 3, 'categories': {1: 2, None: 1}}
+    first = cache.get_or_load('get_counts', (), lambda: counts)
+    first['categories'][1] = 99
+    first['all'] = 0
+    second = cache.get_or_load('get_counts', (), lambda: None)
+    assert second == {'all': 3, 'categories': {1: 2, None: 1}}
+    second['categories'].clear()
+    assert cache.get_or_load('get_counts', (), lambda: None)['categories'] == {1: 2, None: 1}
+
+    table = MetadataTable([(1, 't', '#fff', 0, 0, 'c', 'u', 'text', 0, 0, ())])
+    cache.get_or_load('meta', (), lambda: table).extend(table)
+    assert len(cache.get_or_load('meta', (), lambda: None)) == 1
+
+
+def test_generation_change_clears_cache_and_skips_stale_loads():
+    generation = [0]
+    cache = QueryCache(lambda: generation[0])
+    loader = Loader(1)
+    cache.get_or_load('a', (), loader)
+    generation[0] += 1
+    cache.get_or_load('a', (), loader)
+    assert loader.calls == 2
+
+    # 加载期间发生了写入：结果照常返回，但不放入缓存
+    def load_during_write():
+        generation[0] += 1
+        return 'stale'
+    assert cache.get_or_load('b', (), load_during_write) == 'stale'
+    fresh = Loader('fresh')
+    assert cache.get_or_load('b', (), fresh) == 'fresh' and fresh.calls == 1
+
+
+def test_lru_eviction_by_entries_and_rows():
+    cache = QueryCache(lambda: 0, max_entries=2, max_rows=5)
+    a, b, c = Loader(1), Loader(2), Loader(3)
+    cache.get_or_load('a', (), a)
+    cache.get_or_load('b', (), b)
+    cache.get_or_load('a', (), a)  # a 最近使用过
+    cache.get_or_load('c', (), c)  # 淘汰 b
+    cache.get_or_load('a', (), a)
+    cache.get_or_load('b', (), b)
+    assert (a.calls, b.calls, c.calls) == (1, 2, 1)
+
+    cache = QueryCache(lambda: 0, max_entries=10, max_rows=5)
+    small, big, huge = Loader([1, 2]), Loader([1, 2, 3, 4]), Loader(list(range(6)))
+    cache.get_or_load('small', (), small)
+    cache.get_or_load('big', (), big)  # 合计 6 行超出上限，淘汰 small
+    cache.get_or_load('small', (), small)
+    assert small.calls == 2
+    # 单个结果超出行数上限时不缓存
+    cache.get_or_load('huge', (), huge)
+    cache.get_or_load('huge', (), huge)
+    assert huge.calls == 2
+
+
+@pytest.fixture
+def service(db):
+    pytest.importorskip('PyQt5.QtCore')
+    from data.repositories.category_repository import CategoryRepository
+    from data.repositories.tag_repository import TagRepository
+    from services.idea_service import IdeaService
+    return IdeaService(IdeaRepository(db), CategoryRepository(db), TagRepository(db))
+
+
+def test_service_cache_invalidation(service, db, monkeypatch):
+    import services.idea_service as idea_service
+
+    service.add_idea('first', 'body', '#4a90e2', [])
+    assert service.get_counts()['all'] == 1
+    hits = service.query_cache.hits
+    assert service.get_counts()['all'] == 1
+    assert service.query_cache.hits == hits + 1
+
+    # 本连接上的写入（total_changes 变化）
+    service.add_idea('second', 'body', '#4a90e2', [])
+    assert service.get_counts()['all'] == 2
+
+    # 其它进程写入：本连接的 total_changes 不变，缓存仍是旧值，收到通知后作废
+    other = DBContext(db.db_path, QueryProfiler(enabled=False))
+    try:
+        IdeaRepository(other).add('from daemon', 'body', '#4a90e2', None, 'text', None)
+    finally:
+        other.close()
+    assert service.get_counts()['all'] == 2
+    service.notify_external_change()
+    assert service.get_counts()['all'] == 3
+
+    # 跨过零点："今天" 的统计依赖日期
+    class Tomorrow(datetime.date):
+        @classmethod
+        def today(cls):
+            return datetime.date.today() + datetime.timedelta(days=1)
+    before = service.generation
+    monkeypatch.setattr(idea_service, 'date', Tomorrow)
+    assert service.generation != before
+    misses = service.query_cache.misses
+    service.get_counts()
+    assert service.query_cache.misses == misses + 1
@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+# tests/test_query_plans.py
+"""
+查询计划回归测试。
+
+枚举仓库层的各种查询形状（过滤类型 × 搜索 × 标签筛选 × 高级筛选条件），
+在合成数据库上执行 EXPLAIN QUERY PLAN。出现以下情况即判定失败：
+- 对表做不走索引的全表扫描（SCAN <table>）
+- 为 ORDER BY 建临时 B 树（USE TEMP B-TREE FOR ORDER BY）
+- 规划器临时建自动索引（说明缺少应有的索引）
+确实无法避免的扫描登记在 ALLOWLIST 中，并写明原因。
+"""
+import re
+import sqlite3
+
+import pytest
+
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.category_repository import CategoryRepository
+from data.repositories.tag_repository import TagRepository
+
+BAD_PLAN_PATTERNS = (
+    re.compile(r'^SCAN \w+$'),
+    re.compile(r'USE TEMP B-TREE FOR ORDER BY'),
+    re.compile(r'AUTOMATIC (COVERING |PARTIAL )*INDEX'),
+)
+
+# (用例名正则, 计划行正则, 原因)
+ALLOWLIST = (
+    (r'search=', r'USE TEMP B-TREE FOR ORDER BY', '搜索结果需全表匹配后再排序'),
+    (r'regex=note', r'USE TEMP B-TREE FOR ORDER BY', '全文索引预筛出的候选再排序'),
+    (r'\|tag\b|criteria=tags', r'USE TEMP B-TREE FOR ORDER BY', '按标签取出的少量结果再排序'),
+    (r'\[today|criteria=date_create', r'USE TEMP B-TREE FOR ORDER BY', '时间区间索引取出的少量结果再排序'),
+    (r'^category_repo\.', r'^SCAN categories$|USE TEMP B-TREE FOR ORDER BY', '分类表很小，整表读取后排序'),
+    (r'query=.*\btag:', r'USE TEMP B-TREE FOR ORDER BY', '按标签取出的少量结果再排序'),
+    (r'query=.*\bin:', r'^SCAN categories$', 'in: 分类路径解析需读取分类表，表很小'),
+    (r'^(tag_repo\.get_top_tags|idea_repo\.get_filter_stats)', r'^SCAN (it|t)$', '标签统计需要遍历全部标签关联'),
+    (r'^(tag_repo\.get_top_tags|idea_repo\.get_filter_stats)', r'USE TEMP B-TREE FOR ORDER BY', '按聚合计数排序，无法走索引'),
+)
+
+FILTERS = (
+    ('all', None), ('today', None), ('untagged', None), ('bookmark', None),
+    ('trash', None), ('category', 'CAT'), ('category', None),
+)
+SEARCHES = ('', 'note')
+# 搜索框查询语法（TAG / CATNAME 在运行时替换为样本值）
+QUERIES = (
+    'tag:TAG note',
+    'type:text rating>=3 after:2020-01-01',
+    'in:"CATNAME" is:pinned',
+    'is:favorite before:2030-01-01 ab',
+)
+# 正则搜索：有必含子串时走全文索引预筛，没有时按排序索引逐行匹配
+REGEX_PATTERNS = (r'note\w*', r'\d{3}')
+CRITERIA = (
+    {'stars': [4, 5]},
+    {'colors': ['#2d2d2d']},
+    {'types': ['text', 'image']},
+    {'tags': ['TAG']},
+    {'date_create': ['today', 'yesterday', 'week']},
+    {'date_create': ['month']},
+)
+
+
+class CapturingProfiler(QueryProfiler):
+    """只记录执行过的 SQL 与参数，不做计时和慢日志"""
+
+    def __init__(self):
+        super().__init__(enabled=True)
+        self.captured = []
+
+    def record(self, conn, sql, params, rows, elapsed_ms):
+        self.captured.append((sql, tuple(params or ())))
+
+
+def _label(f_type, f_val, search, tag=None, criteria=None):
+    parts = [f_type if f_val is None else f'{f_type}:{f_val}']
+    if search: parts.append(f'search={search}')
+    if tag: parts.append('tag')
+    if criteria: parts.append('criteria=' + ','.join(sorted(criteria)))
+    return '|'.join(parts)
+
+
+def _build_cases(sample):
+    """返回 [(用例名, callable(repos)), ...]"""
+    def resolve(value):
+        return {'CAT': sample['category'], 'TAG': sample['tag']}.get(value, value)
+
+    cases = []
+    for f_type, f_val in FILTERS:
+        f_val = resolve(f_val)
+        for search in SEARCHES:
+            for tag in (None, sample['tag']):
+                label = _label(f_type, f_val, search, tag)
+                cases.append((f'idea_repo.get_list_by_filter[{label}]',
+                              lambda r, a=(search, f_type, f_val, 1, 100, tag): r['idea'].get_list_by_filter(*a)))
+                cases.append((f'idea_repo.get_count_by_filter[{label}]',
+                              lambda r, a=(search, f_type, f_val, tag): r['idea'].get_count_by_filter(*a)))
+            label = _label(f_type, f_val, search)
+            cases.append((f'idea_repo.get_metadata_by_filter[{label}]',
+                          lambda r, a=(search, f_type, f_val): r['idea'].get_metadata_by_filter(*a)))
+            cases.append((f'idea_repo.get_filter_stats[{label}]',
+                          lambda r, a=(search, f_type, f_val): r['idea'].get_filter_stats(*a)))
+
+    # 相关度排序由 FTS5 在索引内完成，不应出现临时 B 树排序
+    for f_type, f_val in FILTERS:
+        f_val = resolve(f_val)
+        label = _label(f_type, f_val, '') + '|ranked'
+        cases.append((f'idea_repo.get_list_by_filter[{label}]',
+                      lambda r, a=('note', f_type, f_val, 1, 100): r['idea'].get_list_by_filter(*a, ranked=True)))
+        cases.append((f'idea_repo.get_metadata_by_filter[{label}]',
+                      lambda r, a=('note', f_type, f_val): r['idea'].get_metadata_by_filter(*a, ranked=True)))
+
+    for query in QUERIES:
+        query = query.replace('TAG', sample['tag']).replace('CATNAME', sample['category_name'])
+        label = f'query={query}'
+        cases.append((f'idea_repo.get_list_by_filter[{label}]',
+                      lambda r, q=query: r['idea'].get_list_by_filter(q, 'all', None, 1, 100)))
+        cases.append((f'idea_repo.get_list_by_filter[{label}|ranked]',
+                      lambda r, q=query: r['idea'].get_list_by_filter(q, 'all', None, 1, 100, ranked=True)))
+        cases.append((f'idea_repo.get_count_by_filter[{label}]',
+                      lambda r, q=query: r['idea'].get_count_by_filter(q, 'all', None)))
+
+    for pattern in REGEX_PATTERNS:
+        for f_type, f_val in FILTERS:
+            f_val = resolve(f_val)
+            label = _label(f_type, f_val, '') + f'|regex={pattern}'
+            cases.append((f'idea_repo.get_metadata_by_regex[{label}]',
+                          lambda r, a=(pattern, f_type, f_val): r['idea'].get_metadata_by_regex(*a)))
+
+    for criteria in CRITERIA:
+        criteria = {k: [resolve(v) for v in vals] for k, vals in criteria.items()}
+        label = _label('all', None, '', criteria=criteria)
+        cases.append((f'idea_repo.get_list_by_filter[{label}]',
+                      lambda r, c=criteria: r['idea'].get_list_by_filter('', 'all', None, 1, 100, None, c)))
+        cases.append((f'idea_repo.get_count_by_filter[{label}]',
+                      lambda r, c=criteria: r['idea'].get_count_by_filter('', 'all', None, None, c)))
+
+    ids = sample['ids']
+    cases.extend([
+        ('idea_repo.get_counts', lambda r: r['idea'].get_counts()),
+        ('idea_repo.get_details_by_ids', lambda r: r['idea'].get_details_by_ids(ids)),
+        ('idea_repo.get_by_id', lambda r: r['idea'].get_by_id(ids[0])),
+        ('idea_repo.get_lock_status', lambda r: r['idea'].get_lock_status(ids)),
+        ('tag_repo.get_by_idea', lambda r: r['tag'].get_by_idea(ids[0])),
+        ('tag_repo.get_all', lambda r: r['tag'].get_all()),
+        ('tag_repo.get_top_tags', lambda r: r['tag'].get_top_tags()),
+        ('category_repo.get_all', lambda r: r['category'].get_all()),
+        ('category_repo.get_tree', lambda r: r['category'].get_tree()),
+    ])
+    return cases
+
+
+def _check_plans(query_plans):
+    """返回 (失败描述列表, 命中过的白名单条目集合)"""
+    failures, hits = [], set()
+    for name, entries in query_plans.items():
+        for sql, plan in entries:
+            bad = []
+            for detail in plan:
+                if not any(p.search(detail) for p in BAD_PLAN_PATTERNS):
+                    continue
+                entry = next((e for e in ALLOWLIST if re.search(e[0], name) and re.search(e[1], detail)), None)
+                if entry is None:
+                    bad.append(detail)
+                else:
+                    hits.add(entry)
+            if bad:
+                failures.append(f"{name}\n  SQL: {' '.join(sql.split())[:300]}\n  PLAN: {plan}\n  BAD: {bad}")
+    return failures, hits
+
+
+@pytest.fixture(scope='module')
+def query_plans(seeded_db_path):
+    """执行全部用例，返回 {用例名: [(sql, plan_lines), ...]}"""
+    profiler = CapturingProfiler()
+    db = DBContext(seeded_db_path, profiler)
+    try:
+        repos = {
+            'idea': IdeaRepository(db),
+            'tag': TagRepository(db),
+            'category': CategoryRepository(db),
+        }
+        c = sqlite3.Cursor(db.conn)
+        sample = {
+            'category': c.execute('SELECT category_id FROM ideas WHERE category_id IS NOT NULL LIMIT 1').fetchone()[0],
+            'tag': c.execute('SELECT name FROM tags ORDER BY id LIMIT 1').fetchone()[0],
+            'category_name': c.execute(
+                'SELECT name FROM categories WHERE id=(SELECT category_id FROM ideas WHERE category_id IS NOT NULL LIMIT 1)'
+            ).fetchone()[0],
+            'ids': [r[0] for r in c.execute('SELECT id FROM ideas ORDER BY id DESC LIMIT 50')],
+        }
+        plans = {}
+        for name, run in _build_cases(sample):
+            profiler.captured.clear()
+            run(repos)
+            entries = []
+            for sql, params in profiler.captured:
+                if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+                    continue
+                plan = [row[3] for row in c.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+                entries.append((sql, plan))
+            plans[name] = entries
+        yield plans
+    finally:
+        db.close()
+
+
+def test_every_case_issues_queries(query_plans):
+    silent = [name for name, entries in query_plans.items() if not entries]
+    assert not silent, f"cases that ran no SELECT: {silent}"
+
+
+def test_hot_queries_use_indexes(query_plans):
+    failures, _ = _check_plans(query_plans)
+    assert not failures, 'query plan regressions:\n' + '\n'.join(failures)
+
+
+def test_allowlist_has_no_stale_entries(query_plans):
+    _, hits = _check_plans(query_plans)
+    stale = [e for e in ALLOWLIST if e not in hits]
+    assert not stale, f"allowlist entries no longer needed: {stale}"
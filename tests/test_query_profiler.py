@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# tests/test_query_profiler.py
+"""
+计时游标测试：不预先取回结果（无限结果集也能逐批读取），查询在取完、关闭、
+再次执行或游标回收时各记录一次，行数为实际取走的行数。
+"""
+import sqlite3
+
+import pytest
+
+from data.query_profiler import ProfiledConnection, QueryProfiler
+
+ENDLESS = 'WITH RECURSIVE n(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM n) SELECT x FROM n'
+
+
+class RecordingProfiler(QueryProfiler):
+    def __init__(self, enabled=True):
+        super().__init__(enabled=enabled)
+        self.records = []
+
+    def record(self, conn, sql, params, rows, elapsed_ms):
+        assert elapsed_ms >= 0
+        self.records.append((sql.split()[0], rows))
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:', factory=ProfiledConnection)
+    conn.profiler = RecordingProfiler()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.executemany('INSERT INTO t VALUES (?)', [(i,) for i in range(10)])
+    conn.profiler.records.clear()
+    yield conn
+    conn.close()
+
+
+def test_rows_are_not_fetched_ahead(conn):
+    cur = conn.cursor()
+    cur.execute(ENDLESS)
+    assert [r[0] for r in cur.fetchmany(5)] == [1, 2, 3, 4, 5]
+    assert cur.fetchone()[0] == 6
+    assert conn.profiler.records == []
+    cur.close()
+    assert conn.profiler.records == [('WITH', 6)]
+
+
+def test_recorded_once_when_exhausted(conn):
+    cur = conn.cursor()
+    assert len(cur.execute('SELECT x FROM t').fetchall()) == 10
+    assert [r[0] for r in conn.execute('SELECT x FROM t WHERE x < 3')] == [0, 1, 2]
+    cur.execute('SELECT x FROM t')
+    while cur.fetchmany(4): pass
+    cur.close()
+    assert conn.profiler.records == [('SELECT', 10), ('SELECT', 3), ('SELECT', 10)]
+
+
+def test_unfinished_query_recorded_on_next_execute_or_release(conn):
+    cur = conn.cursor()
+    cur.execute('SELECT x FROM t')
+    cur.fetchone()
+    cur.execute('SELECT COUNT(*) FROM t')
+    assert conn.profiler.records == [('SELECT', 1)]
+    cur.fetchone()
+    del cur
+    assert conn.profiler.records == [('SELECT', 1), ('SELECT', 1)]
+
+
+def test_writes_recorded_immediately(conn):
+    conn.execute('UPDATE t SET x = x + 1 WHERE x < 4')
+    conn.executemany('INSERT INTO t VALUES (?)', [(1,), (2,)])
+    assert conn.profiler.records == [('UPDATE', 4), ('INSERT', 2)]
+
+
+def test_disabled_profiler_records_nothing(conn):
+    conn.profiler = RecordingProfiler(enabled=False)
+    cur = conn.cursor()
+    cur.execute(ENDLESS)
+    assert cur.fetchone()[0] == 1
+    cur.close()
+    conn.execute('DELETE FROM t')
+    assert conn.profiler.records == []
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+# tests/test_records.py
+"""
+紧凑记录测试：IdeaMeta / IdeaDetail 按键取值的行为与原来的字典一致；
+MetadataTable 的下标、切片、筛选、拼接与逐行记录一致，副本互不影响。
+"""
+import pytest
+
+from data.records import (
+    DETAIL_FIELDS, META_FIELDS, IdeaDetail, IdeaMeta, MetadataTable, as_table, detail_from_row, split_tags,
+)
+
+
+def _meta(iid, pinned=0, favorite=0, locked=0, tags=()):
+    return IdeaMeta(iid, f'title {iid}', '#4a90e2', pinned, favorite, 'c', 'u', 'text', iid % 6, locked, tags)
+
+
+@pytest.fixture
+def record():
+    return _meta(7, pinned=1, tags=('work', 'todo'))
+
+
+def test_record_matches_dict_access(record):
+    expected = dict(zip(META_FIELDS, record))
+    assert dict(record) == expected
+    assert list(record.keys()) == list(expected.keys())
+    for key, value in expected.items():
+        assert record[key] == value
+        assert record.get(key) == value
+
+    # in 判断的是字段名而不是值，与字典一致
+    assert 'tags' in record and 'title' in record
+    assert 7 not in record and 'title 7' not in record
+    assert 'content' not in record
+    assert record.get('content') is None
+    assert record.get('content', '') == ''
+    with pytest.raises(KeyError):
+        record['content']
+
+    # 按位置取值保持元组语义
+    assert record[0] == 7 and record[-1] == ('work', 'todo')
+    assert record[1:3] == ('title 7', '#4a90e2')
+    assert record.id == record['id'] == 7
+
+
+def test_detail_from_row_shares_strings_and_tags():
+    row = (1, 't', 'c', '#4a90e2', 0, 1, 'ca', 'ua', None, 0, 'text', None, None, 0, 3, 'a,b')
+    detail = detail_from_row(row)
+    assert isinstance(detail, IdeaDetail)
+    assert dict(detail) == dict(zip(DETAIL_FIELDS, row[:-1] + (('a', 'b'),)))
+    assert detail_from_row(row).tags is detail.tags is split_tags('a,b')
+    assert split_tags('') == () and split_tags(None) == ()
+
+
+def test_table_rows_round_trip():
+    records = [_meta(1), _meta(2, pinned=1, locked=1), _meta(3, favorite=1, tags=('x',))]
+    table = MetadataTable(records)
+    assert len(table) == 3 and bool(table) and not MetadataTable()
+    assert list(table) == records
+    assert [table[i] for i in range(3)] == records
+    assert table[-1] == records[-1]
+    with pytest.raises(IndexError):
+        table[3]
+    with pytest.raises(IndexError):
+        table[-4]
+
+    # 数据库中的 NULL 标志与星级取回为 0
+    table.append((4, 't', None, None, None, 'c', 'u', 'text', None, None, ()))
+    assert table[3][3:5] == (0, 0) and table[3].rating == 0 and table[3].is_locked == 0
+
+
+@pytest.mark.parametrize('index', [
+    slice(1, 3), slice(None, 2), slice(2, None), slice(-2, None), slice(None, None, 2),
+    slice(None, None, -1), slice(3, 1, -1), slice(5, 9), slice(0, 0),
+])
+def test_table_slices_match_list_slices(index):
+    records = [_meta(i, pinned=i % 2, favorite=i % 3 == 0, tags=(str(i),)) for i in range(6)]
+    table = MetadataTable(records)
+    part = table[index]
+    assert isinstance(part, MetadataTable)
+    assert list(part) == records[index]
+    # 切片是独立的新表
+    part.append(_meta(99))
+    assert len(table) == 6
+
+
+def test_table_filter_extend_and_copy():
+    records = [_meta(i) for i in range(5)]
+    table = MetadataTable(records)
+    evens = table.filter(lambda r: r.id % 2 == 0)
+    assert list(evens) == records[::2]
+
+    copy = table.copy()
+    copy.extend(evens)
+    copy.extend([_meta(9)])
+    assert list(copy) == records + records[::2] + [_meta(9)]
+    assert len(table) == 5
+    assert as_table(table) is table
+    assert list(as_table(records)) == records
+
+
+def test_from_rows_with_content():
+    rows = [
+        (1, 't1', '#fff', 1, 0, 'c', 'u', 'text', 5, 0, 'a,b', 'body one'),
+        (2, 't2', '#000', 0, 1, 'c', 'u', 'image', 0, 1, None, 'body two'),
+    ]
+    table = MetadataTable.from_rows(rows, include_content=True)
+    assert [r.tags for r in table] == [('a', 'b'), ()]
+    assert table[1].is_favorite == 1 and table[1].is_locked == 1
+    assert table.pop_content() == ['body one', 'body two']
+    assert table.pop_content() is None
+    assert MetadataTable.from_rows(rows).content is None
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+# tests/test_revisions.py
+"""
+历史版本测试：行增量编码可逆，多次编辑后每个版本都能重建，精简后保留的版本仍能重建且增量链不超长。
+"""
+import sqlite3
+
+import pytest
+
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.revision_repository import RevisionRepository
+from data.revisions import (
+    KIND_DELTA, KIND_SNAPSHOT, SNAPSHOT_INTERVAL, KEEP_RECENT, apply_delta, encode_delta, encode_revision,
+    decode_revision,
+)
+
+
+@pytest.mark.parametrize('base, text', [
+    ('a\nb\nc\n', 'a\nB\nc\n'),
+    ('a\nb\nc\n', 'a\nb\nc\nd'),
+    ('a\nb\nc', 'b\n'),
+    ('', '第一行\n第二行\n'),
+    ('只有一行', ''),
+    ('x\r\ny\r\n', 'x\r\nz\r\ny\r\n'),
+])
+def test_delta_round_trip(base, text):
+    assert apply_delta(base, encode_delta(base, text)) == text
+
+
+def test_small_edit_of_long_text_is_stored_as_delta():
+    base = ''.join(f'line {i}\n' for i in range(500))
+    text = base.replace('line 250\n', 'changed\n')
+    kind, depth, payload = encode_revision(base, text, 3)
+    assert (kind, depth) == (KIND_DELTA, 4)
+    assert decode_revision(kind, payload, base) == text
+    # 链到达上限时改存快照
+    kind, depth, _ = encode_revision(base, text, SNAPSHOT_INTERVAL - 1)
+    assert (kind, depth) == (KIND_SNAPSHOT, 0)
+
+
+def _edit(lines, i):
+    """第 i 次编辑：轮流改写、追加、删除一行"""
+    lines = list(lines)
+    if i % 3 == 0: lines[i % len(lines)] = f'rewritten {i}\n'
+    elif i % 3 == 1: lines.append(f'appended {i}\n')
+    else: del lines[len(lines) // 2]
+    return lines
+
+
+def _make_history(db, edits):
+    """返回 (iid, {seq: (标题, 正文)})；版本 1 为首次编辑前的原内容"""
+    ideas, revisions = IdeaRepository(db), RevisionRepository(db)
+    lines = [f'line {i}\n' for i in range(30)]
+    iid = ideas.add('v0', ''.join(lines), '#4a90e2', None, 'text', None)
+    expected = {1: ('v0', ''.join(lines))}
+    for i in range(1, edits + 1):
+        lines = _edit(lines, i)
+        title, content = f'v{i}', ''.join(lines)
+        seq = revisions.record_edit(iid, title, content)
+        ideas.update(iid, title, content, '#4a90e2', None, 'text', None)
+        expected[seq] = (title, content)
+    return iid, expected
+
+
+def _chain(db, iid):
+    return db.conn.execute(
+        'SELECT seq, kind, depth FROM idea_revisions WHERE idea_id=? ORDER BY seq', (iid,)
+    ).fetchall()
+
+
+def _assert_chain_consistent(rows):
+    prev_depth = None
+    for r in rows:
+        assert r['depth'] < SNAPSHOT_INTERVAL
+        if r['kind'] == KIND_SNAPSHOT: assert r['depth'] == 0
+        else: assert r['depth'] == prev_depth + 1
+        prev_depth = r['depth']
+
+
+def test_every_version_reconstructs(db):
+    iid, expected = _make_history(db, 40)
+    revisions = RevisionRepository(db)
+    assert sorted(expected) == list(range(1, 42))
+    for seq, version in expected.items():
+        assert revisions.get(iid, seq) == version
+    assert revisions.get(iid, 99) is None
+
+    rows = _chain(db, iid)
+    _assert_chain_consistent(rows)
+    kinds = [r['kind'] for r in rows]
+    assert kinds.count(KIND_DELTA) > kinds.count(KIND_SNAPSHOT)
+
+    # 内容不变的保存不新增版本
+    assert revisions.record_edit(iid, *expected[41]) == 41
+
+
+def test_prune_keeps_recent_and_one_per_day(db):
+    iid, expected = _make_history(db, 44)
+    revisions = RevisionRepository(db)
+    # 每天两个版本：版本 s 创建于 (45 - s) // 2 天前
+    db.conn.execute(
+        "UPDATE idea_revisions SET created_at = datetime('now', '-' || ((45 - seq) / 2) || ' days') WHERE idea_id=?",
+        (iid,)
+    )
+    db.commit()
+
+    dropped = revisions.prune(iid)
+    # 最近 KEEP_RECENT 个（26..45）全部保留；更早的每天留最后一个，即 1..25 中的奇数
+    retained = set(range(45 - KEEP_RECENT + 1, 46)) | set(range(1, 26, 2))
+    assert dropped == 45 - len(retained)
+    assert {r['seq'] for r in revisions.list(iid)} == retained
+    for seq in retained:
+        assert revisions.get(iid, seq) == expected[seq]
+    _assert_chain_consistent(_chain(db, iid))
+    assert revisions.prune(iid) == 0
+
+
+def test_revision_is_rolled_back_with_failed_update(db, monkeypatch):
+    pytest.importorskip('PyQt5.QtCore')
+    from data.repositories.category_repository import CategoryRepository
+    from data.repositories.tag_repository import TagRepository
+    from services.idea_service import IdeaService
+
+    ideas = IdeaRepository(db)
+    service = IdeaService(ideas, CategoryRepository(db), TagRepository(db))
+    iid = ideas.add('title', 'original', '#4a90e2', None, 'text', None)
+
+    def fail(*args):
+        raise sqlite3.OperationalError('disk I/O error')
+    monkeypatch.setattr(ideas, 'update', fail)
+    with pytest.raises(sqlite3.OperationalError):
+        service.update_idea(iid, 'title', 'edited', '#4a90e2', [])
+    db.commit()
+    assert RevisionRepository(db).list(iid) == []
+    assert ideas.get_by_id(iid)['content'] == 'original'
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# tests/test_search_executor.py
+"""
+后台搜索执行器测试：所属对象被销毁或重复调用 shutdown() 时，工作线程结束、只读连接关闭。
+"""
+import sqlite3
+import time
+
+import pytest
+
+
+def _wait_result(qapp, results, timeout_s=5):
+    deadline = time.monotonic() + timeout_s
+    while not results and time.monotonic() < deadline:
+        qapp.processEvents()
+    return results
+
+
+def test_executor_stops_with_its_owner(qapp, db):
+    from PyQt5 import sip
+    from PyQt5.QtCore import QObject
+    from services.search_executor import SearchExecutor
+
+    owner = QObject()
+    executor = SearchExecutor(db, parent=owner)
+    results = []
+    executor.finished.connect(lambda seq, result, partial: results.append(result))
+    executor.submit(lambda repo, token: repo.get_count_by_filter('', 'all', None))
+    assert _wait_result(qapp, results) == [0]
+    thread, reader = executor._thread, executor._reader
+
+    sip.delete(owner)
+    assert not thread.is_alive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        reader.conn.execute('SELECT 1')
+
+
+def test_shutdown_is_idempotent(qapp, db):
+    from services.search_executor import SearchExecutor
+
+    executor = SearchExecutor(db)
+    executor.shutdown()
+    executor.shutdown()
+    assert executor._closed
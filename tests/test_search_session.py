@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+# tests/test_search_session.py
+"""
+增量搜索会话测试：关键词加长时在内存中收窄，结果与重新查询完全一致；
+关键词删短、范围变化、切换到相关度排序或数据库版本变化时重新查询。
+"""
+import pytest
+
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.repositories.idea_repository import IdeaRepository
+from services.search_session import SearchSession
+
+
+@pytest.fixture(scope='module')
+def repo(seeded_db_path):
+    db = DBContext(seeded_db_path, QueryProfiler(enabled=False))
+    yield IdeaRepository(db)
+    db.close()
+
+
+@pytest.fixture
+def session(repo, monkeypatch):
+    """返回 (会话, 查库次数列表)"""
+    calls = []
+    load = repo.get_metadata_by_filter
+
+    def counted(*args, **kwargs):
+        calls.append(args[0])
+        return load(*args, **kwargs)
+    monkeypatch.setattr(repo, 'get_metadata_by_filter', counted)
+    return SearchSession(repo), calls
+
+
+def _fresh(repo, search, f_type='all', f_val=None):
+    return list(IdeaRepository.get_metadata_by_filter(repo, search, f_type, f_val))
+
+
+def test_extending_term_narrows_in_memory(repo, session):
+    session, calls = session
+    for term in ('re', 'rev', 'REVI', 'review'):
+        result = session.lookup(term, 'all', None)
+        assert list(result) == _fresh(repo, term)
+    assert calls == ['re']
+    assert len(_fresh(repo, 'review')) < len(_fresh(repo, 're'))
+
+
+def test_shortening_term_queries_again(repo, session):
+    session, calls = session
+    session.lookup('review', 'all', None)
+    assert list(session.lookup('rev', 'all', None)) == _fresh(repo, 'rev')
+    assert list(session.lookup('view', 'all', None)) == _fresh(repo, 'view')
+    assert calls == ['review', 'rev', 'view']
+
+
+def test_changed_filter_queries_again(repo, session):
+    session, calls = session
+    category = repo.db.conn.execute(
+        'SELECT category_id FROM ideas WHERE category_id IS NOT NULL AND is_deleted=0 LIMIT 1'
+    ).fetchone()[0]
+    session.lookup('no', 'all', None)
+    assert list(session.lookup('note', 'category', category)) == _fresh(repo, 'note', 'category', category)
+    assert list(session.lookup('note', 'all', None)) == _fresh(repo, 'note')
+    assert list(session.lookup('note', 'trash', None)) == _fresh(repo, 'note', 'trash')
+    assert calls == ['no', 'note', 'note', 'note']
+
+
+def test_changed_mode_queries_again(repo, session):
+    session, calls = session
+    session.lookup('dep', 'all', None)
+    # 相关度排序不走会话，并且丢弃旧结果
+    assert repo.fts_match('deploy')
+    assert session.lookup('deploy', 'all', None, ranked=True) is None
+    assert list(session.lookup('deploy', 'all', None)) == _fresh(repo, 'deploy')
+    assert calls == ['dep', 'deploy']
+    # 多个关键词或结构化条件同样回退
+    assert session.lookup('deploy fix', 'all', None) is None
+    assert session.lookup('deploy type:text', 'all', None) is None
+
+
+def test_database_change_queries_again(repo, session):
+    session, calls = session
+    session.lookup('fi', 'all', None)
+    repo.db.mark_external_change()
+    assert list(session.lookup('fix', 'all', None)) == _fresh(repo, 'fix')
+    assert calls == ['fi', 'fix']
+
+
+def test_too_many_rows_fall_back(repo):
+    session = SearchSession(repo, max_cached_rows=10)
+    assert session.lookup('e', 'all', None) is None
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# tests/test_settings.py
+"""
+设置存储测试：并发落盘按取快照的顺序写入，写入失败后保留脏标记并在下次落盘时重试。
+"""
+import json
+import threading
+
+from core.settings import SettingsStore
+
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_concurrent_flushes_keep_latest_value(tmp_path, monkeypatch):
+    path = str(tmp_path / 'settings.json')
+    store = SettingsStore(path, flush_delay=60)
+    store.set('theme', 'old')
+
+    # 第一次写入进行中时再修改并落盘，第二次必须等第一次写完
+    writing, release = threading.Event(), threading.Event()
+    original = store._write_atomic
+
+    def slow_write(snapshot):
+        if snapshot['theme'] == 'old':
+            writing.set()
+            release.wait(5)
+        return original(snapshot)
+    monkeypatch.setattr(store, '_write_atomic', slow_write)
+
+    first = threading.Thread(target=store.flush)
+    first.start()
+    assert writing.wait(5)
+    store.set('theme', 'new')
+    second = threading.Thread(target=store.flush)
+    second.start()
+    release.set()
+    first.join(5); second.join(5)
+    assert _read(path) == {'theme': 'new'}
+
+
+def test_failed_write_is_retried(tmp_path, monkeypatch):
+    path = str(tmp_path / 'settings.json')
+    store = SettingsStore(path, flush_delay=60)
+    store.set('width', 800)
+
+    original = store._write_atomic
+    monkeypatch.setattr(store, '_write_atomic', lambda snapshot: False)
+    store.flush()
+    assert store._dirty
+
+    monkeypatch.setattr(store, '_write_atomic', original)
+    store.flush()
+    assert not store._dirty
+    assert _read(path) == {'width': 800}
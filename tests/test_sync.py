@@ -0,0 +1,287 @@
+# -*- coding: utf-8 -*-
+# tests/test_sync.py
+"""
+离线同步测试：两个临时数据库分别代表台式机和笔记本，互相导出、导入同步包后内容一致。
+"""
+import gzip
+import time
+
+import pytest
+
+from data.changeset import ChangesetError, ChangesetWriter, read_frames
+from data.db_context import DBContext
+from data.query_profiler import QueryProfiler
+from data.repositories.category_repository import CategoryRepository
+from data.repositories.idea_repository import IdeaRepository
+from data.repositories.journal_repository import JournalRepository
+from data.repositories.sync_repository import SyncRepository
+from data.repositories.tag_repository import TagRepository
+from services.sync_service import SyncService
+
+
+class Machine:
+    def __init__(self, path, batch_size=500):
+        self.db = DBContext(path, QueryProfiler(enabled=False))
+        self.ideas = IdeaRepository(self.db)
+        self.tags = TagRepository(self.db)
+        self.categories = CategoryRepository(self.db)
+        self.sync = SyncService(SyncRepository(self.db), JournalRepository(self.db), batch_size)
+
+    def add(self, title, content, tags=(), category_id=None, item_type='text', blob=None, content_hash=None):
+        iid = self.ideas.add(title, content, '#4a90e2', category_id, item_type, blob, content_hash)
+        if tags: self.tags.update_tags(iid, list(tags))
+        return iid
+
+    def set_updated_at(self, iid, value):
+        self.db.conn.execute('UPDATE ideas SET updated_at=? WHERE id=?', (value, iid))
+        self.db.commit()
+
+    def uuid_of(self, iid):
+        return self.db.conn.execute('SELECT uuid FROM ideas WHERE id=?', (iid,)).fetchone()[0]
+
+    def by_uuid(self, uuid):
+        return self.db.conn.execute('SELECT * FROM ideas WHERE uuid=?', (uuid,)).fetchone()
+
+    def snapshot(self):
+        """{uuid: 可比较的记录内容}（不含本地 ID）"""
+        repo = self.sync.repo
+        paths = {row['id']: tuple(p) for p, row in repo.category_rows()}
+        ids = [r[0] for r in self.db.conn.execute('SELECT id FROM ideas')]
+        result = {}
+        for row, tags in repo.get_ideas(ids):
+            result[row['uuid']] = (
+                row['title'], row['content'], row['is_favorite'], row['is_deleted'], row['updated_at'],
+                tuple(tags), paths.get(row['category_id']), repo.get_blob(row['id']),
+            )
+        return result
+
+
+@pytest.fixture
+def machines(tmp_path):
+    desktop = Machine(str(tmp_path / 'desktop.db'))
+    laptop = Machine(str(tmp_path / 'laptop.db'))
+    yield desktop, laptop, tmp_path
+    desktop.db.close()
+    laptop.db.close()
+
+
+def _sync(source, target, path):
+    stats = source.sync.export_changeset(str(path))
+    return stats, target.sync.import_changeset(str(path))
+
+
+def test_full_export_recreates_notes_on_empty_machine(machines):
+    desktop, laptop, tmp = machines
+    work = desktop.categories.add('工作')
+    project = desktop.categories.add('项目A', work)
+    desktop.add('会议', '周一会议纪要', tags=['会议', '周报'], category_id=project)
+    desktop.add('截图', '[image]', item_type='image', blob=b'\x89PNG\r\n\x1a\n' + bytes(range(256)) * 100)
+    desktop.add('空白', '')
+
+    exported, imported = _sync(desktop, laptop, tmp / 'full.rnsync')
+    assert exported['full'] and exported['ideas'] == 3
+    assert imported['inserted'] == 3
+    assert laptop.snapshot() == desktop.snapshot()
+    # 空分类也随同步包传过去
+    assert {tuple(p) for p, _ in laptop.sync.repo.category_rows()} >= {('工作',), ('工作', '项目A')}
+
+    # 重复导入同一个包不产生任何变化
+    again = laptop.sync.import_changeset(str(tmp / 'full.rnsync'))
+    assert again['inserted'] == again['updated'] == 0 and again['skipped'] == 3
+
+
+def test_incremental_changes_flow_both_ways(machines):
+    desktop, laptop, tmp = machines
+    a = desktop.add('A', 'a1')
+    b = desktop.add('B', 'b1', tags=['x'])
+    _sync(desktop, laptop, tmp / '1.rnsync')
+    uuid_a, uuid_b = desktop.uuid_of(a), desktop.uuid_of(b)
+
+    # 台式机改正文，笔记本只改收藏和标签（不改 updated_at）
+    desktop.ideas.update(a, 'A', 'a2', '#4a90e2', None, 'text', None)
+    lb = laptop.by_uuid(uuid_b)['id']
+    laptop.ideas.toggle_field(lb, 'is_favorite')
+    laptop.tags.update_tags(lb, ['x', 'y'])
+    new = laptop.add('C', 'from laptop')
+
+    exported, _ = _sync(desktop, laptop, tmp / '2.rnsync')
+    assert not exported['full'] and exported['ideas'] == 1
+    _sync(laptop, desktop, tmp / '3.rnsync')
+
+    assert desktop.snapshot() == laptop.snapshot()
+    assert desktop.by_uuid(uuid_a)['content'] == 'a2'
+    assert desktop.by_uuid(uuid_b)['is_favorite'] == 1
+    assert desktop.tags.get_by_idea(desktop.by_uuid(uuid_b)['id']) == ['x', 'y']
+    assert desktop.by_uuid(laptop.uuid_of(new))['content'] == 'from laptop'
+
+
+def test_conflict_resolved_by_last_writer(machines):
+    desktop, laptop, tmp = machines
+    iid = desktop.add('T', 'original')
+    _sync(desktop, laptop, tmp / '1.rnsync')
+    uuid = desktop.uuid_of(iid)
+    lid = laptop.by_uuid(uuid)['id']
+
+    desktop.ideas.update(iid, 'T', 'desktop edit', '#4a90e2', None, 'text', None)
+    desktop.set_updated_at(iid, '2030-01-01 10:00:00')
+    laptop.ideas.update(lid, 'T', 'laptop edit', '#4a90e2', None, 'text', None)
+    laptop.set_updated_at(lid, '2030-01-01 11:00:00')
+
+    _, to_laptop = _sync(desktop, laptop, tmp / '2.rnsync')
+    _, to_desktop = _sync(laptop, desktop, tmp / '3.rnsync')
+    assert to_laptop['skipped'] == 1 and to_desktop['updated'] == 1
+    assert desktop.by_uuid(uuid)['content'] == laptop.by_uuid(uuid)['content'] == 'laptop edit'
+
+
+def test_later_flag_edit_beats_earlier_content_edit(machines):
+    desktop, laptop, tmp = machines
+    iid = desktop.add('T', 'original')
+    _sync(desktop, laptop, tmp / '1.rnsync')
+    uuid = desktop.uuid_of(iid)
+    lid = laptop.by_uuid(uuid)['id']
+
+    # 台式机改了正文（编辑时间更晚），之后笔记本只加了收藏：按最后一次修改决定，而不是编辑时间
+    desktop.ideas.update(iid, 'T', 'desktop edit', '#4a90e2', None, 'text', None)
+    desktop.set_updated_at(iid, '2030-01-01 10:00:00')
+    time.sleep(0.01)  # modified_at 精确到毫秒
+    laptop.ideas.update_field(lid, 'is_favorite', 1)
+
+    _, to_laptop = _sync(desktop, laptop, tmp / '2.rnsync')
+    _, to_desktop = _sync(laptop, desktop, tmp / '3.rnsync')
+    assert to_laptop['skipped'] == 1 and to_desktop['updated'] == 1
+    assert desktop.by_uuid(uuid)['is_favorite'] == laptop.by_uuid(uuid)['is_favorite'] == 1
+    assert desktop.snapshot() == laptop.snapshot()
+
+
+def test_same_clipboard_item_on_both_machines_is_merged(machines):
+    desktop, laptop, tmp = machines
+    desktop.add('copied', 'same text', content_hash='h1')
+    laptop.add('copied', 'same text', content_hash='h1')
+
+    _sync(desktop, laptop, tmp / '1.rnsync')
+    _sync(laptop, desktop, tmp / '2.rnsync')
+    _sync(desktop, laptop, tmp / '3.rnsync')
+
+    assert len(desktop.snapshot()) == len(laptop.snapshot()) == 1
+    assert desktop.snapshot().keys() == laptop.snapshot().keys()
+
+
+def test_merged_uuid_is_exported_even_when_local_copy_wins(machines):
+    desktop, laptop, tmp = machines
+    did = desktop.add('copied', 'same text', content_hash='h1')
+    lid = laptop.add('copied', 'same text', content_hash='h1')
+    desktop.db.conn.execute("UPDATE ideas SET uuid='00000000' WHERE id=?", (did,))
+    desktop.db.commit()
+    laptop.db.conn.execute("UPDATE ideas SET uuid='ffffffff' WHERE id=?", (lid,))
+    laptop.db.commit()
+    laptop.ideas.update_field(lid, 'rating', 5)
+    laptop.sync.export_changeset(str(tmp / 'baseline.rnsync'))
+
+    # 笔记本上的副本较新，不被覆盖，但改用较小的 uuid
+    _, imported = _sync(desktop, laptop, tmp / '1.rnsync')
+    assert imported['skipped'] == 1
+    assert laptop.uuid_of(lid) == '00000000'
+    assert 'uuid' in JournalRepository(laptop.db).changes_since(0)[-1].fields
+
+    # 增量导出带上这条记录，台式机收到较新的内容
+    exported, imported = _sync(laptop, desktop, tmp / '2.rnsync')
+    assert exported['ideas'] == 1 and imported['updated'] == 1
+    assert desktop.by_uuid('00000000')['rating'] == 5
+    assert desktop.snapshot() == laptop.snapshot()
+
+
+def test_permanent_delete_propagates(machines):
+    desktop, laptop, tmp = machines
+    keep = desktop.add('keep', '1')
+    gone = desktop.add('gone', '2')
+    _sync(desktop, laptop, tmp / '1.rnsync')
+
+    desktop.ideas.delete_permanent(gone)
+    exported, imported = _sync(desktop, laptop, tmp / '2.rnsync')
+    assert exported['deleted'] == 1 and imported['deleted'] == 1
+    assert set(laptop.snapshot()) == {desktop.uuid_of(keep)}
+
+
+def test_import_commits_in_batches_and_rejects_truncated_file(machines):
+    desktop, laptop, tmp = machines
+    for i in range(10):
+        desktop.add(f'n{i}', f'content {i}')
+    path = tmp / 'full.rnsync'
+    desktop.sync.export_changeset(str(path))
+
+    with gzip.open(str(path), 'rb') as f:
+        data = f.read()
+    truncated = tmp / 'truncated.rnsync'
+    with gzip.open(str(truncated), 'wb') as f:
+        f.write(data[:len(data) * 2 // 3])
+
+    small_batches = SyncService(laptop.sync.repo, laptop.sync.journal, batch_size=2)
+    with pytest.raises(ChangesetError):
+        small_batches.import_changeset(str(truncated))
+    partial = len(laptop.snapshot())
+    assert 0 < partial < 10
+
+    # 完整的包再导入一次即可补齐
+    small_batches.import_changeset(str(path))
+    assert laptop.snapshot() == desktop.snapshot()
+
+
+def test_corrupted_file_is_rejected(machines):
+    desktop, laptop, tmp = machines
+    for i in range(20):
+        desktop.add(f'n{i}', f'content {i} ' * 50)
+    path = tmp / 'full.rnsync'
+    desktop.sync.export_changeset(str(path))
+    raw = bytearray(path.read_bytes())
+
+    # 压缩流中间翻转一段字节：解压出错或校验和不符
+    flipped = tmp / 'flipped.rnsync'
+    middle = len(raw) // 2
+    raw[middle:middle + 16] = bytes(b ^ 0xFF for b in raw[middle:middle + 16])
+    flipped.write_bytes(bytes(raw))
+    with pytest.raises(ChangesetError):
+        laptop.sync.import_changeset(str(flipped))
+
+    # 压缩流完好，帧头部的 JSON 损坏（长度不变）
+    with gzip.open(str(path), 'rb') as f:
+        data = f.read()
+    bad_json = tmp / 'bad_json.rnsync'
+    with gzip.open(str(bad_json), 'wb') as f:
+        f.write(data.replace(b'"idea":{', b'"idea":[', 1))
+    with pytest.raises(ChangesetError, match='corrupted'):
+        list(read_frames(str(bad_json)))
+
+    # 头部缺少必需的键
+    missing = tmp / 'missing.rnsync'
+    with ChangesetWriter(str(missing)) as writer:
+        writer.write({'type': 'idea', 'tags': []})
+        writer.write({'type': 'end'})
+    with pytest.raises(ChangesetError, match='without idea'):
+        laptop.sync.import_changeset(str(missing))
+
+    # 不是 gzip 文件
+    garbage = tmp / 'garbage.rnsync'
+    garbage.write_bytes(b'RNCS')
+    with pytest.raises(ChangesetError):
+        list(read_frames(str(garbage)))
+
+
+def test_failed_export_leaves_no_partial_file(machines, monkeypatch):
+    desktop, laptop, tmp = machines
+    for i in range(3):
+        desktop.add(f'n{i}', f'content {i}')
+    path = tmp / 'out.rnsync'
+
+    def broken(ids):
+        raise OSError('disk full')
+    monkeypatch.setattr(desktop.sync.repo, 'get_ideas', broken)
+    with pytest.raises(OSError):
+        desktop.sync.export_changeset(str(path))
+    assert list(tmp.glob('out.rnsync*')) == []
+    assert desktop.sync.journal.get_checkpoint('sync') is None
+
+    monkeypatch.undo()
+    progress = []
+    assert desktop.sync.export_changeset(str(path), progress=progress.append)['ideas'] == 3
+    assert progress == [3]
+    assert [p.name for p in tmp.glob('out.rnsync*')] == ['out.rnsync']
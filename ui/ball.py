@@ -3,11 +3,59 @@
 import math
 import random
 from PyQt5.QtWidgets import QWidget, QMenu
-from PyQt5.QtCore import Qt, pyqtSignal, QPoint, QTimer, QRectF
-from PyQt5.QtGui import (QPainter, QColor, QPen, QBrush, 
+from PyQt5.QtCore import Qt, pyqtSignal, QObject, QPoint, QPointF, QTimer, QRectF, QElapsedTimer
+from PyQt5.QtGui import (QPainter, QColor, QPen, QBrush, QPixmap,
                          QLinearGradient, QPainterPath, QPolygonF)
 from core.settings import save_setting
 
+# 动画参数原本按 16ms 一帧调校，按真实间隔换算成帧数推进
+FRAME_MS = 16.0
+IDLE_FRAME_MS = 100
+# 窗口被挡住、系统休眠后恢复时，不一次推进过多
+MAX_STEP_MS = 100.0
+
+
+class AnimationScheduler(QObject):
+    """
+    按需驱动动画的计时器，三种模式：
+    - active：书写、拖入悬停或仍在回弹时 60fps
+    - idle：只剩待机摆动，低帧率
+    - paused：不可见时完全停止
+    tick(帧数) 给出距上一帧经过了多少个 16ms 帧（可为小数）。
+    """
+    tick = pyqtSignal(float)
+
+    ACTIVE, IDLE, PAUSED = 'active', 'idle', 'paused'
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.mode = self.PAUSED
+        self._timer = QTimer(self)
+        self._timer.timeout.connect(self._on_timeout)
+        self._clock = QElapsedTimer()
+
+    def set_mode(self, mode):
+        if mode == self.mode: return
+        self.mode = mode
+        if mode == self.PAUSED:
+            self._timer.stop()
+            return
+        if mode == self.ACTIVE:
+            self._timer.setTimerType(Qt.PreciseTimer)
+            self._timer.setInterval(int(FRAME_MS))
+        else:
+            # 粗粒度计时器允许系统合并唤醒
+            self._timer.setTimerType(Qt.CoarseTimer)
+            self._timer.setInterval(IDLE_FRAME_MS)
+        if not self._timer.isActive():
+            self._clock.start()
+        self._timer.start()
+
+    def _on_timeout(self):
+        elapsed = min(float(self._clock.restart()), MAX_STEP_MS)
+        self.tick.emit(elapsed / FRAME_MS)
+
+
 class FloatingBall(QWidget):
     request_show_quick_window = pyqtSignal()
     request_show_main_window = pyqtSignal()
@@ -21,6 +69,9 @@ class FloatingBall(QWidget):
     SKIN_MATCHA = 3  # 抹茶绿 (清新风) - 新增
     SKIN_OPEN = 4    # 摊开手稿 (沉浸风)
 
+    # (皮肤, 设备像素比) -> 阴影与笔记本的静态图层；笔记本只会整体上下浮动，不必每帧重画
+    _book_layers = {}
+
     def __init__(self, main_window):
         super().__init__()
         self.mw = main_window 
@@ -47,23 +98,47 @@ class FloatingBall(QWidget):
         
         # 粒子
         self.particles = [] 
+        # 上一次请求重绘时的画面状态，待机时画面没有可见变化就不重绘
+        self._last_frame = None
 
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self._update_physics)
-        self.timer.start(16) 
+        # 显示后才开始计时，见 showEvent
+        self.scheduler = AnimationScheduler(self)
+        self.scheduler.tick.connect(self._update_physics)
 
     def trigger_clipboard_feedback(self):
         """触发记录成功特效"""
         self.is_writing = True
         self.write_timer = 0
+        self._reschedule()
 
     def switch_skin(self, skin_id):
         """切换皮肤并刷新"""
         self.current_skin = skin_id
         self.update()
 
-    def _update_physics(self):
-        self.time_step += 0.05
+    def _needs_full_rate(self):
+        """书写、悬停，或笔和粒子还没回到待机状态时需要全帧率"""
+        if self.is_writing or self.is_hovering or self.particles: return True
+        return abs(self.pen_angle + 45) > 0.5 or abs(self.pen_x) > 0.5 or self.book_y < -2.5
+
+    def _reschedule(self):
+        if not self.isVisible():
+            self.scheduler.set_mode(AnimationScheduler.PAUSED)
+        elif self._needs_full_rate():
+            self.scheduler.set_mode(AnimationScheduler.ACTIVE)
+        else:
+            self.scheduler.set_mode(AnimationScheduler.IDLE)
+
+    def showEvent(self, e):
+        super().showEvent(e)
+        self._reschedule()
+
+    def hideEvent(self, e):
+        super().hideEvent(e)
+        self.scheduler.set_mode(AnimationScheduler.PAUSED)
+
+    def _update_physics(self, frames=1.0):
+        self.time_step += 0.05 * frames
         
         # 1. 待机悬浮 (Breathing)
         # 不同的书可能有不同的悬浮重心，但动画逻辑通用
@@ -76,7 +151,7 @@ class FloatingBall(QWidget):
         
         # 2. 书写动画 (Fluid Signature Flow) - 适用于所有皮肤
         if self.is_writing or self.is_hovering:
-            self.write_timer += 1
+            self.write_timer += frames
             
             # 笔立起来
             target_pen_angle = -65 
@@ -93,8 +168,8 @@ class FloatingBall(QWidget):
             if self.is_writing and self.write_timer > 90: 
                 self.is_writing = False
         
-        # 3. 物理平滑
-        easing = 0.1
+        # 3. 物理平滑（每 16ms 逼近 10%，按经过的帧数折算）
+        easing = 1.0 - 0.9 ** frames
         self.pen_angle += (target_pen_angle - self.pen_angle) * easing
         self.pen_x += (target_pen_x - self.pen_x) * easing
         self.pen_y += (target_pen_y - self.pen_y) * easing
@@ -102,7 +177,13 @@ class FloatingBall(QWidget):
 
         # 4. 粒子更新
         self._update_particles()
-        self.update()
+
+        # 笔记本图层按整像素绘制，笔的位置精确到 1/4 像素
+        frame = (round(self.book_y), round(self.pen_x * 4), round(self.pen_y * 4), round(self.pen_angle * 4))
+        if self.particles or frame != self._last_frame:
+            self._last_frame = frame
+            self.update()
+        self._reschedule()
 
     def _update_particles(self):
         # 只有在书写时产生
@@ -133,16 +214,25 @@ class FloatingBall(QWidget):
                 alive.append(p)
         self.particles = alive
 
-    def paintEvent(self, e):
-        p = QPainter(self)
-        p.setRenderHint(QPainter.Antialiasing)
-        
-        w, h = self.width(), self.height()
-        cx, cy = w / 2, h / 2
-        
+    def _book_layer(self):
+        dpr = self.devicePixelRatioF()
+        key = (self.current_skin, dpr)
+        layer = self._book_layers.get(key)
+        if layer is None:
+            layer = QPixmap(int(self.width() * dpr), int(self.height() * dpr))
+            layer.setDevicePixelRatio(dpr)
+            layer.fill(Qt.transparent)
+            p = QPainter(layer)
+            p.setRenderHint(QPainter.Antialiasing)
+            self._paint_book(p, self.width() / 2, self.height() / 2)
+            p.end()
+            self._book_layers[key] = layer
+        return layer
+
+    def _paint_book(self, p, cx, cy):
         # --- 1. 绘制阴影 (通用) ---
         p.save()
-        p.translate(cx, cy + self.book_y + 15)
+        p.translate(cx, cy + 15)
         p.setPen(Qt.NoPen)
         p.setBrush(QColor(0, 0, 0, 40))
         p.drawEllipse(QRectF(-35, -10, 70, 20))
@@ -150,7 +240,7 @@ class FloatingBall(QWidget):
 
         # --- 2. 绘制笔记本 (根据皮肤) ---
         p.save()
-        p.translate(cx, cy + self.book_y)
+        p.translate(cx, cy)
         # 大部分本子微倾斜，除了摊开的
         if self.current_skin != self.SKIN_OPEN:
             p.rotate(-6)
@@ -167,6 +257,16 @@ class FloatingBall(QWidget):
             self._draw_book_open(p)
         p.restore()
 
+    def paintEvent(self, e):
+        p = QPainter(self)
+        p.setRenderHint(QPainter.Antialiasing)
+        
+        w, h = self.width(), self.height()
+        cx, cy = w / 2, h / 2
+        
+        # --- 1~2. 阴影与笔记本：缓存的静态图层 ---
+        p.drawPixmap(QPointF(0, round(self.book_y)), self._book_layer())
+
         # --- 3. 绘制笔的投影 ---
         p.save()
         p.translate(cx + self.pen_x + 5, cy + self.book_y - 2 + self.pen_y * 0.5) 
@@ -349,6 +449,7 @@ class FloatingBall(QWidget):
         if e.mimeData().hasText():
             e.accept()
             self.is_hovering = True
+            self._reschedule()
         else:
             e.ignore()
 
@@ -368,6 +469,7 @@ class FloatingBall(QWidget):
             self.dragging = True
             self.offset = e.pos()
             self.pen_y += 3
+            self.update()
 
     def mouseMoveEvent(self, e):
         if self.dragging:
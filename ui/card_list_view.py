@@ -9,6 +9,9 @@ from ui.flow_layout import FlowLayout
 from ui.utils import create_svg_icon
 from core.config import COLORS
 
+# 卡片池中最多保留的空闲卡片数（超出的直接销毁）
+CARD_POOL_LIMIT = 200
+
 class ContentContainer(QWidget):
     cleared = pyqtSignal()
     def mousePressEvent(self, e):
@@ -36,6 +39,11 @@ class CardListView(QScrollArea):
         self.db = service 
         self.cards = {}
         self.ordered_ids = []
+        # 空闲卡片：翻页、筛选时收回复用，换数据只刷新变化的部分，不重新构建
+        self._card_pool = []
+        # 选中集合（MainWindow 持有的同一个 set）与当前画成选中状态的卡片 id
+        self._selected_ids = set()
+        self._shown_selected = set()
         
         # 内部记录复选框状态，防止重绘时丢失
         self._recursive_checked = False
@@ -69,10 +77,17 @@ class CardListView(QScrollArea):
         self._recursive_checked = checked
 
     def clear_all(self):
-        """完全清空并销毁所有组件"""
+        """清空视图：卡片收回卡片池，其余组件销毁"""
+        for card in self._detach_all().values():
+            self._release_card(card)
+
+    def _detach_all(self):
+        """从布局中取下所有组件，返回原来的 {id: 卡片}（未隐藏，可直接复用）"""
+        cards = self.cards
         while self.layout.count():
             item = self.layout.takeAt(0)
             if item.widget():
+                if isinstance(item.widget(), IdeaCard): continue
                 item.widget().hide()
                 item.widget().deleteLater()
             elif item.layout():
@@ -81,6 +96,30 @@ class CardListView(QScrollArea):
                 
         self.cards = {}
         self.ordered_ids = []
+        self._shown_selected = set()
+        return cards
+
+    def _acquire_card(self, data):
+        if self._card_pool:
+            card = self._card_pool.pop()
+            card.update_data(data)
+            return card
+        card = IdeaCard(data, self.db)
+        card.get_selected_ids_func = self._selected_id_list
+        card.selection_requested.connect(self.card_selection_requested)
+        card.double_clicked.connect(self.card_double_clicked)
+        card.setContextMenuPolicy(Qt.CustomContextMenu)
+        # 卡片会被复用，id 在触发时读取
+        card.customContextMenuRequested.connect(lambda pos, card=card: self.card_context_menu_requested.emit(card.id, pos))
+        return card
+
+    def _release_card(self, card):
+        self.layout.removeWidget(card)
+        card.hide()
+        if len(self._card_pool) < CARD_POOL_LIMIT:
+            self._card_pool.append(card)
+        else:
+            card.deleteLater()
 
     def _clear_layout(self, layout):
         while layout.count():
@@ -100,9 +139,16 @@ class CardListView(QScrollArea):
         渲染内容：
         1. 顶部的分组区域 (GroupCard) + 复选框
         2. 底部的笔记区域 (IdeaCard)
+        重绘期间暂停界面刷新；已显示的同一条笔记沿用原卡片，其余从卡片池取出后换绑数据。
         """
-        self.clear()
-        
+        self.setUpdatesEnabled(False)
+        try:
+            self._render_cards(data_list, sub_folders)
+        finally:
+            self.setUpdatesEnabled(True)
+
+    def _render_cards(self, data_list, sub_folders):
+        previous = self._detach_all()
         has_content = False
         
         # --- 1. 渲染子分组 (Group Area) ---
@@ -166,14 +212,18 @@ class CardListView(QScrollArea):
             # 笔记列表 (垂直布局)
             for d in data_list:
                 iid = d['id']
-                c = IdeaCard(d, self.db)
-                c.selection_requested.connect(self.card_selection_requested)
-                c.double_clicked.connect(self.card_double_clicked)
-                c.setContextMenuPolicy(Qt.CustomContextMenu)
-                c.customContextMenuRequested.connect(lambda pos, iid=iid: self.card_context_menu_requested.emit(iid, pos))
+                c = previous.pop(iid, None)
+                if c is not None: c.update_data(d)
+                else: c = self._acquire_card(d)
                 self.cards[iid] = c
                 self.layout.addWidget(c)
+                c.show()
+                c.update_selection(iid in self._selected_ids)
                 self.ordered_ids.append(iid)
+            self._shown_selected = {iid for iid in self.cards if iid in self._selected_ids}
+                
+        for card in previous.values():
+            self._release_card(card)
                 
         # --- 3. 空状态 ---
         if not has_content:
@@ -207,12 +257,19 @@ class CardListView(QScrollArea):
         if idea_id in self.cards:
             card = self.cards.pop(idea_id)
             if idea_id in self.ordered_ids: self.ordered_ids.remove(idea_id)
-            self.layout.removeWidget(card)
-            card.hide(); card.deleteLater()
+            self._shown_selected.discard(idea_id)
+            self._release_card(card)
 
     def update_all_selections(self, selected_ids):
-        for iid, card in self.cards.items():
-            card.update_selection(iid in selected_ids)
-            card.get_selected_ids_func = lambda: list(selected_ids)
+        """与上次显示的选中集合比较，只重绘状态翻转的卡片"""
+        self._selected_ids = selected_ids
+        shown = {iid for iid in selected_ids if iid in self.cards}
+        for iid in shown ^ self._shown_selected:
+            self.cards[iid].update_selection(iid in shown)
+        self._shown_selected = shown
+
+    def _selected_id_list(self):
+        # 拖拽时读取，始终反映最新的选中集合
+        return list(self._selected_ids)
 
     def recalc_layout(self): pass
\ No newline at end of file
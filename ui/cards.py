@@ -2,10 +2,14 @@
 # ui/cards.py
 import sys
 from PyQt5.QtWidgets import QFrame, QVBoxLayout, QHBoxLayout, QLabel, QApplication, QSizePolicy, QWidget
-from PyQt5.QtCore import Qt, pyqtSignal, QMimeData, QSize, QPoint
-from PyQt5.QtGui import QDrag, QPixmap, QImage, QPainter
+from PyQt5.QtCore import Qt, pyqtSignal, QMimeData, QSize, QPoint, QRectF
+from PyQt5.QtGui import QDrag, QPixmap, QImage, QPainter, QPen
 from core.config import STYLES, COLORS
-from ui.utils import create_svg_icon
+from ui.utils import create_svg_icon, highlight_html, star_strip_pixmap
+
+_UNSET = object()
+# 卡片中图片的最大显示尺寸（预取时按此尺寸生成缩略图）
+IMAGE_PREVIEW_SIZE = (600, 300)
 
 class IdeaCard(QFrame):
     selection_requested = pyqtSignal(int, bool, bool)
@@ -26,17 +30,25 @@ class IdeaCard(QFrame):
         
         self._drag_start_pos = None
         self._is_potential_click = False
+        self._selected = False
         self.get_selected_ids_func = None
         
         self._setup_ui_structure()
         self.update_data(data)
 
     def update_data(self, data):
+        """绑定数据；卡片池复用卡片时也调用此方法，只刷新与上次不同的部分"""
+        if data['id'] != getattr(self, 'id', None):
+            # 换绑到另一条笔记：选中状态由 CardListView 重新设置
+            self.update_selection(False)
         self.data = data
         # 使用键名访问，确保 ID 获取正确
         self.id = data['id']
         self._refresh_ui_content()
 
+    def _field(self, name, default=None):
+        return self.data[name] if name in self.data.keys() else default
+
     def _setup_ui_structure(self):
         self.main_layout = QVBoxLayout(self)
         self.main_layout.setContentsMargins(15, 12, 15, 12)
@@ -80,6 +92,21 @@ class IdeaCard(QFrame):
         self.content_layout.setContentsMargins(0,0,0,0)
         self.main_layout.addWidget(self.content_widget)
 
+        # 图片与文字预览各一个标签，换数据时只改内容与显隐
+        self.image_label = QLabel()
+        self.image_label.setStyleSheet("background: transparent;")
+        self.image_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.image_label.hide()
+        self.content_layout.addWidget(self.image_label)
+
+        self.preview_label = QLabel()
+        self.preview_label.setStyleSheet("color: rgba(255,255,255,180); margin-top: 4px; background: transparent; font-size: 13px; line-height: 1.5;")
+        self.preview_label.setWordWrap(True)
+        self.preview_label.setAlignment(Qt.AlignTop | Qt.AlignLeft)
+        self.preview_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Minimum)
+        self.preview_label.hide()
+        self.content_layout.addWidget(self.preview_label)
+
         # 3. 底部区域
         bot_layout = QHBoxLayout()
         bot_layout.setSpacing(6)
@@ -94,146 +121,188 @@ class IdeaCard(QFrame):
         self.tags_layout = QHBoxLayout()
         self.tags_layout.setSpacing(4)
         bot_layout.addLayout(self.tags_layout)
+        self.tag_labels = []
+        self.more_tags_label = None
         
         self.main_layout.addLayout(bot_layout)
 
+        # 各区域上次渲染时的输入，相同则跳过
+        self._shown = {}
+
+    def _changed(self, part, key):
+        if self._shown.get(part, _UNSET) == key: return False
+        self._shown[part] = key
+        return True
+
     def _refresh_ui_content(self):
+        # 搜索时 MainWindow 会附带 search_hl = (标记后的标题, 正文片段)
+        search_hl = self._field('search_hl')
+
         # 使用键名访问，防止索引错位
-        self.title_label.setText(self.data['title'])
+        title_hl = search_hl[0] if search_hl else None
+        if self._changed('title', (self.data['title'], title_hl)):
+            if title_hl:
+                self.title_label.setTextFormat(Qt.RichText)
+                self.title_label.setText(highlight_html(title_hl))
+            else:
+                self.title_label.setTextFormat(Qt.PlainText)
+                self.title_label.setText(self.data['title'])
         
         # 安全获取字段
-        rating = self.data['rating'] if 'rating' in self.data.keys() else 0
-        is_locked = self.data['is_locked'] if 'is_locked' in self.data.keys() else 0
+        rating = self._field('rating', 0)
+        is_locked = self._field('is_locked', 0)
         is_pinned = self.data['is_pinned']
         is_favorite = self.data['is_favorite']
 
         # 星级
-        if rating and rating > 0:
-            self.rating_label.setPixmap(self._generate_stars_pixmap(rating))
-            self.rating_label.show()
-        else:
-            self.rating_label.hide()
+        if self._changed('rating', rating):
+            if rating and rating > 0:
+                self.rating_label.setPixmap(self._generate_stars_pixmap(rating))
+                self.rating_label.show()
+            else:
+                self.rating_label.hide()
             
         # 锁定 (绿色图标)
-        if is_locked:
-            self.lock_icon.setPixmap(create_svg_icon("lock.svg", COLORS['success']).pixmap(14, 14))
-            self.lock_icon.show()
-        else:
-            self.lock_icon.hide()
+        if self._changed('locked', bool(is_locked)):
+            if is_locked:
+                self.lock_icon.setPixmap(create_svg_icon("lock.svg", COLORS['success']).pixmap(14, 14))
+                self.lock_icon.show()
+            else:
+                self.lock_icon.hide()
 
         # 置顶 (红色实心图标)
-        if is_pinned:
-            self.pin_icon.setPixmap(create_svg_icon("pin_vertical.svg", "#e74c3c").pixmap(14, 14))
-            self.pin_icon.show()
-        else:
-            self.pin_icon.hide()
+        if self._changed('pinned', bool(is_pinned)):
+            if is_pinned:
+                self.pin_icon.setPixmap(create_svg_icon("pin_vertical.svg", "#e74c3c").pixmap(14, 14))
+                self.pin_icon.show()
+            else:
+                self.pin_icon.hide()
 
         # 书签 (核心修复：背景是粉色，所以图标必须是白色，否则看不见)
-        if is_favorite:
-            self.fav_icon.setPixmap(create_svg_icon("bookmark.svg", "#ff6b81").pixmap(14, 14))
-            self.fav_icon.show()
-        else:
-            self.fav_icon.hide()
+        if self._changed('favorite', bool(is_favorite)):
+            if is_favorite:
+                self.fav_icon.setPixmap(create_svg_icon("bookmark.svg", "#ff6b81").pixmap(14, 14))
+                self.fav_icon.show()
+            else:
+                self.fav_icon.hide()
 
         # 内容渲染
-        while self.content_layout.count():
-            item = self.content_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
-        
         item_type = self.data['item_type'] or 'text'
-        
-        if item_type == 'image' and self.data['data_blob']:
-            pixmap = QPixmap()
-            pixmap.loadFromData(self.data['data_blob'])
-            if not pixmap.isNull():
-                img_label = QLabel()
-                scaled_pixmap = pixmap.scaled(QSize(600, 300), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                img_label.setPixmap(scaled_pixmap)
-                img_label.setStyleSheet("background: transparent;")
-                img_label.setAlignment(Qt.AlignLeft | Qt.AlignTop)
-                self.content_layout.addWidget(img_label)
-                
-        elif self.data['content']:
-            preview_text = self.data['content'].strip()[:300].replace('\n', ' ')
-            if len(self.data['content']) > 300: preview_text += "..."
-            content = QLabel(preview_text)
-            content.setStyleSheet("color: rgba(255,255,255,180); margin-top: 4px; background: transparent; font-size: 13px; line-height: 1.5;")
-            content.setWordWrap(True)
-            content.setAlignment(Qt.AlignTop | Qt.AlignLeft)
-            content.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Minimum)
-            self.content_layout.addWidget(content)
+        blob = self._field('data_blob') if item_type == 'image' else None
+        snippet = search_hl[1] if search_hl else None
+        if self._changed('content', (item_type, blob, snippet, None if blob else self.data['content'])):
+            self._refresh_content(blob, snippet)
 
         # 时间 (带时钟符号)
-        self.time_label.setText(f'{self.data["updated_at"][:16]}')
-        
-        # 标签
-        while self.tags_layout.count():
-            item = self.tags_layout.takeAt(0)
-            if item.widget(): item.widget().deleteLater()
+        if self._changed('time', self.data['updated_at']):
+            self.time_label.setText(f'{self.data["updated_at"][:16]}')
         
         # 优先使用预加载的标签，避免 N+1 查询
-        if 'tags' in self.data:
+        if 'tags' in self.data.keys():
             tags = self.data['tags']
         else:
             tags = self.db.get_tags(self.id)
-            
-        limit = 6 
-        for i, tag in enumerate(tags):
-            if i >= limit:
-                more_label = QLabel(f'+{len(tags) - limit}')
-                more_label.setStyleSheet(f"background: rgba(74,144,226,0.3); border-radius: 4px; padding: 2px 6px; font-size: 10px; color: {COLORS['primary']}; font-weight:bold;")
-                self.tags_layout.addWidget(more_label)
-                break
-            tag_label = QLabel(f"#{tag}")
+        if self._changed('tags', tuple(tags)):
+            self._refresh_tags(tags)
+
+        self._apply_style()
+
+    def _refresh_content(self, blob, snippet):
+        pixmap = None
+        if blob:
+            pixmap = QPixmap()
+            pixmap.loadFromData(blob)
+            if pixmap.isNull(): pixmap = None
+        if pixmap is not None:
+            self.image_label.setPixmap(pixmap.scaled(QSize(*IMAGE_PREVIEW_SIZE), Qt.KeepAspectRatio, Qt.SmoothTransformation))
+            self.image_label.show()
+            self.preview_label.hide()
+            return
+        self.image_label.hide()
+        self.image_label.clear()
+
+        if blob is None and snippet:
+            # 搜索命中片段：只显示命中位置附近的内容
+            self.preview_label.setTextFormat(Qt.RichText)
+            self.preview_label.setText(highlight_html(snippet))
+            self.preview_label.show()
+        elif blob is None and self.data['content']:
+            preview_text = self.data['content'].strip()[:300].replace('\n', ' ')
+            if len(self.data['content']) > 300: preview_text += "..."
+            self.preview_label.setTextFormat(Qt.AutoText)
+            self.preview_label.setText(preview_text)
+            self.preview_label.show()
+        else:
+            self.preview_label.hide()
+
+    def _refresh_tags(self, tags):
+        limit = 6
+        shown = list(tags[:limit])
+        while len(self.tag_labels) < len(shown):
+            tag_label = QLabel()
             tag_label.setStyleSheet("background: rgba(255,255,255,0.1); border-radius: 4px; padding: 2px 6px; font-size: 10px; color: rgba(255,255,255,180);")
-            self.tags_layout.addWidget(tag_label)
+            self.tags_layout.insertWidget(len(self.tag_labels), tag_label)
+            self.tag_labels.append(tag_label)
+        for i, tag_label in enumerate(self.tag_labels):
+            if i < len(shown):
+                tag_label.setText(f"#{shown[i]}")
+                tag_label.show()
+            else:
+                tag_label.hide()
 
-        self.update_selection(False)
+        if len(tags) > limit:
+            if self.more_tags_label is None:
+                self.more_tags_label = QLabel()
+                self.more_tags_label.setStyleSheet(f"background: rgba(74,144,226,0.3); border-radius: 4px; padding: 2px 6px; font-size: 10px; color: {COLORS['primary']}; font-weight:bold;")
+                self.tags_layout.addWidget(self.more_tags_label)
+            self.more_tags_label.setText(f'+{len(tags) - limit}')
+            self.more_tags_label.show()
+        elif self.more_tags_label is not None:
+            self.more_tags_label.hide()
 
     def _generate_stars_pixmap(self, rating):
-        star_size = 12
-        spacing = 2
-        total_width = (star_size * rating) + (spacing * (rating - 1))
-        pixmap = QPixmap(total_width, star_size)
-        pixmap.fill(Qt.transparent)
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.Antialiasing)
-        star_icon = create_svg_icon("star_filled.svg", COLORS['warning'])
-        for i in range(rating):
-            x = i * (star_size + spacing)
-            star_icon.paint(painter, x, 0, star_size, star_size)
-        painter.end()
-        return pixmap
+        # 星级条由图集统一生成并缓存，同一评级的卡片共用一张
+        return star_strip_pixmap(rating, COLORS['warning'], dpr=self.devicePixelRatioF())
 
-    def update_selection(self, selected):
+    def _apply_style(self):
+        # 样式表只随颜色变化；重设会触发整张卡片及其子控件重新计算样式
         bg_color = self.data['color']
-        base_style = f"""
+        if not self._changed('style', bg_color): return
+        self.setStyleSheet(f"""
             IdeaCard {{
                 background-color: {bg_color};
                 border-radius: 8px;
                 padding: 0px;
+                border: 1px solid rgba(255,255,255,0.05);
+            }}
+            IdeaCard:hover {{
+                border: 1px solid rgba(255,255,255,0.3);
             }}
             QLabel {{
                 background-color: transparent;
                 border: none;
             }}
-        """
-        if selected:
-            border_style = "border: 2px solid white;"
-        else:
-            border_style = "border: 1px solid rgba(255,255,255,0.05);"
-            
-        final_style = base_style + f"""
-            IdeaCard {{ {border_style} }}
-            IdeaCard:hover {{
-                border: 1px solid rgba(255,255,255,0.3);
-            }}
-        """
-        if selected:
-            final_style += "IdeaCard:hover { border: 2px solid white; }"
-            
-        self.setStyleSheet(final_style)
+        """)
+
+    def update_selection(self, selected):
+        """选中边框在 paintEvent 中绘制，状态不变时什么也不做"""
+        selected = bool(selected)
+        if selected == self._selected: return
+        self._selected = selected
+        self.update()
+
+    def is_selected(self):
+        return self._selected
+
+    def paintEvent(self, e):
+        super().paintEvent(e)
+        if not self._selected: return
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(QPen(Qt.white, 2))
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRoundedRect(QRectF(self.rect()).adjusted(1, 1, -1, -1), 8, 8)
+        painter.end()
 
     def mousePressEvent(self, e):
         if e.button() == Qt.LeftButton:
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# ui/components/highlight_delegate.py
+
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyleOptionViewItem, QStyle, QApplication
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QTextDocument, QAbstractTextDocumentLayout, QPalette
+
+# 列表项上保存搜索高亮富文本的数据角色
+HIGHLIGHT_ROLE = Qt.UserRole + 1
+
+
+class HighlightDelegate(QStyledItemDelegate):
+    """
+    列表项带有 HIGHLIGHT_ROLE 富文本时按富文本绘制（搜索命中高亮），
+    否则走默认绘制。背景、选中态、图标仍由当前样式负责。
+    """
+
+    def paint(self, painter, option, index):
+        html = index.data(HIGHLIGHT_ROLE)
+        if not html:
+            super().paint(painter, option, index)
+            return
+
+        opt = QStyleOptionViewItem(option)
+        self.initStyleOption(opt, index)
+        style = opt.widget.style() if opt.widget else QApplication.style()
+
+        # 先画不含文字的条目（背景、选中态、图标），再把富文本画进文字区域
+        opt.text = ''
+        style.drawControl(QStyle.CE_ItemViewItem, opt, painter, opt.widget)
+        text_rect = style.subElementRect(QStyle.SE_ItemViewItemText, opt, opt.widget)
+
+        doc = QTextDocument()
+        doc.setDefaultFont(opt.font)
+        doc.setDocumentMargin(0)
+        doc.setHtml(html)
+
+        ctx = QAbstractTextDocumentLayout.PaintContext()
+        role = QPalette.HighlightedText if opt.state & QStyle.State_Selected else QPalette.Text
+        ctx.palette.setColor(QPalette.Text, opt.palette.color(role))
+
+        painter.save()
+        top = text_rect.top() + (text_rect.height() - doc.size().height()) / 2
+        painter.translate(text_rect.left(), top)
+        painter.setClipRect(0, 0, text_rect.width(), text_rect.height())
+        doc.documentLayout().draw(painter, ctx)
+        painter.restore()
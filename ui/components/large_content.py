@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# ui/components/large_content.py
+"""
+大文本与大图片的显示。
+
+- 超过 LARGE_TEXT_THRESHOLD 字符的文本不再整段塞进富文本 QTextEdit，而是用不带高亮的
+  QPlainTextEdit 显示，由定时器每轮追加一块，首屏立即可见，界面在加载过程中保持响应。
+- 图片按显示尺寸解码：QImageReader.setScaledSize 让解码器直接输出缩小后的图像，
+  不必先生成原尺寸位图再缩放。
+- 缩略图：按显示尺寸解码后重新编码，缓存中只保留小图。
+"""
+from PyQt5.QtWidgets import QPlainTextEdit
+from PyQt5.QtGui import QImageReader, QTextCursor
+from PyQt5.QtCore import Qt, QObject, QTimer, QBuffer, QByteArray, QIODevice, pyqtSignal
+
+# 按字符数判断；20 MB 的日志远超此值，普通笔记远低于此值
+LARGE_TEXT_THRESHOLD = 256 * 1024
+LOAD_CHUNK_CHARS = 64 * 1024
+
+
+def is_large_text(text):
+    return bool(text) and len(text) >= LARGE_TEXT_THRESHOLD
+
+
+def read_scaled_image(source, max_width, max_height=None):
+    """
+    source 为二进制数据或文件路径。图片超出 max_width x max_height 时按比例缩小解码，
+    max_height 为 None 时只限制宽度。无法解码时返回空 QImage。
+    """
+    if isinstance(source, (bytes, bytearray, QByteArray)):
+        buffer = QBuffer()
+        buffer.setData(QByteArray(bytes(source)))
+        buffer.open(QIODevice.ReadOnly)
+        reader = QImageReader(buffer)
+    else:
+        buffer = None
+        reader = QImageReader(source)
+    reader.setAutoTransform(True)
+
+    size = reader.size()
+    max_width = max(1, int(max_width))
+    max_height = size.height() if max_height is None else max(1, int(max_height))
+    if size.isValid() and (size.width() > max_width or size.height() > max_height):
+        reader.setScaledSize(size.scaled(max_width, max_height, Qt.KeepAspectRatio))
+    image = reader.read()
+    if buffer is not None: buffer.close()
+    return image
+
+
+def encode_thumbnail(source, max_width, max_height):
+    """
+    缩小到 max_width x max_height 以内后重新编码（有透明通道用 PNG，否则 JPEG），返回字节；
+    无法解码时返回 None。只用 QImage，可在工作线程中调用。
+    """
+    image = read_scaled_image(source, max_width, max_height)
+    if image.isNull(): return None
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if image.hasAlphaChannel(): image.save(buffer, 'PNG')
+    else: image.save(buffer, 'JPG', 90)
+    buffer.close()
+    return bytes(data)
+
+
+class ChunkedTextLoader(QObject):
+    """把长文本分块追加到 QPlainTextEdit，每个事件循环周期一块；加载期间关闭撤销记录"""
+    finished = pyqtSignal()
+
+    def __init__(self, editor, chunk_chars=LOAD_CHUNK_CHARS):
+        super().__init__(editor)
+        self.editor = editor
+        self.chunk_chars = chunk_chars
+        self._text = ''
+        self._pos = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(0)
+        self._timer.timeout.connect(self._append_next)
+
+    def load(self, text):
+        self._timer.stop()
+        self._text = text or ''
+        self._pos = 0
+        self.editor.setUndoRedoEnabled(False)
+        self.editor.clear()
+        # 第一块同步追加，窗口显示时已有首屏内容
+        self._append_next()
+        if self.is_loading(): self._timer.start()
+
+    def is_loading(self):
+        return self._pos < len(self._text)
+
+    def finish(self):
+        """立即追加剩余全部内容（保存或复制全文前调用）"""
+        if self.is_loading(): self._append(len(self._text))
+
+    def cancel(self):
+        self._timer.stop()
+        self._text, self._pos = '', 0
+
+    def _append_next(self):
+        end = min(self._pos + self.chunk_chars, len(self._text))
+        if end < len(self._text):
+            # 在换行处切块，避免把 \r\n 拆到两次插入中
+            newline = self._text.rfind('\n', self._pos, end)
+            if newline > self._pos: end = newline + 1
+        self._append(end)
+
+    def _append(self, end):
+        cursor = QTextCursor(self.editor.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(self._text[self._pos:end])
+        self._pos = end
+        if not self.is_loading():
+            self._timer.stop()
+            self._text, self._pos = '', 0
+            self.editor.setUndoRedoEnabled(True)
+            self.editor.document().setModified(False)
+            self.finished.emit()
+
+
+class LargeTextEdit(QPlainTextEdit):
+    """
+    大文本编辑器：纯文本、无语法高亮，内容分块加载。
+    提供与 RichTextEdit 相同的接口，编辑窗口的工具栏、查找与保存逻辑无需区分；
+    富文本相关的操作（列表、高亮、Markdown 预览、图片）在此模式下不生效。
+    """
+    is_markdown_preview = False
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.loader = ChunkedTextLoader(self)
+        self.setStyleSheet("""
+            QPlainTextEdit { border: none; color: #dddddd; }
+            QScrollBar:vertical { border: none; background: transparent; width: 6px; margin: 0px; }
+            QScrollBar::handle:vertical { background: #444; border-radius: 3px; min-height: 20px; }
+            QScrollBar::handle:vertical:hover { background: #555; }
+            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height: 0px; }
+            QScrollBar::add-page:vertical, QScrollBar::sub-page:vertical { background: none; }
+        """)
+
+    def load_text(self, text):
+        self.loader.load(text)
+
+    def setText(self, text):
+        self.load_text(text)
+
+    def setPlainText(self, text):
+        self.load_text(text)
+
+    def toPlainText(self):
+        # 加载尚未完成时先补齐，保证取到的是全文
+        self.loader.finish()
+        return super().toPlainText()
+
+    def toggle_markdown_preview(self): pass
+
+    def insert_todo(self):
+        cursor = self.textCursor()
+        if not cursor.atBlockStart(): cursor.insertText("\n")
+        cursor.insertText("- [ ] ")
+        self.setTextCursor(cursor)
+        self.setFocus()
+
+    def toggle_list(self, list_style): pass
+
+    def highlight_selection(self, color_str): pass
+
+    def get_image_data(self): return None
+
+    def set_image_data(self, data): pass
@@ -1,11 +1,13 @@
 # -*- coding: utf-8 -*-
 # ui/components/rich_text_edit.py
 
+import logging
 from PyQt5.QtWidgets import QTextEdit, QRubberBand
 from PyQt5.QtGui import QImage, QColor, QTextCharFormat, QTextCursor, QPainter, QTextImageFormat, QTextBlockFormat, QTextListFormat
 from PyQt5.QtCore import Qt, QByteArray, QBuffer, QIODevice, QPoint, QRect
-import markdown2
+from services.markdown_renderer import MarkdownRenderer
 from .syntax_highlighter import MarkdownHighlighter
+from .large_content import read_scaled_image
 
 class ImageResizer(QRubberBand):
     def __init__(self, parent=None, cursor=None, image_format=None):
@@ -83,6 +85,8 @@ class ImageResizer(QRubberBand):
         painter.drawRect(self.width()-10, self.height()-10, 10, 10)
 
 class RichTextEdit(QTextEdit):
+    RENDERING_HTML = '<p style="color:#888;">正在渲染预览…</p>'
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.image_data = None
@@ -93,6 +97,10 @@ class RichTextEdit(QTextEdit):
         
         self.is_markdown_preview = False
         self._source_text = ""
+        self._preview_seq = None
+        self.md_renderer = MarkdownRenderer(self)
+        self.md_renderer.rendered.connect(self._on_markdown_rendered)
+        self.md_renderer.failed.connect(self._on_markdown_failed)
 
         # 样式设置，确保背景色不干扰
         self.setStyleSheet("""
@@ -106,41 +114,39 @@ class RichTextEdit(QTextEdit):
 
     # --- Markdown 增强功能 ---
     def toggle_markdown_preview(self):
-        """切换 Markdown 源码编辑与 HTML 预览"""
+        """
+        切换 Markdown 源码编辑与 HTML 预览。
+        HTML 在后台线程渲染并按内容缓存，未改动的内容再次预览时立即显示。
+        """
         if not self.is_markdown_preview:
-            # 进入预览模式
+            # 进入预览模式：预览期间高亮器与文档解绑，不对 HTML 逐块高亮
             self._source_text = self.toPlainText()
-            try:
-                # 使用 markdown2 转 HTML
-                html_content = markdown2.markdown(
-                    self._source_text, 
-                    extras=["fenced-code-blocks", "tables", "strike", "task_list"]
-                )
-                
-                # 预览样式 CSS
-                css = """
-                <style>
-                    body { font-family: "Microsoft YaHei"; color: #ddd; font-size: 14px; }
-                    code { background-color: #333; padding: 2px 4px; border-radius: 3px; font-family: Consolas; color: #98C379; }
-                    pre { background-color: #1e1e1e; padding: 10px; border-radius: 5px; border: 1px solid #444; color: #ccc; }
-                    blockquote { border-left: 4px solid #569CD6; padding-left: 10px; color: #888; background: #252526; }
-                    a { color: #4a90e2; text-decoration: none; }
-                    table { border-collapse: collapse; width: 100%; }
-                    th, td { border: 1px solid #444; padding: 6px; }
-                    th { background-color: #333; }
-                </style>
-                """
-                self.setHtml(css + html_content)
-                self.setReadOnly(True)
-                self.is_markdown_preview = True
-            except Exception as e:
-                print(f"Markdown preview error: {e}")
+            self.highlighter.setDocument(None)
+            self.setReadOnly(True)
+            self.is_markdown_preview = True
+            seq, html_content = self.md_renderer.request(self._source_text)
+            self._preview_seq = seq
+            self.setHtml(html_content if html_content is not None else self.RENDERING_HTML)
         else:
             # 返回编辑模式
-            self.setReadOnly(False)
-            self.setPlainText(self._source_text)
-            self.highlighter.setDocument(self.document()) # 重新绑定高亮器
-            self.is_markdown_preview = False
+            self._leave_markdown_preview()
+
+    def _leave_markdown_preview(self):
+        self._preview_seq = None
+        self.md_renderer.cancel()
+        self.setReadOnly(False)
+        self.setPlainText(self._source_text)
+        self.highlighter.setDocument(self.document()) # 重新绑定高亮器
+        self.is_markdown_preview = False
+
+    def _on_markdown_rendered(self, seq, html_content):
+        if not self.is_markdown_preview or seq != self._preview_seq: return
+        self.setHtml(html_content)
+
+    def _on_markdown_failed(self, seq, error):
+        if not self.is_markdown_preview or seq != self._preview_seq: return
+        logging.error(f"Markdown preview error: {error}")
+        self._leave_markdown_preview()
 
     def insert_todo(self):
         """插入待办事项 Checkbox"""
@@ -262,18 +268,11 @@ class RichTextEdit(QTextEdit):
     def set_image_data(self, data):
         self.image_data = data
         if data:
-            image = QImage()
-            image.loadFromData(data)
+            # 按编辑区宽度直接解码，原图只以二进制形式保存在 image_data 中
+            image = read_scaled_image(data, self.viewport().width() - 40)
             if not image.isNull():
                 self.clear()
-                cursor = self.textCursor()
-                max_width = self.viewport().width() - 40
-                if image.width() > max_width:
-                    scale = max_width / image.width()
-                    scaled_image = image.scaled(int(max_width), int(image.height() * scale), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    cursor.insertImage(scaled_image)
-                else:
-                    cursor.insertImage(image)
+                self.textCursor().insertImage(image)
 
     def toggle_list(self, list_style):
         cursor = self.textCursor()
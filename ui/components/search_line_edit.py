@@ -3,9 +3,11 @@
 
 from PyQt5.QtWidgets import (QLineEdit, QPushButton, QHBoxLayout, QWidget, 
                              QVBoxLayout, QApplication, QLabel, QLayout, 
-                             QScrollArea, QFrame, QGraphicsDropShadowEffect, QSizePolicy)
+                             QScrollArea, QFrame, QGraphicsDropShadowEffect, QSizePolicy,
+                             QActionGroup)
 from PyQt5.QtCore import Qt, QSettings, QPoint, QRect, QSize, pyqtSignal, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QColor, QFont, QCursor
+from core.settings import load_setting, save_setting
 
 # --- 1. 流式布局 ---
 class FlowLayout(QLayout):
@@ -305,11 +307,92 @@ class SearchHistoryPopup(QWidget):
 class SearchLineEdit(QLineEdit):
     SETTINGS_KEY = "SearchHistoryList"
     MAX_HISTORY = 30
+    # 右键菜单切换：搜索结果按相关度 (bm25) 排序 / 按置顶+更新时间排序
+    RANKED_SETTING = "search_ranked"
+
+    # 右键菜单切换搜索模式：普通（查询语法）/ 全字匹配 / 正则表达式
+    MODE_SETTING = "search_mode"
+    MODE_LABELS = (('plain', "普通搜索"), ('word', "全字匹配"), ('regex', "正则表达式"))
+
+    # 右键菜单切换：不搜索时列表也显示已归档的笔记（搜索时总是包含归档库）
+    ARCHIVE_SETTING = "show_archived"
+
+    ranking_toggled = pyqtSignal(bool)
+    mode_changed = pyqtSignal(str)
+    archive_toggled = pyqtSignal(bool)
+
+    SYNTAX_TIP = (
+        "支持筛选语法，可与关键词组合：\n"
+        "tag:工作  type:image  rating>=3  color:#ff0000\n"
+        "in:\"项目/Alpha\"  after:2025-01-01  before:2025-02\n"
+        "is:pinned / is:favorite / is:locked\n"
+        "多个关键词需全部命中，\"双引号\" 括起的内容作为整体匹配"
+    )
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.settings = QSettings("KMain_V3", "KMain_V3")
         self.popup = None
+        self._base_placeholder = ''
+        self.setToolTip(self.SYNTAX_TIP)
+
+    def contextMenuEvent(self, event):
+        menu = self.createStandardContextMenu()
+        menu.addSeparator()
+        action = menu.addAction("按相关度排序搜索结果")
+        action.setCheckable(True)
+        action.setChecked(load_setting(self.RANKED_SETTING, True))
+        action.toggled.connect(self._on_ranking_toggled)
+
+        mode_menu = menu.addMenu("搜索模式")
+        group = QActionGroup(mode_menu)
+        current = self.search_mode()
+        for mode, label in self.MODE_LABELS:
+            mode_action = mode_menu.addAction(label)
+            mode_action.setCheckable(True)
+            mode_action.setChecked(mode == current)
+            mode_action.setActionGroup(group)
+            mode_action.triggered.connect(lambda _, m=mode: self._set_search_mode(m))
+
+        archive_action = menu.addAction("显示已归档笔记")
+        archive_action.setCheckable(True)
+        archive_action.setChecked(self.show_archived())
+        archive_action.toggled.connect(self._on_archive_toggled)
+        menu.exec_(event.globalPos())
+        menu.deleteLater()
+
+    def _on_ranking_toggled(self, checked):
+        save_setting(self.RANKED_SETTING, checked)
+        self.ranking_toggled.emit(checked)
+
+    @classmethod
+    def show_archived(cls):
+        return load_setting(cls.ARCHIVE_SETTING, False)
+
+    def _on_archive_toggled(self, checked):
+        save_setting(self.ARCHIVE_SETTING, checked)
+        self.archive_toggled.emit(checked)
+
+    @classmethod
+    def search_mode(cls):
+        return load_setting(cls.MODE_SETTING, 'plain')
+
+    def _set_search_mode(self, mode):
+        if mode == self.search_mode(): return
+        save_setting(self.MODE_SETTING, mode)
+        self._refresh_placeholder()
+        self.mode_changed.emit(mode)
+
+    def setPlaceholderText(self, text):
+        self._base_placeholder = text
+        self._refresh_placeholder()
+
+    def _refresh_placeholder(self):
+        # 非普通模式时在提示文字前标注当前模式，避免忘记切换回来
+        mode = self.search_mode()
+        label = dict(self.MODE_LABELS).get(mode)
+        text = self._base_placeholder if mode == 'plain' or not label else f"[{label}] {self._base_placeholder}"
+        super().setPlaceholderText(text)
 
     def mouseDoubleClickEvent(self, event):
         if event.button() == Qt.LeftButton:
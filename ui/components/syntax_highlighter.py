@@ -4,65 +4,69 @@
 import re
 from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QFont
 
-class MarkdownHighlighter(QSyntaxHighlighter):
-    def __init__(self, parent=None):
-        super().__init__(parent)
-        self.rules = []
+# 块状态：围栏代码块 (```) 跨越多行，用块状态把 "是否在代码块内" 传给下一行。
+# 某行状态变化时 Qt 才会继续重新高亮后续各行，普通编辑只重算当前行。
+STATE_NORMAL = 0
+STATE_IN_FENCE = 1
 
-        # --- 1. 标题 (Headers) ---
-        # 匹配 # 开头，蓝色，加粗
-        headerFormat = QTextCharFormat()
-        headerFormat.setForeground(QColor("#569CD6")) 
-        headerFormat.setFontWeight(QFont.Bold)
-        self.rules.append((re.compile(r"^#{1,6}\s.*"), headerFormat))
+# 整行类规则，只匹配行首，每行最多判断一次
+_FENCE = re.compile(r"^\s*```")
+_HEADER = re.compile(r"^#{1,6}\s")
+_QUOTE = re.compile(r"^\s*>")
+_LIST = re.compile(r"^\s*[\-\*]\s")
 
-        # --- 2. 粗体 (**bold**) ---
-        # 匹配 **中间的内容**，红色，加粗
-        boldFormat = QTextCharFormat()
-        boldFormat.setFontWeight(QFont.Bold)
-        boldFormat.setForeground(QColor("#E06C75")) 
-        self.rules.append((re.compile(r"\*\*.*?\*\*"), boldFormat))
+# 行内规则合并成一个正则，一遍扫描；分组名即格式名
+_INLINE = re.compile(
+    r"(?P<bold>\*\*.*?\*\*)"
+    r"|(?P<code>`[^`]+`)"
+    r"|(?P<unchecked>-\s\[\s\])"
+    r"|(?P<checked>-\s\[x\])"
+)
 
-        # --- 3. 待办事项 ([ ] [x]) ---
-        # 未完成，黄色
-        uncheckedFormat = QTextCharFormat()
-        uncheckedFormat.setForeground(QColor("#E5C07B")) 
-        self.rules.append((re.compile(r"-\s\[\s\]"), uncheckedFormat))
-        
-        # 已完成，绿色
-        checkedFormat = QTextCharFormat()
-        checkedFormat.setForeground(QColor("#6A9955")) 
-        self.rules.append((re.compile(r"-\s\[x\]"), checkedFormat))
 
-        # --- 4. 代码块 (``` ... ```) ---
-        # 绿色，等宽字体
-        codeFormat = QTextCharFormat()
-        codeFormat.setForeground(QColor("#98C379")) 
-        codeFormat.setFontFamily("Consolas") 
-        # 注意：这里处理简单的多行代码块会有局限，但在 QSyntaxHighlighter 中
-        # 使用多行正则比较复杂，这里先确保单行 ``` 和行内 `code` 能亮
-        self.rules.append((re.compile(r"`[^`]+`"), codeFormat)) 
-        self.rules.append((re.compile(r"```.*"), codeFormat)) # 简单的代码块头
+def _format(color, bold=False, italic=False, family=None):
+    fmt = QTextCharFormat()
+    fmt.setForeground(QColor(color))
+    if bold: fmt.setFontWeight(QFont.Bold)
+    if italic: fmt.setFontItalic(True)
+    if family: fmt.setFontFamily(family)
+    return fmt
 
-        # --- 5. 引用 (> Quote) ---
-        # 灰色，斜体
-        quoteFormat = QTextCharFormat()
-        quoteFormat.setForeground(QColor("#808080")) 
-        quoteFormat.setFontItalic(True)
-        self.rules.append((re.compile(r"^\s*>.*"), quoteFormat))
-        
-        # --- 6. 列表项 (- item) ---
-        # 紫色
-        listFormat = QTextCharFormat()
-        listFormat.setForeground(QColor("#C678DD")) 
-        self.rules.append((re.compile(r"^\s*[\-\*]\s"), listFormat))
+
+class MarkdownHighlighter(QSyntaxHighlighter):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.formats = {
+            'header': _format("#569CD6", bold=True),        # 标题 (# ...)：蓝色，加粗
+            'bold': _format("#E06C75", bold=True),          # 粗体 (**bold**)：红色，加粗
+            'unchecked': _format("#E5C07B"),                # 待办 [ ]：黄色
+            'checked': _format("#6A9955"),                  # 已完成 [x]：绿色
+            'code': _format("#98C379", family="Consolas"),  # 代码：绿色，等宽
+            'quote': _format("#808080", italic=True),       # 引用 (> ...)：灰色，斜体
+            'list': _format("#C678DD"),                     # 列表项 (- item)：紫色
+        }
 
     def highlightBlock(self, text):
-        """
-        使用 Python 的 re 模块进行匹配，速度快且语法支持全。
-        """
-        for pattern, format in self.rules:
-            # 使用 finditer 查找所有匹配项
-            for match in pattern.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, format)
\ No newline at end of file
+        in_fence = self.previousBlockState() == STATE_IN_FENCE
+
+        # 围栏行本身与代码块内部整行按代码显示，不再套用其它规则
+        if _FENCE.match(text):
+            self.setFormat(0, len(text), self.formats['code'])
+            self.setCurrentBlockState(STATE_NORMAL if in_fence else STATE_IN_FENCE)
+            return
+        if in_fence:
+            self.setFormat(0, len(text), self.formats['code'])
+            self.setCurrentBlockState(STATE_IN_FENCE)
+            return
+        self.setCurrentBlockState(STATE_NORMAL)
+
+        if _HEADER.match(text):
+            self.setFormat(0, len(text), self.formats['header'])
+        for match in _INLINE.finditer(text):
+            start, end = match.span()
+            self.setFormat(start, end - start, self.formats[match.lastgroup])
+        if _QUOTE.match(text):
+            self.setFormat(0, len(text), self.formats['quote'])
+        else:
+            match = _LIST.match(text)
+            if match: self.setFormat(0, match.end(), self.formats['list'])
@@ -5,13 +5,14 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QGridLayout, QHBoxLayout,
                               QLabel, QLineEdit, QTextEdit, QComboBox, QPushButton,
                               QProgressBar, QFrame, QApplication, QMessageBox, QShortcut,
                              QSpacerItem, QSizePolicy, QSplitter, QWidget, QScrollBar,
-                             QGraphicsDropShadowEffect, QCheckBox)
+                             QGraphicsDropShadowEffect, QCheckBox, QListWidget, QListWidgetItem, QPlainTextEdit)
 from PyQt5.QtGui import QKeySequence, QColor, QCursor, QTextDocument, QTextCursor, QTextListFormat, QTextCharFormat, QPixmap, QImage
 from PyQt5.QtCore import Qt, QPoint, QRect, QEvent, pyqtSignal
 from PyQt5.QtWidgets import QDesktopWidget
 from core.config import STYLES, COLORS
 from core.settings import save_setting, load_setting
 from .components.rich_text_edit import RichTextEdit
+from .components.large_content import LargeTextEdit, is_large_text, read_scaled_image
 from ui.utils import create_svg_icon
 
 class BaseDialog(QDialog):
@@ -257,6 +258,9 @@ class EditDialog(BaseDialog):
         header_layout.addWidget(btn_preview)
 
         c = _create_tool_btn("", "清除格式", lambda: self.content_inp.setCurrentCharFormat(QTextCharFormat())); c.setIcon(create_svg_icon("edit_clear.svg", '#ccc'))
+        # 历史版本（仅已保存过的笔记）
+        h = _create_tool_btn("", "历史版本", self._show_revisions); h.setIcon(create_svg_icon("clock.svg", '#ccc'))
+        h.setEnabled(bool(self.idea_id))
 
         header_layout.addStretch()
         
@@ -298,6 +302,7 @@ class EditDialog(BaseDialog):
         shortcut_search = QShortcut(QKeySequence("Ctrl+F"), self.content_inp)
         shortcut_search.activated.connect(self._toggle_search_bar)
         right_panel.addWidget(self.content_inp)
+        self.content_panel = right_panel
         
         self.splitter.addWidget(left_container); self.splitter.addWidget(right_container); self.splitter.setSizes([300, 650]); self.splitter.setStretchFactor(0, 0); self.splitter.setStretchFactor(1, 1)
         content_layout.addWidget(self.splitter)
@@ -436,11 +441,12 @@ class EditDialog(BaseDialog):
             if not self.content_inp.find(text, QTextDocument.FindBackward): self.content_inp.setTextCursor(curr)
 
     def _load_data(self):
-        d = self.db.get_idea(self.idea_id, include_blob=True)
+        d = self.db.open_idea(self.idea_id)
         if d:
             self.title_inp.setText(d[1])
             item_type = d[10] if len(d) > 10 else 'text'
-            if item_type != 'image': self.content_inp.setText(d[2])
+            if item_type != 'image' and is_large_text(d[2]): self._use_large_text_editor(d[2])
+            elif item_type != 'image': self.content_inp.setText(d[2])
             else: self.content_inp.clear()
             self._set_color(d[3])
             self.category_id = d[8]
@@ -451,6 +457,27 @@ class EditDialog(BaseDialog):
             if item_type == 'image' and data_blob: self.content_inp.set_image_data(data_blob)
             self.tags_inp.setText(','.join(self.db.get_tags(self.idea_id)))
 
+    def _use_large_text_editor(self, text):
+        """大文本改用纯文本编辑器分块加载，避免整段构建富文本文档卡住界面"""
+        editor = LargeTextEdit()
+        shortcut_search = QShortcut(QKeySequence("Ctrl+F"), editor)
+        shortcut_search.activated.connect(self._toggle_search_bar)
+        self.content_panel.replaceWidget(self.content_inp, editor)
+        self.content_inp.deleteLater()
+        self.content_inp = editor
+        editor.load_text(text)
+
+    def _show_revisions(self):
+        """选中的历史版本载入编辑区，保存后成为新的版本"""
+        if not self.idea_id: return
+        dlg = RevisionDialog(self.db, self.idea_id, self)
+        if dlg.exec_() != QDialog.Accepted or not dlg.selected: return
+        title, content = dlg.selected
+        if self.content_inp.is_markdown_preview: self.content_inp.toggle_markdown_preview()
+        self.title_inp.setText(title)
+        if is_large_text(content) and not isinstance(self.content_inp, LargeTextEdit): self._use_large_text_editor(content)
+        else: self.content_inp.setPlainText(content)
+
     def _save_data(self):
         title = self.title_inp.text().strip()
         if not title: self.title_inp.setPlaceholderText("标题不能为空!"); self.title_inp.setFocus(); return
@@ -472,6 +499,58 @@ class EditDialog(BaseDialog):
         self.data_saved.emit()
         self.accept()
 
+# === 历史版本窗口 ===
+class RevisionDialog(BaseDialog):
+    def __init__(self, db, idea_id, parent=None):
+        super().__init__(parent, window_title="历史版本")
+        self.db = db
+        self.idea_id = idea_id
+        self.selected = None
+        self.resize(820, 540)
+        layout = QVBoxLayout(self.content_container)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        header = QHBoxLayout()
+        header.setSpacing(8)
+        header_icon = QLabel()
+        header_icon.setPixmap(create_svg_icon("clock.svg", COLORS['primary']).pixmap(20, 20))
+        header.addWidget(header_icon)
+        header_title = QLabel("历史版本")
+        header_title.setStyleSheet(f"color: {COLORS['primary']}; font-size: 16px; font-weight: bold;")
+        header.addWidget(header_title)
+        header.addStretch()
+        layout.addLayout(header)
+
+        body = QHBoxLayout(); body.setSpacing(10)
+        self.rev_list = QListWidget(); self.rev_list.setFixedWidth(250)
+        self.rev_list.setStyleSheet(f"QListWidget {{ background-color: {COLORS['bg_mid']}; border: none; border-radius: 6px; color: #ddd; }} QListWidget::item {{ padding: 6px; }} QListWidget::item:selected {{ background-color: {COLORS['primary']}; color: white; }}")
+        # 列表只读版本号、时间和标题，选中时才重建正文
+        for r in db.get_revisions(idea_id):
+            item = QListWidgetItem(f"#{r['seq']}  {r['created_at']}\n{r['title'] or ''}")
+            item.setData(Qt.UserRole, r['seq'])
+            self.rev_list.addItem(item)
+        self.preview = QPlainTextEdit(); self.preview.setReadOnly(True)
+        self.preview.setPlaceholderText("暂无历史版本")
+        self.preview.setStyleSheet(f"QPlainTextEdit {{ background-color: {COLORS['bg_mid']}; border: none; border-radius: 6px; padding: 8px; color: #ddd; }}")
+        body.addWidget(self.rev_list); body.addWidget(self.preview, 1)
+        layout.addLayout(body, 1)
+
+        buttons = QHBoxLayout(); buttons.addStretch()
+        self.btn_restore = QPushButton("恢复此版本"); self.btn_restore.setFixedHeight(36); self.btn_restore.setStyleSheet(STYLES['btn_primary']); self.btn_restore.setEnabled(False)
+        self.btn_restore.clicked.connect(self.accept)
+        btn_close = QPushButton("关闭"); btn_close.setFixedHeight(36); btn_close.setStyleSheet(f"background-color:{COLORS['bg_mid']}; border:1px solid #444; color:#ccc; border-radius:5px; padding: 0 16px;")
+        btn_close.clicked.connect(self.reject)
+        buttons.addWidget(btn_close); buttons.addWidget(self.btn_restore)
+        layout.addLayout(buttons)
+
+        self.rev_list.currentItemChanged.connect(self._on_revision_selected)
+        if self.rev_list.count(): self.rev_list.setCurrentRow(0)
+
+    def _on_revision_selected(self, current, previous):
+        self.selected = self.db.get_revision(self.idea_id, current.data(Qt.UserRole)) if current else None
+        self.preview.setPlainText(self.selected[1] if self.selected else "")
+        self.btn_restore.setEnabled(self.selected is not None)
+
 # === 看板窗口 ===
 class StatsDialog(BaseDialog):
     def __init__(self, db, parent=None):
@@ -570,19 +649,24 @@ class PreviewDialog(QDialog):
 
     def _setup_text_preview(self, layout, text_data):
         self.resize(600, 500)
-        text_edit = QTextEdit(); text_edit.setReadOnly(True); text_edit.setText(text_data)
-        text_edit.setStyleSheet("QTextEdit { background-color: transparent; border: none; padding: 15px; color: #ddd; font-size: 14px; }")
+        if is_large_text(text_data):
+            text_edit = LargeTextEdit(); text_edit.setReadOnly(True); text_edit.load_text(text_data)
+            text_edit.setStyleSheet("QPlainTextEdit { background-color: transparent; border: none; padding: 15px; color: #ddd; font-size: 14px; }")
+        else:
+            text_edit = QTextEdit(); text_edit.setReadOnly(True); text_edit.setText(text_data)
+            text_edit.setStyleSheet("QTextEdit { background-color: transparent; border: none; padding: 15px; color: #ddd; font-size: 14px; }")
         layout.addWidget(text_edit)
 
     def _setup_image_preview(self, layout, image_data):
-        pixmap = QPixmap(); pixmap.loadFromData(image_data)
-        if pixmap.isNull():
+        # 按屏幕 80% 的尺寸直接解码，不生成原尺寸位图
+        screen_geo = QDesktopWidget().availableGeometry(self)
+        max_width = screen_geo.width() * 0.8; max_height = screen_geo.height() * 0.8
+        image = read_scaled_image(image_data, max_width, max_height) if image_data else QImage()
+        if image.isNull():
             label = QLabel("无法加载图片"); label.setAlignment(Qt.AlignCenter); label.setStyleSheet("color: #E81123; font-size: 16px;")
             layout.addWidget(label); self.resize(300, 200); return
         label = QLabel(); label.setAlignment(Qt.AlignCenter); layout.addWidget(label)
-        screen_geo = QDesktopWidget().availableGeometry(self)
-        max_width = screen_geo.width() * 0.8; max_height = screen_geo.height() * 0.8
-        scaled_pixmap = pixmap.scaled(int(max_width), int(max_height), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        scaled_pixmap = QPixmap.fromImage(image)
         label.setPixmap(scaled_pixmap)
         self.resize(scaled_pixmap.width() + 20, scaled_pixmap.height() + 20)
 
@@ -251,9 +251,7 @@ class FilterPanel(QWidget):
         self._block_item_click = True
         
         star_data = []
-        # star_icon = create_svg_icon('star_filled.svg', '#f39c12') # 用户倾向于直接显示字符星星
-        star_empty_icon = create_svg_icon('star_filled.svg', '#555')
-        
+        # 评级用字符星星显示，不再每次刷新都生成星级图标
         for i in range(5, 0, -1):
             c = stats['stars'].get(i, 0)
             if c > 0: 
@@ -279,11 +277,6 @@ class FilterPanel(QWidget):
         self._update_fixed_node('date_create', stats.get('date_create', {}))
         
         type_map = {'text': '文本', 'image': '图片', 'file': '文件'}
-        type_icons = {
-            'text': create_svg_icon('edit_list_ul.svg', '#aaa'),
-            'image': create_svg_icon('monitor.svg', '#aaa'), # 或者 action_eye
-            'file': create_svg_icon('folder.svg', '#aaa')
-        }
         
         type_data = []
         for t, count in stats.get('types', {}).items():
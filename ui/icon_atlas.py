@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+# ui/icon_atlas.py
+"""
+内置 SVG 图标的栅格化图集。
+
+内置图标都是单色的（SVG 里只有 currentColor），所以每个图标只栅格化一张透明度蒙版，
+任意颜色都由蒙版着色得到，不必为每个 (图标, 颜色) 组合重新解析、渲染 SVG。
+首次启动时把全部内置图标渲染成蒙版写入缓存文件，之后启动用一次 mmap 映射整个文件直接取用。
+文件头带格式版本和图标源数据的摘要，内置 SVG 或蒙版尺寸变化后自动重建。
+
+文件格式：MAGIC | 版本(uint32) | 摘要(20 字节) | 索引长度(uint32) | 索引 JSON {名称: 偏移} | 蒙版数据
+每张蒙版为 MASK_SIZE x MASK_SIZE 的 8 位透明度，逐行存放。
+"""
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+
+from PyQt5.QtCore import Qt, QByteArray, QBuffer, QIODevice
+from PyQt5.QtGui import QImage, QPixmap, QPainter, QColor
+from PyQt5.QtSvg import QSvgRenderer
+
+MAGIC = b'RNIA'
+ATLAS_VERSION = 1
+# 与原先的渲染尺寸一致：界面上的图标为 14~20px，足以覆盖 3 倍以内的设备像素比
+MASK_SIZE = 64
+
+_HEADER = struct.Struct('<4sI20sI')
+
+logger = logging.getLogger(__name__)
+
+
+def _render_mask(svg_data, size):
+    renderer = QSvgRenderer(QByteArray(svg_data.replace('currentColor', '#000000').encode('utf-8')))
+    image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+    image.fill(Qt.transparent)
+    painter = QPainter(image)
+    renderer.render(painter)
+    painter.end()
+    return image.convertToFormat(QImage.Format_Alpha8)
+
+
+def _mask_bytes(mask):
+    size = mask.width()
+    ptr = mask.constBits()
+    ptr.setsize(mask.byteCount())
+    raw = bytes(ptr)
+    stride = mask.bytesPerLine()
+    if stride == size: return raw
+    return b''.join(raw[y * stride:y * stride + size] for y in range(size))
+
+
+class IconAtlas:
+    """
+    图标蒙版的持久化图集，以及由它派生的着色图、星级条与 data URI 片段（均在内存中缓存）。
+    不在图集中的名称（如从 ui/icons 目录加载的图标）返回 None，由调用方按原方式渲染。
+    """
+
+    def __init__(self, path, svgs, size=MASK_SIZE):
+        self.path = path
+        self.size = size
+        self._svgs = svgs
+        self._digest = self._source_digest(svgs, size)
+        self._map = None
+        self._offsets = {}
+        self._masks = {}
+        self._pixmaps = {}
+        self._strips = {}
+        self._data_uris = {}
+        self._loaded = False
+
+    @staticmethod
+    def _source_digest(svgs, size):
+        h = hashlib.sha1(str(size).encode())
+        for name in sorted(svgs):
+            h.update(name.encode('utf-8')); h.update(b'\0')
+            h.update(svgs[name].encode('utf-8')); h.update(b'\0')
+        return h.digest()
+
+    def _ensure_loaded(self):
+        if self._loaded: return
+        self._loaded = True
+        if self._open_file(): return
+        self._build()
+
+    def _open_file(self):
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        try:
+            magic, version, digest, index_len = _HEADER.unpack_from(mapped, 0)
+            if magic != MAGIC or version != ATLAS_VERSION or digest != self._digest:
+                mapped.close()
+                return False
+            start = _HEADER.size
+            offsets = json.loads(mapped[start:start + index_len].decode('utf-8'))
+            data_start = start + index_len
+            offsets = {name: data_start + off for name, off in offsets.items()}
+            # 文件被截断或索引损坏时偏移会越过映射范围，读出的蒙版不完整，按损坏处理
+            n = self.size * self.size
+            for name in self._svgs:
+                off = offsets.get(name)
+                if type(off) is not int or off < data_start or off + n > len(mapped):
+                    raise ValueError(f"bad offset for {name}")
+        except (struct.error, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"Icon atlas unreadable, rebuilding: {e}")
+            mapped.close()
+            return False
+        self._offsets = offsets
+        self._map = mapped
+        return True
+
+    def _build(self):
+        """渲染全部内置图标并写入缓存文件；写入失败时只在本次运行的内存中使用"""
+        chunks, offsets, pos = [], {}, 0
+        for name, svg_data in self._svgs.items():
+            mask = _render_mask(svg_data, self.size)
+            self._masks[name] = mask
+            raw = _mask_bytes(mask)
+            offsets[name] = pos
+            chunks.append(raw)
+            pos += len(raw)
+
+        index = json.dumps(offsets, ensure_ascii=False).encode('utf-8')
+        header = _HEADER.pack(MAGIC, ATLAS_VERSION, self._digest, len(index))
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix='.icon_atlas_', dir=directory)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(header); f.write(index)
+                    for raw in chunks: f.write(raw)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        except OSError as e:
+            logger.warning(f"Failed to write icon atlas {self.path}: {e}")
+
+    def mask(self, name):
+        """图标的透明度蒙版 (QImage.Format_Alpha8)，不在图集中时返回 None"""
+        mask = self._masks.get(name)
+        if mask is not None: return mask
+        if name not in self._svgs: return None
+        self._ensure_loaded()
+        mask = self._masks.get(name)
+        if mask is None and name in self._offsets:
+            off, n = self._offsets[name], self.size * self.size
+            # QImage 不复制外部缓冲区，copy() 之后才与 mmap 脱离
+            mask = QImage(self._map[off:off + n], self.size, self.size, self.size, QImage.Format_Alpha8).copy()
+            self._masks[name] = mask
+        return mask
+
+    def _tinted_image(self, name, color, pixel_size):
+        mask = self.mask(name)
+        if mask is None: return None
+        if pixel_size != self.size:
+            mask = mask.scaled(pixel_size, pixel_size, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        image = QImage(mask.size(), QImage.Format_ARGB32_Premultiplied)
+        image.fill(QColor(color))
+        painter = QPainter(image)
+        painter.setCompositionMode(QPainter.CompositionMode_DestinationIn)
+        painter.drawImage(0, 0, mask)
+        painter.end()
+        return image
+
+    def pixmap(self, name, color, size=None, dpr=1.0):
+        """着色后的图标；size 为逻辑尺寸（默认为蒙版原尺寸），按 dpr 生成物理像素"""
+        pixel_size = self.size if size is None else max(1, round(size * dpr))
+        key = (name, color, pixel_size)
+        pixmap = self._pixmaps.get(key)
+        if pixmap is None:
+            image = self._tinted_image(name, color, pixel_size)
+            if image is None: return None
+            pixmap = QPixmap.fromImage(image)
+            if size is not None: pixmap.setDevicePixelRatio(dpr)
+            self._pixmaps[key] = pixmap
+        return pixmap
+
+    def star_strip(self, rating, color, star_size=12, spacing=2, dpr=1.0, name='star_filled.svg'):
+        """一排 rating 颗星的图像，同一组参数全局只绘制一次"""
+        key = (rating, color, star_size, spacing, dpr, name)
+        strip = self._strips.get(key)
+        if strip is None:
+            star = self.pixmap(name, color, star_size, dpr)
+            total_width = (star_size * rating) + (spacing * (rating - 1))
+            strip = QPixmap(max(1, round(total_width * dpr)), max(1, round(star_size * dpr)))
+            strip.setDevicePixelRatio(dpr)
+            strip.fill(Qt.transparent)
+            if star is not None:
+                painter = QPainter(strip)
+                for i in range(rating):
+                    painter.drawPixmap(i * (star_size + spacing), 0, star)
+                painter.end()
+            self._strips[key] = strip
+        return strip
+
+    def data_uri(self, name, color, size):
+        """PNG data URI，供富文本提示中的 <img> 使用"""
+        key = (name, color, size)
+        uri = self._data_uris.get(key)
+        if uri is None:
+            image = self._tinted_image(name, color, size)
+            if image is None: return None
+            ba = QByteArray()
+            buffer = QBuffer(ba)
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, "PNG")
+            uri = 'data:image/png;base64,' + base64.b64encode(bytes(ba)).decode('ascii')
+            self._data_uris[key] = uri
+        return uri
+
+    def close(self):
+        """释放文件映射；之后仍需要未取出的蒙版时重新映射"""
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+            self._offsets = {}
+            self._loaded = False
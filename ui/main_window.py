@@ -9,18 +9,22 @@ from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QSplitter,
 from PyQt5.QtCore import Qt, QTimer, QPoint, pyqtSignal, QByteArray, QPropertyAnimation, QEasingCurve
 from PyQt5.QtGui import QKeySequence, QCursor, QColor
 
-from core.config import STYLES, COLORS
+from core.config import STYLES, COLORS, REGEX_TIME_BUDGET_MS
 from core.settings import load_setting, save_setting
 from ui.sidebar import Sidebar
 from ui.card_list_view import CardListView 
+from ui.cards import IMAGE_PREVIEW_SIZE
 from ui.dialogs import EditDialog
 from services.preview_service import PreviewService
-from ui.utils import create_svg_icon
+from ui.utils import create_svg_icon, action_span
 from ui.filter_panel import FilterPanel 
+from data.regex_search import build_pattern, pattern_error
+from data.records import MetadataTable, as_table
 
 # 引用组件
 from ui.main_window_parts.header_bar import HeaderBar
 from ui.main_window_parts.metadata_panel import MetadataPanel
+from ui.main_window_parts.page_prefetcher import PagePrefetcher
 
 class MainWindow(QWidget):
     closing = pyqtSignal()
@@ -31,6 +35,14 @@ class MainWindow(QWidget):
         QApplication.setQuitOnLastWindowClosed(False)
         self.service = service
         self.preview_service = PreviewService(self.service, self)
+        self.search_session = self.service.create_search_session()
+        self.search_executor = self.service.create_search_executor(self)
+        self.search_executor.finished.connect(self._on_search_finished)
+        self.search_executor.failed.connect(self._on_search_failed)
+        self.search_executor.progress.connect(self._on_search_progress)
+        self._search_result = (None, None)  # (搜索键, 上一次后台搜索的完整结果)
+        # 空闲时把前后页的详情预先放进记录缓存，翻页时不必同步查库
+        self.page_prefetcher = PagePrefetcher(self.service, IMAGE_PREVIEW_SIZE, parent=self)
         
         self.curr_filter = ('all', None)
         self.selected_ids = set()
@@ -39,12 +51,12 @@ class MainWindow(QWidget):
         self.card_ordered_ids = []
         
         # 缓存与分页
-        self.cached_metadata = []
+        self.cached_metadata = MetadataTable()
         self.filtered_ids = []
-        self.cards_cache = {}
         self.current_page = 1
         self.page_size = 100
         self.total_pages = 1
+        self._page_step = 1  # 上一次翻页的方向，预取时先取这个方向的下一页
         
         # 文件夹数据缓存
         self.current_sub_folders = []
@@ -96,6 +108,9 @@ class MainWindow(QWidget):
         self.header.search_changed.connect(lambda: self._set_page(1))
         self.header.search_changed.connect(self._rebuild_filter_panel)
         self.header.search_history_added.connect(self._add_search_to_history)
+        self.header.search.ranking_toggled.connect(lambda _: self._set_page(1))
+        self.header.search.mode_changed.connect(lambda _: self._set_page(1))
+        self.header.search.archive_toggled.connect(lambda _: self._set_page(1))
         self.header.page_changed.connect(self._set_page)
         self.header.window_minimized.connect(self.showMinimized)
         self.header.window_maximized.connect(self._toggle_maximize)
@@ -187,6 +202,7 @@ class MainWindow(QWidget):
 
     def _set_page(self, page_num):
         if page_num < 1: page_num = 1
+        self._page_step = -1 if page_num < self.current_page else 1
         self.current_page = page_num
         self._load_data()
 
@@ -296,32 +312,132 @@ class MainWindow(QWidget):
             ids.extend(self._get_all_descendant_ids(child_id, all_categories))
         return ids
 
+    @action_span('main_window.load_data')
     def _load_data(self):
-        self.cards_cache.clear()
+        # 本次加载开始后，之前提交的后台搜索一律作废，避免晚到的结果覆盖当前视图
+        self.search_executor.cancel()
+        # 结果集可能已经变化，旧的预取不再有用；新的一页显示后重新安排
+        self.page_prefetcher.cancel()
         
         # 1. 获取基础元数据（当前层级）
-        # 注意：这里我们首先获取当前选中分类的直接数据
-        self.cached_metadata = self.service.get_metadata(self.header.search.text(), self.curr_filter[0], self.curr_filter[1])
-        
-        # [新增] 递归逻辑
-        if self.is_recursive_mode and self.curr_filter[0] == 'category':
-            current_cat_id = self.curr_filter[1]
-            all_categories = self.service.get_categories()
-            
-            # 获取所有子孙 ID
-            descendant_ids = self._get_all_descendant_ids(current_cat_id, all_categories)
-            
-            # 循环获取子孙分类的数据并合并 (为了不修改后端，在前端做循环聚合)
-            for sub_id in descendant_ids:
-                sub_data = self.service.get_metadata(self.header.search.text(), 'category', sub_id)
-                self.cached_metadata.extend(sub_data)
+        # 关键词在上一次基础上延长时，搜索会话直接在内存中收窄结果
+        # 相关度排序模式下，搜索结果按 bm25 排名返回
+        search_text = self.header.search.text()
+        ranked = load_setting(self.header.search.RANKED_SETTING, True)
+        f_type, f_val = self.curr_filter
+        
+        # [新增] 递归逻辑：子孙分类的数据在前端循环聚合（为了不修改后端）
+        scopes = [(f_type, f_val)]
+        if self.is_recursive_mode and f_type == 'category':
+            descendant_ids = self._get_all_descendant_ids(f_val, self.service.get_categories())
+            scopes.extend(('category', sub_id) for sub_id in descendant_ids)
+        
+        mode = self.header.search.search_mode()
+        if search_text and mode != 'plain':
+            self._load_pattern_search(search_text, mode, scopes)
+            return
+        
+        metadata = self.search_session.lookup(search_text, f_type, f_val, ranked)
+        if metadata is None and search_text and self.search_executor.available:
+            # 关键词搜索可能很慢，交给后台执行：继续输入时旧查询立即中断，超时只显示部分结果。
+            # 翻页等重复加载直接复用上一次的完整结果
+            search_key = (search_text, tuple(scopes), ranked, self.service.generation)
+            if not self._reuse_search_result(search_key):
+                self.search_executor.submit(
+                    lambda repo, token: (search_key, self._search_metadata(repo, token, search_text, scopes, ranked))
+                )
+            return
+        # 不搜索时默认只列出主库中的笔记，勾选"显示已归档笔记"后连同归档库
+        archived = self.header.search.show_archived()
+        if metadata is None:
+            metadata = self.service.get_metadata(search_text, f_type, f_val, ranked, archived)
+        for sub_type, sub_val in scopes[1:]:
+            metadata.extend(self.service.get_metadata(search_text, sub_type, sub_val, ranked, archived))
+        self._on_metadata_loaded(metadata)
+
+    def _load_pattern_search(self, search_text, mode, scopes):
+        """正则 / 全字匹配搜索：在后台逐批匹配，找到的结果边找边显示"""
+        pattern = build_pattern(search_text, mode)
+        error = pattern_error(pattern)
+        if error:
+            self._on_metadata_loaded([])
+            self._show_tooltip(f"正则表达式无效: {error}", 3000)
+            return
+        if not self.search_executor.available:
+            metadata = MetadataTable()
+            for f_type, f_val in scopes:
+                metadata.extend(self.service.get_metadata_by_regex(pattern, f_type, f_val))
+            self._on_metadata_loaded(metadata)
+            return
+        search_key = (mode, pattern, tuple(scopes), self.service.generation)
+        if self._reuse_search_result(search_key): return
+        self.cached_metadata, self.filtered_ids = MetadataTable(), []
+        self.search_executor.submit(
+            lambda repo, token: (search_key, self._regex_metadata(repo, token, pattern, scopes)),
+            REGEX_TIME_BUDGET_MS
+        )
+
+    def _reuse_search_result(self, search_key):
+        if search_key != self._search_result[0]: return False
+        self._on_metadata_loaded(self._search_result[1].copy())
+        return True
+
+    @staticmethod
+    def _search_metadata(repo, token, search_text, scopes, ranked):
+        """在后台线程中执行，不能访问界面对象"""
+        metadata = MetadataTable()
+        for f_type, f_val in scopes:
+            token.check()
+            metadata.extend(repo.get_metadata_by_filter(search_text, f_type, f_val, ranked=ranked, token=token))
+            if token.partial: break
+        return metadata
+
+    @staticmethod
+    def _regex_metadata(repo, token, pattern, scopes):
+        """在后台线程中执行；每找到一批就通过 token.report 送回界面"""
+        metadata = MetadataTable()
+        for f_type, f_val in scopes:
+            token.check()
+            metadata.extend(repo.get_metadata_by_regex(pattern, f_type, f_val, token=token, on_batch=token.report))
+            if token.partial: break
+        return metadata
+
+    def _on_search_progress(self, seq, rows):
+        if not self.search_executor.is_current(seq): return
+        if self.current_tag_filter:
+            rows = rows.filter(lambda r: self.current_tag_filter in r.tags)
+        # 当前页已经填满时只更新页数，不重复渲染卡片
+        page_was_full = len(self.filtered_ids) >= self.current_page * self.page_size
+        self.cached_metadata.extend(rows)
+        self._apply_filters()
+        if page_was_full: self._update_pagination_ui()
+        else: self._render_current_page()
+
+    def _on_search_finished(self, seq, result, partial):
+        if not self.search_executor.is_current(seq): return
+        search_key, metadata = result
+        # 执行期间数据有写入时，结果可能不是最新的，不保留
+        if not partial and search_key[-1] == self.service.generation:
+            self._search_result = (search_key, metadata)
+        self._on_metadata_loaded(metadata.copy())
+        if partial:
+            self._show_tooltip(f"搜索超时，仅显示已找到的 {len(metadata)} 条结果", 3000)
+
+    def _on_search_failed(self, seq, error):
+        if not self.search_executor.is_current(seq): return
+        self._on_metadata_loaded([])
+        self._show_tooltip(f"搜索失败: {error}", 3000)
+
+    def _on_metadata_loaded(self, metadata):
+        # 元数据按列存放：20 万条时比逐行字典省下数百 MB
+        self.cached_metadata = as_table(metadata)
         
         # 2. 获取子文件夹（如果是分类视图）
         self.current_sub_folders = []
         if self.curr_filter[0] == 'category':
             current_cat_id = self.curr_filter[1]
             all_categories = self.service.get_categories() 
-            all_counts = self.service.get_counts().get('categories', {})
+            all_counts = self.service.get_counts(self.header.search.show_archived()).get('categories', {})
             
             for cat in all_categories:
                 if cat[2] == current_cat_id:
@@ -330,20 +446,25 @@ class MainWindow(QWidget):
                     
         # 3. 标签筛选
         if self.current_tag_filter:
-            new_cache = []
-            for item in self.cached_metadata:
-                if self.current_tag_filter in item['tags']: new_cache.append(item)
-            self.cached_metadata = new_cache
+            tag = self.current_tag_filter
+            self.cached_metadata = self.cached_metadata.filter(lambda item: tag in item.tags)
             
         self._apply_filters_and_render()
         if self.is_metadata_panel_visible: self._rebuild_filter_panel()
 
     def _apply_filters_and_render(self):
+        self._apply_filters()
+        self._render_current_page()
+
+    def _apply_filters(self):
         criteria = self.filter_panel.get_checked_criteria()
-        matched_ids = []
-        for item in self.cached_metadata:
-            match = True
-            if criteria:
+        if not criteria:
+            # 没有勾选筛选条件时直接取 id 列，不必逐行生成记录
+            matched_ids = self.cached_metadata.ids.tolist()
+        else:
+            matched_ids = []
+            for item in self.cached_metadata:
+                match = True
                 if 'stars' in criteria and item['rating'] not in criteria['stars']: match = False
                 if match and 'colors' in criteria and item['color'] not in criteria['colors']: match = False
                 if match and 'types' in criteria and (item['item_type'] or 'text') not in criteria['types']: match = False
@@ -360,24 +481,26 @@ class MainWindow(QWidget):
                         elif d_opt == 'week' and created_date >= now_date - timedelta(days=6): date_match = True
                         elif d_opt == 'month' and created_date.year == now_date.year and created_date.month == now_date.month: date_match = True
                     if not date_match: match = False
-            if match: matched_ids.append(item['id'])
+                if match: matched_ids.append(item['id'])
                 
         self.filtered_ids = matched_ids
         total_items = len(self.filtered_ids)
         self.total_pages = math.ceil(total_items / self.page_size) if total_items > 0 else 1
         if self.current_page > self.total_pages: self.current_page = self.total_pages
         if self.current_page < 1: self.current_page = 1
-        self._render_current_page()
 
     def _render_current_page(self):
         start_idx = (self.current_page - 1) * self.page_size
         end_idx = start_idx + self.page_size
         page_ids = self.filtered_ids[start_idx:end_idx]
-        ids_to_fetch = [iid for iid in page_ids if iid not in self.cards_cache]
-        if ids_to_fetch:
-            new_details = self.service.get_details(ids_to_fetch)
-            for d in new_details: self.cards_cache[d['id']] = d
-        data_list = [self.cards_cache[iid] for iid in page_ids if iid in self.cards_cache]
+        # 详情由服务层的记录缓存提供，各窗口共用，记录被修改时自动失效
+        data_list = self.service.get_details(page_ids)
+
+        # 搜索命中高亮只对当前页生成
+        search_text = self.header.search.text()
+        if search_text:
+            highlights = self.service.get_search_highlights(search_text, data_list, self.header.search.search_mode())
+            data_list = [dict(d, search_hl=highlights[d['id']]) if d['id'] in highlights else d for d in data_list]
         
         # 将子文件夹数据传给 CardListView
         # 注意：只有第一页才显示子文件夹
@@ -387,6 +510,16 @@ class MainWindow(QWidget):
         self.card_ordered_ids = [d['id'] for d in data_list]
         self._update_pagination_ui()
         self._update_ui_state()
+        self._prefetch_adjacent_pages()
+
+    def _prefetch_adjacent_pages(self):
+        """安排预取前后两页，沿上一次翻页方向的那一页优先"""
+        pages = []
+        for page in (self.current_page + self._page_step, self.current_page - self._page_step):
+            if 1 <= page <= self.total_pages:
+                start = (page - 1) * self.page_size
+                pages.append(self.filtered_ids[start:start + self.page_size])
+        self.page_prefetcher.schedule(pages)
 
     def _on_folder_clicked(self, cat_id):
         """点击卡片区域的文件夹时，跳转到该分类"""
@@ -466,7 +599,9 @@ class MainWindow(QWidget):
             self._rebuild_filter_panel()
 
     def _rebuild_filter_panel(self):
-        stats = self.service.get_filter_stats(self.header.search.text(), self.curr_filter[0], self.curr_filter[1])
+        stats = self.service.get_filter_stats(
+            self.header.search.text(), self.curr_filter[0], self.curr_filter[1], self.header.search.show_archived()
+        )
         self.filter_panel.update_stats(stats)
 
     def _add_search_to_history(self):
@@ -538,7 +673,6 @@ class MainWindow(QWidget):
         self.last_clicked_id = None
         self.current_tag_filter = None
         self.tag_filter_label.hide()
-        self.cards_cache.clear()
         self.card_list_view.clear_all()
         
         # [修改] 切换大分类时重置递归模式，避免 confusion
@@ -847,6 +981,11 @@ class MainWindow(QWidget):
 
     def save_state(self):
         self._save_window_state()
+
+    def shutdown(self):
+        """退出程序时调用：关闭窗口只是隐藏，后台搜索与预取的线程和只读连接在这里结束"""
+        self.search_executor.shutdown()
+        self.page_prefetcher.shutdown()
     
     def _restore_window_state(self):
         geo = load_setting("main_window_geometry_hex")
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+# ui/main_window_parts/page_prefetcher.py
+import sqlite3
+
+from PyQt5.QtCore import QObject, QTimer
+
+from core.config import PREFETCH_DELAY_MS, PREFETCH_MAX_BYTES, PREFETCH_TIME_BUDGET_MS
+from ui.components.large_content import encode_thumbnail
+
+
+class PagePrefetcher(QObject):
+    """
+    相邻页预取：当前页显示后，界面空闲片刻再在后台只读连接上读取前后页的详情，
+    放进服务层的记录缓存（'details'），翻页时 get_details 直接命中，不再同步查库。
+
+    - 不缓存原图：图片笔记的 data_blob 换成卡片尺寸的缩略图；原图逐条读取，同时只有一张在内存中
+    - 每轮预取的正文与缩略图合计不超过 max_bytes，超出即停止，已取到的部分照常放进缓存
+    - 只做最新的一轮：翻页或切换筛选时，未开始的预取作废，进行中的立即中止，按新的顺序重新开始
+    """
+
+    def __init__(self, service, thumbnail_size, max_bytes=PREFETCH_MAX_BYTES, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self.thumbnail_size = thumbnail_size
+        self.max_bytes = max_bytes
+        # 独立的执行器与只读连接，不会打断搜索执行器上的请求
+        self._executor = service.create_search_executor(self)
+        self._pages = []
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(PREFETCH_DELAY_MS)
+        self._timer.timeout.connect(self._start)
+
+    def schedule(self, pages):
+        """pages 为按优先级排列的各页 ID 列表；取代尚未完成的预取"""
+        self.cancel()
+        self._pages = [list(ids) for ids in pages if ids]
+        if self._pages and self._executor.available:
+            self._timer.start()
+
+    def cancel(self):
+        self._timer.stop()
+        self._pages = []
+        self._executor.cancel()
+
+    def shutdown(self):
+        """退出程序时调用：停止预取并关闭独立的只读连接"""
+        self._timer.stop()
+        self._pages = []
+        self._executor.shutdown()
+
+    def _start(self):
+        pages, self._pages = self._pages, []
+        self._executor.submit(lambda repo, token: self._prefetch(repo, token, pages), PREFETCH_TIME_BUDGET_MS)
+
+    def _prefetch(self, repo, token, pages):
+        """在后台线程中执行，不能访问界面对象"""
+        budget = [self.max_bytes]
+        try:
+            for ids in pages:
+                if budget[0] <= 0 or token.should_stop(): break
+                # 已在缓存中的记录不会再读；加载期间记录被修改时，结果不放进缓存
+                self.service.entities.get_many('details', ids, lambda missing: self._load(repo, token, missing, budget))
+        except sqlite3.OperationalError:
+            # 超出时间预算时查询被中断，已放进缓存的部分保留
+            if not token.should_stop(): raise
+
+    def _load(self, repo, token, ids, budget):
+        details = []
+        for detail in repo.get_details_by_ids(ids, include_blob=False):
+            token.check()
+            if detail.item_type == 'image':
+                blob = repo.get_blob(detail.id)
+                thumbnail = encode_thumbnail(blob, *self.thumbnail_size) if blob else None
+                # 无法解码或原图本来就小时保留原图，卡片显示与同步加载一致
+                if thumbnail is None or (blob and len(thumbnail) >= len(blob)): thumbnail = blob
+                detail = detail._replace(data_blob=thumbnail)
+            details.append(detail)
+            budget[0] -= len(detail.content or '') + len(detail.data_blob or b'')
+            if budget[0] <= 0: break
+        return details
@@ -15,17 +15,21 @@ from PyQt5.QtWidgets import (QApplication, QWidget, QVBoxLayout, QListWidget, QL
                              QListWidgetItem, QHBoxLayout, QTreeWidget, QTreeWidgetItem, 
                              QPushButton, QStyle, QAction, QSplitter, QGraphicsDropShadowEffect, 
                              QLabel, QTreeWidgetItemIterator, QShortcut, QAbstractItemView, QMenu,
-                             QColorDialog, QInputDialog, QMessageBox, QFrame)
-from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, QSettings, QUrl, QMimeData, pyqtSignal, QObject, QSize, QByteArray, QBuffer, QIODevice
+                             QColorDialog, QInputDialog, QMessageBox, QFrame, QToolTip)
+from PyQt5.QtCore import Qt, QTimer, QPoint, QRect, QSettings, QUrl, QMimeData, pyqtSignal, QObject, QSize, QByteArray
 from PyQt5.QtGui import QImage, QColor, QCursor, QPixmap, QPainter, QIcon, QKeySequence, QDrag, QIntValidator, QTransform
 
 from services.preview_service import PreviewService
 from ui.dialogs import EditDialog
 from ui.advanced_tag_selector import AdvancedTagSelector
 from ui.components.search_line_edit import SearchLineEdit
-from core.config import COLORS
+from ui.components.highlight_delegate import HighlightDelegate, HIGHLIGHT_ROLE
+from core.config import COLORS, REGEX_TIME_BUDGET_MS
 from core.settings import load_setting, save_setting
-from ui.utils import create_svg_icon, create_clear_button_icon
+from ui.utils import create_svg_icon, create_clear_button_icon, action_span, highlight_html, icon_img_html
+from data.search_index import HL_START
+from data.regex_search import build_pattern, pattern_error
+from data.records import MetadataTable
 
 # ... (Platform specific imports) ...
 if sys.platform == "win32":
@@ -318,7 +322,6 @@ class QuickWindow(QWidget):
         self.page_size = 100
         self.total_pages = 1
         
-        self._icon_html_cache = {}
         
         self.last_active_hwnd = None
         self.last_focus_hwnd = None
@@ -333,6 +336,12 @@ class QuickWindow(QWidget):
         
         self.open_dialogs = []
         self.preview_service = PreviewService(self.db, self)
+        self.search_session = self.db.create_search_session()
+        self.search_executor = self.db.create_search_executor(self)
+        self.search_executor.finished.connect(self._on_search_finished)
+        self.search_executor.failed.connect(self._on_search_failed)
+        self.search_executor.progress.connect(self._on_search_progress)
+        self._pattern_key, self._pattern_matches = None, MetadataTable()  # 正则搜索的 (键, 已找到的结果)
         
         self._init_ui()
         self._setup_shortcuts()
@@ -351,6 +360,9 @@ class QuickWindow(QWidget):
         
         self.search_box.textChanged.connect(self._on_search_text_changed)
         self.search_box.returnPressed.connect(self._add_search_to_history)
+        self.search_box.ranking_toggled.connect(self._on_search_option_changed)
+        self.search_box.mode_changed.connect(self._on_search_option_changed)
+        self.search_box.archive_toggled.connect(self._on_search_option_changed)
         self.list_widget.itemActivated.connect(self._on_item_activated)
         
         self.list_widget.setContextMenuPolicy(Qt.CustomContextMenu)
@@ -383,6 +395,14 @@ class QuickWindow(QWidget):
         self._update_list()
         self._update_partition_status_display()
 
+    def set_clipboard_capture(self, enabled):
+        """剪贴板采集交给守护进程后，关闭本进程内的监听"""
+        try:
+            self.clipboard.dataChanged.disconnect(self.on_clipboard_changed)
+        except TypeError:
+            pass
+        if enabled: self.clipboard.dataChanged.connect(self.on_clipboard_changed)
+
     def on_clipboard_changed(self):
         if self._processing_clipboard: return
         self._processing_clipboard = True
@@ -452,6 +472,7 @@ class QuickWindow(QWidget):
         self.list_widget.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
         self.list_widget.setIconSize(QSize(28, 28))
+        self.list_widget.setItemDelegate(HighlightDelegate(self.list_widget))
         
         self.right_sidebar_widget = QWidget()
         self.right_sidebar_layout = QVBoxLayout(self.right_sidebar_widget)
@@ -882,6 +903,10 @@ class QuickWindow(QWidget):
         save_setting("partition_panel_hidden", self.right_sidebar_widget.isHidden())
         save_setting("quick_window_pinned", self.btn_stay_top.isChecked())
 
+    def shutdown(self):
+        """退出程序时调用：关闭窗口只是隐藏，后台搜索的线程和只读连接在这里结束"""
+        self.search_executor.shutdown()
+
     def closeEvent(self, event):
         self.save_state()
         self.hide()
@@ -993,6 +1018,10 @@ class QuickWindow(QWidget):
             self.last_thread_id = user32.GetWindowThreadProcessId(current_hwnd, None)
             self.last_focus_hwnd = None 
 
+    def _on_search_option_changed(self, _value):
+        self.current_page = 1
+        self._update_list()
+
     def _on_search_text_changed(self):
         # 搜索变更时，重置为第一页
         self.current_page = 1
@@ -1082,6 +1111,7 @@ class QuickWindow(QWidget):
             """
         self.list_widget.setStyleSheet(style)
 
+    @action_span('quick_window.update_list', 'db')
     def _update_list(self):
         search_text = self.search_box.text()
         
@@ -1116,8 +1146,125 @@ class QuickWindow(QWidget):
         # [新增] 应用动态列表颜色
         self._apply_list_theme(current_color)
 
-        total_items = self.db.get_ideas_count(search=search_text, f_type=f_type, f_val=f_val)
-        
+        mode = self.search_box.search_mode()
+        if search_text and mode != 'plain':
+            self._load_pattern_search(search_text, mode, f_type, f_val)
+            return
+
+        # 关键词在上一次基础上延长时，搜索会话直接在内存中收窄结果，不再查库；
+        # 相关度排序模式下由全文索引按 bm25 排名分页
+        self.search_executor.cancel()
+        self._pattern_key = None
+        ranked = load_setting(SearchLineEdit.RANKED_SETTING, True)
+        matched = self.search_session.lookup(search_text, f_type, f_val, ranked)
+        if matched is None and search_text and self.search_executor.available:
+            # 关键词搜索交给后台执行：继续输入时旧查询立即中断，超时只显示部分结果
+            page, page_size = self.current_page, self.page_size
+            self.search_executor.submit(
+                lambda repo, token: self._search_page(repo, token, search_text, f_type, f_val, page, page_size, ranked)
+            )
+            return
+
+        if matched is not None:
+            self._show_matched(matched)
+            return
+
+        archived = self.search_box.show_archived()
+        self._update_pagination(
+            self.db.get_ideas_count(search=search_text, f_type=f_type, f_val=f_val, include_archive=archived)
+        )
+        items = self.db.get_ideas(
+            search=search_text, 
+            f_type=f_type, 
+            f_val=f_val, 
+            page=self.current_page, 
+            page_size=self.page_size,
+            ranked=ranked,
+            include_archive=archived
+        )
+        self._fill_list(items, search_text)
+
+    def _show_matched(self, matched):
+        """matched 为按显示顺序排列的元数据，只取当前页的完整数据"""
+        self._update_pagination(len(matched))
+        start = (self.current_page - 1) * self.page_size
+        items = self.db.get_ideas_by_ids([m['id'] for m in matched[start:start + self.page_size]])
+        self._fill_list(items, self.search_box.text())
+
+    def _load_pattern_search(self, search_text, mode, f_type, f_val):
+        """正则 / 全字匹配搜索：在后台逐批匹配，当前页一有结果就先显示"""
+        pattern = build_pattern(search_text, mode)
+        key = (pattern, f_type, f_val, self.db.generation)
+        if key == self._pattern_key:
+            # 翻页：沿用正在进行或已完成的匹配结果，不重新搜索
+            self._show_matched(self._pattern_matches)
+            return
+
+        self.search_executor.cancel()
+        self._pattern_key = None
+        error = pattern_error(pattern)
+        if error:
+            self._show_matched([])
+            self._show_search_hint(f"正则表达式无效: {error}")
+            return
+        if not self.search_executor.available:
+            self._show_matched(self.db.get_metadata_by_regex(pattern, f_type, f_val))
+            return
+
+        self._pattern_key, self._pattern_matches = key, MetadataTable()
+        self._show_matched([])
+        self.search_executor.submit(
+            lambda repo, token: ('matches', repo.get_metadata_by_regex(pattern, f_type, f_val, token=token, on_batch=token.report)),
+            REGEX_TIME_BUDGET_MS
+        )
+
+    @staticmethod
+    def _search_page(repo, token, search_text, f_type, f_val, page, page_size, ranked):
+        """
+        在后台线程中执行，不能访问界面对象。返回 ('page', (总数, 页码, 本页条目))。
+        先取当前页：分页查询按索引顺序取到一页即可结束，超时也能先显示这一部分；
+        总数超时未算完时返回 None。
+        """
+        items = repo.get_list_by_filter(search_text, f_type, f_val, page, page_size, ranked=ranked, token=token)
+        total = None if token.partial else repo.get_count_by_filter(search_text, f_type, f_val, token=token)
+        if total is not None and page > 1 and page > math.ceil(total / page_size):
+            page = max(1, math.ceil(total / page_size))
+            items = repo.get_list_by_filter(search_text, f_type, f_val, page, page_size, ranked=ranked, token=token)
+        return 'page', (total, page, items)
+
+    def _on_search_finished(self, seq, result, partial):
+        if not self.search_executor.is_current(seq): return
+        kind, payload = result
+        if kind == 'matches':
+            self._pattern_matches = payload
+            self._show_matched(payload)
+        else:
+            total, page, items = payload
+            self.current_page = page
+            # 总数未知时按已取到的条目估算，只保证当前页可用
+            self._update_pagination(total if total is not None else (page - 1) * self.page_size + len(items))
+            self._fill_list(items, self.search_box.text())
+        if partial:
+            self._show_search_hint("搜索超时，仅显示部分结果")
+
+    def _on_search_progress(self, seq, rows):
+        if not self.search_executor.is_current(seq): return
+        # 当前页已经填满时只更新页数，不重复刷新列表
+        page_was_full = len(self._pattern_matches) >= self.current_page * self.page_size
+        self._pattern_matches.extend(rows)
+        if page_was_full: self._update_pagination(len(self._pattern_matches))
+        else: self._show_matched(self._pattern_matches)
+
+    def _show_search_hint(self, text):
+        QToolTip.showText(self.search_box.mapToGlobal(self.search_box.rect().bottomLeft()), text, self.search_box)
+
+    def _on_search_failed(self, seq, error):
+        if not self.search_executor.is_current(seq): return
+        self._update_pagination(0)
+        self._fill_list([], '')
+        logging.warning(f"Quick window search failed: {error}")
+
+    def _update_pagination(self, total_items):
         if total_items > 0:
             self.total_pages = math.ceil(total_items / self.page_size)
         else:
@@ -1134,15 +1281,9 @@ class QuickWindow(QWidget):
         self.btn_prev_page.setDisabled(self.current_page <= 1)
         self.btn_next_page.setDisabled(self.current_page >= self.total_pages)
 
-        items = self.db.get_ideas(
-            search=search_text, 
-            f_type=f_type, 
-            f_val=f_val, 
-            page=self.current_page, 
-            page_size=self.page_size
-        )
-        
+    def _fill_list(self, items, search_text):
         self.list_widget.clear()
+        highlights = self.db.get_search_highlights(search_text, items, self.search_box.search_mode()) if search_text else {}
         
         for item_tuple in items:
             list_item = QListWidgetItem()
@@ -1150,6 +1291,9 @@ class QuickWindow(QWidget):
             
             text_part = self._get_content_display(item_tuple)
             list_item.setText(text_part)
+            highlight = self._get_highlight_display(item_tuple, highlights.get(item_tuple['id']))
+            if highlight:
+                list_item.setData(HIGHLIGHT_ROLE, highlight)
             
             item_type = item_tuple['item_type'] or 'text'
             icon = QIcon()
@@ -1199,21 +1343,8 @@ class QuickWindow(QWidget):
             self._update_partition_status_display()
 
     def _get_icon_html(self, icon_name, color):
-        cache_key = (icon_name, color)
-        if cache_key in self._icon_html_cache:
-            return self._icon_html_cache[cache_key]
-
-        icon = create_svg_icon(icon_name, color)
-        pixmap = icon.pixmap(14, 14) 
-        ba = QByteArray()
-        buffer = QBuffer(ba)
-        buffer.open(QIODevice.WriteOnly)
-        pixmap.save(buffer, "PNG")
-        base64_str = ba.toBase64().data().decode()
-        
-        html = f'<img src="data:image/png;base64,{base64_str}" width="14" height="14" style="vertical-align:middle;">'
-        self._icon_html_cache[cache_key] = html
-        return html
+        # data URI 由共享图集生成并缓存
+        return icon_img_html(icon_name, color, 14)
 
     def _update_list_item_tooltip(self, list_item, item_data):
         category_id = item_data['category_id']
@@ -1286,6 +1417,15 @@ class QuickWindow(QWidget):
         text_part = text_part.replace('\n', ' ').replace('\r', '').strip()[:150]
         return text_part
 
+    def _get_highlight_display(self, item_tuple, search_hl):
+        """搜索命中时的富文本显示：文本类显示正文命中片段，其它类型显示标记后的标题"""
+        if not search_hl: return None
+        title, snippet = search_hl
+        item_type = item_tuple['item_type'] or 'text'
+        marked = snippet if item_type == 'text' and snippet and HL_START in snippet else title
+        if not marked or HL_START not in marked: return None
+        return highlight_html(marked.replace('\r', '').strip())
+
     def _create_color_icon(self, color_str):
         pixmap = QPixmap(16, 16); pixmap.fill(Qt.transparent); painter = QPainter(pixmap)
         painter.setRenderHint(QPainter.Antialiasing); painter.setBrush(QColor(color_str or "#808080"))
@@ -1297,7 +1437,7 @@ class QuickWindow(QWidget):
         
         # 1. 更新上部系统树
         self.system_tree.clear()
-        counts = self.db.get_counts()
+        counts = self.db.get_counts(self.search_box.show_archived())
         
         static_items = [
             ("全部数据", 'all', 'all_data.svg'), 
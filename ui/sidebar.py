@@ -9,7 +9,7 @@ from PyQt5.QtCore import Qt, pyqtSignal, QSize, QEvent, QTimer
 from PyQt5.QtGui import QFont, QColor, QPixmap, QPainter, QIcon, QCursor
 from core.config import COLORS
 from ui.advanced_tag_selector import AdvancedTagSelector
-from ui.utils import create_svg_icon
+from ui.utils import create_svg_icon, action_span
 from core.settings import load_setting, save_setting
 
 class ClickableLineEdit(QLineEdit):
@@ -77,6 +77,7 @@ class Sidebar(QTreeWidget):
     def refresh(self):
         QTimer.singleShot(10, self.refresh_sync)
 
+    @action_span('sidebar.refresh_sync', 'db')
     def refresh_sync(self):
         current_selection = None
         current_item = self.currentItem()
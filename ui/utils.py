@@ -2,10 +2,15 @@
 # ui/utils.py
 
 import os
+import html
+import functools
 from PyQt5.QtSvg import QSvgRenderer
 from PyQt5.QtCore import Qt, QByteArray
 from PyQt5.QtGui import QPalette, QIcon, QPixmap, QPainter
 from PyQt5.QtWidgets import QApplication
+from core.config import ICON_ATLAS_FILE
+from data.search_index import HL_START, HL_END
+from ui.icon_atlas import IconAtlas
 
 # ==========================================
 # 🎨 专业配色方案 (用于 Icon 智能着色)
@@ -135,6 +140,21 @@ _system_icons = {
 
 # 全局图标缓存
 _icon_cache = {}
+_atlas = None
+
+
+def icon_atlas():
+    """内置图标的共享图集：图标、星级条和提示中的 data URI 都从这里取"""
+    global _atlas
+    if _atlas is None:
+        _atlas = IconAtlas(ICON_ATLAS_FILE, _system_icons)
+    return _atlas
+
+
+def close_icon_atlas():
+    """退出时释放图集的文件映射"""
+    if _atlas is not None: _atlas.close()
+
 
 def create_svg_icon(icon_name, color=None):
     """
@@ -157,6 +177,12 @@ def create_svg_icon(icon_name, color=None):
     if cache_key in _icon_cache:
         return _icon_cache[cache_key]
 
+    pixmap = icon_atlas().pixmap(icon_name, render_color)
+    if pixmap is not None:
+        icon = QIcon(pixmap)
+        _icon_cache[cache_key] = icon
+        return icon
+
     svg_data = ""
     if icon_name in _system_icons:
         svg_data = _system_icons[icon_name]
@@ -192,6 +218,17 @@ def create_svg_icon(icon_name, color=None):
     _icon_cache[cache_key] = icon
     return icon
 
+def star_strip_pixmap(rating, color, star_size=12, spacing=2, dpr=1.0):
+    return icon_atlas().star_strip(rating, color, star_size, spacing, dpr)
+
+
+def icon_img_html(icon_name, color, size=14):
+    """富文本中内嵌的图标 <img>"""
+    uri = icon_atlas().data_uri(icon_name, color, size)
+    if uri is None: return ''
+    return f'<img src="{uri}" width="{size}" height="{size}" style="vertical-align:middle;">'
+
+
 def create_clear_button_icon():
     """
     专门为 QLineEdit 的 clearButton 生成一个经典的 '×' 图标,
@@ -225,4 +262,23 @@ def create_clear_button_icon():
     pixmap.save(icon_path, "PNG")
     
     # 确保 QSS 能正确使用路径
-    return icon_path.replace("\\", "/")
\ No newline at end of file
+    return icon_path.replace("\\", "/")
+
+
+def action_span(name, service_attr='service'):
+    """方法装饰器：在 self.<service_attr> 的查询分析器上为该动作开启一个 span"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with getattr(self, service_attr).span(name):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def highlight_html(marked_text, color='#f1c40f'):
+    """把搜索高亮标记 (HL_START/HL_END) 转成富文本，其余内容做 HTML 转义"""
+    escaped = html.escape(marked_text or '').replace('\n', ' ')
+    return (escaped
+            .replace(HL_START, f'<span style="color:{color}; font-weight:bold;">')
+            .replace(HL_END, '</span>'))